@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+状态存储基准测试
+对比 file / wal / database 三种 StateStorage 在订单写入、订单更新、持仓写入、
+读取和重启恢复上的耗时
+
+用法:
+    python benchmarks/state_storage_benchmark.py --orders 2000 --updates 3
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from quantsys.execution.state_storage import StateStorage, StateStorageFactory
+
+BACKENDS = ("file", "wal", "database")
+
+
+def _create(backend: str, root: Path) -> StateStorage:
+    if backend == "database":
+        return StateStorageFactory.create("database", db_path=str(root / "state.db"))
+    return StateStorageFactory.create(backend, storage_dir=str(root / backend))
+
+
+def _close(storage: StateStorage):
+    close = getattr(storage, "close", None)
+    if close is not None:
+        close()
+
+
+def _timed(func, items) -> list[float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p99_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+        "total_s": sum(ordered),
+    }
+
+
+def run_backend(backend: str, orders: int, updates: int, symbols: int) -> dict[str, dict]:
+    """
+    对一种存储方式跑一轮基准
+
+    Returns:
+        操作名 -> 延迟统计
+    """
+    root = Path(tempfile.mkdtemp(prefix=f"state_bench_{backend}_"))
+    try:
+        storage = _create(backend, root)
+        order_ids = [f"bench-{i:08d}" for i in range(orders)]
+        results = {
+            "save_order": _summary(
+                _timed(
+                    lambda oid: storage.save_order(
+                        {
+                            "order_id": oid,
+                            "symbol": f"SYM{int(oid[-8:]) % symbols}-USDT",
+                            "side": "buy",
+                            "price": 100.0,
+                            "amount": 1.0,
+                            "status": "OPEN",
+                        }
+                    ),
+                    order_ids,
+                )
+            ),
+            "update_order": _summary(
+                _timed(
+                    lambda oid: storage.update_order(oid, {"status": "PARTIAL", "filled": 0.5}),
+                    order_ids * updates,
+                )
+            ),
+            "save_position": _summary(
+                _timed(
+                    lambda i: storage.save_position(
+                        f"SYM{i % symbols}-USDT", {"amount": float(i), "notional": 100.0 * i}
+                    ),
+                    range(orders),
+                )
+            ),
+            "get_order": _summary(_timed(storage.get_order, order_ids)),
+        }
+        _close(storage)
+
+        start = time.perf_counter()
+        reopened = _create(backend, root)
+        recovered = reopened.get_order(order_ids[-1])
+        results["reopen"] = _summary([time.perf_counter() - start])
+        _close(reopened)
+        if not recovered or recovered.get("status") != "PARTIAL":
+            raise AssertionError(f"{backend}: state not recovered after reopen: {recovered}")
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StateStorage benchmark")
+    parser.add_argument("--orders", type=int, default=2000, help="订单数")
+    parser.add_argument("--updates", type=int, default=3, help="每个订单的更新次数")
+    parser.add_argument("--symbols", type=int, default=50, help="持仓品种数")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+
+    report = {
+        backend: run_backend(backend, args.orders, args.updates, args.symbols)
+        for backend in args.backends
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"orders={args.orders} updates/order={args.updates} symbols={args.symbols}")
+    print(f"{'backend':<10}{'operation':<15}{'ops':>8}{'mean_us':>12}{'p50_us':>12}{'p99_us':>12}")
+    for backend, results in report.items():
+        for op, stats in results.items():
+            print(
+                f"{backend:<10}{op:<15}{stats['ops']:>8}{stats['mean_us']:>12.1f}"
+                f"{stats['p50_us']:>12.1f}{stats['p99_us']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+pytest 全局配置
+
+测试收集时会导入 quantsys 包，其 __init__ 会创建日志文件；将日志重定向到临时目录，
+避免在源码树中生成 quant_system.log。
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault(
+    "QUANTSYS_LOG_FILE", os.path.join(tempfile.gettempdir(), "quantsys_test.log")
+)
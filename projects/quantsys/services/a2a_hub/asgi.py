@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+A2A Hub ASGI server
+
+Serves the hub under an ASGI server (uvicorn) instead of the Flask development server.
+
+- Regular endpoints run the Flask WSGI app on a bounded pool of worker threads. All
+  workers share the hub's single writer thread (WriteQueue group commit), deadline
+  scheduler and task notifier, so more workers add request concurrency without adding
+  SQLite writers.
+- Agent delivery endpoints (/api/task/next?wait=N, /api/task/stream) are served on the
+  event loop: a parked agent awaits its notifier key instead of pinning a worker thread,
+  so idle agents cost no threads. Dispatch attempts still run on the worker pool and
+  claims still go through the shared writer.
+- The lifespan protocol runs main.start_hub() on startup and main.stop_hub() on shutdown.
+
+Run one server process: SQLite has one writer, and the write queue, deadline heap and
+notifier live in process memory. Scale with --threads, not with uvicorn --workers.
+
+Usage:
+    python asgi.py [--host 0.0.0.0] [--port 5001] [--threads 32]
+    uvicorn asgi:application --port 5001    (from this directory)
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+try:
+    from . import main as hub
+except ImportError:
+    import main as hub
+
+ASGI_CONFIG = {
+    # Worker threads running Flask handlers and dispatch attempts
+    "threads": int(os.environ.get("A2A_HUB_ASGI_THREADS", "32")),
+}
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ for an ASGI http scope and its buffered request body."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").lower()
+        value = raw_value.decode("latin-1")
+        if name == "content-length":
+            continue
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+            continue
+        key = "HTTP_" + name.upper().replace("-", "_")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class HubASGIApp:
+    """
+    ASGI application wrapping the hub's Flask app.
+    """
+
+    def __init__(self, wsgi_app, threads=32):
+        """
+        Args:
+            wsgi_app: The Flask application (main.app)
+            threads: Number of worker threads
+        """
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self._executor = None
+
+    @property
+    def executor(self):
+        """Worker thread pool (created on first use so --threads can still change it)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix="a2a-hub-worker"
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run a blocking hub function on a worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        handled = False
+        if scope["method"] == "GET" and scope["path"] == "/api/task/next":
+            handled = await self._next_task(scope, send)
+        elif scope["method"] == "GET" and scope["path"] == "/api/task/stream":
+            handled = await self._stream_tasks(scope, receive, send)
+        if not handled:
+            await self._call_wsgi(scope, receive, send)
+
+    # ------------------------------------------------------------------ lifespan
+
+    def startup(self):
+        """Check secrets, initialize the database and start the background services."""
+        hub.check_required_secrets()
+        hub.start_hub()
+        print(f"A2A Hub ASGI server ready ({self.threads} worker threads, one writer)")
+
+    def shutdown(self):
+        """Stop background services and the worker pool."""
+        hub.stop_hub()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await loop.run_in_executor(None, self.startup)
+                except (Exception, SystemExit) as e:
+                    await send({"type": "lifespan.startup.failed", "message": repr(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await loop.run_in_executor(None, self.shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ------------------------------------------------------------------ WSGI bridge
+
+    async def _call_wsgi(self, scope, receive, send):
+        """Run the Flask app on a worker thread and relay its (possibly streamed) response."""
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+
+        def emit(message):
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        environ = build_environ(scope, b"".join(chunks))
+        worker = loop.run_in_executor(self.executor, self._run_wsgi, environ, emit)
+        while True:
+            message = await messages.get()
+            await send(message)
+            if message["type"] == "http.response.body" and not message["more_body"]:
+                break
+        await worker
+
+    def _run_wsgi(self, environ, emit):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+            ]
+            return write
+
+        def write(data):
+            if not response.get("sent"):
+                response["sent"] = True
+                emit(
+                    {
+                        "type": "http.response.start",
+                        "status": response["status"],
+                        "headers": response["headers"],
+                    }
+                )
+            if data:
+                emit({"type": "http.response.body", "body": data, "more_body": True})
+
+        try:
+            result = self.wsgi_app(environ, start_response)
+            try:
+                for data in result:
+                    if data:
+                        write(data)
+            finally:
+                close = getattr(result, "close", None)
+                if close is not None:
+                    close()
+            write(b"")
+        except Exception:
+            if not response.get("sent"):
+                response["status"] = 500
+                response["headers"] = [(b"content-type", b"text/plain; charset=utf-8")]
+                write(b"Internal Server Error")
+            emit({"type": "http.response.body", "body": b"", "more_body": False})
+            raise
+        emit({"type": "http.response.body", "body": b"", "more_body": False})
+
+    # ------------------------------------------------------------------ agent delivery
+
+    async def _authorize(self, scope, send):
+        """RBAC check for natively served endpoints; sends the 403 and returns False if denied."""
+        headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        }
+        role = headers.get("x-a2a-role", "submitter")
+        token = headers.get("x-a2a-token", "")
+        denied = hub.authorize_request(role, token, scope["path"], scope["method"])
+        if denied is None:
+            return True
+        await self._send_json(send, 403, denied)
+        return False
+
+    async def _send_json(self, send, status, body):
+        # Same encoding as flask.jsonify (sorted keys, compact separators)
+        payload = (hub.app.json.dumps(body, separators=(",", ":")) + "\n").encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": payload, "more_body": False})
+
+    @staticmethod
+    def _query_args(scope):
+        args = {}
+        for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), True):
+            args.setdefault(name, value)
+        return args
+
+    async def _next_task(self, scope, send):
+        """
+        Long-poll /api/task/next?wait=N on the event loop.
+
+        Returns False to leave the request to the Flask route (no wait, missing agent_id,
+        invalid wait, unknown agent), which produces the usual responses.
+        """
+        args = self._query_args(scope)
+        agent_id = args.get("agent_id")
+        try:
+            wait = float(args.get("wait", 0))
+        except ValueError:
+            return False
+        if not math.isfinite(wait):
+            return False
+        wait = min(max(wait, 0.0), hub.TASK_DELIVERY_CONFIG["max_wait"])
+        if not agent_id or not wait > 0:
+            return False
+        if not await self._authorize(scope, send):
+            return True
+
+        agent_owner_role = await self.run(hub.get_agent_owner_role, agent_id)
+        if agent_owner_role is None:
+            return False
+
+        key = (agent_owner_role, agent_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            # Read the version before dispatching so work queued in between is not missed
+            version = hub.task_notifier.version(key)
+            body = await self.run(hub.dispatch_next_task, agent_id, agent_owner_role)
+            remaining = deadline - loop.time()
+            if body["task"] or remaining <= 0:
+                await self._send_json(send, 200, body)
+                return True
+            await hub.task_notifier.wait_async(key, version, remaining)
+
+    async def _stream_tasks(self, scope, receive, send):
+        """
+        Server-Sent Events push channel on the event loop (same events as main.stream_tasks).
+        A claimed task whose event cannot be written is released (_send_task).
+
+        Returns False to leave missing/unknown agents to the Flask route.
+        """
+        agent_id = self._query_args(scope).get("agent_id")
+        if not agent_id:
+            return False
+        if not await self._authorize(scope, send):
+            return True
+
+        agent_owner_role = await self.run(hub.get_agent_owner_role, agent_id)
+        if agent_owner_role is None:
+            return False
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        key = (agent_owner_role, agent_id)
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream; charset=utf-8"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            await self._send_event(send, "retry: 3000\n\n")
+            # The first attempt re-delivers a task leased before a reconnect (ACK recovery)
+            redeliver = True
+            while not disconnected.done():
+                version = hub.task_notifier.version(key)
+                body = await self.run(hub.dispatch_next_task, agent_id, agent_owner_role, redeliver)
+                redeliver = False
+                if body["task"]:
+                    await self._send_task(send, body, agent_id, disconnected)
+                    continue
+                waiter = asyncio.ensure_future(
+                    hub.task_notifier.wait_async(
+                        key, version, hub.TASK_DELIVERY_CONFIG["keepalive_interval"]
+                    )
+                )
+                await asyncio.wait({waiter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not waiter.done():
+                    waiter.cancel()
+                    break
+                if not waiter.result():
+                    await self._send_event(send, ": keepalive\n\n")
+        finally:
+            disconnected.cancel()
+        return True
+
+    async def _send_task(self, send, body, agent_id, disconnected):
+        """
+        Push a claimed task; release the claim if the event cannot be written.
+
+        The claim is released when the client disconnected before the send or the send
+        raised. An event lost after a successful send is recovered like a lost ACK
+        (re-delivery on reconnect/poll, or lease expiry).
+        """
+        task_id = body["task"]["id"]
+        if disconnected.done():
+            await self.run(hub.release_task_claim, task_id, agent_id)
+            return
+        try:
+            await self._send_event(send, f"event: task\ndata: {json.dumps(body)}\n\n")
+        except (Exception, asyncio.CancelledError):
+            # Not awaited: the stream may be cancelled, the worker finishes the release
+            self.executor.submit(hub.release_task_claim, task_id, agent_id)
+            raise
+
+    @staticmethod
+    async def _send_event(send, text):
+        await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+
+
+application = HubASGIApp(hub.app, threads=ASGI_CONFIG["threads"])
+
+
+def main():
+    """Run the hub under uvicorn."""
+    parser = argparse.ArgumentParser(description="A2A Hub ASGI server")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=5001, help="Bind port")
+    parser.add_argument(
+        "--threads", type=int, default=ASGI_CONFIG["threads"], help="Worker threads"
+    )
+    parser.add_argument("--log-level", default="info", help="uvicorn log level")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is required for the ASGI server: pip install -r requirements.txt")
+        return 1
+
+    application.threads = args.threads
+    print("Starting A2A Hub (ASGI)...")
+    print(f"Database: {hub.DB_PATH}")
+    # A single process on purpose: the writer queue, deadline heap and notifier are in memory
+    uvicorn.run(application, host=args.host, port=args.port, log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
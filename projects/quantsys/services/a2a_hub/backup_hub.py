@@ -13,11 +13,21 @@ Options:
 import argparse
 import datetime
 import os
-import shutil
 import sqlite3
 import sys
 
 
+def copy_database(src_path, dst_path):
+    """Copy a SQLite database with the backup API (includes pages still in the WAL file)"""
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
 def main():
     """Main function for backup script"""
     parser = argparse.ArgumentParser(description="A2A Hub State Backup Script")
@@ -50,8 +60,8 @@ def main():
 
         # Perform backup
         print("开始备份...")
-        # Use shutil.copy2 to preserve metadata
-        shutil.copy2(db_path, backup_path)
+        # The hub runs in WAL mode: a plain file copy could miss committed pages
+        copy_database(db_path, backup_path)
 
         # Verify backup
         if os.path.exists(backup_path):
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""A2A Hub SQLite 负载基准
+
+Drives concurrent heartbeats and task claims through the real Flask handlers
+(/api/task/heartbeat, /api/task/next) against a throw-away database and reports
+throughput, latency percentiles and "database is locked" errors.
+
+Two modes are compared:
+    legacy  one sqlite3.connect() per request, rollback journal, commit per request
+    pooled  ConnectionPool (WAL, synchronous=NORMAL) + WriteQueue group commit
+
+Usage:
+    python benchmark_db_load.py [--agents 200] [--tasks 20000] [--threads 64] [--duration 10]
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main as hub
+
+ROLE = "Benchmark Engineer"
+HEADERS = {"X-A2A-Role": "admin"}
+
+
+class LegacyWriteQueue:
+    """Previous behaviour: every write runs on its own connection and commits alone."""
+
+    def submit(self, job, timeout=None):
+        conn = sqlite3.connect(hub.DB_PATH)
+        try:
+            result = job(conn.cursor())
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+
+def seed_database(db_path, agents, tasks):
+    """Create the schema and enqueue `tasks` PENDING tasks spread over `agents` agents."""
+    hub.DB_PATH = db_path
+    hub.init_db()
+    now = datetime.datetime.utcnow()
+    now_ts = now.isoformat() + "Z"
+    agent_ids = [f"bench-agent-{i}" for i in range(agents)]
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        """
+    INSERT INTO agents (
+        id, agent_id, owner_role, capabilities, online, last_seen, allowed_tools,
+        created_at, updated_at, capacity, available_capacity, completion_window_start
+    )
+    VALUES (?, ?, ?, '[]', 1, ?, '[]', ?, ?, 1000, 1000, ?)
+    """,
+        [
+            (str(uuid.uuid4()), agent_id, ROLE, now_ts, now_ts, now_ts, now_ts)
+            for agent_id in agent_ids
+        ],
+    )
+    conn.executemany(
+        """
+    INSERT INTO tasks (id, task_code, instructions, owner_role, status, created_at, updated_at,
+                       agent_id, priority, lease_seconds)
+    VALUES (?, ?, 'benchmark', ?, 'PENDING', ?, ?, ?, ?, 600)
+    """,
+        [
+            (
+                str(uuid.uuid4()),
+                f"BENCH-{i}",
+                ROLE,
+                (now + datetime.timedelta(microseconds=i)).isoformat() + "Z",
+                now_ts,
+                agent_ids[i % agents],
+                i % 4,
+            )
+            for i in range(tasks)
+        ],
+    )
+    conn.commit()
+    conn.close()
+    return agent_ids
+
+
+def run_load(mode, agents, tasks, threads, duration, heartbeat_ratio):
+    """Run one benchmark mode and return its statistics."""
+    state_dir = tempfile.mkdtemp(prefix=f"a2a_bench_{mode}_")
+    db_path = os.path.join(state_dir, "a2a_hub.db")
+    hub.get_db_connection = original_get_db_connection
+    hub.get_write_queue = original_get_write_queue
+    agent_ids = seed_database(db_path, agents, tasks)
+    hub.close_db_pools()
+
+    if mode == "legacy":
+        # Emulate the per-request connections and commits the handlers used before
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        hub.get_db_connection = lambda: sqlite3.connect(hub.DB_PATH)
+        hub.get_write_queue = LegacyWriteQueue
+
+    # Let handler exceptions ("database is locked") reach the client instead of a bare 500
+    hub.app.config["PROPAGATE_EXCEPTIONS"] = True
+    claimed = {agent_id: [] for agent_id in agent_ids}
+    latencies = {"heartbeat": [], "claim": []}
+    errors = {"locked": 0, "other": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        client = hub.app.test_client()
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            agent_id = rng.choice(agent_ids)
+            with lock:
+                held = list(claimed[agent_id])
+            kind = "heartbeat" if held and rng.random() < heartbeat_ratio else "claim"
+            started = time.perf_counter()
+            try:
+                if kind == "heartbeat":
+                    response = client.post(
+                        "/api/task/heartbeat", json={"task_id": rng.choice(held)}, headers=HEADERS
+                    )
+                else:
+                    response = client.get(f"/api/task/next?agent_id={agent_id}", headers=HEADERS)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors["locked" if "locked" in str(e) else "other"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            body = response.get_json() or {}
+            with lock:
+                if response.status_code >= 500:
+                    errors["other"] += 1
+                    continue
+                latencies[kind].append(elapsed)
+                task = body.get("task") if kind == "claim" else None
+                if task and task["id"] not in claimed[agent_id]:
+                    claimed[agent_id].append(task["id"])
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    hub.close_db_pools()
+
+    conn = sqlite3.connect(db_path)
+    running = conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'RUNNING'").fetchone()[0]
+    conn.close()
+
+    stats = {"mode": mode, "running_tasks": running, "errors": errors}
+    total = 0
+    for kind, values in latencies.items():
+        values.sort()
+        total += len(values)
+        stats[kind] = {
+            "count": len(values),
+            "p50_ms": round(values[len(values) // 2] * 1000, 2) if values else None,
+            "p99_ms": round(values[int(len(values) * 0.99)] * 1000, 2) if values else None,
+        }
+    stats["ops_per_sec"] = round(total / duration, 1)
+    return stats
+
+
+original_get_db_connection = hub.get_db_connection
+original_get_write_queue = hub.get_write_queue
+
+
+def main():
+    """Main function for the benchmark"""
+    parser = argparse.ArgumentParser(description="A2A Hub SQLite load benchmark")
+    parser.add_argument("--agents", type=int, default=200, help="Number of agents")
+    parser.add_argument("--tasks", type=int, default=20000, help="Queued PENDING tasks")
+    parser.add_argument("--threads", type=int, default=64, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    parser.add_argument(
+        "--heartbeat-ratio", type=float, default=0.8, help="Share of heartbeats vs claims"
+    )
+    parser.add_argument(
+        "--mode", choices=["legacy", "pooled", "both"], default="both", help="Mode to run"
+    )
+    args = parser.parse_args()
+
+    modes = ["legacy", "pooled"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        stats = run_load(
+            mode, args.agents, args.tasks, args.threads, args.duration, args.heartbeat_ratio
+        )
+        print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
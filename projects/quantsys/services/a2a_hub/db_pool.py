@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+A2A Hub SQLite access layer
+
+- ConnectionPool: reusable connections configured for WAL journaling,
+  synchronous=NORMAL and a busy timeout. Each connection keeps its own
+  prepared-statement cache, which is only useful because connections are reused.
+- WriteQueue: one writer thread that runs queued write jobs and commits everything
+  that arrived while the previous commit was in flight as a single transaction
+  (group commit). Hot write paths (heartbeats, task claims) no longer fight over the
+  SQLite write lock, so they stop failing with "database is locked".
+  The ASGI server reaches the writer from its worker threads (dispatch attempts run
+  there), so submit() is the only entry point.
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+
+class PooledConnection:
+    """
+    sqlite3.Connection proxy whose close() hands the connection back to its pool.
+
+    Everything else (cursor, execute, commit, rollback, row_factory, ...) is delegated,
+    so request handlers keep the usual connect / commit / close pattern.
+    """
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """
+    Pool of SQLite connections for one database file.
+
+    Connections are created with check_same_thread=False and handed to one thread at a
+    time: the Flask development server starts a new thread per request, so a pure
+    thread-local cache would never be reused.
+    """
+
+    def __init__(self, db_path, max_idle=32, busy_timeout_ms=5000, cached_statements=256):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created = 0
+
+    def connect(self):
+        """Open a new raw connection with the hub pragmas applied."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        # WAL lets readers run alongside the single writer; NORMAL only syncs at checkpoints
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def acquire(self):
+        """Borrow a connection; close() on the returned proxy gives it back."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Return a raw connection, dropping any transaction the borrower left open."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn.close()
+            return
+        if self._closed or self._idle.qsize() >= self.max_idle:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close every idle connection; connections still borrowed are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class WriteQueue:
+    """
+    Single-writer queue with group commit.
+
+    submit(job) runs job(cursor) on the writer thread and returns its result once the
+    batch containing it has been committed. Each job runs inside its own SAVEPOINT, so
+    a failing job is rolled back and re-raised to its caller without affecting the
+    rest of the batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, pool, max_batch=64):
+        self.pool = pool
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs_committed = 0
+
+    def submit(self, job, timeout=None):
+        """Queue a write job and wait for its committed result."""
+        future = Future()
+        self._ensure_started()
+        self._jobs.put((job, future))
+        return future.result(timeout)
+
+    def stop(self):
+        """Stop the writer thread after the queued jobs have been committed."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._jobs.put(self._STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="a2a-hub-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._jobs.get()]
+        while len(batch) < self.max_batch and batch[-1] is not self._STOP:
+            try:
+                batch.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self.pool.connect()
+        conn.isolation_level = None  # transactions are managed explicitly below
+        cursor = conn.cursor()
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is self._STOP
+                if stop:
+                    batch.pop()
+                if batch:
+                    self._commit_batch(cursor, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit_batch(self, cursor, batch):
+        outcomes = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for job, _future in batch:
+                cursor.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((True, job(cursor)))
+                    cursor.execute("RELEASE job")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO job")
+                    cursor.execute("RELEASE job")
+                    outcomes.append((False, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if cursor.connection.in_transaction:
+                cursor.execute("ROLLBACK")
+            for _job, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.jobs_committed += len(batch)
+        for (_job, future), (ok, value) in zip(batch, outcomes, strict=True):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
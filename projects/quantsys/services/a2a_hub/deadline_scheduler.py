@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+A2A Hub deadline scheduler
+
+In-memory min-heap of (deadline, kind, key) entries served by one thread. The thread
+sleeps until the earliest deadline (or until an earlier one is scheduled), then hands
+only the due keys to the handler registered for their kind. Background work therefore
+scales with the number of deadlines that pass, not with the size of the queue.
+
+- schedule() replaces the previous deadline of a (kind, key); superseded heap entries
+  are skipped lazily when they surface.
+- A handler receives the due keys of its kind and returns {key: next_deadline} for the
+  keys that need to be looked at again (None or a missing key means done).
+- Deadlines are epoch seconds (time.time()).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """
+    Min-heap timer scheduler with per-kind batch handlers.
+    """
+
+    def __init__(self, retry_delay=1.0, max_batch=500, clock=time.time):
+        """
+        Args:
+            retry_delay: Seconds before due keys are retried when their handler raised
+            max_batch: Max keys passed to one handler call
+            clock: Time function returning epoch seconds
+        """
+        self.retry_delay = retry_delay
+        self.max_batch = max_batch
+        self._clock = clock
+        self._heap = []
+        self._deadlines = {}
+        self._handlers = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.fired = 0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def register(self, kind, handler):
+        """Register handler(keys) -> {key: next_deadline} for a deadline kind."""
+        self._handlers[kind] = handler
+
+    def schedule(self, kind, key, deadline):
+        """Set (or move) the deadline of a key."""
+        with self._cond:
+            self._deadlines[(kind, key)] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._seq), kind, key))
+            if self._heap[0][2:] == (kind, key):
+                self._cond.notify()
+
+    def cancel(self, kind, key):
+        """Forget the deadline of a key (its heap entry is dropped when it surfaces)."""
+        with self._cond:
+            self._deadlines.pop((kind, key), None)
+
+    def pending(self, kind=None):
+        """Number of live deadlines (of one kind, or all)."""
+        with self._cond:
+            if kind is None:
+                return len(self._deadlines)
+            return sum(1 for entry_kind, _key in self._deadlines if entry_kind == kind)
+
+    def start(self):
+        """Start the scheduler thread."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="a2a-hub-deadlines", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread; scheduled deadlines are kept."""
+        with self._cond:
+            thread = self._thread
+            self._thread = None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+    def _pop_due(self):
+        """Wait for the next deadline and pop every entry that is due, grouped by kind."""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                now = self._clock()
+                if self._heap and self._heap[0][0] <= now:
+                    break
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+
+            due = {}
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _seq, kind, key = heapq.heappop(self._heap)
+                if self._deadlines.get((kind, key)) != deadline:
+                    continue  # superseded or cancelled
+                del self._deadlines[(kind, key)]
+                due.setdefault(kind, []).append(key)
+            return due
+
+    def _run(self):
+        while True:
+            due = self._pop_due()
+            if due is None:
+                return
+            for kind, keys in due.items():
+                self.fired += len(keys)
+                handler = self._handlers.get(kind)
+                if handler is None:
+                    continue
+                for start in range(0, len(keys), self.max_batch):
+                    self._dispatch(kind, handler, keys[start : start + self.max_batch])
+
+    def _dispatch(self, kind, handler, keys):
+        try:
+            next_deadlines = handler(keys) or {}
+        except Exception as e:
+            print(f"Error handling {kind} deadlines: {e}")
+            retry_at = self._clock() + self.retry_delay
+            next_deadlines = dict.fromkeys(keys, retry_at)
+        for key, deadline in next_deadlines.items():
+            if deadline is not None:
+                self.schedule(kind, key, deadline)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""A2A Hub HTTP 负载测试
+
+Drives the full task lifecycle against a running hub (python main.py or python asgi.py)
+and reports per-operation throughput and latency percentiles:
+
+    create     producers POST /api/task/create
+    claim      agents GET /api/task/next?agent_id=...&wait=N (long-poll)
+    heartbeat  agents POST /api/task/heartbeat for each claimed task
+    result     agents POST /api/task/result with status DONE
+
+Agents are registered under a fresh owner_role per run, so runs do not interfere with
+each other, but the tasks stay in the database: point it at a throw-away hub.
+Creates rejected because every agent is at capacity (AGENT_QUOTA_EXCEEDED) are counted
+as backpressure and retried after a short pause.
+
+Usage:
+    python load_test_hub.py [--url http://127.0.0.1:5001] [--agents 50] [--producers 8]
+                            [--duration 30] [--heartbeats 2] [--capacity 4] [--wait 5]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+HEADERS = {"X-A2A-Role": "admin"}
+OPERATIONS = ["create", "claim", "heartbeat", "result"]
+
+
+class LoadStats:
+    """Thread-safe latency and error counters per operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.errors = dict.fromkeys(OPERATIONS, 0)
+        self.backpressure = 0
+        self.empty_polls = 0
+
+    def record(self, op, elapsed):
+        with self._lock:
+            self.latencies[op].append(elapsed)
+
+    def error(self, op):
+        with self._lock:
+            self.errors[op] += 1
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def report(self, duration):
+        report = {"duration_sec": round(duration, 2)}
+        for op in OPERATIONS:
+            values = sorted(self.latencies[op])
+            report[op] = {
+                "count": len(values),
+                "ops_per_sec": round(len(values) / duration, 1),
+                "p50_ms": round(values[len(values) // 2] * 1000, 2) if values else None,
+                "p99_ms": round(values[int(len(values) * 0.99)] * 1000, 2) if values else None,
+            }
+        report["errors"] = self.errors
+        report["backpressure"] = self.backpressure
+        report["empty_polls"] = self.empty_polls
+        return report
+
+
+def timed(session, stats, op, method, url, **kwargs):
+    """
+    Issue one request.
+
+    Returns:
+        (status_code, (body, seconds)), or (None, None) on a transport error (counted)
+    """
+    started = time.perf_counter()
+    try:
+        response = session.request(method, url, headers=HEADERS, **kwargs)
+        body = response.json()
+    except (requests.RequestException, ValueError):
+        stats.error(op)
+        return None, None
+    elapsed = time.perf_counter() - started
+    return response.status_code, (body, elapsed)
+
+
+def register_agents(url, owner_role, agents, capacity):
+    """Register the load-test agents and return their ids."""
+    session = requests.Session()
+    agent_ids = [f"{owner_role}-agent-{i}" for i in range(agents)]
+    for agent_id in agent_ids:
+        response = session.post(
+            f"{url}/api/agent/register",
+            json={
+                "agent_id": agent_id,
+                "owner_role": owner_role,
+                "capabilities": [],
+                "allowed_tools": [],
+                "capacity": capacity,
+                "completion_limit_per_minute": 1000000,
+            },
+            headers=HEADERS,
+        )
+        response.raise_for_status()
+    return agent_ids
+
+
+def producer(url, owner_role, stats, stop):
+    """Create tasks as fast as the hub accepts them."""
+    session = requests.Session()
+    while not stop.is_set():
+        message_id = str(uuid.uuid4())
+        status, outcome = timed(
+            session,
+            stats,
+            "create",
+            "POST",
+            f"{url}/api/task/create",
+            json={
+                "task_code": f"LOAD-{message_id[:8]}",
+                "message_id": message_id,
+                "area": "load_test",
+                "owner_role": owner_role,
+                "instructions": "load test task",
+                "how_to_repro": "n/a",
+                "expected": "n/a",
+                "evidence_requirements": "n/a",
+            },
+        )
+        if outcome is None:
+            continue
+        body, elapsed = outcome
+        if status == 200 and body.get("success"):
+            stats.record("create", elapsed)
+        elif body.get("reason_code") == "AGENT_QUOTA_EXCEEDED":
+            stats.count("backpressure")
+            time.sleep(0.01)
+        else:
+            stats.error("create")
+
+
+def agent(url, agent_id, heartbeats, wait, stats, stop):
+    """Claim, heartbeat and complete tasks for one agent."""
+    session = requests.Session()
+    while not stop.is_set():
+        status, outcome = timed(
+            session,
+            stats,
+            "claim",
+            "GET",
+            f"{url}/api/task/next",
+            params={"agent_id": agent_id, "wait": wait},
+        )
+        if outcome is None:
+            continue
+        body, elapsed = outcome
+        if status != 200:
+            stats.error("claim")
+            continue
+        task = body.get("task")
+        if not task:
+            stats.count("empty_polls")
+            continue
+        stats.record("claim", elapsed)
+
+        for _ in range(heartbeats):
+            status, outcome = timed(
+                session,
+                stats,
+                "heartbeat",
+                "POST",
+                f"{url}/api/task/heartbeat",
+                json={"task_id": task["id"]},
+            )
+            if outcome is not None and status == 200:
+                stats.record("heartbeat", outcome[1])
+            elif outcome is not None:
+                stats.error("heartbeat")
+
+        status, outcome = timed(
+            session,
+            stats,
+            "result",
+            "POST",
+            f"{url}/api/task/result",
+            json={"task_id": task["id"], "status": "DONE", "result": {"load_test": True}},
+        )
+        if outcome is not None and status == 200:
+            stats.record("result", outcome[1])
+        elif outcome is not None:
+            stats.error("result")
+
+
+def run_load_test(url, agents, producers, duration, heartbeats, capacity, wait):
+    """Run one load test against `url` and return the report."""
+    owner_role = f"load-{uuid.uuid4().hex[:8]}"
+    agent_ids = register_agents(url, owner_role, agents, capacity)
+    stats = LoadStats()
+    stop = threading.Event()
+
+    threads = [
+        threading.Thread(target=producer, args=(url, owner_role, stats, stop))
+        for _ in range(producers)
+    ]
+    threads += [
+        threading.Thread(target=agent, args=(url, agent_id, heartbeats, wait, stats, stop))
+        for agent_id in agent_ids
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    # Agents parked in a long-poll finish their current wait before exiting
+    for thread in threads:
+        thread.join()
+
+    report = stats.report(elapsed)
+    report["url"] = url
+    report["owner_role"] = owner_role
+    report["agents"] = agents
+    report["producers"] = producers
+    return report
+
+
+def main():
+    """Main function for the load test"""
+    parser = argparse.ArgumentParser(description="A2A Hub HTTP load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5001", help="Hub base URL")
+    parser.add_argument("--agents", type=int, default=50, help="Agent threads")
+    parser.add_argument("--producers", type=int, default=8, help="Task producer threads")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--heartbeats", type=int, default=2, help="Heartbeats per task")
+    parser.add_argument("--capacity", type=int, default=4, help="Open tasks per agent")
+    parser.add_argument("--wait", type=float, default=5.0, help="Long-poll seconds per claim")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        args.url.rstrip("/"),
+        args.agents,
+        args.producers,
+        args.duration,
+        args.heartbeats,
+        args.capacity,
+        args.wait,
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,11 +13,23 @@ Storage: SQLite database in tools/a2a_hub/state/
 import datetime
 import hashlib
 import json
+import math
 import os
 import sqlite3
+import threading
+import time
 import uuid
 
-from flask import Flask, g, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+
+try:
+    from .db_pool import ConnectionPool, WriteQueue
+    from .deadline_scheduler import DeadlineScheduler
+    from .task_notifier import TaskNotifier
+except ImportError:
+    from db_pool import ConnectionPool, WriteQueue
+    from deadline_scheduler import DeadlineScheduler
+    from task_notifier import TaskNotifier
 
 app = Flask(__name__)
 
@@ -66,6 +78,30 @@ metrics = {"tasks_created": 0, "tasks_done": 0, "tasks_fail": 0, "queue_depth":
 STATE_DIR = os.path.join(os.path.dirname(__file__), "state")
 DB_PATH = os.path.join(STATE_DIR, "a2a_hub.db")
 
+# SQLite connection pool / writer queue configuration
+DB_POOL_CONFIG = {
+    "max_idle": 32,  # Idle connections kept for reuse
+    "busy_timeout_ms": 5000,  # How long a connection waits for the write lock
+    "cached_statements": 256,  # Prepared statements cached per connection
+    "write_batch_size": 64,  # Max write jobs committed in one transaction
+}
+
+_db_pools = {}
+_write_queues = {}
+_db_pools_lock = threading.Lock()
+
+# Lease expiry / priority aging deadlines (armed by the handlers, started in __main__)
+deadline_scheduler = DeadlineScheduler()
+
+# Push / long-poll task delivery
+TASK_DELIVERY_CONFIG = {
+    "max_wait": 60,  # Longest long-poll wait accepted on /api/task/next (seconds)
+    "keepalive_interval": 15,  # SSE keep-alive comment interval on /api/task/stream (seconds)
+}
+
+# Idle agents park here until work becomes ready for their (owner_role, agent_id)
+task_notifier = TaskNotifier()
+
 # Secret key for artifact signing (from environment variable)
 # No default - must be set via environment variable
 SECRET_KEY = os.environ.get("A2A_HUB_SECRET_KEY")
@@ -155,6 +191,43 @@ def get_required_permission(endpoint, method):
 os.makedirs(STATE_DIR, exist_ok=True)
 
 
+def authorize_request(role, token, endpoint, method):
+    """
+    RBAC check for one request.
+
+    Returns:
+        None if allowed, otherwise the 403 response body (the denial is logged)
+    """
+    # Get required permission for the endpoint
+    required_permission = get_required_permission(endpoint, method)
+
+    # Check if the role has the required permission
+    if check_permission(role, required_permission):
+        return None
+
+    # Log the unauthorized access attempt with hashed token
+    hashed_token = get_hashed_identity(token)
+    now = datetime.datetime.utcnow().isoformat() + "Z"
+    log_entry = {
+        "timestamp": now,
+        "level": "ERROR",
+        "component": "rbac",
+        "event": "UNAUTHORIZED_ACCESS",
+        "role": role,
+        "endpoint": endpoint,
+        "token_hash": hashed_token,
+        "reason_code": "acl_denied",
+        "message": f"Role {role} does not have permission {required_permission} for endpoint {endpoint}",
+    }
+    print(json.dumps(log_entry))
+
+    return {
+        "success": False,
+        "error": f"Role {role} does not have permission {required_permission}",
+        "reason_code": "acl_denied",
+    }
+
+
 # Authentication and Authorization Middleware
 @app.before_request
 def before_request():
@@ -169,36 +242,9 @@ def before_request():
     role = get_user_role()
     token = get_user_token()
 
-    # Get required permission for the endpoint
-    endpoint = request.path
-    method = request.method
-    required_permission = get_required_permission(endpoint, method)
-
-    # Check if the role has the required permission
-    if not check_permission(role, required_permission):
-        # Log the unauthorized access attempt with hashed token
-        hashed_token = get_hashed_identity(token)
-        now = datetime.datetime.utcnow().isoformat() + "Z"
-        log_entry = {
-            "timestamp": now,
-            "level": "ERROR",
-            "component": "rbac",
-            "event": "UNAUTHORIZED_ACCESS",
-            "role": role,
-            "endpoint": endpoint,
-            "token_hash": hashed_token,
-            "reason_code": "acl_denied",
-            "message": f"Role {role} does not have permission {required_permission} for endpoint {endpoint}",
-        }
-        print(json.dumps(log_entry))
-
-        return jsonify(
-            {
-                "success": False,
-                "error": f"Role {role} does not have permission {required_permission}",
-                "reason_code": "acl_denied",
-            }
-        ), 403
+    denied = authorize_request(role, token, request.path, request.method)
+    if denied is not None:
+        return jsonify(denied), 403
 
     # Store user information in g for use in routes
     g.user_role = role
@@ -274,10 +320,57 @@ def verify_artifact_signature(artifact):
     return True, None, "Signature verified successfully"
 
 
+def get_db_pool():
+    """Get the connection pool for the current DB_PATH (created on first use)."""
+    pool = _db_pools.get(DB_PATH)
+    if pool is None:
+        with _db_pools_lock:
+            pool = _db_pools.get(DB_PATH)
+            if pool is None:
+                pool = ConnectionPool(
+                    DB_PATH,
+                    max_idle=DB_POOL_CONFIG["max_idle"],
+                    busy_timeout_ms=DB_POOL_CONFIG["busy_timeout_ms"],
+                    cached_statements=DB_POOL_CONFIG["cached_statements"],
+                )
+                _db_pools[DB_PATH] = pool
+    return pool
+
+
+def get_db_connection():
+    """Borrow a pooled connection (WAL, synchronous=NORMAL, busy timeout); close() returns it."""
+    return get_db_pool().acquire()
+
+
+def get_write_queue():
+    """Get the single-writer queue for the current DB_PATH (group-commits hot write paths)."""
+    write_queue = _write_queues.get(DB_PATH)
+    if write_queue is None:
+        pool = get_db_pool()
+        with _db_pools_lock:
+            write_queue = _write_queues.get(DB_PATH)
+            if write_queue is None:
+                write_queue = WriteQueue(pool, max_batch=DB_POOL_CONFIG["write_batch_size"])
+                _write_queues[DB_PATH] = write_queue
+    return write_queue
+
+
+def close_db_pools():
+    """Stop the writer threads and close all pooled connections."""
+    with _db_pools_lock:
+        write_queues = list(_write_queues.values())
+        pools = list(_db_pools.values())
+        _write_queues.clear()
+        _db_pools.clear()
+    for write_queue in write_queues:
+        write_queue.stop()
+    for pool in pools:
+        pool.close_all()
+
+
 def init_db():
     """Initialize the database."""
-    conn = sqlite3.connect(DB_PATH, timeout=10)
-    conn.execute("PRAGMA busy_timeout = 5000")
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Create tasks table
@@ -308,7 +401,8 @@ def init_db():
         routing_decision TEXT,
         trace_id TEXT,
         dependencies TEXT,
-        message_id TEXT
+        message_id TEXT,
+        unresolved_deps INTEGER DEFAULT 0
     )
     """)
 
@@ -318,6 +412,9 @@ def init_db():
     task_columns = [column[1] for column in cursor.fetchall()]
     if "message_id" not in task_columns:
         cursor.execute("ALTER TABLE tasks ADD COLUMN message_id TEXT")
+    # Ensure tasks has unresolved_deps (dependency readiness counter)
+    if "unresolved_deps" not in task_columns:
+        cursor.execute("ALTER TABLE tasks ADD COLUMN unresolved_deps INTEGER DEFAULT 0")
 
     # Switch idempotency key: message_id (task_code is display label only)
     # Drop old task_code unique index if it exists
@@ -335,6 +432,57 @@ def init_db():
         "CREATE UNIQUE INDEX IF NOT EXISTS idx_message_id_unique ON tasks (message_id) WHERE message_id IS NOT NULL"
     )
 
+    # Dispatch index: /api/task/next walks it in (priority DESC, created_at ASC) order
+    # for one agent's queue and stops at the first claimable row.
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_dispatch "
+        "ON tasks (status, agent_id, owner_role, priority DESC, created_at)"
+    )
+
+    # Deadline scheduler rebuild: RUNNING leases and PENDING tasks below max priority
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks (status, lease_expiry_ts)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_aging ON tasks (status, priority, created_at)"
+    )
+
+    # Dependency readiness table: one row per (task, dependency) edge.
+    # tasks.unresolved_deps counts the edges whose dependency is not DONE yet and is
+    # decremented when a dependency completes, so dispatch never re-reads dependencies.
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'task_dependencies'"
+    )
+    backfill_dependencies = cursor.fetchone() is None
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS task_dependencies (
+        task_id TEXT NOT NULL,
+        depends_on TEXT NOT NULL,
+        PRIMARY KEY (task_id, depends_on)
+    )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_dependencies_depends_on "
+        "ON task_dependencies (depends_on)"
+    )
+    if backfill_dependencies:
+        # Older DBs only have the JSON dependencies column: build the edges once
+        cursor.execute(
+            "SELECT id, dependencies FROM tasks "
+            "WHERE dependencies IS NOT NULL AND dependencies != '[]'"
+        )
+        for task_id, dependencies_json in cursor.fetchall():
+            try:
+                dependencies = json.loads(dependencies_json)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(dependencies, list):
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on) VALUES (?, ?)",
+                    [(task_id, str(dep)) for dep in dependencies],
+                )
+        refresh_unresolved_dependencies(cursor)
+
     # Create agents table for registry
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS agents (
@@ -468,6 +616,158 @@ def init_db():
     conn.close()
 
 
+# UPDATE ... RETURNING is available from SQLite 3.35
+SQLITE_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def refresh_unresolved_dependencies(cursor, task_id=None):
+    """Recompute tasks.unresolved_deps from task_dependencies (all tasks, or a single task)."""
+    sql = """
+    UPDATE tasks
+    SET unresolved_deps = (
+        SELECT COUNT(*) FROM task_dependencies d
+        LEFT JOIN tasks dep ON dep.id = d.depends_on
+        WHERE d.task_id = tasks.id AND (dep.status IS NULL OR dep.status != 'DONE')
+    )
+    """
+    if task_id is None:
+        cursor.execute(sql)
+    else:
+        cursor.execute(sql + " WHERE id = ?", (task_id,))
+
+
+def register_task_dependencies(cursor, task_id, dependencies, now):
+    """
+    Record the dependency edges of a new task and initialise its readiness counter.
+
+    A dependency that does not exist or already ended in FAIL/DLQ can never become DONE,
+    so the task is marked BLOCKED (dep_failed) immediately instead of on every poll.
+
+    Returns the task status after registration.
+    """
+    dep_ids = list(dict.fromkeys(str(dep) for dep in dependencies or []))
+    if not dep_ids:
+        return "PENDING"
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on) VALUES (?, ?)",
+        [(task_id, dep_id) for dep_id in dep_ids],
+    )
+    placeholders = ", ".join("?" for _ in dep_ids)
+    cursor.execute(f"SELECT id, status FROM tasks WHERE id IN ({placeholders})", dep_ids)
+    dep_statuses = dict(cursor.fetchall())
+
+    unresolved = sum(1 for dep_id in dep_ids if dep_statuses.get(dep_id) != "DONE")
+    if any(dep_statuses.get(dep_id) in (None, "FAIL", "DLQ") for dep_id in dep_ids):
+        cursor.execute(
+            """
+        UPDATE tasks
+        SET status = ?, updated_at = ?, reason_code = ?, unresolved_deps = ?
+        WHERE id = ?
+        """,
+            ("BLOCKED", now, "dep_failed", unresolved, task_id),
+        )
+        return "BLOCKED"
+
+    cursor.execute("UPDATE tasks SET unresolved_deps = ? WHERE id = ?", (unresolved, task_id))
+    return "PENDING"
+
+
+def resolve_task_dependents(cursor, task_id):
+    """
+    A task reached DONE: release one dependency of every task waiting on it.
+
+    Returns the (owner_role, agent_id) keys of dependents that became ready to dispatch.
+    """
+    cursor.execute(
+        """
+    UPDATE tasks
+    SET unresolved_deps = unresolved_deps - 1
+    WHERE unresolved_deps > 0
+        AND id IN (SELECT task_id FROM task_dependencies WHERE depends_on = ?)
+    """,
+        (task_id,),
+    )
+    if cursor.rowcount == 0:
+        return []
+    cursor.execute(
+        """
+    SELECT t.owner_role, t.agent_id
+    FROM task_dependencies d JOIN tasks t ON t.id = d.task_id
+    WHERE d.depends_on = ? AND t.status = 'PENDING' AND t.unresolved_deps = 0
+    """,
+        (task_id,),
+    )
+    return cursor.fetchall()
+
+
+def block_task_dependents(cursor, task_id, now):
+    """A task failed: mark every PENDING task waiting on it as BLOCKED (dep_failed)."""
+    cursor.execute(
+        """
+    UPDATE tasks
+    SET status = ?, updated_at = ?, reason_code = ?
+    WHERE status = 'PENDING'
+        AND id IN (SELECT task_id FROM task_dependencies WHERE depends_on = ?)
+    """,
+        ("BLOCKED", now, "dep_failed", task_id),
+    )
+
+
+def claim_next_task(cursor, agent_id, owner_role, now, updated_at, lease_expiry_ts, lease_seconds):
+    """
+    Atomically claim the next dispatchable PENDING task of an agent's queue.
+
+    Fresh tasks are served before due retries; within each group idx_tasks_dispatch yields
+    rows in (priority DESC, created_at ASC) order, so the claim is a single index seek that
+    stops at the first task whose dependencies are all DONE.
+
+    Returns the claimed row in SELECT * column order (already RUNNING), or None.
+    """
+    for retry_filter, retry_params in (
+        ("next_retry_ts IS NULL", ()),
+        ("next_retry_ts <= ?", (now,)),
+    ):
+        candidate_sql = f"""
+        SELECT id FROM tasks
+        WHERE status = 'PENDING' AND agent_id = ? AND owner_role = ?
+            AND unresolved_deps = 0 AND {retry_filter}
+        ORDER BY priority DESC, created_at ASC
+        LIMIT 1
+        """
+        candidate_params = (agent_id, owner_role, *retry_params)
+        claim_sql = """
+        UPDATE tasks
+        SET status = 'RUNNING', updated_at = ?, next_retry_ts = NULL,
+            lease_expiry_ts = ?, lease_seconds = ?
+        WHERE id = {target} AND status = 'PENDING'
+        """
+        claim_params = (updated_at, lease_expiry_ts, lease_seconds)
+
+        if SQLITE_SUPPORTS_RETURNING:
+            # Select and claim in one statement: no window for another worker in between
+            cursor.execute(
+                claim_sql.format(target=f"({candidate_sql})") + " RETURNING *",
+                claim_params + candidate_params,
+            )
+            rows = cursor.fetchall()
+            if rows:
+                return rows[0]
+            continue
+
+        # Older SQLite: conditional update on the candidate, retry if another worker won
+        for _ in range(3):
+            cursor.execute(candidate_sql, candidate_params)
+            candidate = cursor.fetchone()
+            if not candidate:
+                break
+            cursor.execute(claim_sql.format(target="?"), claim_params + (candidate[0],))
+            if cursor.rowcount:
+                cursor.execute("SELECT * FROM tasks WHERE id = ?", (candidate[0],))
+                return cursor.fetchone()
+    return None
+
+
 def get_routing_decision(task_data):
     """
     Get routing decision for a task based on routing rules
@@ -481,8 +781,7 @@ def get_routing_decision(task_data):
     # Generate trace_id
     trace_id = str(uuid.uuid4())
 
-    conn = sqlite3.connect(DB_PATH, timeout=10)
-    conn.execute("PRAGMA busy_timeout = 5000")
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Get all routing rules ordered by priority desc
@@ -544,7 +843,7 @@ def get_routing_decision(task_data):
     now = datetime.datetime.utcnow().isoformat() + "Z"
 
     # Store in audit table
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -646,7 +945,7 @@ def create_task():
     # Routing decision (used for both task metadata and agent selection)
     worker_type, routing_decision, trace_id = get_routing_decision(task_data)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Check if task already exists by message_id
@@ -807,6 +1106,9 @@ def create_task():
                 task_data["message_id"],
             ),
         )
+        task_status = register_task_dependencies(
+            cursor, task_id, json.loads(dependencies_json), now
+        )
 
         # Increment tasks_created counter for new tasks
         metrics["tasks_created"] += 1
@@ -840,6 +1142,9 @@ def create_task():
 
         conn.commit()
         conn.close()
+        schedule_priority_aging(task_id, now)
+        if task_status == "PENDING":
+            task_notifier.notify((task_data["owner_role"], matched_agent))
 
         return jsonify(
             {
@@ -847,7 +1152,7 @@ def create_task():
                 "task_id": task_id,
                 "task_code": task_data["task_code"],
                 "message_id": task_data["message_id"],
-                "status": "PENDING",
+                "status": task_status,
                 "agent_id": matched_agent,
                 "timeout_seconds": task_data.get("timeout_seconds", 3600),
                 "max_retries": task_data.get("max_retries", 3),
@@ -888,7 +1193,7 @@ def get_task_status():
     if not task_code and not task_id and not message_id:
         return jsonify({"error": "Missing task_code, task_id, or message_id parameter"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     if message_id:
@@ -944,41 +1249,45 @@ def task_heartbeat():
         if field not in data:
             return jsonify({"error": f"Missing required field: {field}"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Check if task exists and is in RUNNING status
     task_id = data["task_id"]
-    cursor.execute("SELECT id, status, agent_id, lease_seconds FROM tasks WHERE id = ?", (task_id,))
-    task = cursor.fetchone()
+
+    def extend_lease(cursor):
+        # Check if task exists and is in RUNNING status
+        cursor.execute(
+            "SELECT id, status, agent_id, lease_seconds FROM tasks WHERE id = ?", (task_id,)
+        )
+        task = cursor.fetchone()
+        if not task or task[1] != "RUNNING":
+            return task, None, None
+
+        # Calculate new lease expiry time
+        now = datetime.datetime.utcnow()
+        lease_seconds = task[3] if task[3] else 60  # Default to 60 seconds if not set
+        new_lease_expiry = now + datetime.timedelta(seconds=lease_seconds)
+        new_lease_expiry_ts = new_lease_expiry.isoformat() + "Z"
+        updated_at = now.isoformat() + "Z"
+
+        # Update task lease
+        cursor.execute(
+            """
+        UPDATE tasks
+        SET lease_expiry_ts = ?, updated_at = ?
+        WHERE id = ?
+        """,
+            (new_lease_expiry_ts, updated_at, task_id),
+        )
+        return task, new_lease_expiry_ts, lease_seconds
+
+    # Heartbeats are the hottest write path: commit them in batches on the writer thread
+    task, new_lease_expiry_ts, lease_seconds = get_write_queue().submit(extend_lease)
 
     if not task:
-        conn.close()
         return jsonify({"error": "Task not found"}), 404
 
     if task[1] != "RUNNING":
-        conn.close()
         return jsonify({"error": f"Task is not in RUNNING status (current: {task[1]})"}), 400
 
-    # Calculate new lease expiry time
-    now = datetime.datetime.utcnow()
-    lease_seconds = task[3] if task[3] else 60  # Default to 60 seconds if not set
-    new_lease_expiry = now + datetime.timedelta(seconds=lease_seconds)
-    new_lease_expiry_ts = new_lease_expiry.isoformat() + "Z"
-    updated_at = now.isoformat() + "Z"
-
-    # Update task lease
-    cursor.execute(
-        """
-    UPDATE tasks
-    SET lease_expiry_ts = ?, updated_at = ?
-    WHERE id = ?
-    """,
-        (new_lease_expiry_ts, updated_at, task_id),
-    )
-
-    conn.commit()
-    conn.close()
+    schedule_lease_expiry(task_id, new_lease_expiry_ts)
 
     return jsonify(
         {
@@ -991,36 +1300,30 @@ def task_heartbeat():
     )
 
 
-@app.route("/api/task/next", methods=["GET"])
-def get_next_task():
-    """Get next pending task for a specific agent, considering retry schedule."""
-    agent_id = request.args.get("agent_id")
+def get_agent_owner_role(agent_id):
+    """Owner role (queue) of a registered agent, or None if the agent is unknown."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT owner_role FROM agents WHERE agent_id = ?", (agent_id,))
+    agent_info = cursor.fetchone()
+    conn.close()
+    return agent_info[0] if agent_info else None
 
-    if not agent_id:
-        return jsonify({"error": "Missing agent_id parameter"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
+def dispatch_next_task(agent_id, agent_owner_role, redeliver=True):
+    """
+    One dispatch attempt for an agent: re-deliver its leased RUNNING task, or claim the
+    next ready PENDING task of its queue. Returns the /api/task/next response body.
+
+    With redeliver=False an agent that still holds a leased task gets no task and the
+    lease is left alone (push channels already delivered it).
+    """
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Get current time for retry scheduling
     now = datetime.datetime.utcnow().isoformat() + "Z"
 
-    # Get agent info to determine which queue it belongs to
-    cursor.execute(
-        """
-    SELECT owner_role 
-    FROM agents 
-    WHERE agent_id = ?
-    """,
-        (agent_id,),
-    )
-    agent_info = cursor.fetchone()
-    if not agent_info:
-        conn.close()
-        return jsonify({"success": True, "task": None, "message": "Agent not found"})
-
-    agent_owner_role = agent_info[0]
-
     # ACK 丢失/重复恢复：若该 agent 已有未过期 lease 的 RUNNING 任务，优先返回同一任务
     try:
         cursor.execute(
@@ -1033,6 +1336,13 @@ def get_next_task():
             (agent_id, now),
         )
         running_task = cursor.fetchone()
+        if running_task and not redeliver:
+            conn.close()
+            return {
+                "success": True,
+                "task": None,
+                "message": "Agent already holds a leased RUNNING task",
+            }
         if running_task:
             # Extend lease on re-delivery to avoid accidental expiry during ACK 恢复
             now_dt = datetime.datetime.utcnow()
@@ -1050,6 +1360,7 @@ def get_next_task():
             )
             conn.commit()
             conn.close()
+            schedule_lease_expiry(running_task[0], lease_expiry_ts)
 
             task_dict = {
                 "id": running_task[0],
@@ -1080,129 +1391,34 @@ def get_next_task():
                 "dependencies": running_task[24] if len(running_task) > 24 else None,
                 "message_id": running_task[25] if len(running_task) > 25 else None,
             }
-            return jsonify(
-                {
-                    "success": True,
-                    "task": task_dict,
-                    "message": "Re-delivering leased RUNNING task (ACK recovery)",
-                }
-            )
+            return {
+                "success": True,
+                "task": task_dict,
+                "message": "Re-delivering leased RUNNING task (ACK recovery)",
+            }
     except Exception:
         # Fall through to normal pending selection
         pass
 
-    # Get all pending tasks for this agent that match its owner_role (queue partitioning)
-    # Tasks with the same owner_role belong to the same queue
-    cursor.execute(
-        """
-    SELECT * FROM tasks 
-    WHERE status = 'PENDING' AND agent_id = ? AND owner_role = ? 
-        AND (next_retry_ts IS NULL OR next_retry_ts <= ?)
-    ORDER BY 
-        CASE WHEN next_retry_ts IS NULL THEN 0 ELSE 1 END, 
-        priority DESC, 
-        created_at ASC
-    """,
-        (agent_id, agent_owner_role, now),
-    )
-
-    tasks = cursor.fetchall()
-
-    selected_task = None
-    now_dt = datetime.datetime.utcnow().isoformat() + "Z"
-
-    for task in tasks:
-        task_id = task[0]
-        dependencies_json = task[24] if len(task) > 24 else None
-
-        # Check if task has dependencies
-        if dependencies_json:
-            try:
-                dependencies = json.loads(dependencies_json)
-            except json.JSONDecodeError:
-                dependencies = []
-
-            if dependencies:
-                # Check status of all dependencies
-                all_dependencies_done = True
-                any_dependency_failed = False
-
-                for dep_task_id in dependencies:
-                    cursor.execute("SELECT status FROM tasks WHERE id = ?", (dep_task_id,))
-                    dep_status = cursor.fetchone()
-
-                    if dep_status:
-                        dep_status = dep_status[0]
-                        if dep_status != "DONE":
-                            all_dependencies_done = False
-                            if dep_status == "FAIL" or dep_status == "DLQ":
-                                any_dependency_failed = True
-                                break
-                    else:
-                        # Dependency task not found, consider it as failed
-                        all_dependencies_done = False
-                        any_dependency_failed = True
-                        break
-
-                if any_dependency_failed:
-                    # Block the task if any dependency failed
-                    cursor.execute(
-                        """
-                    UPDATE tasks 
-                    SET status = ?, updated_at = ?, reason_code = ? 
-                    WHERE id = ?
-                    """,
-                        ("BLOCKED", now_dt, "dep_failed", task_id),
-                    )
-                    conn.commit()
-                    continue
-
-                if not all_dependencies_done:
-                    # Skip this task, dependencies not ready yet
-                    continue
-
-        # Task has no dependencies or all dependencies are DONE
-        selected_task = task
-        break
-
-    if not selected_task:
-        conn.close()
-        return jsonify(
-            {"success": True, "task": None, "message": "No pending tasks found for this agent"}
-        )
-
-    # Calculate lease expiry time
+    # Claim the next task of this agent's queue (same owner_role) in a single statement,
+    # committed together with concurrent claims/heartbeats on the writer thread.
+    # Dependency readiness comes from tasks.unresolved_deps, maintained on completion.
     now_dt = datetime.datetime.utcnow()
     lease_seconds = 60  # Default lease time
     lease_expiry = now_dt + datetime.timedelta(seconds=lease_seconds)
     lease_expiry_ts = lease_expiry.isoformat() + "Z"
     updated_at = now_dt.isoformat() + "Z"
 
-    # Update task status to RUNNING, clear next_retry_ts, and set lease
-    # Use atomic update with status check to prevent race conditions
-    cursor.execute(
-        """
-    UPDATE tasks 
-    SET status = ?, updated_at = ?, next_retry_ts = ?, lease_expiry_ts = ?, lease_seconds = ? 
-    WHERE id = ? AND status = 'PENDING'
-    """,
-        ("RUNNING", updated_at, None, lease_expiry_ts, lease_seconds, selected_task[0]),
-    )
-
-    # Check if the update was successful (affected rows > 0)
-    if cursor.rowcount == 0:
-        conn.close()
-        # Task was already assigned to another worker, try again
-        return jsonify(
-            {
-                "success": True,
-                "task": None,
-                "message": "Task was already assigned to another worker",
-            }
+    conn.close()
+    selected_task = get_write_queue().submit(
+        lambda cursor: claim_next_task(
+            cursor, agent_id, agent_owner_role, now, updated_at, lease_expiry_ts, lease_seconds
         )
+    )
 
-    conn.commit()
-    conn.close()
+    if not selected_task:
+        return {"success": True, "task": None, "message": "No pending tasks found for this agent"}
+    schedule_lease_expiry(selected_task[0], lease_expiry_ts)
 
     # Format the response with all new retry fields, lease information, and priority
     task_dict = {
@@ -1237,19 +1453,140 @@ def get_next_task():
         "message_id": selected_task[25] if len(selected_task) > 25 else None,
     }
 
-    return jsonify(
-        {
-            "success": True,
-            "task": task_dict,
-            "message": "Task assigned and status updated to RUNNING",
-        }
+    return {
+        "success": True,
+        "task": task_dict,
+        "message": "Task assigned and status updated to RUNNING",
+    }
+
+
+def release_task_claim(task_id, agent_id):
+    """
+    Hand a claimed task back to its queue because its delivery failed (the push channel
+    closed before the task event was written).
+
+    The task must still be RUNNING for the agent; it goes back to PENDING without a lease
+    and the agent's notifier is woken. Returns True if the claim was released.
+    """
+    now = datetime.datetime.utcnow().isoformat() + "Z"
+
+    def release(cursor):
+        cursor.execute(
+            """
+        UPDATE tasks
+        SET status = 'PENDING', updated_at = ?, lease_expiry_ts = NULL
+        WHERE id = ? AND agent_id = ? AND status = 'RUNNING'
+        """,
+            (now, task_id, agent_id),
+        )
+        if cursor.rowcount == 0:
+            return None
+        cursor.execute("SELECT owner_role FROM tasks WHERE id = ?", (task_id,))
+        return cursor.fetchone()[0]
+
+    owner_role = get_write_queue().submit(release)
+    if owner_role is None:
+        return False
+    deadline_scheduler.cancel("lease", task_id)
+    schedule_priority_aging(task_id)
+    task_notifier.notify((owner_role, agent_id))
+    return True
+
+
+@app.route("/api/task/next", methods=["GET"])
+def get_next_task():
+    """
+    Get next pending task for a specific agent, considering retry schedule.
+
+    With ?wait=<seconds> the request long-polls: an idle agent is parked on its
+    (owner_role, agent_id) notifier until work becomes ready for it or the wait expires,
+    instead of re-running the dispatch query in a tight polling loop.
+    """
+    agent_id = request.args.get("agent_id")
+
+    if not agent_id:
+        return jsonify({"error": "Missing agent_id parameter"}), 400
+
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait):
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    wait = min(max(wait, 0.0), TASK_DELIVERY_CONFIG["max_wait"])
+
+    agent_owner_role = get_agent_owner_role(agent_id)
+    if agent_owner_role is None:
+        return jsonify({"success": True, "task": None, "message": "Agent not found"})
+
+    key = (agent_owner_role, agent_id)
+    deadline = time.monotonic() + wait
+    while True:
+        # Read the version before dispatching so work queued in between is not missed
+        version = task_notifier.version(key)
+        body = dispatch_next_task(agent_id, agent_owner_role)
+        remaining = deadline - time.monotonic()
+        if body["task"] or remaining <= 0:
+            return jsonify(body)
+        task_notifier.wait(key, version, remaining)
+
+
+@app.route("/api/task/stream", methods=["GET"])
+def stream_tasks():
+    """
+    Server-Sent Events push channel for an agent.
+
+    Each ready task is claimed for the agent and pushed as an `event: task` message with
+    the same payload as /api/task/next. While idle the stream waits on the agent's
+    notifier and sends a keep-alive comment every keepalive_interval seconds.
+
+    A task is claimed before its event is written. If the client is gone by then (the
+    server closes the stream at the task event), the claim is released right away
+    instead of holding the task until its lease expires. An event lost after the write
+    is recovered like a lost ACK: the task is re-delivered when the agent reconnects or
+    polls, or returns to PENDING when its lease expires.
+    """
+    agent_id = request.args.get("agent_id")
+
+    if not agent_id:
+        return jsonify({"error": "Missing agent_id parameter"}), 400
+
+    agent_owner_role = get_agent_owner_role(agent_id)
+    if agent_owner_role is None:
+        return jsonify({"success": False, "error": "Agent not found"}), 404
+
+    key = (agent_owner_role, agent_id)
+
+    def events():
+        # Flush the response headers right away and set the client reconnect delay (ms)
+        yield "retry: 3000\n\n"
+        # The first attempt re-delivers a task leased before a reconnect (ACK recovery)
+        redeliver = True
+        while True:
+            version = task_notifier.version(key)
+            body = dispatch_next_task(agent_id, agent_owner_role, redeliver=redeliver)
+            redeliver = False
+            if body["task"]:
+                try:
+                    yield f"event: task\ndata: {json.dumps(body)}\n\n"
+                except GeneratorExit:
+                    release_task_claim(body["task"]["id"], agent_id)
+                    raise
+                continue
+            if not task_notifier.wait(key, version, TASK_DELIVERY_CONFIG["keepalive_interval"]):
+                yield ": keepalive\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @app.route("/api/dlq/list", methods=["GET"])
 def get_dlq_list():
     """Get DLQ entries with pagination support."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Get pagination parameters
@@ -1326,7 +1663,7 @@ def get_dlq_list():
 @app.route("/api/dlq", methods=["GET"])
 def get_dlq_entries():
     """Get all DLQ entries (deprecated, use /api/dlq/list instead)."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute(
@@ -1377,7 +1714,7 @@ def replay_dlq_entry():
 
     dlq_id = data["dlq_id"]
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Get DLQ entry
@@ -1481,6 +1818,12 @@ def replay_dlq_entry():
                 dlq_entry[3] or task_data.get("message_id"),
             ),
         )
+        try:
+            replay_dependencies = json.loads(task_data.get("dependencies") or "[]")
+        except (TypeError, json.JSONDecodeError):
+            replay_dependencies = []
+        if isinstance(replay_dependencies, list):
+            register_task_dependencies(cursor, task_id, replay_dependencies, now)
 
     # Update DLQ entry with audit info
     cursor.execute(
@@ -1512,6 +1855,8 @@ def replay_dlq_entry():
 
     conn.commit()
     conn.close()
+    schedule_priority_aging(task_exists[0] if task_exists else task_id)
+    task_notifier.notify((task_data["owner_role"], agent_id))
 
     return jsonify(
         {
@@ -1527,7 +1872,7 @@ def replay_dlq_entry():
 @app.route("/api/dlq/<dlq_id>", methods=["GET"])
 def get_dlq_entry(dlq_id):
     """Get a specific DLQ entry by ID."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute(
@@ -1570,7 +1915,7 @@ def get_dlq_entry(dlq_id):
 @app.route("/api/dlq/task/<task_code>", methods=["GET"])
 def get_dlq_entry_by_task_code(task_code):
     """Get DLQ entry by task_code."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute(
@@ -1615,7 +1960,7 @@ def get_dlq_entry_by_task_code(task_code):
 @app.route("/api/dlq/message/<message_id>", methods=["GET"])
 def get_dlq_entry_by_message_id(message_id):
     """Get DLQ entry by message_id (idempotency key)."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -1675,7 +2020,7 @@ def workflow_recover():
 @app.route("/api/workflow/status", methods=["GET"])
 def workflow_status():
     """Get workflow status."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
@@ -1875,7 +2220,7 @@ def submit_task_result():
                         {"error": message, "reason_code": reason_code, "success": False}
                     ), 400
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Resolve the task row
@@ -1975,6 +2320,8 @@ def submit_task_result():
         ), 400
 
     # Update retry count if status is FAIL
+    next_retry_ts = None
+    ready_keys = []
     if status == "FAIL":
         # Get current retry count and max retries
         cursor.execute(
@@ -2137,39 +2484,19 @@ def submit_task_result():
 
     # FAILURE PROPAGATION: If task is failing, mark all dependent tasks as BLOCKED
     if status in ["FAIL", "DLQ"]:
-        # Find all tasks that have this task in their dependencies
-        cursor.execute("SELECT id, dependencies FROM tasks WHERE status = ?", ("PENDING",))
-        pending_tasks = cursor.fetchall()
-
-        for pending_task in pending_tasks:
-            pending_task_id = pending_task[0]
-            dependencies_json = pending_task[1]
-
-            if dependencies_json:
-                try:
-                    dependencies = json.loads(dependencies_json)
-                    if isinstance(dependencies, list) and task_id in dependencies:
-                        # This task depends on the failed task, mark as BLOCKED
-                        cursor.execute(
-                            """
-                        UPDATE tasks 
-                        SET status = ?, updated_at = ?, reason_code = ? 
-                        WHERE id = ?
-                        """,
-                            ("BLOCKED", now, "dep_failed", pending_task_id),
-                        )
-                except json.JSONDecodeError:
-                    # Invalid dependencies JSON, skip
-                    continue
+        # Indexed lookup of the PENDING tasks that depend on the failed task
+        block_task_dependents(cursor, task_id, now)
 
     # Get agent_id for the task
-    cursor.execute("SELECT agent_id FROM tasks WHERE id = ?", (resolved_task_id,))
+    cursor.execute("SELECT agent_id, owner_role FROM tasks WHERE id = ?", (resolved_task_id,))
     task_agent = cursor.fetchone()
     agent_id = task_agent[0] if task_agent else None
 
     # Update metrics based on status change
     if status == "DONE" and current_status != "DONE":
         metrics["tasks_done"] += 1
+        # Dependency readiness: dependents waiting on this task have one dependency less
+        ready_keys = resolve_task_dependents(cursor, task_id)
         if current_status in ["PENDING", "RUNNING"]:
             metrics["queue_depth"] = max(0, metrics["queue_depth"] - 1)
         # 恢复agent的available_capacity
@@ -2218,6 +2545,22 @@ def submit_task_result():
     conn.commit()
     conn.close()
 
+    # Keep the in-memory deadlines in step: only RUNNING tasks hold a lease, and a failed
+    # attempt that is retried goes back to PENDING (the aging handler re-checks the status)
+    if status != "RUNNING":
+        deadline_scheduler.cancel("lease", resolved_task_id)
+    if status in ("PENDING", "FAIL"):
+        schedule_priority_aging(resolved_task_id)
+
+    # Wake parked agents: this agent may be free for its next task (or got it back), and
+    # dependents whose last dependency just completed are ready
+    if agent_id:
+        agent_key = (task_agent[1], agent_id)
+        task_notifier.notify(agent_key)
+        if next_retry_ts and deadline_scheduler.running:
+            deadline_scheduler.schedule("wake", agent_key, iso_to_epoch(next_retry_ts))
+    task_notifier.notify_many(ready_keys)
+
     return jsonify({"success": True, "message": "Result submitted successfully", "status": status})
 
 
@@ -2228,7 +2571,7 @@ def check_workflow_consistency():
     Returns:
         tuple: (consistent, inconsistent_tasks)
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     now = datetime.datetime.utcnow().isoformat() + "Z"
@@ -2315,39 +2658,31 @@ def repair_workflow_inconsistencies():
     """
     Repair workflow inconsistencies.
 
+    RUNNING tasks without a valid lease go back to PENDING the same way an expired lease
+    does (release_task_lease): the agent slot is freed, the aging deadline is armed and
+    the agent's notifier is woken.
+
     Returns:
         tuple: (success, repaired_tasks, errors)
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
     now = datetime.datetime.utcnow().isoformat() + "Z"
-    repaired_tasks = []
     errors = []
 
-    try:
+    def repair(cursor):
+        repaired_tasks = []
+        released = []
+
         # Get all RUNNING tasks with invalid leases
         cursor.execute(
-            'SELECT id, task_code, lease_expiry_ts FROM tasks WHERE status = "RUNNING" AND (lease_expiry_ts IS NULL OR lease_expiry_ts < ?)',
+            """
+        SELECT id, task_code, owner_role, agent_id FROM tasks
+        WHERE status = 'RUNNING' AND (lease_expiry_ts IS NULL OR lease_expiry_ts < ?)
+        """,
             (now,),
         )
-        invalid_running_tasks = cursor.fetchall()
-
-        # Repair RUNNING tasks with invalid leases
-        for task in invalid_running_tasks:
-            task_id = task[0]
-            task_code = task[1]
-
-            # Update task to PENDING
-            cursor.execute(
-                """
-            UPDATE tasks
-            SET status = ?, lease_expiry_ts = NULL, updated_at = ?
-            WHERE id = ?
-            """,
-                ("PENDING", now, task_id),
-            )
-
+        for task_id, task_code, owner_role, agent_id in cursor.fetchall():
+            release_task_lease(cursor, task_id, agent_id, now)
+            released.append((task_id, (owner_role, agent_id)))
             repaired_tasks.append(
                 {
                     "task_code": task_code,
@@ -2366,6 +2701,7 @@ def repair_workflow_inconsistencies():
         for task in all_tasks:
             task_status_map[task[0]] = {"task_code": task[1], "status": task[2]}
 
+        failed = []
         for task in all_tasks:
             task_id = task[0]
             task_code = task[1]
@@ -2392,6 +2728,7 @@ def repair_workflow_inconsistencies():
                                 task_id,
                             ),
                         )
+                        failed.append(task_id)
 
                         repaired_tasks.append(
                             {
@@ -2402,15 +2739,23 @@ def repair_workflow_inconsistencies():
                             }
                         )
                     break
+        return repaired_tasks, released, failed
 
-        conn.commit()
-        conn.close()
-        return True, repaired_tasks, errors
+    try:
+        repaired_tasks, released, failed = get_write_queue().submit(repair)
     except Exception as e:
-        conn.rollback()
-        conn.close()
         errors.append(str(e))
-        return False, repaired_tasks, errors
+        return False, [], errors
+
+    for task_id, agent_key in released:
+        # Same bookkeeping as an expired lease (the aging handler skips tasks failed above)
+        metrics["queue_depth"] = max(0, metrics["queue_depth"] + 1)
+        deadline_scheduler.cancel("lease", task_id)
+        schedule_priority_aging(task_id)
+        task_notifier.notify(agent_key)
+    for task_id in failed:
+        deadline_scheduler.cancel("lease", task_id)
+    return True, repaired_tasks, errors
 
 
 def recover_workflow():
@@ -2434,7 +2779,7 @@ def recover_workflow():
             consistent, final_inconsistent_tasks = check_workflow_consistency()
             if consistent:
                 # Step 4: Update workflow recovery status
-                conn = sqlite3.connect(DB_PATH)
+                conn = get_db_connection()
                 cursor = conn.cursor()
 
                 # Check if default workflow exists, create if not
@@ -2482,7 +2827,7 @@ def recover_workflow():
                 )
             else:
                 # Update workflow recovery status to FAILED
-                conn = sqlite3.connect(DB_PATH)
+                conn = get_db_connection()
                 cursor = conn.cursor()
 
                 # Check if default workflow exists, create if not
@@ -2535,7 +2880,7 @@ def recover_workflow():
             )
     else:
         # Workflow is already consistent
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if default workflow exists, create if not
@@ -2587,10 +2932,14 @@ def submit_artifact_pointer(task_code, pointers):
             "submitted_at": datetime.datetime.utcnow().isoformat() + "Z",
         }
 
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         now = datetime.datetime.utcnow().isoformat() + "Z"
+        cursor.execute(
+            "SELECT id FROM tasks WHERE task_code = ? AND status != 'DONE'", (task_code,)
+        )
+        completed_ids = [row[0] for row in cursor.fetchall()]
         cursor.execute(
             """
         UPDATE tasks
@@ -2605,8 +2954,13 @@ def submit_artifact_pointer(task_code, pointers):
             conn.close()
             return False
 
+        ready_keys = []
+        for completed_id in completed_ids:
+            ready_keys.extend(resolve_task_dependents(cursor, completed_id))
+
         conn.commit()
         conn.close()
+        task_notifier.notify_many(ready_keys)
         return True
     except Exception as e:
         print(f"Error submitting artifact pointer: {e}")
@@ -2630,7 +2984,7 @@ def register_agent():
     available_capacity = data.get("available_capacity", capacity)
     completion_limit_per_minute = data.get("completion_limit_per_minute", 60)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Check if agent already exists
@@ -2715,7 +3069,7 @@ def register_agent():
 @app.route("/api/agent/list", methods=["GET"])
 def list_agents():
     """List all agents."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM agents")
@@ -2750,7 +3104,7 @@ def list_agents():
 @app.route("/api/agent/<agent_id>", methods=["GET"])
 def get_agent(agent_id):
     """Get agent details."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM agents WHERE agent_id = ?", (agent_id,))
@@ -2788,7 +3142,7 @@ def get_agent(agent_id):
 def update_agent(agent_id):
     """Update agent details."""
     data = request.json
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Check if agent exists
@@ -2855,7 +3209,7 @@ def update_agent(agent_id):
 @app.route("/api/agent/<agent_id>", methods=["DELETE"])
 def deregister_agent(agent_id):
     """Deregister an agent."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
 
     # Check if agent exists
@@ -2885,7 +3239,7 @@ def health_check():
     """Health check endpoint for A2A Hub."""
     try:
         # Check database connection
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT 1")
         cursor.fetchone()
@@ -2948,8 +3302,13 @@ def get_version():
 # Command-line interface for cleanup/rollback
 def cleanup_state():
     """Cleanup/rollback the state by deleting the database."""
+    close_db_pools()
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
+        # WAL side files belong to the deleted database
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DB_PATH + suffix):
+                os.remove(DB_PATH + suffix)
         print(f"State cleaned up: {DB_PATH} deleted")
         return True
     else:
@@ -2963,8 +3322,7 @@ def reset_completion_window_if_needed(agent_id, cursor=None):
     conn = None
     owns_conn = False
     if cursor is None:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
-        conn.execute("PRAGMA busy_timeout = 5000")
+        conn = get_db_connection()
         cursor = conn.cursor()
         owns_conn = True
 
@@ -3032,172 +3390,259 @@ def check_required_secrets():
         sys.exit(1)
 
 
-# Function to check and handle expired leases
-def check_expired_leases():
-    """Check for tasks with expired leases and update their status to PENDING."""
-    import time
+def iso_to_epoch(ts):
+    """Convert a stored ISO timestamp (naive values are UTC) to epoch seconds."""
+    dt = datetime.datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.UTC)
+    return dt.timestamp()
 
-    while True:
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
 
-            # Get current time in proper ISO format with timezone
-            now_dt = datetime.datetime.now(datetime.UTC)
-            now = now_dt.isoformat().replace("+00:00", "Z")
+def schedule_lease_expiry(task_id, lease_expiry_ts):
+    """Arm the in-memory lease deadline of a RUNNING task (no-op unless the scheduler runs)."""
+    if deadline_scheduler.running and lease_expiry_ts:
+        deadline_scheduler.schedule("lease", task_id, iso_to_epoch(lease_expiry_ts))
 
-            # Find tasks with expired leases
-            cursor.execute(
-                """
-            SELECT id, task_code, status, agent_id, retry_count, max_retries, retry_backoff_sec 
-            FROM tasks 
-            WHERE status = 'RUNNING' AND lease_expiry_ts IS NOT NULL AND lease_expiry_ts < ?
-            """,
-                (now,),
-            )
 
-            expired_tasks = cursor.fetchall()
+def schedule_priority_aging(task_id, created_at=None):
+    """
+    Arm the aging deadline of a PENDING task (no-op unless the scheduler runs).
 
-            if expired_tasks:
-                print(f"Found {len(expired_tasks)} tasks with expired leases")
+    Without created_at the task is checked right away; the aging handler then moves the
+    deadline to created_at + aging_threshold if it is not due yet.
+    """
+    if deadline_scheduler.running:
+        if created_at:
+            deadline = iso_to_epoch(created_at) + PRIORITY_AGING_CONFIG["aging_threshold"]
+        else:
+            deadline = time.time()
+        deadline_scheduler.schedule("aging", task_id, deadline)
 
-                for task in expired_tasks:
-                    (
-                        task_id,
-                        task_code,
-                        status,
-                        agent_id,
-                        retry_count,
-                        max_retries,
-                        retry_backoff_sec,
-                    ) = task
-
-                    print(
-                        f"Task {task_id} ({task_code}) has expired lease, updating status to PENDING"
-                    )
 
-                    # Calculate next retry time if we're using retry mechanism
-                    next_retry_ts = None
+def release_task_lease(cursor, task_id, agent_id, now):
+    """Move a RUNNING task back to PENDING, clear its lease and free its agent's slot."""
+    # 恢复agent的available_capacity
+    if agent_id:
+        cursor.execute(
+            """
+        UPDATE agents
+        SET available_capacity = available_capacity + 1, updated_at = ?
+        WHERE agent_id = ?
+        """,
+            (now, agent_id),
+        )
 
-                    # 恢复agent的available_capacity
-                    if agent_id:
-                        cursor.execute(
-                            """
-                        UPDATE agents
-                        SET available_capacity = available_capacity + 1, updated_at = ?
-                        WHERE agent_id = ?
-                        """,
-                            (now, agent_id),
-                        )
+    # Update task status to PENDING and clear lease
+    cursor.execute(
+        """
+    UPDATE tasks
+    SET status = ?, updated_at = ?, lease_expiry_ts = NULL, next_retry_ts = ?
+    WHERE id = ?
+    """,
+        ("PENDING", now, None, task_id),
+    )
 
-                    # Update task status to PENDING and clear lease
-                    cursor.execute(
-                        """
-                    UPDATE tasks 
-                    SET status = ?, updated_at = ?, lease_expiry_ts = NULL, next_retry_ts = ? 
-                    WHERE id = ?
-                    """,
-                        ("PENDING", now, next_retry_ts, task_id),
-                    )
 
-                    # Update metrics - task moved from RUNNING to PENDING, so queue_depth increases by 1
-                    metrics["queue_depth"] = max(0, metrics["queue_depth"] + 1)
+# Function to check and handle expired leases
+def check_expired_leases(task_ids=None):
+    """
+    Move RUNNING tasks whose lease has expired back to PENDING.
 
-            conn.commit()
-            conn.close()
+    Only the given task ids are checked (all expired leases through idx_tasks_lease when
+    task_ids is None). Returns {task_id: lease deadline} for given tasks whose lease has
+    not expired yet, so the scheduler can look at them again.
+    """
+    # Get current time in proper ISO format with timezone
+    now_dt = datetime.datetime.now(datetime.UTC)
+    now = now_dt.isoformat().replace("+00:00", "Z")
+
+    def expire_leases(cursor):
+        # Find tasks with expired leases
+        sql = """
+        SELECT id, task_code, owner_role, agent_id, lease_expiry_ts
+        FROM tasks
+        WHERE status = 'RUNNING' AND lease_expiry_ts IS NOT NULL
+        """
+        params = []
+        if task_ids is None:
+            sql += " AND lease_expiry_ts < ?"
+            params.append(now)
+        else:
+            sql += f" AND id IN ({', '.join('?' for _ in task_ids)})"
+            params.extend(task_ids)
+        cursor.execute(sql, params)
 
-        except Exception as e:
-            print(f"Error checking expired leases: {e}")
+        expired_tasks = []
+        not_expired = {}
+        for task_id, task_code, owner_role, agent_id, lease_expiry_ts in cursor.fetchall():
+            if lease_expiry_ts >= now:
+                # Lease was extended (or the timer fired on the boundary): look again later
+                not_expired[task_id] = max(iso_to_epoch(lease_expiry_ts), now_dt.timestamp())
+                continue
+            expired_tasks.append((task_id, (owner_role, agent_id)))
 
-        # Sleep for 10 seconds before next check
-        time.sleep(10)
+            print(f"Task {task_id} ({task_code}) has expired lease, updating status to PENDING")
+            release_task_lease(cursor, task_id, agent_id, now)
+
+        if expired_tasks:
+            print(f"Found {len(expired_tasks)} tasks with expired leases")
+        return expired_tasks, not_expired
+
+    expired_tasks, not_expired = get_write_queue().submit(expire_leases)
+
+    for task_id, agent_key in expired_tasks:
+        # Update metrics - task moved from RUNNING to PENDING, so queue_depth increases by 1
+        metrics["queue_depth"] = max(0, metrics["queue_depth"] + 1)
+        schedule_priority_aging(task_id)
+        task_notifier.notify(agent_key)
+    return not_expired
 
 
 # Function to check and apply priority aging
-def check_priority_aging():
-    """Check for pending tasks that have been waiting too long and increase their priority."""
-    import time
+def check_priority_aging(task_ids=None):
+    """
+    Increase the priority of pending tasks that have been waiting too long.
 
-    while True:
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-
-            # Get current time
-            now_dt = datetime.datetime.now(datetime.UTC)
-            now = now_dt.isoformat().replace("+00:00", "Z")
-
-            # Find pending tasks and their creation times
-            cursor.execute("""
-            SELECT id, task_code, priority, created_at 
-            FROM tasks 
-            WHERE status = 'PENDING' 
-            ORDER BY created_at ASC
-            """)
-
-            pending_tasks = cursor.fetchall()
-
-            for task in pending_tasks:
-                task_id, task_code, current_priority, created_at_str = task
-
-                # Parse created_at time
-                created_at = datetime.datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
-
-                # Calculate time since task creation in seconds
-                wait_time_seconds = (now_dt - created_at).total_seconds()
-
-                # Check if task needs priority aging
-                if (
-                    wait_time_seconds > PRIORITY_AGING_CONFIG["aging_threshold"]
-                    and current_priority < PRIORITY_AGING_CONFIG["max_priority"]
-                ):
-                    # Calculate new priority
-                    new_priority = min(
-                        current_priority + PRIORITY_AGING_CONFIG["aging_step"],
-                        PRIORITY_AGING_CONFIG["max_priority"],
-                    )
+    Only the given task ids are checked (every PENDING task below max_priority when
+    task_ids is None). Returns {task_id: next aging deadline} for tasks that can still
+    be aged.
+    """
+    # Get current time
+    now_dt = datetime.datetime.now(datetime.UTC)
+    now = now_dt.isoformat().replace("+00:00", "Z")
+    now_epoch = now_dt.timestamp()
+    threshold = PRIORITY_AGING_CONFIG["aging_threshold"]
+    max_priority = PRIORITY_AGING_CONFIG["max_priority"]
+
+    def age_tasks(cursor):
+        sql = """
+        SELECT id, task_code, priority, created_at
+        FROM tasks
+        WHERE status = 'PENDING' AND priority < ?
+        """
+        params = [max_priority]
+        if task_ids is not None:
+            sql += f" AND id IN ({', '.join('?' for _ in task_ids)})"
+            params.extend(task_ids)
+        cursor.execute(sql, params)
 
-                    # Update task priority
-                    cursor.execute(
-                        """
-                    UPDATE tasks 
-                    SET priority = ?, updated_at = ? 
-                    WHERE id = ?
-                    """,
-                        (new_priority, now, task_id),
-                    )
+        next_deadlines = {}
+        for task_id, task_code, current_priority, created_at_str in cursor.fetchall():
+            created_at = iso_to_epoch(created_at_str)
 
-                    # Output structured log for scheduling decision
-                    log_entry = {
-                        "timestamp": now,
-                        "level": "INFO",
-                        "component": "priority_aging",
-                        "event": "TASK_PRIORITY_INCREASED",
-                        "task_id": task_id,
-                        "task_code": task_code,
-                        "current_priority": current_priority,
-                        "new_priority": new_priority,
-                        "wait_time_seconds": wait_time_seconds,
-                        "aging_threshold": PRIORITY_AGING_CONFIG["aging_threshold"],
-                        "reason": "TASK_STARVATION_PREVENTION",
-                    }
-                    print(json.dumps(log_entry))
+            # Calculate time since task creation in seconds
+            wait_time_seconds = now_epoch - created_at
 
-            conn.commit()
-            conn.close()
+            # Check if task needs priority aging
+            if wait_time_seconds <= threshold:
+                next_deadlines[task_id] = created_at + threshold
+                continue
+
+            # Calculate new priority
+            new_priority = min(current_priority + PRIORITY_AGING_CONFIG["aging_step"], max_priority)
+
+            # Update task priority
+            cursor.execute(
+                """
+            UPDATE tasks
+            SET priority = ?, updated_at = ?
+            WHERE id = ?
+            """,
+                (new_priority, now, task_id),
+            )
+            if new_priority < max_priority:
+                next_deadlines[task_id] = now_epoch + PRIORITY_AGING_CONFIG["check_interval"]
 
-        except Exception as e:
-            error_entry = {
-                "timestamp": datetime.datetime.now(datetime.UTC).isoformat().replace("+00:00", "Z"),
-                "level": "ERROR",
+            # Output structured log for scheduling decision
+            log_entry = {
+                "timestamp": now,
+                "level": "INFO",
                 "component": "priority_aging",
-                "event": "ERROR",
-                "message": f"Error checking priority aging: {e}",
+                "event": "TASK_PRIORITY_INCREASED",
+                "task_id": task_id,
+                "task_code": task_code,
+                "current_priority": current_priority,
+                "new_priority": new_priority,
+                "wait_time_seconds": wait_time_seconds,
+                "aging_threshold": threshold,
+                "reason": "TASK_STARVATION_PREVENTION",
             }
-            print(json.dumps(error_entry))
+            print(json.dumps(log_entry))
+        return next_deadlines
 
-        # Sleep for configured check interval
-        time.sleep(PRIORITY_AGING_CONFIG["check_interval"])
+    return get_write_queue().submit(age_tasks)
+
+
+def start_deadline_scheduler():
+    """
+    Start event-driven lease expiry and priority aging.
+
+    The heap is rebuilt from indexed queries (idx_tasks_lease, idx_tasks_aging); from then
+    on the request handlers arm deadlines as leases are granted/extended and tasks are
+    queued, and the scheduler thread only touches tasks whose deadline has passed.
+    """
+    deadline_scheduler.register("lease", check_expired_leases)
+    deadline_scheduler.register("aging", check_priority_aging)
+    # Retry backoff elapsed: wake the agent parked on the task's queue
+    deadline_scheduler.register("wake", task_notifier.notify_many)
+    deadline_scheduler.start()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, lease_expiry_ts FROM tasks "
+        "WHERE status = 'RUNNING' AND lease_expiry_ts IS NOT NULL"
+    )
+    leases = cursor.fetchall()
+    cursor.execute(
+        "SELECT id, created_at FROM tasks WHERE status = 'PENDING' AND priority < ?",
+        (PRIORITY_AGING_CONFIG["max_priority"],),
+    )
+    pending = cursor.fetchall()
+    conn.close()
+
+    for task_id, lease_expiry_ts in leases:
+        schedule_lease_expiry(task_id, lease_expiry_ts)
+    for task_id, created_at in pending:
+        schedule_priority_aging(task_id, created_at)
+    return len(leases), len(pending)
+
+
+def start_hub():
+    """
+    Prepare the hub for serving: initialize the database, run workflow recovery and
+    start the deadline scheduler. Shared by the Flask server (python main.py) and the
+    ASGI server (asgi.py).
+    """
+    # Initialize database
+    init_db()
+
+    # Run workflow recovery on startup
+    print("Running workflow recovery on startup...")
+    success, message, recovered_tasks, inconsistent_tasks = recover_workflow()
+    print(f"Workflow recovery result: {'SUCCESS' if success else 'FAILED'}")
+    print(f"Recovery message: {message}")
+    if recovered_tasks:
+        print(f"Recovered {len(recovered_tasks)} tasks:")
+        for task in recovered_tasks:
+            print(f"  - {task['task_code']}: {task['old_status']} -> {task['new_status']}")
+    if inconsistent_tasks:
+        print(f"Found {len(inconsistent_tasks)} inconsistent tasks:")
+        for task in inconsistent_tasks:
+            print(f"  - {task['task_code']}: {task['reason_code']} - {task['description']}")
+    print()
+
+    # Start event-driven lease expiry and priority aging
+    armed_leases, armed_aging = start_deadline_scheduler()
+    print(
+        f"Started deadline scheduler ({armed_leases} leases, {armed_aging} aging deadlines armed)"
+    )
+
+
+def stop_hub():
+    """Stop the deadline scheduler, flush the writer queue and close pooled connections."""
+    deadline_scheduler.stop()
+    close_db_pools()
 
 
 if __name__ == "__main__":
@@ -3241,35 +3686,7 @@ if __name__ == "__main__":
     # Check required secrets before starting the server
     check_required_secrets()
 
-    # Initialize database
-    init_db()
-
-    # Run workflow recovery on startup
-    print("Running workflow recovery on startup...")
-    success, message, recovered_tasks, inconsistent_tasks = recover_workflow()
-    print(f"Workflow recovery result: {'SUCCESS' if success else 'FAILED'}")
-    print(f"Recovery message: {message}")
-    if recovered_tasks:
-        print(f"Recovered {len(recovered_tasks)} tasks:")
-        for task in recovered_tasks:
-            print(f"  - {task['task_code']}: {task['old_status']} -> {task['new_status']}")
-    if inconsistent_tasks:
-        print(f"Found {len(inconsistent_tasks)} inconsistent tasks:")
-        for task in inconsistent_tasks:
-            print(f"  - {task['task_code']}: {task['reason_code']} - {task['description']}")
-    print()
-
-    # Start lease expiration checker in background thread
-    import threading
-
-    lease_checker_thread = threading.Thread(target=check_expired_leases, daemon=True)
-    lease_checker_thread.start()
-    print("Started lease expiration checker thread")
-
-    # Start priority aging checker in background thread
-    priority_aging_thread = threading.Thread(target=check_priority_aging, daemon=True)
-    priority_aging_thread.start()
-    print("Started priority aging checker thread")
+    start_hub()
 
     # Start Flask server
     print("Starting A2A Hub...")
@@ -3278,12 +3695,15 @@ if __name__ == "__main__":
     print("  POST /api/task/create - Create new task")
     print("  GET /api/task/status?task_code=XXX - Query task status")
     print("  GET /api/task/next - Get next pending task")
+    print("  GET /api/task/next?wait=N - Long-poll up to N seconds for the next task")
+    print("  GET /api/task/stream - Push tasks to an agent (Server-Sent Events)")
     print("  POST /api/task/heartbeat - Update task heartbeat and extend lease")
     print("  POST /api/task/result - Submit task result")
     print("  GET /version - Get version information")
     print("  ")
     print("To cleanup state: python main.py cleanup")
     print("To get version: python main.py --version")
+    print("To serve with the ASGI server: python asgi.py --port 5001")
     print("  ")
 
     app.run(host="0.0.0.0", port=5001, debug=False)
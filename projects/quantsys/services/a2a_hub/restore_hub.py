@@ -16,11 +16,21 @@ Options:
 import argparse
 import datetime
 import os
-import shutil
 import sqlite3
 import sys
 
 
+def copy_database(src_path, dst_path):
+    """Copy a SQLite database with the backup API (includes pages still in the WAL file)"""
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
 def find_latest_backup(backup_dir):
     """Find the latest backup file in the backup directory"""
     backups = []
@@ -217,12 +227,13 @@ def main():
         if os.path.exists(db_path):
             rollback_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             rollback_path = os.path.join(state_dir, f"a2a_hub_rollback_{rollback_timestamp}.db")
-            shutil.copy2(db_path, rollback_path)
+            copy_database(db_path, rollback_path)
             print(f"   OK 回滚备份创建成功: {rollback_path}")
 
-        # Restore from backup
+        # Restore from backup (through SQLite so an existing WAL file cannot be replayed
+        # on top of the restored pages)
         print("开始恢复...")
-        shutil.copy2(backup_file, db_path)
+        copy_database(backup_file, db_path)
 
         # Verify restore
         if os.path.exists(db_path):
@@ -254,7 +265,7 @@ def main():
                 # Restore from rollback if available
                 if "rollback_path" in locals():
                     print("恢复回滚备份...")
-                    shutil.copy2(rollback_path, db_path)
+                    copy_database(rollback_path, db_path)
                 return 1
         else:
             print("ERROR: 恢复文件未创建")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+A2A Hub task notifier
+
+Idle agents (long-poll /api/task/next?wait=..., SSE /api/task/stream) park on a
+per-(owner_role, agent_id) condition instead of re-running the dispatch query. Code
+paths that make work ready for an agent (task created, dependency completed, lease
+expired, task released) call notify() after committing, which bumps the key's version
+and wakes its waiters.
+
+Waiters read version() before their dispatch attempt and pass it to wait(), so a
+notification that lands between the attempt and the wait is never lost.
+
+wait_async() is the event-loop counterpart used by the ASGI server: a parked agent
+holds an asyncio future instead of a thread.
+"""
+
+import asyncio
+import threading
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class TaskNotifier:
+    """
+    Versioned wake-up channel per (owner_role, agent_id).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conds = {}
+        self._versions = {}
+        self._async_waiters = {}
+        self._waiters = 0
+
+    def _cond(self, key):
+        cond = self._conds.get(key)
+        if cond is None:
+            # All conditions share one lock: notify/wait are short and keys are few
+            cond = threading.Condition(self._lock)
+            self._conds[key] = cond
+        return cond
+
+    def version(self, key):
+        """Current notification version of a key."""
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def notify(self, key):
+        """Signal that work may be ready for a key."""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            cond = self._conds.get(key)
+            if cond is not None:
+                cond.notify_all()
+            for loop, future in self._async_waiters.pop(key, ()):
+                loop.call_soon_threadsafe(_wake, future)
+
+    def notify_many(self, keys):
+        """Signal several keys (duplicates are notified once)."""
+        for key in set(keys):
+            self.notify(key)
+
+    def wait(self, key, version, timeout):
+        """
+        Wait until the key's version moves past `version` or the timeout expires.
+
+        Returns:
+            True if notified, False on timeout
+        """
+        with self._lock:
+            cond = self._cond(key)
+            self._waiters += 1
+            try:
+                return cond.wait_for(lambda: self._versions.get(key, 0) != version, timeout)
+            finally:
+                self._waiters -= 1
+
+    async def wait_async(self, key, version, timeout):
+        """
+        Event-loop version of wait(); notify() may be called from any thread.
+
+        Returns:
+            True if notified, False on timeout
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            if self._versions.get(key, 0) != version:
+                return True
+            self._async_waiters.setdefault(key, set()).add(waiter)
+            self._waiters += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters -= 1
+                waiters = self._async_waiters.get(key)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._async_waiters[key]
+
+    def waiting(self):
+        """Number of parked waiters."""
+        with self._lock:
+            return self._waiters
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the A2A Hub ASGI server (asgi.py)
+
+Drives the ASGI application directly with in-memory receive/send callables:
+1. build_environ maps the ASGI scope and body onto a WSGI environ
+2. _run_wsgi relays streamed WSGI responses and turns handler errors into a 500
+3. The lifespan protocol reports startup success/failure and shutdown
+4. Native long-poll and SSE endpoints, including releasing an undeliverable claim
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+# Add the current directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from asgi import HubASGIApp, build_environ
+from test_task_dispatch import AGENT_ID, create_task, fresh_hub
+
+ADMIN = [(b"x-a2a-role", b"admin")]
+
+
+def http_scope(path, query=b"", method="GET", headers=ADMIN):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": headers,
+        "server": ("127.0.0.1", 5001),
+        "client": ("10.0.0.7", 51234),
+    }
+
+
+async def call(app, scope, body=b""):
+    """Run one request and return (status, headers, body) from the sent messages."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()  # never disconnects
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    payload = b"".join(m.get("body", b"") for m in sent[1:])
+    assert sent[-1]["type"] == "http.response.body" and not sent[-1].get("more_body")
+    return start["status"], dict(start["headers"]), payload
+
+
+def test_build_environ():
+    scope = http_scope(
+        "/api/task/create",
+        query=b"a=1&b=%20",
+        method="POST",
+        headers=[
+            (b"content-type", b"application/json"),
+            (b"content-length", b"999"),
+            (b"x-a2a-role", b"admin"),
+            (b"accept", b"text/html"),
+            (b"accept", b"application/json"),
+        ],
+    )
+    scope["root_path"] = "/hub"
+    environ = build_environ(scope, b'{"x": 1}')
+    assert environ["REQUEST_METHOD"] == "POST"
+    assert environ["SCRIPT_NAME"] == "/hub"
+    assert environ["PATH_INFO"] == "/api/task/create"
+    assert environ["QUERY_STRING"] == "a=1&b=%20"
+    assert (environ["SERVER_NAME"], environ["SERVER_PORT"]) == ("127.0.0.1", "5001")
+    assert environ["REMOTE_ADDR"] == "10.0.0.7"
+    # The length of the buffered body wins over the header
+    assert environ["CONTENT_LENGTH"] == "8"
+    assert environ["CONTENT_TYPE"] == "application/json"
+    assert environ["wsgi.input"].read() == b'{"x": 1}'
+    assert environ["HTTP_X_A2A_ROLE"] == "admin"
+    assert environ["HTTP_ACCEPT"] == "text/html,application/json"
+    assert "HTTP_CONTENT_TYPE" not in environ
+
+
+def test_run_wsgi_relays_streamed_body():
+    closed = []
+
+    class Body:
+        def __iter__(self):
+            yield b"one,"
+            yield b""
+            yield b"two"
+
+        def close(self):
+            closed.append(True)
+
+    def wsgi_app(environ, start_response):
+        start_response("201 Created", [("Content-Type", "text/plain"), ("X-Extra", "1")])
+        return Body()
+
+    emitted = []
+    HubASGIApp(wsgi_app)._run_wsgi({}, emitted.append)
+    assert emitted[0] == {
+        "type": "http.response.start",
+        "status": 201,
+        "headers": [(b"content-type", b"text/plain"), (b"x-extra", b"1")],
+    }
+    assert b"".join(m.get("body", b"") for m in emitted[1:]) == b"one,two"
+    assert emitted[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+    assert closed == [True]
+
+
+def test_run_wsgi_error_becomes_500():
+    def wsgi_app(environ, start_response):
+        raise RuntimeError("boom")
+
+    emitted = []
+    try:
+        HubASGIApp(wsgi_app)._run_wsgi({}, emitted.append)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("handler error should be re-raised")
+    assert emitted[0]["status"] == 500
+    assert emitted[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+class LifespanApp(HubASGIApp):
+    """Records lifespan calls instead of starting the hub."""
+
+    def __init__(self, fail=False):
+        super().__init__(main.app, threads=1)
+        self.fail = fail
+        self.calls = []
+
+    def startup(self):
+        self.calls.append("startup")
+        if self.fail:
+            raise SystemExit(1)
+
+    def shutdown(self):
+        self.calls.append("shutdown")
+
+
+def run_lifespan(app, events):
+    incoming = [{"type": event} for event in events]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(app({"type": "lifespan"}, receive, send))
+    return sent
+
+
+def test_lifespan_startup_and_shutdown():
+    app = LifespanApp()
+    sent = run_lifespan(app, ["lifespan.startup", "lifespan.shutdown"])
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert app.calls == ["startup", "shutdown"]
+
+    # A failed startup (e.g. missing secrets exit the process) is reported, not raised
+    failing = LifespanApp(fail=True)
+    assert run_lifespan(failing, ["lifespan.startup"]) == ["lifespan.startup.failed"]
+    assert failing.calls == ["startup"]
+
+
+def task_status(task_id):
+    conn = main.get_db_connection()
+    try:
+        return conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_wsgi_bridge_and_native_long_poll():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        app = HubASGIApp(main.app, threads=4)
+        try:
+            # Regular endpoint through the WSGI bridge
+            status, headers, body = asyncio.run(call(app, http_scope("/api/agent/list")))
+            assert status == 200 and headers[b"content-type"] == b"application/json"
+            assert AGENT_ID in body.decode("utf-8")
+
+            # Invalid waits fall through to the Flask route
+            for wait in (b"nan", b"inf", b"later"):
+                query = b"agent_id=" + AGENT_ID.encode() + b"&wait=" + wait
+                response = asyncio.run(call(app, http_scope("/api/task/next", query)))
+                assert response[0] == 400, wait
+
+            task = create_task(client, "ASGI-A")
+            query = b"agent_id=" + AGENT_ID.encode() + b"&wait=5"
+            status, _headers, body = asyncio.run(call(app, http_scope("/api/task/next", query)))
+            assert status == 200
+            assert json.loads(body)["task"]["id"] == task["task_id"]
+
+            denied = http_scope("/api/task/next", query, headers=[(b"x-a2a-role", b"nobody")])
+            assert asyncio.run(call(app, denied))[0] == 403
+        finally:
+            app.shutdown()
+
+
+def test_stream_releases_claim_when_send_fails():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        app = HubASGIApp(main.app, threads=4)
+        try:
+            task = create_task(client, "ASGI-SSE")
+
+            async def receive():
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if b"event: task" in message.get("body", b""):
+                    raise OSError("client went away")
+
+            scope = http_scope("/api/task/stream", b"agent_id=" + AGENT_ID.encode())
+            try:
+                asyncio.run(app(scope, receive, send))
+            except OSError:
+                pass
+            else:
+                raise AssertionError("send failure should end the stream")
+            app.executor.shutdown(wait=True)
+            assert task_status(task["task_id"]) == "PENDING"
+        finally:
+            app._executor = None
+            main.close_db_pools()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the A2A Hub SQLite access layer (db_pool.py)
+
+1. Pooled connections are reused and configured for WAL
+2. WriteQueue group commit: a failing job is rolled back to its savepoint and re-raised
+   to its caller, while the other jobs of the same batch are committed
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# Add the current directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import ConnectionPool, WriteQueue
+
+
+def make_pool(tmp):
+    pool = ConnectionPool(os.path.join(tmp, "pool.db"))
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE items (name TEXT PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    return pool
+
+
+def item_names(pool):
+    conn = pool.acquire()
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+    finally:
+        conn.close()
+
+
+def test_pool_reuses_connections():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp)
+        conn = pool.acquire()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
+        for _ in range(5):
+            pool.acquire().close()
+        assert pool.created == 1
+        pool.close_all()
+
+
+def test_failing_job_is_rolled_back_within_its_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp)
+        write_queue = WriteQueue(pool)
+        gate = threading.Event()
+        results = {}
+
+        def insert(name, fail=False):
+            def job(cursor):
+                cursor.execute("INSERT INTO items (name) VALUES (?)", (name,))
+                if fail:
+                    raise ValueError(f"job {name} failed")
+                return name
+
+            return job
+
+        def submit(name, job):
+            try:
+                results[name] = write_queue.submit(job)
+            except Exception as e:
+                results[name] = e
+
+        # Hold the writer on a first batch so the next three jobs are committed together
+        running = threading.Event()
+
+        def hold(cursor):
+            running.set()
+            return gate.wait()
+
+        blocker = threading.Thread(target=submit, args=("blocker", hold))
+        blocker.start()
+        running.wait()
+        threads = [
+            threading.Thread(target=submit, args=("a", insert("a"))),
+            threading.Thread(target=submit, args=("b", insert("b", fail=True))),
+            threading.Thread(target=submit, args=("c", insert("c"))),
+        ]
+        for thread in threads:
+            thread.start()
+        while write_queue._jobs.qsize() < 3:
+            pass
+        gate.set()
+        for thread in [blocker, *threads]:
+            thread.join()
+
+        assert results["a"] == "a" and results["c"] == "c"
+        assert isinstance(results["b"], ValueError)
+        assert item_names(pool) == ["a", "c"]
+        assert write_queue.batches == 2
+        assert write_queue.jobs_committed == 4
+
+        write_queue.stop()
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Unit tests for A2A Hub deadline-driven background work
+
+1. DeadlineScheduler: schedule, supersede, cancel, handler re-arm and retry on error
+2. check_expired_leases / check_priority_aging with explicit task ids only touch those
+   tasks and hand back the deadlines that are not due yet
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the current directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from deadline_scheduler import DeadlineScheduler
+from test_task_dispatch import create_task, fresh_hub, next_task
+
+
+class Recorder:
+    """Deadline handler that records its calls and returns preset next deadlines."""
+
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.next_deadlines = {}
+        self.fail_times = fail_times
+        self.called = threading.Event()
+
+    def __call__(self, keys):
+        self.calls.append(sorted(keys))
+        self.called.set()
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("handler failed")
+        return {key: self.next_deadlines.pop(key, None) for key in keys}
+
+    def wait(self, timeout=2.0):
+        assert self.called.wait(timeout), "handler was not called"
+        self.called.clear()
+
+
+def started_scheduler(**kwargs):
+    scheduler = DeadlineScheduler(**kwargs)
+    recorder = Recorder()
+    scheduler.register("lease", recorder)
+    scheduler.start()
+    return scheduler, recorder
+
+
+def test_due_keys_are_batched_and_rearmed():
+    scheduler, recorder = started_scheduler()
+    try:
+        now = time.time()
+        scheduler.schedule("lease", "b", now + 0.05)
+        scheduler.schedule("lease", "a", now + 0.05)
+        scheduler.schedule("lease", "later", now + 60)
+        recorder.next_deadlines["a"] = now + 0.1
+        recorder.wait()
+        assert recorder.calls == [["a", "b"]]
+        # "a" asked to be looked at again
+        recorder.wait()
+        assert recorder.calls[-1] == ["a"]
+        assert scheduler.pending("lease") == 1
+        assert scheduler.fired == 3
+    finally:
+        scheduler.stop()
+
+
+def test_supersede_and_cancel():
+    scheduler, recorder = started_scheduler()
+    try:
+        now = time.time()
+        scheduler.schedule("lease", "moved", now + 0.05)
+        scheduler.schedule("lease", "moved", now + 0.3)
+        scheduler.schedule("lease", "cancelled", now + 0.05)
+        scheduler.cancel("lease", "cancelled")
+        # An earlier deadline wakes the sleeping thread
+        scheduler.schedule("lease", "early", now + 0.01)
+        recorder.wait()
+        assert recorder.calls == [["early"]]
+        recorder.wait()
+        assert recorder.calls == [["early"], ["moved"]]
+        assert time.time() >= now + 0.3
+        time.sleep(0.1)
+        assert len(recorder.calls) == 2
+        assert scheduler.pending() == 0
+    finally:
+        scheduler.stop()
+
+
+def test_failing_handler_is_retried():
+    scheduler = DeadlineScheduler(retry_delay=0.05)
+    recorder = Recorder(fail_times=1)
+    scheduler.register("aging", recorder)
+    scheduler.start()
+    try:
+        scheduler.schedule("aging", "t1", time.time())
+        recorder.wait()
+        failed_at = time.time()
+        # The keys of the failed call are re-armed retry_delay later
+        recorder.wait()
+        assert time.time() - failed_at >= 0.04
+        assert recorder.calls == [["t1"], ["t1"]]
+        assert scheduler.pending("aging") == 0
+    finally:
+        scheduler.stop()
+
+
+def test_stop_keeps_deadlines():
+    scheduler, recorder = started_scheduler()
+    scheduler.schedule("lease", "kept", time.time() + 60)
+    scheduler.stop()
+    assert not scheduler.running
+    assert scheduler.pending("lease") == 1
+    assert recorder.calls == []
+
+
+def iso(dt):
+    return dt.isoformat().replace("+00:00", "Z")
+
+
+def update_task(task_id, **columns):
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    conn = main.get_db_connection()
+    conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", (*columns.values(), task_id))
+    conn.commit()
+    conn.close()
+
+
+def task_row(task_id):
+    conn = main.get_db_connection()
+    try:
+        return conn.execute(
+            "SELECT status, priority, lease_expiry_ts, created_at FROM tasks WHERE id = ?",
+            (task_id,),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def test_check_expired_leases_only_touches_given_tasks():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            ids = [create_task(client, f"LEASE-{i}")["task_id"] for i in range(3)]
+            for task_id in ids:
+                assert next_task(client)["id"] == task_id
+                # Park the claim on another agent id, or the next poll re-delivers it
+                update_task(task_id, agent_id=f"held-{task_id}")
+            expired, extended, untouched = ids
+            now = datetime.datetime.now(datetime.UTC)
+            past = iso(now - datetime.timedelta(seconds=5))
+            future = now + datetime.timedelta(seconds=30)
+            update_task(expired, lease_expiry_ts=past)
+            update_task(extended, lease_expiry_ts=iso(future))
+            update_task(untouched, lease_expiry_ts=past)
+
+            not_expired = main.check_expired_leases([expired, extended])
+            assert set(not_expired) == {extended}
+            assert abs(not_expired[extended] - future.timestamp()) < 1e-3
+            assert task_row(expired)[0] == "PENDING" and task_row(expired)[2] is None
+            assert task_row(extended)[0] == "RUNNING"
+            assert task_row(untouched)[0] == "RUNNING"
+
+            # Without ids every expired lease is released
+            assert main.check_expired_leases() == {}
+            assert task_row(untouched)[0] == "PENDING"
+        finally:
+            main.close_db_pools()
+
+
+def test_check_priority_aging_only_touches_given_tasks():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            old, fresh, untouched, capped = (
+                create_task(client, f"AGING-{i}", priority=priority)["task_id"]
+                for i, priority in enumerate((0, 0, 0, 3))
+            )
+            now = datetime.datetime.now(datetime.UTC)
+            threshold = main.PRIORITY_AGING_CONFIG["aging_threshold"]
+            long_ago = iso(now - datetime.timedelta(seconds=threshold + 10))
+            for task_id in (old, untouched, capped):
+                update_task(task_id, created_at=long_ago)
+
+            next_deadlines = main.check_priority_aging([old, fresh, capped])
+            assert set(next_deadlines) == {old, fresh}
+            check_interval = main.PRIORITY_AGING_CONFIG["check_interval"]
+            assert abs(next_deadlines[old] - (now.timestamp() + check_interval)) < 5
+            fresh_created = main.iso_to_epoch(task_row(fresh)[3])
+            assert next_deadlines[fresh] == fresh_created + threshold
+            assert task_row(old)[1] == 1
+            assert task_row(fresh)[1] == 0
+            assert task_row(untouched)[1] == 0
+            assert task_row(capped)[1] == 3
+        finally:
+            main.close_db_pools()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Unit tests for A2A Hub push / long-poll task delivery
+
+1. TaskNotifier: versions, no lost wake-up between a dispatch attempt and the wait,
+   timeouts and wait_async
+2. /api/task/next?wait=N and /api/task/stream through the Flask test client, including
+   releasing a claim whose task event could not be written
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the current directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from task_notifier import TaskNotifier
+from test_task_dispatch import AGENT_ID, HEADERS, create_task, fresh_hub
+
+KEY = ("Dispatch Engineer", "agent-1")
+
+
+def test_versions_and_lost_wakeup_ordering():
+    notifier = TaskNotifier()
+    assert notifier.version(KEY) == 0
+    version = notifier.version(KEY)
+    # Work arrives after the waiter read its version but before it parks
+    notifier.notify(KEY)
+    start = time.monotonic()
+    assert notifier.wait(KEY, version, 5) is True
+    assert time.monotonic() - start < 1
+    assert notifier.version(KEY) == 1
+
+    notifier.notify_many([KEY, KEY, ("other", "agent-2")])
+    assert notifier.version(KEY) == 2
+    assert notifier.version(("other", "agent-2")) == 1
+
+
+def test_wait_times_out_and_wakes_from_other_threads():
+    notifier = TaskNotifier()
+    assert notifier.wait(KEY, notifier.version(KEY), 0.05) is False
+    assert notifier.waiting() == 0
+
+    version = notifier.version(KEY)
+    woken = []
+    waiter = threading.Thread(target=lambda: woken.append(notifier.wait(KEY, version, 5)))
+    waiter.start()
+    while notifier.waiting() == 0:
+        time.sleep(0.001)
+    # Other keys do not wake the waiter
+    notifier.notify(("other", "agent-2"))
+    time.sleep(0.05)
+    assert woken == []
+    notifier.notify(KEY)
+    waiter.join(5)
+    assert woken == [True]
+    assert notifier.waiting() == 0
+
+
+def test_wait_async():
+    notifier = TaskNotifier()
+
+    async def scenario():
+        version = notifier.version(KEY)
+        assert await notifier.wait_async(KEY, version, 0.05) is False
+
+        # Notified from another thread while parked on the event loop
+        timer = threading.Timer(0.05, notifier.notify, args=(KEY,))
+        timer.start()
+        assert await notifier.wait_async(KEY, version, 5) is True
+        timer.join()
+
+        # Version already moved: no wait at all
+        assert await notifier.wait_async(KEY, version, 5) is True
+        assert notifier.waiting() == 0
+        assert notifier._async_waiters == {}
+
+    asyncio.run(scenario())
+
+
+def task_status(task_id):
+    conn = main.get_db_connection()
+    try:
+        return conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_next_task_rejects_invalid_wait():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            for wait in ("nan", "inf", "-inf", "soon"):
+                response = client.get(
+                    f"/api/task/next?agent_id={AGENT_ID}&wait={wait}", headers=HEADERS
+                )
+                assert response.status_code == 400, wait
+        finally:
+            main.close_db_pools()
+
+
+def test_long_poll_returns_when_task_is_created():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            start = time.monotonic()
+            response = client.get(f"/api/task/next?agent_id={AGENT_ID}&wait=0.1", headers=HEADERS)
+            assert response.get_json()["task"] is None
+            assert time.monotonic() - start >= 0.1
+
+            created = {}
+            producer = threading.Timer(
+                0.1,
+                lambda: created.update(create_task(main.app.test_client(), "POLL-A")),
+            )
+            producer.start()
+            start = time.monotonic()
+            response = client.get(f"/api/task/next?agent_id={AGENT_ID}&wait=10", headers=HEADERS)
+            producer.join()
+            assert response.get_json()["task"]["id"] == created["task_id"]
+            assert time.monotonic() - start < 5
+        finally:
+            main.close_db_pools()
+
+
+def open_stream(client, agent_id=AGENT_ID):
+    response = client.get(f"/api/task/stream?agent_id={agent_id}", headers=HEADERS, buffered=False)
+    return response, iter(response.response)
+
+
+def next_chunk(chunks):
+    chunk = next(chunks)
+    return chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+
+
+def test_stream_pushes_tasks_and_keepalives():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        saved = dict(main.TASK_DELIVERY_CONFIG)
+        main.TASK_DELIVERY_CONFIG["keepalive_interval"] = 0.05
+        try:
+            unknown = client.get("/api/task/stream?agent_id=nobody", headers=HEADERS)
+            assert unknown.status_code == 404
+
+            task = create_task(client, "STREAM-A")
+            response, chunks = open_stream(client)
+            assert response.mimetype == "text/event-stream"
+            assert next_chunk(chunks) == "retry: 3000\n\n"
+            event = next_chunk(chunks)
+            assert event.startswith("event: task\n")
+            assert task["task_id"] in event
+            # Asking for the next chunk means the task event was written
+            assert next_chunk(chunks) == ": keepalive\n\n"
+            response.close()
+            assert task_status(task["task_id"]) == "RUNNING"
+        finally:
+            main.TASK_DELIVERY_CONFIG.update(saved)
+            main.close_db_pools()
+
+
+def test_stream_releases_claim_when_event_is_not_written():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            task = create_task(client, "STREAM-B")
+            response, chunks = open_stream(client)
+            next_chunk(chunks)
+            assert task["task_id"] in next_chunk(chunks)
+            assert task_status(task["task_id"]) == "RUNNING"
+
+            # The server closes the stream at the task event (client went away)
+            response.close()
+            assert task_status(task["task_id"]) == "PENDING"
+            response = client.get(f"/api/task/next?agent_id={AGENT_ID}", headers=HEADERS)
+            assert response.get_json()["task"]["id"] == task["task_id"]
+        finally:
+            main.close_db_pools()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Unit tests for A2A Hub task dispatch
+
+Runs the hub in-process (Flask test client, temporary database) and checks:
+1. Dependency readiness (tasks.unresolved_deps), including a dependency that is
+   already DONE when the dependent task is created
+2. Concurrent claims of one queue never hand the same task out twice
+3. Workflow repair releases lease-less RUNNING tasks like an expired lease
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# Add the current directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from deadline_scheduler import DeadlineScheduler
+
+HEADERS = {"X-A2A-Role": "admin"}
+AGENT_ID = "dispatch-agent"
+OWNER_ROLE = "Dispatch Engineer"
+
+
+def fresh_hub(tmp, capacity=100):
+    """Point the hub at a new database in tmp and register one agent; returns a test client."""
+    main.close_db_pools()
+    main.DB_PATH = os.path.join(tmp, "a2a_hub.db")
+    main.init_db()
+    client = main.app.test_client()
+    response = client.post(
+        "/api/agent/register",
+        json={
+            "agent_id": AGENT_ID,
+            "owner_role": OWNER_ROLE,
+            "capabilities": ["dispatch"],
+            "allowed_tools": ["python"],
+            "capacity": capacity,
+        },
+        headers=HEADERS,
+    )
+    assert response.status_code == 200, response.get_json()
+    return client
+
+
+def create_task(client, task_code, dependencies=None, priority=0):
+    response = client.post(
+        "/api/task/create",
+        json={
+            "task_code": task_code,
+            "area": "dispatch",
+            "owner_role": OWNER_ROLE,
+            "instructions": f"run {task_code}",
+            "how_to_repro": "n/a",
+            "expected": "done",
+            "evidence_requirements": "none",
+            "dependencies": dependencies or [],
+            "priority": priority,
+        },
+        headers=HEADERS,
+    )
+    body = response.get_json()
+    assert body["success"], body
+    return body
+
+
+def next_task(client):
+    response = client.get(f"/api/task/next?agent_id={AGENT_ID}", headers=HEADERS)
+    return response.get_json()["task"]
+
+
+def finish(client, task_id, status="DONE"):
+    response = client.post(
+        "/api/task/result",
+        json={"task_id": task_id, "status": status, "result": {"ok": status == "DONE"}},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200, response.get_json()
+
+
+def unresolved_deps(task_id):
+    conn = main.get_db_connection()
+    try:
+        row = conn.execute("SELECT unresolved_deps FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return row[0]
+    finally:
+        conn.close()
+
+
+def test_dependent_waits_for_pending_dependency():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            dep = create_task(client, "DEP-A")
+            # Higher priority than its dependency, but it must not be claimed first
+            dependent = create_task(client, "DEP-B", [dep["task_id"]], priority=3)
+            assert dependent["status"] == "PENDING"
+            assert unresolved_deps(dependent["task_id"]) == 1
+
+            claimed = next_task(client)
+            assert claimed["id"] == dep["task_id"]
+            finish(client, dep["task_id"])
+            assert unresolved_deps(dependent["task_id"]) == 0
+
+            assert next_task(client)["id"] == dependent["task_id"]
+        finally:
+            main.close_db_pools()
+
+
+def test_dependency_done_before_dependent_is_created():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            dep = create_task(client, "DONE-A")
+            assert next_task(client)["id"] == dep["task_id"]
+            finish(client, dep["task_id"])
+
+            dependent = create_task(client, "DONE-B", [dep["task_id"]])
+            assert dependent["status"] == "PENDING"
+            assert unresolved_deps(dependent["task_id"]) == 0
+            assert next_task(client)["id"] == dependent["task_id"]
+        finally:
+            main.close_db_pools()
+
+
+def test_failed_or_missing_dependency_blocks_dependent():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp)
+        try:
+            missing = create_task(client, "MISSING-B", ["no-such-task"])
+            assert missing["status"] == "BLOCKED"
+
+            dep = create_task(client, "FAIL-A")
+            dependent = create_task(client, "FAIL-B", [dep["task_id"]])
+            assert next_task(client)["id"] == dep["task_id"]
+            finish(client, dep["task_id"], status="FAIL")
+
+            conn = main.get_db_connection()
+            try:
+                row = conn.execute(
+                    "SELECT status, reason_code FROM tasks WHERE id = ?", (dependent["task_id"],)
+                ).fetchone()
+            finally:
+                conn.close()
+            assert row == ("BLOCKED", "dep_failed")
+        finally:
+            main.close_db_pools()
+
+
+def run_concurrent_claims(workers=8):
+    """Claim every task of the queue from several threads, each on its own connection."""
+    claimed = []
+    errors = []
+    claimed_lock = threading.Lock()
+    start = threading.Barrier(workers)
+
+    def worker():
+        conn = main.get_db_pool().connect()
+        try:
+            start.wait()
+            while True:
+                now = main.datetime.datetime.utcnow().isoformat() + "Z"
+                row = main.claim_next_task(conn.cursor(), AGENT_ID, OWNER_ROLE, now, now, now, 60)
+                conn.commit()
+                if row is None:
+                    return
+                with claimed_lock:
+                    claimed.append(row[0])
+        except Exception as e:  # collected and re-raised in the main thread
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return claimed
+
+
+def test_concurrent_claims_never_double_assign():
+    for supports_returning in (True, False):
+        with tempfile.TemporaryDirectory() as tmp:
+            client = fresh_hub(tmp)
+            saved = main.SQLITE_SUPPORTS_RETURNING
+            main.SQLITE_SUPPORTS_RETURNING = supports_returning
+            try:
+                task_ids = {create_task(client, f"RACE-{i}")["task_id"] for i in range(40)}
+                claimed = run_concurrent_claims()
+                assert len(claimed) == len(set(claimed)), "a task was claimed twice"
+                assert set(claimed) == task_ids
+            finally:
+                main.SQLITE_SUPPORTS_RETURNING = saved
+                main.close_db_pools()
+
+
+def test_repair_releases_running_task_without_lease():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = fresh_hub(tmp, capacity=5)
+        saved = main.deadline_scheduler
+        # A stopped clock keeps armed deadlines in the heap where the test can count them
+        main.deadline_scheduler = DeadlineScheduler(clock=lambda: 0)
+        try:
+            task = create_task(client, "REPAIR-A")
+            assert next_task(client)["id"] == task["task_id"]
+            conn = main.get_db_connection()
+            conn.execute(
+                "UPDATE tasks SET lease_expiry_ts = NULL WHERE id = ?", (task["task_id"],)
+            )
+            conn.commit()
+            conn.close()
+
+            main.deadline_scheduler.start()
+            key = (OWNER_ROLE, AGENT_ID)
+            version = main.task_notifier.version(key)
+            success, repaired, errors = main.repair_workflow_inconsistencies()
+            assert success and not errors
+            transitions = [(t["old_status"], t["new_status"]) for t in repaired]
+            assert transitions == [("RUNNING", "PENDING")]
+
+            conn = main.get_db_connection()
+            try:
+                status = conn.execute(
+                    "SELECT status FROM tasks WHERE id = ?", (task["task_id"],)
+                ).fetchone()[0]
+                capacity = conn.execute(
+                    "SELECT available_capacity FROM agents WHERE agent_id = ?", (AGENT_ID,)
+                ).fetchone()[0]
+            finally:
+                conn.close()
+            assert status == "PENDING"
+            # The slot taken on create is back, as on lease expiry
+            assert capacity == 5
+            assert main.task_notifier.version(key) == version + 1
+            assert main.deadline_scheduler.pending("aging") == 1
+            assert main.deadline_scheduler.pending("lease") == 0
+            assert next_task(client)["id"] == task["task_id"]
+        finally:
+            main.deadline_scheduler.stop()
+            main.deadline_scheduler = saved
+            main.close_db_pools()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -3161,7 +3161,9 @@ async def get_state_orders(
         _ensure_repo_src_on_path()
         from quantsys.execution.state_storage import StateStorageFactory
 
-        _ = StateStorageFactory.create(storage_type=storage_type, storage_dir=storage_dir)
+        _ = StateStorageFactory.create(
+            storage_type=storage_type, storage_dir=storage_dir, read_only=True
+        )
         return {
             "success": True,
             "orders": {},
@@ -3184,7 +3186,9 @@ async def get_state_positions(
         _ensure_repo_src_on_path()
         from quantsys.execution.state_storage import StateStorageFactory
 
-        state_storage = StateStorageFactory.create(storage_type=storage_type, storage_dir=storage_dir)
+        state_storage = StateStorageFactory.create(
+            storage_type=storage_type, storage_dir=storage_dir, read_only=True
+        )
         positions = state_storage.get_all_positions()
         return {
             "success": True,
@@ -3208,7 +3212,9 @@ async def get_state_portfolio(
         _ensure_repo_src_on_path()
         from quantsys.execution.state_storage import StateStorageFactory
 
-        state_storage = StateStorageFactory.create(storage_type=storage_type, storage_dir=storage_dir)
+        state_storage = StateStorageFactory.create(
+            storage_type=storage_type, storage_dir=storage_dir, read_only=True
+        )
         portfolio = state_storage.get_portfolio() or {}
         return {"success": True, "portfolio": portfolio, "timestamp": datetime.now().isoformat()}
     except Exception as e:
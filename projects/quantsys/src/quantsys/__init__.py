@@ -11,11 +11,14 @@ from datetime import datetime
 
 import pandas as pd
 
-# 配置日志
+# 配置日志（QUANTSYS_LOG_FILE 可指定日志文件路径，默认写入当前目录）
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("quant_system.log"), logging.StreamHandler(sys.stdout)],
+    handlers=[
+        logging.FileHandler(os.environ.get("QUANTSYS_LOG_FILE", "quant_system.log")),
+        logging.StreamHandler(sys.stdout),
+    ],
 )
 logger = logging.getLogger(__name__)
 
@@ -17,6 +17,7 @@ from ..models.cost_model import TradeCostModel
 from ..models.fill_model import FillModel
 from ..models.liquidation_model import LiquidationModel
 from ..models.margin_model import MarginModel
+from .bar_arrays import BarArrays, SignalArrays, series_values
 
 # 配置日志
 logging.basicConfig(
@@ -77,6 +78,7 @@ class BacktestEngine:
         # 风险管理器
         self.risk_manager = RiskManager(self.config.get("risk", {}))
         self.last_data_info = {}
+        self.data_store = self._create_data_store()
         self.random_seed = self.config.get("backtest", {}).get("random_seed", 42)
 
         # Margin and liquidation models
@@ -196,11 +198,22 @@ class BacktestEngine:
         """
         优先从数据库加载数据，失败时尝试读取本地数据文件
         """
+        df, data_info = self._read_backtest_data(symbol, timeframe, start_time, end_time)
+        if data_info:
+            self.last_data_info = data_info
+        return df
+
+    def _read_backtest_data(
+        self, symbol, timeframe, start_time, end_time
+    ) -> tuple[pd.DataFrame, dict]:
+        """
+        加载数据并返回 (df, 数据来源信息)，不修改引擎状态（可在线程中并发调用）
+        """
         if self.db_manager is not None:
             try:
                 df = self.db_manager.get_trading_data(symbol, timeframe, start_time, end_time)
                 if df is not None and not df.empty:
-                    self.last_data_info = {
+                    data_info = {
                         "source": "database",
                         "symbol": symbol,
                         "timeframe": timeframe,
@@ -209,18 +222,40 @@ class BacktestEngine:
                         "rows": int(len(df)),
                         "columns": list(df.columns),
                     }
-                    return df
+                    return df, data_info
             except Exception as e:
                 logger.warning(f"从数据库读取数据失败，尝试本地数据: {e}")
 
+        store = self.data_store
         data_path = self.config.get("backtest", {}).get("data_path")
-        if not data_path:
-            return pd.DataFrame()
+        data_abs_path = os.path.abspath(data_path) if data_path else None
+
+        # 配置了源文件时，仅当缓存仍对应源文件当前内容（源文件与分区的文件指纹一致）才使用；
+        # 缓存有效而区间内无数据时直接返回空结果，不回退解析源文件、不重建缓存
+        if store is not None and (
+            store.is_current(symbol, timeframe, data_abs_path)
+            if data_abs_path and os.path.exists(data_abs_path)
+            else store.has(symbol, timeframe)
+        ):
+            df = store.read(symbol, timeframe, start_time, end_time)
+            data_info = {
+                "source": "data_store",
+                "path": str(store.base_path),
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "rows": int(len(df)),
+                "columns": list(df.columns),
+                "start_time": str(df.index[0]) if len(df.index) > 0 else None,
+                "end_time": str(df.index[-1]) if len(df.index) > 0 else None,
+            }
+            return df, data_info
+
+        if not data_abs_path:
+            return pd.DataFrame(), {}
 
-        data_abs_path = os.path.abspath(data_path)
         if not os.path.exists(data_abs_path):
             logger.error(f"本地数据文件不存在: {data_abs_path}")
-            return pd.DataFrame()
+            return pd.DataFrame(), {}
 
         if data_abs_path.endswith(".feather"):
             df = pd.read_feather(data_abs_path)
@@ -237,6 +272,13 @@ class BacktestEngine:
         if hasattr(df.index, "tz") and df.index.tz is not None:
             df.index = df.index.tz_convert(None)
 
+        if store is not None and isinstance(df.index, pd.DatetimeIndex):
+            # 首次读取（或源文件变化后）整体重建列式缓存，后续冷启动直接内存映射
+            try:
+                store.replace(symbol, timeframe, df, data_abs_path)
+            except Exception as e:
+                logger.warning(f"写入行情缓存失败: {e}")
+
         if start_time and end_time:
             df = df.loc[start_time:end_time]
 
@@ -246,7 +288,7 @@ class BacktestEngine:
         except OSError:
             last_modified = None
 
-        self.last_data_info = {
+        data_info = {
             "source": "file",
             "path": data_abs_path,
             "last_modified": last_modified,
@@ -256,7 +298,22 @@ class BacktestEngine:
             "end_time": str(df.index[-1]) if len(df.index) > 0 else None,
         }
 
-        return df
+        return df, data_info
+
+    def _create_data_store(self):
+        """
+        列式行情缓存（backtest.data_store_path 配置时启用）
+        """
+        store_path = self.config.get("backtest", {}).get("data_store_path")
+        if not store_path:
+            return None
+        try:
+            from .market_data_store import MarketDataStore
+
+            return MarketDataStore(store_path)
+        except ImportError as e:
+            logger.warning(f"行情缓存不可用，回退到本地数据文件: {e}")
+            return None
 
     def _set_random_seed(self) -> None:
         seed = self.config.get("backtest", {}).get("random_seed", 42)
@@ -285,6 +342,66 @@ class BacktestEngine:
             return None
         return exec_index
 
+    def _use_vectorized_loop(self) -> bool:
+        """
+        execution_mode: iterrows（默认，逐行读取 DataFrame）/ vectorized（预抽取数组）
+        """
+        mode = self.config.get("backtest", {}).get("execution_mode", "iterrows")
+        if mode not in ("iterrows", "vectorized"):
+            raise ValueError(f"不支持的回测执行模式: {mode}")
+        return mode == "vectorized"
+
+    def _iter_bars(self, df: pd.DataFrame):
+        """
+        逐 bar 产出 (i, exec_index, price, atr, next_open, next_high, next_low)
+        """
+        if self._use_vectorized_loop():
+            yield from self._iter_bar_arrays(df)
+            return
+
+        total_len = len(df)
+        for i, (_, row) in enumerate(df.iterrows()):
+            exec_index = self._get_execution_index(i, total_len)
+            if exec_index is None:
+                return
+
+            next_row = df.iloc[exec_index]
+
+            price = float(row["close"])
+            atr = float(row.get("atr", np.nan)) if "atr" in row else np.nan
+
+            next_open = float(next_row.get("open", next_row["close"]))
+            next_high = float(next_row.get("high", max(next_row["close"], next_open)))
+            next_low = float(next_row.get("low", min(next_row["close"], next_open)))
+
+            yield i, exec_index, price, atr, next_open, next_high, next_low
+
+    def _iter_bar_arrays(self, df: pd.DataFrame):
+        """
+        _iter_bars 的数组版本：OHLC 一次性抽取，执行延迟只校验一次
+        """
+        total_len = len(df)
+        if total_len == 0:
+            return
+        # 复用校验逻辑（execution_delay_bars < 1 时抛出 FutureLeakError）
+        self._get_execution_index(0, total_len)
+        delay = int(self.config.get("backtest", {}).get("execution_delay_bars", 1))
+
+        bars = BarArrays.from_frame(df)
+        close, atr = bars.close, bars.atr
+        opens, highs, lows = bars.open, bars.high, bars.low
+        for i in range(total_len - delay):
+            j = i + delay
+            yield (
+                i,
+                j,
+                close[i],
+                atr[i] if atr is not None else np.nan,
+                opens[j],
+                highs[j],
+                lows[j],
+            )
+
     def _build_models(self, backtest_cfg: dict) -> tuple[FillModel, TradeCostModel]:
         slippage_bps = self._get_slippage_bps(backtest_cfg)
         fill_model = FillModel(slippage_bps=slippage_bps)
@@ -360,10 +477,13 @@ class BacktestEngine:
         strategy_id=None,
         strategy_file=None,
         strategy_class=None,
+        data=None,
     ):
         """
         self._set_random_seed()
         执行回测（支持数据库策略或本地策略文件）
+
+        data: 已加载的行情数据（如并行优化共享的数据帧），提供时不再重复加载
         """
         if strategy_file:
             strategy = self._load_strategy_from_file(strategy_file, strategy_class)
@@ -378,6 +498,10 @@ class BacktestEngine:
         elif strategy is None:
             logger.error("未提供策略信息")
             return None
+        elif isinstance(strategy, dict):
+            strategy_name = strategy.get("name", "strategy")
+        else:
+            strategy_name = getattr(strategy, "name", "strategy")
 
         symbol = symbol or self.config["backtest"].get("symbol", "ETH-USDT")
         timeframe = timeframe or self.config["backtest"].get("timeframe", "1h")
@@ -391,7 +515,10 @@ class BacktestEngine:
         logger.info(f"开始回测策略: {strategy_name} - {symbol} {timeframe}")
 
         # 获取历史数据
-        df = self._load_backtest_data(symbol, timeframe, start_time, end_time)
+        if data is not None:
+            df = data
+        else:
+            df = self._load_backtest_data(symbol, timeframe, start_time, end_time)
         if df is None or df.empty:
             logger.error(f"未找到交易数据: {symbol} {timeframe}")
             return None
@@ -606,21 +733,26 @@ class BacktestEngine:
 
         max_equity = initial_capital
 
-        total_len = len(df)
-        for i, (time, row) in enumerate(df.iterrows()):
-            exec_index = self._get_execution_index(i, total_len)
-            if exec_index is None:
-                break
-
-            next_row = df.iloc[exec_index]
-
-            price = float(row["close"])
-            atr = float(row.get("atr", np.nan)) if "atr" in row else np.nan
+        if self._use_vectorized_loop():
+            read_signals = SignalArrays.from_signals(signals).at
+        else:
 
-            next_open = float(next_row.get("open", next_row["close"]))
-            next_high = float(next_row.get("high", max(next_row["close"], next_open)))
-            next_low = float(next_row.get("low", min(next_row["close"], next_open)))
+            def read_signals(i):
+                return (
+                    signals["enter_long"].iloc[i] == 1 if "enter_long" in signals else False,
+                    signals["enter_short"].iloc[i] == 1 if "enter_short" in signals else False,
+                    signals["exit_long"].iloc[i] == 1 if "exit_long" in signals else False,
+                    signals["exit_short"].iloc[i] == 1 if "exit_short" in signals else False,
+                    float(signals["stop_distance"].iloc[i])
+                    if "stop_distance" in signals
+                    else 0.0,
+                    signals["taker_entry"].iloc[i] == 1 if "taker_entry" in signals else False,
+                    float(signals["taker_exit_distance"].iloc[i])
+                    if "taker_exit_distance" in signals
+                    else 0.0,
+                )
 
+        for i, exec_index, price, atr, next_open, next_high, next_low in self._iter_bars(df):
             current_equity = capital + (
                 position * position_size * (price - entry_price) if position != 0 else 0
             )
@@ -639,7 +771,7 @@ class BacktestEngine:
                 cooldown_candles = max(cooldown_candles, 72)
                 results["risk_adjustments"].append(
                     {
-                        "time": str(time),
+                        "time": str(df.index[i]),
                         "reason": "drawdown_limit",
                         "new_risk_per_trade": risk_per_trade,
                         "new_cooldown_candles": cooldown_candles,
@@ -650,19 +782,15 @@ class BacktestEngine:
             if position == 0 and i < cooldown_until:
                 continue
 
-            enter_long = signals["enter_long"].iloc[i] == 1 if "enter_long" in signals else False
-            enter_short = signals["enter_short"].iloc[i] == 1 if "enter_short" in signals else False
-            exit_long = signals["exit_long"].iloc[i] == 1 if "exit_long" in signals else False
-            exit_short = signals["exit_short"].iloc[i] == 1 if "exit_short" in signals else False
-            stop_distance = (
-                float(signals["stop_distance"].iloc[i]) if "stop_distance" in signals else 0.0
-            )
-            taker_entry = signals["taker_entry"].iloc[i] == 1 if "taker_entry" in signals else False
-            taker_exit_distance = (
-                float(signals["taker_exit_distance"].iloc[i])
-                if "taker_exit_distance" in signals
-                else 0.0
-            )
+            (
+                enter_long,
+                enter_short,
+                exit_long,
+                exit_short,
+                stop_distance,
+                taker_entry,
+                taker_exit_distance,
+            ) = read_signals(i)
 
             # ??????
             if position == 0 and stop_distance > 0:
@@ -887,19 +1015,9 @@ class BacktestEngine:
         position_size_pct = params.get("risk_management", {}).get("position_size", 1.0)
         position_size_pct = max(0.0, min(1.0, position_size_pct))
 
-        total_len = len(df)
-        for i, (time, row) in enumerate(df.iterrows()):
-            exec_index = self._get_execution_index(i, total_len)
-            if exec_index is None:
-                break
-
-            next_row = df.iloc[exec_index]
-            price = float(row["close"])
-
-            next_open = float(next_row.get("open", next_row["close"]))
-            next_high = float(next_row.get("high", max(next_row["close"], next_open)))
-            next_low = float(next_row.get("low", min(next_row["close"], next_open)))
+        signal_values = series_values(signals) if self._use_vectorized_loop() else None
 
+        for i, exec_index, price, _, next_open, next_high, next_low in self._iter_bars(df):
             # 计算当前保证金状态
             margin_state = margin_model.calculate_margin_state(
                 initial_capital=initial_capital,
@@ -915,7 +1033,9 @@ class BacktestEngine:
 
             if is_liquidation and position_side != 0:
                 # 执行强平
-                liquidation_event = liquidation_model.execute_liquidation(margin_state, str(time))
+                liquidation_event = liquidation_model.execute_liquidation(
+                    margin_state, str(df.index[i])
+                )
                 logger.warning(f"强平触发: {liquidation_event.liquidation_reason}")
 
                 # 记录强平事件
@@ -1037,7 +1157,7 @@ class BacktestEngine:
                 current_drawdown = (max_equity - margin_state.equity) / max_equity
             results["drawdown_curve"].append(current_drawdown)
 
-            signal = signals.iloc[i]
+            signal = signal_values[i] if signal_values is not None else signals.iloc[i]
             if signal == 1 and position_side == 0:
                 # 计算最大允许持仓大小
                 max_position_size = margin_model.calculate_max_position_size(
@@ -1324,29 +1444,59 @@ class BacktestEngine:
         else:
             results["avg_holding_hours"] = 0.0
 
-    def run_batch_backtest(self, symbols, timeframes, start_time, end_time):
+    def run_batch_backtest(
+        self, symbols, timeframes, start_time, end_time, max_workers=1, on_progress=None
+    ):
         """
         批量回测所有加载的策略
+
+        每个 (symbol, timeframe) 的数据只加载一次并供所有策略共享；
+        max_workers > 1 时在进程池中并行回测。on_progress 接收每个任务的 JobReport。
         """
+        from .batch_scheduler import BatchBacktestScheduler
+
         logger.info(f"开始批量回测，共 {len(self.strategies)} 个策略")
 
-        all_results = []
-        for strategy in self.strategies:
-            for symbol in symbols:
-                for timeframe in timeframes:
-                    result = self.run_backtest(strategy, symbol, timeframe, start_time, end_time)
-                    if result:
-                        all_results.append(result)
+        scheduler = BatchBacktestScheduler(self, max_workers=max_workers, on_progress=on_progress)
+        reports = scheduler.run(self.strategies, symbols, timeframes, start_time, end_time)
+        all_results = [report.result for report in reports if report.result]
 
         logger.info(f"批量回测完成，共回测 {len(all_results)} 个策略实例")
         return all_results
 
-    def optimize_parameters(self, strategy, symbol, timeframe, start_time, end_time, param_ranges):
+    def optimize_parameters(
+        self,
+        strategy,
+        symbol,
+        timeframe,
+        start_time,
+        end_time,
+        param_ranges,
+        n_jobs=1,
+        **parallel_options,
+    ):
         """
         参数优化
+
+        n_jobs != 1 或提供 parallel_options（halving_eta / min_fraction / journal_path /
+        metric / on_result）时使用 ParallelOptimizer：数据只加载一次并通过内存映射共享，
+        参数组合在进程池中并行回测。n_jobs=None 表示使用全部 CPU。
         """
         logger.info(f"开始参数优化: {strategy['name']} - {symbol} {timeframe}")
 
+        if n_jobs != 1 or parallel_options:
+            from .parallel_optimizer import ParallelOptimizer
+
+            df = self._load_backtest_data(symbol, timeframe, start_time, end_time)
+            if df is None or df.empty:
+                logger.error(f"未找到交易数据: {symbol} {timeframe}")
+                return {"best_params": None, "best_result": None, "all_results": []}
+
+            optimizer = ParallelOptimizer(self.config, n_jobs=n_jobs, **parallel_options)
+            return optimizer.run(
+                strategy, df, symbol, timeframe, start_time, end_time, param_ranges
+            )
+
         # 生成参数组合
         param_names = list(param_ranges.keys())
         param_values = list(param_ranges.values())
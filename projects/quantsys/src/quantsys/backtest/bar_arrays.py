@@ -0,0 +1,114 @@
+"""
+回测K线/信号数组化
+
+将 OHLC 与信号列一次性抽取为 Python 原生列表，供 BacktestEngine 的
+vectorized 执行模式逐 bar 读取，避免 df.iterrows() / Series.iloc 的开销。
+
+取值口径与 iterrows 路径逐项保持一致（缺列回退、NaN 处理、== 1 判定），
+保证两种模式产出的交易与指标完全相同。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# 完整信号表（DataFrame）中引擎识别的列
+BOOL_SIGNAL_COLUMNS = ("enter_long", "enter_short", "exit_long", "exit_short", "taker_entry")
+FLOAT_SIGNAL_COLUMNS = ("stop_distance", "taker_exit_distance")
+
+
+def _as_float_list(values) -> list[float]:
+    return np.asarray(values, dtype=float).tolist()
+
+
+@dataclass(frozen=True)
+class BarArrays:
+    """
+    按位置索引的K线数组
+
+    open/high/low 已按 iterrows 路径的回退规则补齐：
+    - 缺 open 时使用 close
+    - 缺 high/low 时使用 max/min(close, open)
+    """
+
+    close: list[float]
+    open: list[float]
+    high: list[float]
+    low: list[float]
+    atr: list[float] | None
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> BarArrays:
+        close = _as_float_list(df["close"])
+        open_ = _as_float_list(df["open"]) if "open" in df.columns else list(close)
+
+        if "high" in df.columns:
+            high = _as_float_list(df["high"])
+        else:
+            # 与 max(next_row["close"], next_open) 的比较顺序保持一致（NaN 语义相同）
+            high = [max(c, o) for c, o in zip(close, open_)]
+
+        if "low" in df.columns:
+            low = _as_float_list(df["low"])
+        else:
+            low = [min(c, o) for c, o in zip(close, open_)]
+
+        atr = _as_float_list(df["atr"]) if "atr" in df.columns else None
+        return cls(close=close, open=open_, high=high, low=low, atr=atr)
+
+
+@dataclass(frozen=True)
+class SignalArrays:
+    """
+    完整信号表的数组视图
+
+    缺失的列以 None 表示，读取时按 iterrows 路径的默认值（False / 0.0）处理。
+    """
+
+    enter_long: list[bool] | None
+    enter_short: list[bool] | None
+    exit_long: list[bool] | None
+    exit_short: list[bool] | None
+    taker_entry: list[bool] | None
+    stop_distance: list[float] | None
+    taker_exit_distance: list[float] | None
+
+    @classmethod
+    def from_signals(cls, signals) -> SignalArrays:
+        columns: dict[str, list | None] = {}
+        for name in BOOL_SIGNAL_COLUMNS:
+            columns[name] = (
+                (np.asarray(signals[name]) == 1).tolist() if name in signals else None
+            )
+        for name in FLOAT_SIGNAL_COLUMNS:
+            columns[name] = _as_float_list(signals[name]) if name in signals else None
+        return cls(**columns)
+
+    def at(self, i: int) -> tuple[bool, bool, bool, bool, float, bool, float]:
+        """
+        返回第 i 根 bar 的信号：
+        (enter_long, enter_short, exit_long, exit_short,
+         stop_distance, taker_entry, taker_exit_distance)
+        """
+        return (
+            self.enter_long[i] if self.enter_long is not None else False,
+            self.enter_short[i] if self.enter_short is not None else False,
+            self.exit_long[i] if self.exit_long is not None else False,
+            self.exit_short[i] if self.exit_short is not None else False,
+            self.stop_distance[i] if self.stop_distance is not None else 0.0,
+            self.taker_entry[i] if self.taker_entry is not None else False,
+            self.taker_exit_distance[i] if self.taker_exit_distance is not None else 0.0,
+        )
+
+
+def series_values(signals: pd.Series) -> list:
+    """
+    简单信号序列（1 / -1 / 0）转为原生列表，按位置读取
+    """
+    return signals.to_numpy().tolist()
@@ -0,0 +1,244 @@
+"""
+批量回测调度器
+
+- 每个 (symbol, timeframe) 的行情数据只加载一次，由所有策略共享
+- 数据预取在线程池中并发进行（数据库/文件 I/O）
+- 回测任务在有界进程池中并行执行，数据通过 SharedFrame 内存映射传递
+- 每个任务完成时上报进度与耗时
+"""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from .shared_frame import SharedFrame
+
+logger = logging.getLogger(__name__)
+
+_WORKER_ENGINE = None
+_WORKER_FRAMES: dict[str, Any] = {}
+
+
+@dataclass
+class BatchJob:
+    """
+    单个回测任务
+    """
+
+    job_id: int
+    strategy: Any
+    symbol: str
+    timeframe: str
+
+
+@dataclass
+class JobReport:
+    """
+    任务进度报告
+    """
+
+    job_id: int
+    strategy_name: str
+    symbol: str
+    timeframe: str
+    status: str  # completed / no_data / failed
+    wall_time: float
+    completed: int
+    total: int
+    error: str | None = None
+    result: dict | None = field(default=None, repr=False)
+
+
+def _strategy_name(strategy: Any) -> str:
+    if isinstance(strategy, dict):
+        return str(strategy.get("name", "strategy"))
+    return str(getattr(strategy, "name", "strategy"))
+
+
+def _init_worker(config: dict) -> None:
+    global _WORKER_ENGINE
+    from .backtest_engine import BacktestEngine
+
+    _WORKER_ENGINE = BacktestEngine(config)
+
+
+def _run_job(
+    job: BatchJob,
+    shared: SharedFrame,
+    data_info: dict,
+    start_time: datetime,
+    end_time: datetime,
+) -> tuple[dict | None, float]:
+    started = time.perf_counter()
+    df = _WORKER_FRAMES.get(shared.directory)
+    if df is None:
+        df = shared.load()
+        _WORKER_FRAMES[shared.directory] = df
+
+    _WORKER_ENGINE.last_data_info = data_info
+    result = _WORKER_ENGINE.run_backtest(
+        job.strategy, job.symbol, job.timeframe, start_time, end_time, data=df.copy(deep=False)
+    )
+    return result, time.perf_counter() - started
+
+
+class BatchBacktestScheduler:
+    """
+    策略 × 交易对 × 周期 的批量回测调度
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_workers: int = 1,
+        prefetch_workers: int = 4,
+        on_progress: Callable[[JobReport], None] | None = None,
+    ):
+        """
+        Args:
+            engine: 主进程中的 BacktestEngine（用于加载数据和串行执行）
+            max_workers: 回测进程数上限，1 表示在当前进程内串行执行
+            prefetch_workers: 数据预取线程数
+            on_progress: 每个任务完成时的回调
+        """
+        self.engine = engine
+        self.max_workers = max(1, int(max_workers))
+        self.prefetch_workers = max(1, int(prefetch_workers))
+        self.on_progress = on_progress
+
+    def _prefetch(self, keys, start_time, end_time) -> dict[tuple[str, str], tuple[Any, dict]]:
+        """
+        并发加载每个 (symbol, timeframe) 的数据
+        """
+        frames = {}
+
+        def load(key):
+            symbol, timeframe = key
+            started = time.perf_counter()
+            df, info = self.engine._read_backtest_data(symbol, timeframe, start_time, end_time)
+            logger.info(
+                f"预取数据 {symbol} {timeframe}: {0 if df is None else len(df)} 行, "
+                f"耗时 {time.perf_counter() - started:.2f}s"
+            )
+            return key, df, info
+
+        # 数据库游标不是线程安全的，使用数据库时串行预取
+        workers = 1 if self.engine.db_manager is not None else self.prefetch_workers
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for key, df, info in pool.map(load, keys):
+                frames[key] = (df, info)
+        return frames
+
+    def run(self, strategies, symbols, timeframes, start_time, end_time) -> list[JobReport]:
+        """
+        执行批量回测，返回全部任务报告（按 job_id 排序）
+        """
+        jobs = [
+            BatchJob(job_id, strategy, symbol, timeframe)
+            for job_id, (strategy, symbol, timeframe) in enumerate(
+                (s, sym, tf) for s in strategies for sym in symbols for tf in timeframes
+            )
+        ]
+        keys = list(dict.fromkeys((job.symbol, job.timeframe) for job in jobs))
+        logger.info(
+            f"批量回测: {len(jobs)} 个任务, {len(keys)} 份数据, 最多 {self.max_workers} 个进程"
+        )
+
+        frames = self._prefetch(keys, start_time, end_time)
+        reports: list[JobReport] = []
+
+        def report(job, status, wall_time, result=None, error=None):
+            job_report = JobReport(
+                job_id=job.job_id,
+                strategy_name=_strategy_name(job.strategy),
+                symbol=job.symbol,
+                timeframe=job.timeframe,
+                status=status,
+                wall_time=wall_time,
+                completed=len(reports) + 1,
+                total=len(jobs),
+                error=error,
+                result=result,
+            )
+            reports.append(job_report)
+            logger.info(
+                f"[{job_report.completed}/{job_report.total}] {job_report.strategy_name} "
+                f"{job.symbol} {job.timeframe}: {status} ({wall_time:.2f}s)"
+            )
+            if self.on_progress:
+                self.on_progress(job_report)
+
+        runnable = []
+        for job in jobs:
+            df, _ = frames[(job.symbol, job.timeframe)]
+            if df is None or df.empty:
+                report(job, "no_data", 0.0)
+            else:
+                runnable.append(job)
+
+        if self.max_workers == 1:
+            self._run_serial(runnable, frames, start_time, end_time, report)
+        else:
+            self._run_parallel(runnable, frames, start_time, end_time, report)
+
+        return sorted(reports, key=lambda r: r.job_id)
+
+    def _run_serial(self, jobs, frames, start_time, end_time, report) -> None:
+        for job in jobs:
+            df, info = frames[(job.symbol, job.timeframe)]
+            started = time.perf_counter()
+            try:
+                self.engine.last_data_info = info
+                result = self.engine.run_backtest(
+                    job.strategy,
+                    job.symbol,
+                    job.timeframe,
+                    start_time,
+                    end_time,
+                    data=df.copy(deep=False),
+                )
+            except Exception as e:
+                report(job, "failed", time.perf_counter() - started, error=str(e))
+                continue
+            report(
+                job,
+                "completed" if result else "failed",
+                time.perf_counter() - started,
+                result=result,
+            )
+
+    def _run_parallel(self, jobs, frames, start_time, end_time, report) -> None:
+        with tempfile.TemporaryDirectory(prefix="quantsys_batch_") as tmp_dir:
+            shared = {
+                key: SharedFrame.publish(df, f"{tmp_dir}/{index}")
+                for index, (key, (df, _)) in enumerate(frames.items())
+                if df is not None and not df.empty
+            }
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.engine.config,),
+            ) as pool:
+                futures = {}
+                for job in jobs:
+                    key = (job.symbol, job.timeframe)
+                    future = pool.submit(
+                        _run_job, job, shared[key], frames[key][1], start_time, end_time
+                    )
+                    futures[future] = (job, time.perf_counter())
+
+                for future in as_completed(futures):
+                    job, submitted = futures[future]
+                    try:
+                        result, wall_time = future.result()
+                    except Exception as e:
+                        report(job, "failed", time.perf_counter() - submitted, error=str(e))
+                        continue
+                    report(job, "completed" if result else "failed", wall_time, result=result)
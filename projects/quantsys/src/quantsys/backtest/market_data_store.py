@@ -0,0 +1,303 @@
+"""
+列式行情数据缓存
+
+按 symbol/timeframe/month 分区存储为 Arrow IPC 文件（未压缩，可直接内存映射）：
+
+    <base_path>/symbol=ETH-USDT/timeframe=1h/month=2025-01.arrow
+    <base_path>/manifest.json
+
+- 读取时通过 pa.memory_map 零拷贝映射文件
+- 时间范围谓词下推：先按 manifest 中每个分区的 min/max 时间裁剪分区，
+  再在分区内对有序时间列二分查找切片
+- manifest 记录每个分区的行数、时间范围、文件大小/修改时间和 sha256 校验和，
+  以及每个 symbol/timeframe 导入时源文件（CSV/feather）的大小与修改时间；
+  源文件或分区文件的大小/修改时间变化时由调用方重建
+- 冷启动只比较文件指纹（stat），不读取分区内容；sha256 仅由显式 verify() 校验
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_COLUMN = "timestamp"
+MANIFEST_FILE = "manifest.json"
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_datetime64(value) -> np.datetime64:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return np.datetime64(ts.to_datetime64(), "ns")
+
+
+def _partition_stamp(path: Path) -> dict:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def source_stamp(path: str) -> dict:
+    """
+    源文件指纹：绝对路径、大小与纳秒级修改时间
+    """
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class MarketDataStore:
+    """
+    按月分区的 Arrow IPC 行情缓存
+    """
+
+    def __init__(self, base_path: str):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("缺少pyarrow库，请先安装: pip install pyarrow")
+        self.base_path = Path(base_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.base_path / MANIFEST_FILE
+        self.manifest = self._load_manifest()
+        self.manifest.setdefault("sources", {})
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ manifest
+
+    def _load_manifest(self) -> dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"version": 1, "partitions": {}}
+
+    def _save_manifest(self) -> None:
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _partition_key(symbol: str, timeframe: str, month: str) -> str:
+        return f"symbol={symbol}/timeframe={timeframe}/month={month}.arrow"
+
+    def partitions(self, symbol: str, timeframe: str) -> dict[str, dict]:
+        """
+        返回指定 symbol/timeframe 的分区元数据（按月份排序）
+        """
+        prefix = f"symbol={symbol}/timeframe={timeframe}/"
+        return {
+            key: meta
+            for key, meta in sorted(self.manifest["partitions"].items())
+            if key.startswith(prefix)
+        }
+
+    def has(self, symbol: str, timeframe: str) -> bool:
+        return bool(self.partitions(symbol, timeframe))
+
+    def is_current(self, symbol: str, timeframe: str, source_path: str) -> bool:
+        """
+        缓存是否仍对应 source_path 的当前内容
+
+        比较 manifest 记录的源文件与各分区文件的大小/修改时间（只做 stat，不读取
+        分区内容）；分区文件缺失或被改写同样视为过期。内容校验和见 verify()。
+        """
+        partitions = self.partitions(symbol, timeframe)
+        if not partitions:
+            return False
+        recorded = self.manifest["sources"].get(f"{symbol}/{timeframe}")
+        try:
+            current = source_stamp(source_path)
+        except OSError:
+            return False
+        if recorded != current:
+            return False
+        for key, meta in partitions.items():
+            try:
+                stamp = _partition_stamp(self.base_path / key)
+            except OSError:
+                return False
+            if meta.get("size") != stamp["size"] or meta.get("mtime_ns") != stamp["mtime_ns"]:
+                return False
+        return True
+
+    # ------------------------------------------------------------------ write
+
+    def write(self, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        """
+        写入（合并）行情数据，df 以时间为索引；同一时间戳以新数据为准
+
+        Returns:
+            写入的分区数
+        """
+        if df is None or df.empty:
+            return 0
+
+        frame = df.copy()
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        frame.index = index.astype("datetime64[ns]")
+        frame.index.name = TIMESTAMP_COLUMN
+
+        with self._lock:
+            return self._write_locked(symbol, timeframe, frame)
+
+    def replace(self, symbol: str, timeframe: str, df: pd.DataFrame, source_path: str) -> int:
+        """
+        以 source_path 的内容整体重建 symbol/timeframe 的分区，并记录源文件指纹
+
+        与 write() 不同，旧分区中源文件已不存在的行会被丢弃。
+        """
+        stamp = source_stamp(source_path)
+        frame = df.copy()
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        frame.index = index.astype("datetime64[ns]")
+        frame.index.name = TIMESTAMP_COLUMN
+
+        with self._lock:
+            for key in self.partitions(symbol, timeframe):
+                (self.base_path / key).unlink(missing_ok=True)
+                del self.manifest["partitions"][key]
+            self.manifest["sources"][f"{symbol}/{timeframe}"] = stamp
+            if frame.empty:
+                self._save_manifest()
+                return 0
+            return self._write_locked(symbol, timeframe, frame)
+
+    def _write_locked(self, symbol: str, timeframe: str, frame: pd.DataFrame) -> int:
+        written = 0
+        for month, part in frame.groupby(frame.index.strftime("%Y-%m")):
+            key = self._partition_key(symbol, timeframe, month)
+            path = self.base_path / key
+            if path.exists():
+                existing = self._read_partition(path).to_pandas().set_index(TIMESTAMP_COLUMN)
+                part = pd.concat([existing, part])
+                part = part[~part.index.duplicated(keep="last")]
+            part = part.sort_index()
+
+            table = pa.Table.from_pandas(part.reset_index(), preserve_index=False)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".arrow.tmp")
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+
+            self.manifest["partitions"][key] = {
+                "rows": int(len(part)),
+                "min_ts": part.index[0].isoformat(),
+                "max_ts": part.index[-1].isoformat(),
+                "columns": list(part.columns),
+                "sha256": _file_sha256(path),
+                **_partition_stamp(path),
+                "written_at": datetime.now().isoformat(),
+            }
+            written += 1
+
+        self._save_manifest()
+        logger.info(f"行情缓存已写入 {symbol} {timeframe}: {written} 个分区, {len(frame)} 行")
+        return written
+
+    # ------------------------------------------------------------------ read
+
+    @staticmethod
+    def _read_partition(path: Path):
+        # 未压缩的 IPC 文件经 memory_map 读取时，列缓冲区直接指向映射内存
+        source = pa.memory_map(str(path), "r")
+        return pa.ipc.open_file(source).read_all()
+
+    def read(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time=None,
+        end_time=None,
+        columns: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        读取 [start_time, end_time]（闭区间）内的数据，返回以时间为索引的 DataFrame
+        """
+        start = _to_datetime64(start_time) if start_time is not None else None
+        end = _to_datetime64(end_time) if end_time is not None else None
+
+        tables = []
+        for key, meta in self.partitions(symbol, timeframe).items():
+            if start is not None and _to_datetime64(meta["max_ts"]) < start:
+                continue
+            if end is not None and _to_datetime64(meta["min_ts"]) > end:
+                continue
+
+            table = self._read_partition(self.base_path / key)
+            if columns is not None:
+                table = table.select([TIMESTAMP_COLUMN, *columns])
+
+            timestamps = table.column(TIMESTAMP_COLUMN).to_numpy().astype("datetime64[ns]")
+            lo = int(np.searchsorted(timestamps, start, "left")) if start is not None else 0
+            hi = (
+                int(np.searchsorted(timestamps, end, "right"))
+                if end is not None
+                else len(timestamps)
+            )
+            if hi > lo:
+                tables.append(table.slice(lo, hi - lo))
+
+        if not tables:
+            return pd.DataFrame()
+
+        table = pa.concat_tables(tables)
+        df = table.to_pandas(split_blocks=True)
+        df.set_index(TIMESTAMP_COLUMN, inplace=True)
+        return df
+
+    # ------------------------------------------------------------------ verify
+
+    def verify(self, symbol: str | None = None, timeframe: str | None = None) -> list[str]:
+        """
+        按 manifest 校验分区文件的存在性、行数和校验和（读取全部分区内容，按需显式调用）
+
+        Returns:
+            校验失败的分区列表
+        """
+        failures = []
+        for key, meta in sorted(self.manifest["partitions"].items()):
+            if symbol is not None and not key.startswith(f"symbol={symbol}/"):
+                continue
+            if timeframe is not None and f"/timeframe={timeframe}/" not in key:
+                continue
+            path = self.base_path / key
+            if not path.exists():
+                failures.append(key)
+                continue
+            if _file_sha256(path) != meta["sha256"]:
+                failures.append(key)
+                continue
+            if self._read_partition(path).num_rows != meta["rows"]:
+                failures.append(key)
+        if failures:
+            logger.error(f"行情缓存校验失败: {failures}")
+        return failures
@@ -0,0 +1,365 @@
+"""
+并行参数优化
+
+- 行情数据只加载一次，通过 SharedFrame 内存映射共享给工作进程
+- 参数组合分发到进程池，结果按完成顺序流式返回
+- 可选逐级减半（successive halving）提前淘汰：先在数据前缀上评估全部组合，
+  每一级只保留前 1/eta 的组合进入更长的数据区间
+- 结果写入 JSONL 日志，中断后重跑会跳过已完成的 (参数, 数据比例)；
+  每条记录带运行指纹（策略、品种、周期、时间区间、回测配置、指标、数据范围），
+  指纹不同的记录不会被复用
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import tempfile
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any
+
+import pandas as pd
+
+from .shared_frame import SharedFrame
+
+logger = logging.getLogger(__name__)
+
+# 写入日志的结果摘要字段
+SUMMARY_FIELDS = (
+    "total_trades",
+    "total_profit",
+    "total_return",
+    "annual_return",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "max_drawdown",
+    "win_rate",
+    "profit_factor",
+)
+
+# 工作进程内的全局状态（由 _init_worker 初始化）
+_WORKER_ENGINE = None
+_WORKER_FRAME: pd.DataFrame | None = None
+
+
+def _init_worker(config: dict, shared_frame: SharedFrame) -> None:
+    global _WORKER_ENGINE, _WORKER_FRAME
+    from .backtest_engine import BacktestEngine
+
+    _WORKER_ENGINE = BacktestEngine(config)
+    _WORKER_FRAME = shared_frame.load()
+
+
+def _run_combination(
+    strategy: dict,
+    params: dict[str, Any],
+    fraction: float,
+    symbol: str,
+    timeframe: str,
+    start_time: datetime,
+    end_time: datetime,
+) -> dict | None:
+    engine = _WORKER_ENGINE
+    strategy = copy.deepcopy(strategy)
+    for name, value in params.items():
+        engine._update_param(strategy["parameters"], name, value)
+
+    df = _WORKER_FRAME
+    if fraction < 1.0:
+        df = df.iloc[: max(2, int(len(df) * fraction))]
+
+    return engine.run_backtest(
+        strategy, symbol, timeframe, start_time, end_time, data=df.copy(deep=False)
+    )
+
+
+def params_key(params: dict[str, Any]) -> str:
+    """
+    参数组合的稳定键（用于日志去重）
+    """
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def run_fingerprint(
+    config: dict,
+    strategy: dict,
+    symbol: str,
+    timeframe: str,
+    start_time: datetime,
+    end_time: datetime,
+    metric: str,
+    df: pd.DataFrame,
+) -> str:
+    """
+    一次优化运行的指纹：日志中只有指纹相同的记录才会被复用
+    """
+    payload = {
+        "backtest": config.get("backtest", {}),
+        "strategy": strategy,
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "start_time": start_time,
+        "end_time": end_time,
+        "metric": metric,
+        "rows": len(df),
+        "first": df.index[0] if len(df) else None,
+        "last": df.index[-1] if len(df) else None,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def halving_rungs(num_candidates: int, eta: int, min_fraction: float) -> list[float]:
+    """
+    逐级减半的数据比例序列，最后一级固定为 1.0
+    """
+    if eta < 2:
+        raise ValueError("halving eta must be >= 2")
+    if not 0 < min_fraction <= 1:
+        raise ValueError("min_fraction must be in (0, 1]")
+
+    rungs = []
+    fraction = min_fraction
+    remaining = num_candidates
+    while fraction < 1.0 and remaining > 1:
+        rungs.append(fraction)
+        fraction *= eta
+        remaining = math.ceil(remaining / eta)
+    rungs.append(1.0)
+    return rungs
+
+
+class OptimizationJournal:
+    """
+    可续跑的结果日志（JSONL，每行一个已完成的评估）
+
+    只加载 run 字段与 run_id 相同的记录；其他运行（或缺少 run 字段的旧格式）的记录
+    保留在文件中但被忽略。
+    """
+
+    def __init__(self, path: str | None, run_id: str):
+        self.path = path
+        self.run_id = run_id
+        self.entries: dict[tuple[str, float], dict] = {}
+        ignored = 0
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 进程中断时最后一行可能写了一半
+                        logger.warning(f"跳过损坏的优化日志行: {line[:80]}")
+                        continue
+                    if entry.get("run") != run_id:
+                        ignored += 1
+                        continue
+                    self.entries[(entry["key"], float(entry["fraction"]))] = entry
+            logger.info(f"已从优化日志恢复 {len(self.entries)} 条结果: {path}")
+            if ignored:
+                logger.warning(f"忽略 {ignored} 条其他运行的优化日志记录: {path}")
+
+    def get(self, key: str, fraction: float) -> dict | None:
+        return self.entries.get((key, fraction))
+
+    def record(self, params: dict, fraction: float, score: float, result: dict | None) -> dict:
+        key = params_key(params)
+        entry = {
+            "run": self.run_id,
+            "key": key,
+            "params": params,
+            "fraction": fraction,
+            "score": score,
+            "summary": {f: result.get(f) for f in SUMMARY_FIELDS} if result else None,
+            "completed_at": datetime.now().isoformat(),
+        }
+        self.entries[(key, fraction)] = entry
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+                f.flush()
+        return entry
+
+
+class ParallelOptimizer:
+    """
+    进程池参数优化器
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        n_jobs: int | None = None,
+        metric: str = "total_profit",
+        halving_eta: int | None = None,
+        min_fraction: float = 0.25,
+        journal_path: str | None = None,
+        on_result: Callable[[dict], None] | None = None,
+    ):
+        """
+        Args:
+            config: 回测引擎配置（每个工作进程各自构建 BacktestEngine）
+            n_jobs: 进程数，None 表示 os.cpu_count()
+            metric: 排序指标（越大越好）
+            halving_eta: 逐级减半系数，None 表示不提前淘汰
+            min_fraction: 第一级使用的数据比例
+            journal_path: 结果日志路径，None 表示不落盘
+            on_result: 每个评估完成时的回调，参数为日志条目
+        """
+        self.config = config
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.metric = metric
+        self.halving_eta = halving_eta
+        self.min_fraction = min_fraction
+        self.journal_path = journal_path
+        self.journal: OptimizationJournal | None = None
+        self.on_result = on_result
+
+    def _score(self, result: dict | None) -> float:
+        if not result:
+            return -math.inf
+        value = result.get(self.metric)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return -math.inf
+        return float(value)
+
+    def run(
+        self,
+        strategy: dict,
+        df: pd.DataFrame,
+        symbol: str,
+        timeframe: str,
+        start_time: datetime,
+        end_time: datetime,
+        param_ranges: dict[str, list],
+    ) -> dict:
+        """
+        执行并行优化
+
+        Returns:
+            {"best_params", "best_result", "best_score", "all_results", "rungs"}
+            all_results 为日志条目列表；best_result 若来自已恢复的日志，则只有摘要字段
+        """
+        param_names = list(param_ranges.keys())
+        candidates = [
+            dict(zip(param_names, values))
+            for values in itertools.product(*param_ranges.values())
+        ]
+        if not candidates:
+            return {
+                "best_params": None,
+                "best_result": None,
+                "best_score": -math.inf,
+                "all_results": [],
+                "rungs": [],
+            }
+
+        self.journal = OptimizationJournal(
+            self.journal_path,
+            run_fingerprint(
+                self.config, strategy, symbol, timeframe, start_time, end_time, self.metric, df
+            ),
+        )
+        rungs = (
+            halving_rungs(len(candidates), self.halving_eta, self.min_fraction)
+            if self.halving_eta
+            else [1.0]
+        )
+        logger.info(
+            f"并行参数优化: {len(candidates)} 个组合, {self.n_jobs} 个进程, 数据比例分级 {rungs}"
+        )
+
+        best = {"score": -math.inf, "params": None, "result": None}
+        all_entries: list[dict] = []
+
+        with tempfile.TemporaryDirectory(prefix="quantsys_opt_") as tmp_dir:
+            shared = SharedFrame.publish(df, tmp_dir)
+            with ProcessPoolExecutor(
+                max_workers=self.n_jobs,
+                initializer=_init_worker,
+                initargs=(self.config, shared),
+            ) as pool:
+                for level, fraction in enumerate(rungs):
+                    scores = self._evaluate_rung(
+                        pool,
+                        strategy,
+                        candidates,
+                        fraction,
+                        (symbol, timeframe, start_time, end_time),
+                        best if fraction >= 1.0 else None,
+                        all_entries,
+                    )
+                    if fraction >= 1.0:
+                        break
+
+                    keep = max(1, math.ceil(len(candidates) / self.halving_eta))
+                    candidates = sorted(
+                        candidates, key=lambda p: scores[params_key(p)], reverse=True
+                    )[:keep]
+                    logger.info(f"第 {level + 1} 级 (数据比例 {fraction:.2f}) 保留 {keep} 个组合")
+
+        logger.info(f"参数优化完成，最优参数: {best['params']}, {self.metric}={best['score']}")
+        return {
+            "best_params": best["params"],
+            "best_result": best["result"],
+            "best_score": best["score"],
+            "all_results": all_entries,
+            "rungs": rungs,
+        }
+
+    def _evaluate_rung(
+        self,
+        pool: ProcessPoolExecutor,
+        strategy: dict,
+        candidates: list[dict],
+        fraction: float,
+        run_args: tuple,
+        best: dict | None,
+        all_entries: list[dict],
+    ) -> dict[str, float]:
+        scores: dict[str, float] = {}
+
+        def accept(params: dict, entry: dict, result: dict | None) -> None:
+            scores[entry["key"]] = entry["score"]
+            all_entries.append(entry)
+            if best is not None and entry["score"] > best["score"]:
+                best["score"] = entry["score"]
+                best["params"] = params
+                best["result"] = result if result is not None else entry["summary"]
+            if self.on_result:
+                self.on_result(entry)
+
+        futures = {}
+        for params in candidates:
+            cached = self.journal.get(params_key(params), fraction)
+            if cached is not None:
+                accept(params, cached, None)
+                continue
+            future = pool.submit(_run_combination, strategy, params, fraction, *run_args)
+            futures[future] = params
+
+        total = len(futures)
+        for done, future in enumerate(as_completed(futures), start=1):
+            params = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"参数组合回测失败 {params}: {e}")
+                result = None
+            entry = self.journal.record(params, fraction, self._score(result), result)
+            accept(params, entry, result)
+
+            if done % 10 == 0 or done == total:
+                logger.info(f"参数优化进度 (数据比例 {fraction:.2f}): {done}/{total}")
+
+        return scores
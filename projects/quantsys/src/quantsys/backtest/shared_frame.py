@@ -0,0 +1,83 @@
+"""
+跨进程共享的行情数据帧
+
+主进程把 OHLCV DataFrame 按列写成 .npy 文件，工作进程以 mmap_mode="r"
+只读映射，所有进程共享同一份页缓存，避免每个参数组合/任务重复加载数据。
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """
+    DataFrame 的可序列化句柄（只包含文件路径与元数据，可安全传给子进程）
+
+    数值/时间列走内存映射；object 等无法映射的列直接随句柄序列化。
+    """
+
+    directory: str
+    index_file: str
+    index_name: str | None
+    index_tz: str | None
+    column_files: dict[str, str]
+    column_order: list[str]
+    inline_columns: dict[str, list] = field(default_factory=dict)
+
+    @classmethod
+    def publish(cls, df: pd.DataFrame, directory: str) -> SharedFrame:
+        """
+        将 df 写入 directory，返回共享句柄
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        index = df.index
+        index_tz = None
+        if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+            index_tz = str(index.tz)
+            index = index.tz_convert(None)
+        index_file = os.path.join(directory, "__index__.npy")
+        np.save(index_file, np.asarray(index))
+
+        column_files: dict[str, str] = {}
+        inline_columns: dict[str, list] = {}
+        for position, column in enumerate(df.columns):
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                inline_columns[str(column)] = values.tolist()
+                continue
+            path = os.path.join(directory, f"col_{position}.npy")
+            np.save(path, values)
+            column_files[str(column)] = path
+
+        return cls(
+            directory=directory,
+            index_file=index_file,
+            index_name=df.index.name,
+            index_tz=index_tz,
+            column_files=column_files,
+            column_order=[str(c) for c in df.columns],
+            inline_columns=inline_columns,
+        )
+
+    def load(self) -> pd.DataFrame:
+        """
+        以只读内存映射方式重建 DataFrame
+        """
+        index = pd.Index(np.load(self.index_file, mmap_mode="r"), name=self.index_name)
+        if self.index_tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.index_tz)
+
+        data = {}
+        for column in self.column_order:
+            if column in self.column_files:
+                data[column] = np.load(self.column_files[column], mmap_mode="r")
+            else:
+                data[column] = self.inline_columns[column]
+        return pd.DataFrame(data, index=index, columns=self.column_order, copy=False)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+批量回测调度器测试
+覆盖串行/多进程结果一致、每份数据只加载一次、no_data 与失败任务报告以及进度回调
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.backtest import batch_scheduler
+from quantsys.backtest.backtest_engine import BacktestEngine
+from quantsys.backtest.batch_scheduler import BatchBacktestScheduler
+
+CONFIG = {"backtest": {"use_local_data_only": True, "initial_capital": 10000}}
+START = datetime(2024, 1, 1)
+END = datetime(2024, 2, 1)
+STRATEGIES = [{"name": "fast"}, {"name": "slow"}, {"name": "broken"}]
+
+
+def _frame(symbol, timeframe):
+    if symbol == "EMPTY-USDT":
+        return pd.DataFrame()
+    n = 40 if timeframe == "1h" else 25
+    base = 100.0 if symbol == "ETH-USDT" else 200.0
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame({"close": np.linspace(base, base + 10, n)}, index=index)
+
+
+def _fake_backtest(strategy, symbol, timeframe, data):
+    if strategy["name"] == "broken":
+        raise ValueError("strategy error")
+    return {
+        "strategy": strategy["name"],
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "rows": len(data),
+        "last_close": float(data["close"].iloc[-1]),
+    }
+
+
+class FakeEngine:
+    """
+    记录数据加载次数，回测结果只取决于输入数据
+    """
+
+    def __init__(self, config=None):
+        self.config = config or CONFIG
+        self.db_manager = None
+        self.loads = []
+        self.last_data_info = None
+
+    def _read_backtest_data(self, symbol, timeframe, start_time, end_time):
+        self.loads.append((symbol, timeframe))
+        return _frame(symbol, timeframe), {"source": "fake"}
+
+    def run_backtest(self, strategy, symbol, timeframe, start_time, end_time, data=None):
+        return _fake_backtest(strategy, symbol, timeframe, data)
+
+
+def _fake_init_worker(config):
+    # 由 fork 出的工作进程执行，替代真实 BacktestEngine
+    batch_scheduler._WORKER_ENGINE = FakeEngine(config)
+
+
+def _summary(reports):
+    return [(r.job_id, r.strategy_name, r.symbol, r.timeframe, r.status, r.result) for r in reports]
+
+
+def _run(max_workers):
+    engine = FakeEngine()
+    progress = []
+    scheduler = BatchBacktestScheduler(engine, max_workers=max_workers, on_progress=progress.append)
+    reports = scheduler.run(STRATEGIES, ["ETH-USDT", "EMPTY-USDT"], ["1h", "4h"], START, END)
+    return engine, progress, reports
+
+
+def test_serial_reports_and_shared_loads():
+    engine, progress, reports = _run(max_workers=1)
+
+    # 3 个策略 × 2 个交易对 × 2 个周期，数据只按 (symbol, timeframe) 加载 4 次
+    assert len(reports) == 12
+    assert sorted(engine.loads) == sorted(
+        (s, tf) for s in ("ETH-USDT", "EMPTY-USDT") for tf in ("1h", "4h")
+    )
+    assert [r.job_id for r in reports] == list(range(12))
+
+    by_status = {}
+    for r in reports:
+        by_status.setdefault(r.status, []).append(r)
+    assert {(r.strategy_name, r.symbol) for r in by_status["no_data"]} == {
+        (s["name"], "EMPTY-USDT") for s in STRATEGIES
+    }
+    assert all(r.wall_time == 0.0 and r.result is None for r in by_status["no_data"])
+    assert [(r.strategy_name, r.error) for r in by_status["failed"]] == [
+        ("broken", "strategy error"),
+        ("broken", "strategy error"),
+    ]
+    completed = by_status["completed"]
+    assert len(completed) == 4
+    assert all(r.result["strategy"] == r.strategy_name for r in completed)
+    assert {r.result["rows"] for r in completed} == {40, 25}
+
+    # 每个任务回调一次，completed 计数递增
+    assert len(progress) == 12
+    assert sorted(r.job_id for r in progress) == list(range(12))
+    assert [r.completed for r in progress] == list(range(1, 13))
+    assert all(r.total == 12 for r in progress)
+
+
+def test_parallel_matches_serial():
+    original = batch_scheduler._init_worker
+    batch_scheduler._init_worker = _fake_init_worker
+    try:
+        engine, progress, parallel = _run(max_workers=2)
+    finally:
+        batch_scheduler._init_worker = original
+    _, _, serial = _run(max_workers=1)
+
+    assert _summary(parallel) == _summary(serial)
+    assert len(engine.loads) == 4
+    assert len(progress) == 12
+
+
+def test_engine_run_batch_backtest_uses_scheduler():
+    engine = BacktestEngine(CONFIG)
+    engine.strategies = [{"name": "fast"}, {"name": "slow"}]
+    loads = []
+
+    def read(symbol, timeframe, start_time, end_time):
+        loads.append((symbol, timeframe))
+        return _frame(symbol, timeframe), {}
+
+    engine._read_backtest_data = read
+    engine.run_backtest = lambda strategy, symbol, timeframe, start, end, data=None: (
+        _fake_backtest(strategy, symbol, timeframe, data)
+    )
+    progress = []
+    results = engine.run_batch_backtest(
+        ["ETH-USDT", "BTC-USDT"], ["1h"], START, END, on_progress=progress.append
+    )
+    assert loads == [("ETH-USDT", "1h"), ("BTC-USDT", "1h")]
+    assert [(r["strategy"], r["symbol"]) for r in results] == [
+        ("fast", "ETH-USDT"),
+        ("fast", "BTC-USDT"),
+        ("slow", "ETH-USDT"),
+        ("slow", "BTC-USDT"),
+    ]
+    assert len(progress) == 4
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+列式行情缓存测试
+覆盖时间范围读取、源文件变化后的重建、仅比较文件指纹的冷启动检查以及
+BacktestEngine 的缓存失效与区间外读取
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.backtest import market_data_store
+from quantsys.backtest.backtest_engine import BacktestEngine
+from quantsys.backtest.market_data_store import MarketDataStore
+
+
+def _frame(n=24 * 70, start="2024-01-01", offset=0.0):
+    index = pd.date_range(start, periods=n, freq="h", name="timestamp").astype("datetime64[ns]")
+    close = 100 + np.arange(n, dtype=float) * 0.01 + offset
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0},
+        index=index,
+    )
+
+
+def _write_csv(path, df):
+    df.reset_index().to_csv(path, index=False)
+
+
+def _bump_mtime(path):
+    # 保证修改时间一定变化（部分文件系统 mtime 精度较粗）
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+
+def test_range_read_across_month_partitions():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MarketDataStore(tmp)
+        df = _frame()
+        assert store.write("ETH-USDT", "1h", df) == 3
+        out = store.read("ETH-USDT", "1h", "2024-01-31 20:00", "2024-02-01 03:00")
+        pd.testing.assert_frame_equal(
+            out, df.loc["2024-01-31 20:00":"2024-02-01 03:00"], check_freq=False
+        )
+        assert store.verify() == []
+
+
+def test_is_current_tracks_source_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eth.csv")
+        _write_csv(source, _frame())
+        store = MarketDataStore(os.path.join(tmp, "store"))
+        assert not store.is_current("ETH-USDT", "1h", source)
+
+        store.replace("ETH-USDT", "1h", _frame(), source)
+        assert store.is_current("ETH-USDT", "1h", source)
+        # manifest 持久化后新实例同样识别
+        assert MarketDataStore(os.path.join(tmp, "store")).is_current("ETH-USDT", "1h", source)
+
+        _write_csv(source, _frame(offset=5.0))
+        _bump_mtime(source)
+        assert not store.is_current("ETH-USDT", "1h", source)
+
+
+def test_replace_drops_rows_missing_from_source():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eth.csv")
+        _write_csv(source, _frame())
+        store = MarketDataStore(os.path.join(tmp, "store"))
+        store.replace("ETH-USDT", "1h", _frame(), source)
+
+        shorter = _frame(n=24 * 10)
+        store.replace("ETH-USDT", "1h", shorter, source)
+        assert len(store.partitions("ETH-USDT", "1h")) == 1
+        assert len(store.read("ETH-USDT", "1h")) == len(shorter)
+
+
+def test_rewritten_partition_is_not_current():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eth.csv")
+        _write_csv(source, _frame())
+        base = os.path.join(tmp, "store")
+        MarketDataStore(base).replace("ETH-USDT", "1h", _frame(), source)
+        first, second = list(MarketDataStore(base).partitions("ETH-USDT", "1h"))[:2]
+
+        with open(os.path.join(base, first), "r+b") as f:
+            f.seek(-16, os.SEEK_END)
+            f.write(b"\0" * 16)
+        _bump_mtime(os.path.join(base, first))
+        assert not MarketDataStore(base).is_current("ETH-USDT", "1h", source)
+
+        MarketDataStore(base).replace("ETH-USDT", "1h", _frame(), source)
+        os.truncate(os.path.join(base, second), 100)
+        assert not MarketDataStore(base).is_current("ETH-USDT", "1h", source)
+
+
+def test_is_current_does_not_read_partitions():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eth.csv")
+        _write_csv(source, _frame())
+        base = os.path.join(tmp, "store")
+        MarketDataStore(base).replace("ETH-USDT", "1h", _frame(), source)
+        key = next(iter(MarketDataStore(base).partitions("ETH-USDT", "1h")))
+        path = os.path.join(base, key)
+        stat = os.stat(path)
+        with open(path, "r+b") as f:
+            f.seek(-16, os.SEEK_END)
+            f.write(b"\0" * 16)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        def fail(*args):
+            raise AssertionError("is_current must not read partition contents")
+
+        original = market_data_store._file_sha256, MarketDataStore._read_partition
+        market_data_store._file_sha256 = fail
+        MarketDataStore._read_partition = staticmethod(fail)
+        try:
+            # 冷启动只比较文件指纹：大小与修改时间未变的改写不会被发现
+            assert MarketDataStore(base).is_current("ETH-USDT", "1h", source)
+        finally:
+            market_data_store._file_sha256 = original[0]
+            MarketDataStore._read_partition = staticmethod(original[1])
+        # 显式 verify() 按校验和发现
+        assert MarketDataStore(base).verify("ETH-USDT", "1h") == [key]
+
+
+def test_engine_rebuilds_store_when_source_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eth.csv")
+        _write_csv(source, _frame())
+        config = {
+            "backtest": {
+                "use_local_data_only": True,
+                "data_path": source,
+                "data_store_path": os.path.join(tmp, "store"),
+            }
+        }
+        start, end = datetime(2024, 1, 1), datetime(2024, 3, 1)
+
+        first = BacktestEngine(config)._read_backtest_data("ETH-USDT", "1h", start, end)
+        assert first[1]["source"] == "file"
+        cached = BacktestEngine(config)._read_backtest_data("ETH-USDT", "1h", start, end)
+        assert cached[1]["source"] == "data_store"
+
+        _write_csv(source, _frame(offset=5.0))
+        _bump_mtime(source)
+        rebuilt = BacktestEngine(config)._read_backtest_data("ETH-USDT", "1h", start, end)
+        assert rebuilt[1]["source"] == "file"
+        assert rebuilt[0]["close"].iloc[0] == 105.0
+
+        again = BacktestEngine(config)._read_backtest_data("ETH-USDT", "1h", start, end)
+        assert again[1]["source"] == "data_store"
+        assert again[0]["close"].iloc[0] == 105.0
+
+
+def test_engine_out_of_range_window_uses_current_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eth.csv")
+        _write_csv(source, _frame())
+        config = {
+            "backtest": {
+                "use_local_data_only": True,
+                "data_path": source,
+                "data_store_path": os.path.join(tmp, "store"),
+            }
+        }
+        BacktestEngine(config)._read_backtest_data(
+            "ETH-USDT", "1h", datetime(2024, 1, 1), datetime(2024, 3, 1)
+        )
+
+        def fail(*args, **kwargs):
+            raise AssertionError("a current store must not be rebuilt")
+
+        original_replace, original_read_csv = MarketDataStore.replace, pd.read_csv
+        MarketDataStore.replace = fail
+        pd.read_csv = fail
+        try:
+            df, info = BacktestEngine(config)._read_backtest_data(
+                "ETH-USDT", "1h", datetime(2030, 1, 1), datetime(2030, 2, 1)
+            )
+        finally:
+            MarketDataStore.replace = original_replace
+            pd.read_csv = original_read_csv
+        assert df.empty
+        assert info["source"] == "data_store"
+        assert info["rows"] == 0 and info["start_time"] is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+并行参数优化测试
+覆盖逐级减半比例、优化日志续跑与运行指纹隔离
+"""
+
+import json
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.backtest import parallel_optimizer
+from quantsys.backtest.parallel_optimizer import (
+    OptimizationJournal,
+    ParallelOptimizer,
+    halving_rungs,
+    params_key,
+    run_fingerprint,
+)
+
+CONFIG = {"backtest": {"use_local_data_only": True, "initial_capital": 10000}}
+STRATEGY = {"name": "s", "strategy_id": 1, "parameters": {"x": 0, "factors": []}}
+START = datetime(2024, 1, 1)
+END = datetime(2024, 2, 1)
+
+
+def _frame(n=50):
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame({"close": np.linspace(100, 110, n)}, index=index)
+
+
+def _fingerprint(symbol="ETH-USDT", df=None, metric="total_profit"):
+    return run_fingerprint(
+        CONFIG, STRATEGY, symbol, "1h", START, END, metric, _frame() if df is None else df
+    )
+
+
+def _fake_run_combination(strategy, params, fraction, *run_args):
+    # 由 fork 出的工作进程执行，替代真实回测
+    return {"total_profit": float(params["x"]) * fraction}
+
+
+def test_halving_rungs():
+    assert halving_rungs(27, 3, 1 / 9) == [1 / 9, 1 / 3, 1.0]
+    assert halving_rungs(1, 3, 0.25) == [1.0]
+    for bad in ((10, 1, 0.5), (10, 2, 0.0), (10, 2, 1.5)):
+        try:
+            halving_rungs(*bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"halving_rungs{bad} should raise")
+
+
+def test_fingerprint_covers_run_inputs():
+    base = _fingerprint()
+    assert base == _fingerprint()
+    assert base != _fingerprint(symbol="BTC-USDT")
+    assert base != _fingerprint(metric="sharpe_ratio")
+    assert base != _fingerprint(df=_frame(60))
+    other_range = run_fingerprint(
+        CONFIG, STRATEGY, "ETH-USDT", "1h", START, datetime(2024, 3, 1), "total_profit", _frame()
+    )
+    assert base != other_range
+
+
+def test_journal_resumes_only_matching_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "journal.jsonl")
+        journal = OptimizationJournal(path, "run-a")
+        journal.record({"x": 1}, 1.0, 5.0, {"total_profit": 5.0})
+        OptimizationJournal(path, "run-b").record({"x": 1}, 1.0, -1.0, None)
+        with open(path, "a", encoding="utf-8") as f:
+            # 旧格式（无 run 字段）与中断写了一半的行
+            f.write(json.dumps({"key": params_key({"x": 2}), "fraction": 1.0, "score": 9}) + "\n")
+            f.write('{"key": "tor')
+
+        resumed = OptimizationJournal(path, "run-a")
+        assert resumed.get(params_key({"x": 1}), 1.0)["score"] == 5.0
+        assert resumed.get(params_key({"x": 2}), 1.0) is None
+        assert OptimizationJournal(path, "run-b").get(params_key({"x": 1}), 1.0)["score"] == -1.0
+        assert OptimizationJournal(path, "run-c").entries == {}
+
+
+def test_optimizer_reuses_journal_of_same_run_without_workers():
+    df = _frame()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "journal.jsonl")
+        journal = OptimizationJournal(path, _fingerprint(df=df))
+        for x in (1, 2, 3):
+            journal.record({"x": x}, 1.0, float(x), {"total_profit": float(x)})
+
+        optimizer = ParallelOptimizer(CONFIG, n_jobs=1, journal_path=path)
+        result = optimizer.run(STRATEGY, df, "ETH-USDT", "1h", START, END, {"x": [1, 2, 3]})
+        assert result["best_params"] == {"x": 3}
+        assert result["best_score"] == 3.0
+        assert len(result["all_results"]) == 3
+
+
+def test_optimizer_ignores_journal_of_other_run():
+    df = _frame()
+    original = parallel_optimizer._run_combination
+    parallel_optimizer._run_combination = _fake_run_combination
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "journal.jsonl")
+            stale = OptimizationJournal(path, _fingerprint(symbol="BTC-USDT", df=df))
+            stale.record({"x": 1}, 1.0, 100.0, {"total_profit": 100.0})
+
+            optimizer = ParallelOptimizer(CONFIG, n_jobs=2, journal_path=path)
+            result = optimizer.run(STRATEGY, df, "ETH-USDT", "1h", START, END, {"x": [1, 2]})
+            assert result["best_params"] == {"x": 2}
+            assert result["best_score"] == 2.0
+
+            lines = [json.loads(line) for line in Path(path).read_text().splitlines()]
+            assert len(lines) == 3
+            assert {line["run"] for line in lines[1:]} == {_fingerprint(df=df)}
+    finally:
+        parallel_optimizer._run_combination = original
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
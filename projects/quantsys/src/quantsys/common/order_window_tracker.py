@@ -39,7 +39,9 @@ class OrderWindowTracker:
         """
         self.window_seconds = window_seconds
         self.max_window_amount = max_window_amount
-        self._orders: deque = deque()  # 使用deque存储订单，自动过期
+        self._orders: deque = deque()  # 使用deque存储订单明细，自动过期
+        # 窗口累计金额，随订单入队/过期增减（O(1)），与 _orders 始终对应同一批订单
+        self._total = 0.0
         self._lock = threading.Lock()
         logger.info(
             f"OrderWindowTracker initialized: window={window_seconds}s, max_amount={max_window_amount} USDT"
@@ -66,7 +68,7 @@ class OrderWindowTracker:
             self._cleanup_expired(current_time)
 
             # 计算当前窗口内的累计金额
-            current_total = sum(order.amount for order in self._orders)
+            current_total = self._total
 
             # 检查是否超过限制（使用严格小于，更安全）
             new_total = current_total + amount
@@ -76,6 +78,7 @@ class OrderWindowTracker:
                 # 添加订单到窗口
                 order = WindowOrder(timestamp=current_time, amount=amount, symbol=symbol, side=side)
                 self._orders.append(order)
+                self._total += amount
                 logger.info(
                     f"订单已添加到窗口: {symbol} {side} {amount} USDT, 窗口累计={new_total:.2f} USDT"
                 )
@@ -98,7 +101,7 @@ class OrderWindowTracker:
         with self._lock:
             current_time = time.time()
             self._cleanup_expired(current_time)
-            return sum(order.amount for order in self._orders)
+            return self._total
 
     def get_window_orders(self) -> list[dict[str, any]]:
         """
@@ -132,15 +135,20 @@ class OrderWindowTracker:
         # 从左侧移除过期订单
         while self._orders and self._orders[0].timestamp < cutoff_time:
             expired_order = self._orders.popleft()
+            self._total -= expired_order.amount
             logger.debug(
                 f"订单已过期: {expired_order.symbol} {expired_order.side} "
                 f"{expired_order.amount} USDT (age={current_time - expired_order.timestamp:.1f}s)"
             )
+        if not self._orders:
+            # 窗口清空时归零，消除浮点累加误差
+            self._total = 0.0
 
     def reset(self) -> None:
         """重置窗口（清空所有订单）"""
         with self._lock:
             self._orders.clear()
+            self._total = 0.0
             logger.info("订单窗口已重置")
 
     def get_stats(self) -> dict[str, any]:
@@ -154,7 +162,7 @@ class OrderWindowTracker:
             current_time = time.time()
             self._cleanup_expired(current_time)
 
-            total = sum(order.amount for order in self._orders)
+            total = self._total
             count = len(self._orders)
 
             return {
@@ -46,9 +46,25 @@ class PendingOrderTracker:
     def __init__(self):
         """初始化Pending订单跟踪器"""
         self._orders: dict[str, PendingOrder] = {}  # order_id -> PendingOrder
+        # 按方向累计 PENDING 状态订单的金额和笔数，查询为 O(1)
+        self._pending_amounts: dict[str, float] = {}
+        self._pending_counts: dict[str, int] = {}
         self._lock = threading.Lock()
         logger.info("PendingOrderTracker initialized")
 
+    def _track(self, order: PendingOrder, sign: int) -> None:
+        """
+        把 PENDING 订单计入（sign=1）或移出（sign=-1）累计值，调用方持有锁
+        """
+        if order.status != OrderStatus.PENDING:
+            return
+        count = self._pending_counts.get(order.side, 0) + sign
+        self._pending_counts[order.side] = count
+        # 没有 pending 订单时归零，消除浮点累加误差
+        self._pending_amounts[order.side] = (
+            self._pending_amounts.get(order.side, 0.0) + sign * order.amount if count else 0.0
+        )
+
     def add_order(
         self, order_id: str, symbol: str, side: str, amount: float, price: float | None = None
     ) -> bool:
@@ -81,6 +97,7 @@ class PendingOrderTracker:
                 updated_time=time.time(),
             )
             self._orders[order_id] = order
+            self._track(order, 1)
             logger.info(f"Pending订单已添加: {order_id} {symbol} {side} {amount} USDT")
             return True
 
@@ -104,6 +121,7 @@ class PendingOrderTracker:
                 return False
 
             order = self._orders[order_id]
+            self._track(order, -1)
             order.status = status
             order.updated_time = time.time()
 
@@ -121,6 +139,8 @@ class PendingOrderTracker:
             if status in [OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.REJECTED]:
                 del self._orders[order_id]
                 logger.info(f"Pending订单已移除: {order_id} (状态={status.value})")
+            else:
+                self._track(order, 1)
 
             return True
 
@@ -139,6 +159,7 @@ class PendingOrderTracker:
                 return False
 
             order = self._orders[order_id]
+            self._track(order, -1)
             del self._orders[order_id]
             logger.info(f"Pending订单已移除: {order_id} {order.symbol} {order.side}")
             return True
@@ -154,18 +175,15 @@ class PendingOrderTracker:
             float: 总pending金额（USDT）
         """
         with self._lock:
-            if side:
-                return sum(
-                    order.amount
-                    for order in self._orders.values()
-                    if order.side == side and order.status == OrderStatus.PENDING
-                )
-            else:
-                return sum(
-                    order.amount
-                    for order in self._orders.values()
-                    if order.status == OrderStatus.PENDING
-                )
+            return self._pending_amount(side)
+
+    def _pending_amount(self, side: str | None = None) -> float:
+        """
+        PENDING 订单金额（调用方持有锁）
+        """
+        if side:
+            return self._pending_amounts.get(side, 0.0)
+        return sum(self._pending_amounts.values())
 
     def get_pending_orders(
         self, symbol: str | None = None, side: str | None = None
@@ -225,10 +243,11 @@ class PendingOrderTracker:
             Dict: 统计信息
         """
         with self._lock:
-            total_pending = self.get_total_pending_amount()
-            buy_pending = self.get_total_pending_amount(side="buy")
-            sell_pending = self.get_total_pending_amount(side="sell")
-            order_count = len([o for o in self._orders.values() if o.status == OrderStatus.PENDING])
+            # 已持有锁，直接读取累计值（再调用 get_total_pending_amount 会在非重入锁上死锁）
+            total_pending = self._pending_amount()
+            buy_pending = self._pending_amount(side="buy")
+            sell_pending = self._pending_amount(side="sell")
+            order_count = sum(self._pending_counts.values())
 
             return {
                 "total_pending_amount": total_pending,
@@ -242,4 +261,6 @@ class PendingOrderTracker:
         """清空所有订单"""
         with self._lock:
             self._orders.clear()
+            self._pending_amounts.clear()
+            self._pending_counts.clear()
             logger.info("所有pending订单已清空")
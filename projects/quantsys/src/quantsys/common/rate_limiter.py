@@ -2,13 +2,19 @@
 统一限流与退避模块
 
 实现API请求的统一限流、自动退避、队列化请求和指标记录
+
+RateLimitService 是执行组件（下单、分拆、对账、就绪检查）共用的限流服务：
+按 (端点规则, 账户) 维护带权重的令牌桶，支持同步/异步获取和超时快速失败，
+并根据交易所返回的 429 / Retry-After / x-ratelimit-* 响应头自适应收紧
 """
 
+import asyncio
+import hashlib
 import logging
 import queue
 import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Mapping
 from datetime import datetime
 from functools import wraps
 from typing import Any
@@ -78,12 +84,8 @@ class RateLimiter:
                 "lock": threading.Lock(),
             }
 
-            # 为每个端点创建队列和工作线程
-            self.queues[endpoint] = queue.Queue()
-            self.workers[endpoint] = threading.Thread(
-                target=self._worker, args=(endpoint,), daemon=True
-            )
-            self.workers[endpoint].start()
+            # 为每个端点创建队列；工作线程在第一次 execute_async 时启动
+            self.queues.setdefault(endpoint, queue.Queue())
 
     def _refill_tokens(self, endpoint: str):
         """
@@ -292,6 +294,12 @@ class RateLimiter:
         if endpoint not in self.endpoints:
             raise ValueError(f"Unknown endpoint: {endpoint}")
 
+        with self.lock:
+            if endpoint not in self.workers:
+                self.workers[endpoint] = threading.Thread(
+                    target=self._worker, args=(endpoint,), daemon=True
+                )
+                self.workers[endpoint].start()
         self.queues[endpoint].put((func, args, kwargs, callback))
 
     def get_metrics(self) -> dict[str, Any]:
@@ -343,6 +351,368 @@ class RateLimiter:
         self._init_endpoints()
 
 
+class RateLimitExceeded(Exception):
+    """
+    在允许的最长等待时间内拿不到令牌
+    """
+
+    def __init__(self, key: str, wait_time: float):
+        self.key = key
+        self.wait_time = wait_time
+        super().__init__(f"Rate limit exceeded for {key}, retry in {wait_time:.3f}s")
+
+
+class TokenBucket:
+    """
+    带权重的令牌桶：容量 capacity，每 interval 秒补满
+
+    reserve 允许透支：排队的请求先预占令牌再等待，等待时间按先来后到累加，
+    不会多个等待者在同一时刻一起醒来抢令牌
+    """
+
+    __slots__ = ("blocked_until", "capacity", "interval", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, interval: float):
+        self.capacity = float(capacity)
+        self.interval = float(interval)
+        self.rate = self.capacity / self.interval
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, weight: float, now: float) -> float:
+        """
+        拿到 weight 个令牌还需等待的秒数（不消耗令牌）
+        """
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < weight:
+            wait = max(wait, (weight - self.tokens) / self.rate)
+        return wait
+
+    def reserve(self, weight: float, now: float) -> float:
+        """
+        预占 weight 个令牌（可透支），返回需要等待的秒数
+        """
+        wait = self.wait_time(weight, now)
+        self.tokens -= weight
+        return wait
+
+    def take_available(self, max_weight: int, now: float) -> int:
+        """
+        立即取走至多 max_weight 个整令牌，返回取到的数量
+        """
+        if self.blocked_until > now:
+            return 0
+        self._refill(now)
+        granted = max(0, min(max_weight, int(self.tokens)))
+        self.tokens -= granted
+        return granted
+
+    def penalize(self, until: float, now: float):
+        """
+        交易所已限流：清空令牌并暂停到 until
+        """
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, until)
+
+    def sync_remaining(self, remaining: float, now: float):
+        """
+        按交易所报告的剩余额度收紧本地令牌数
+        """
+        self._refill(now)
+        self.tokens = min(self.tokens, float(remaining))
+
+
+# OKX 各接口的限频（按 UserID，次数/2秒）；批量接口按订单数计权重
+OKX_RATE_LIMITS = {
+    "POST /api/v5/trade/order": {"capacity": 60, "interval": 2.0},
+    "POST /api/v5/trade/batch-orders": {"capacity": 300, "interval": 2.0},
+    "POST /api/v5/trade/cancel-order": {"capacity": 60, "interval": 2.0},
+    "POST /api/v5/trade/cancel-batch-orders": {"capacity": 300, "interval": 2.0},
+    "POST /api/v5/trade/amend-order": {"capacity": 60, "interval": 2.0},
+    "GET /api/v5/trade/order": {"capacity": 60, "interval": 2.0},
+    "GET /api/v5/trade/orders-pending": {"capacity": 60, "interval": 2.0},
+    "GET /api/v5/trade/fills": {"capacity": 60, "interval": 2.0},
+    "GET /api/v5/account/balance": {"capacity": 10, "interval": 2.0},
+    "GET /api/v5/account/positions": {"capacity": 10, "interval": 2.0},
+    "GET /api/v5/account/config": {"capacity": 5, "interval": 2.0},
+    "POST /api/v5/account/set-leverage": {"capacity": 20, "interval": 2.0},
+    "default": {"capacity": 20, "interval": 2.0},
+}
+
+
+def account_key(api_key: str | None) -> str:
+    """
+    限流用的账户标识（API Key 的短哈希，避免把密钥写进日志和指标）
+    """
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _header(headers: Mapping[str, Any], name: str) -> float | None:
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitService:
+    """
+    共享限流服务
+
+    - 规则按端点配置：键为 "METHOD 路径"，也可以只写路径或任意名称（如 order_splitter），未匹配的用 default
+    - 每个 (规则, 账户) 一个令牌桶，acquire 的 weight 为本次请求消耗的额度（批量接口为订单数）
+    - acquire/acquire_async 按预占顺序等待；max_wait 内拿不到令牌时抛出 RateLimitExceeded（附等待时间估计）
+    - update_from_response 读取 429、Retry-After 和 x-ratelimit-remaining/x-ratelimit-reset，收紧对应的桶
+    """
+
+    def __init__(self, limits: dict[str, dict[str, float]] | None = None):
+        """
+        初始化限流服务
+
+        Args:
+            limits: {规则名: {"capacity": 令牌数, "interval": 补满所需秒数}}，默认 OKX_RATE_LIMITS
+        """
+        self._lock = threading.Lock()
+        self._rules: dict[str, tuple[float, float]] = {}
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._resolved: dict[str, str] = {}
+        self.metrics = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_seconds": 0.0,
+            "rejected": 0,
+            "throttled": 0,
+        }
+        for name, rule in (OKX_RATE_LIMITS if limits is None else limits).items():
+            self._rules[name] = (rule["capacity"], rule["interval"])
+        self._rules.setdefault("default", (OKX_RATE_LIMITS["default"]["capacity"], 2.0))
+
+    # ------------------------------------------------------------------ 规则
+
+    def configure(self, name: str, capacity: float, interval: float, replace: bool = True):
+        """
+        添加或修改规则；规则变化时该规则下已有的桶重建
+
+        Args:
+            name: 规则名
+            capacity: 令牌数
+            interval: 补满所需秒数
+            replace: 规则已存在时是否覆盖（False 时保留原规则）
+        """
+        with self._lock:
+            if name in self._rules and (not replace or self._rules[name] == (capacity, interval)):
+                return
+            self._rules[name] = (capacity, interval)
+            self._resolved.clear()
+            for key in [key for key in self._buckets if key[0] == name]:
+                del self._buckets[key]
+
+    def _rule_for(self, endpoint: str) -> str:
+        rule = self._resolved.get(endpoint)
+        if rule is None:
+            path = endpoint.split(" ", 1)[-1].split("?", 1)[0]
+            if endpoint in self._rules:
+                rule = endpoint
+            elif path in self._rules:
+                rule = path
+            else:
+                rule = "default"
+            self._resolved[endpoint] = rule
+        return rule
+
+    def _bucket(self, endpoint: str, account: str) -> TokenBucket:
+        rule = self._rule_for(endpoint)
+        bucket = self._buckets.get((rule, account))
+        if bucket is None:
+            bucket = self._buckets[(rule, account)] = TokenBucket(*self._rules[rule])
+        return bucket
+
+    # ------------------------------------------------------------------ 获取令牌
+
+    def _reserve(self, endpoint: str, weight: float, account: str, max_wait: float | None) -> float:
+        with self._lock:
+            bucket = self._bucket(endpoint, account)
+            now = time.monotonic()
+            wait = bucket.wait_time(weight, now)
+            if max_wait is not None and wait > max_wait:
+                self.metrics["rejected"] += 1
+                raise RateLimitExceeded(f"{endpoint}@{account}", wait)
+            bucket.reserve(weight, now)
+            self.metrics["acquired"] += 1
+            if wait > 0:
+                self.metrics["waited"] += 1
+                self.metrics["wait_seconds"] += wait
+            return wait
+
+    def acquire(
+        self,
+        endpoint: str,
+        weight: float = 1,
+        account: str = "default",
+        max_wait: float | None = None,
+    ) -> float:
+        """
+        获取令牌，必要时阻塞等待
+
+        Args:
+            endpoint: 端点（"METHOD 路径"）或规则名
+            weight: 消耗的令牌数
+            account: 账户标识
+            max_wait: 最长等待秒数，超过时不等待直接抛出 RateLimitExceeded；None 表示一直等待
+
+        Returns:
+            实际等待的秒数
+        """
+        wait = self._reserve(endpoint, weight, account, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(
+        self,
+        endpoint: str,
+        weight: float = 1,
+        account: str = "default",
+        max_wait: float | None = None,
+    ) -> float:
+        """
+        acquire 的异步版本（等待时不阻塞事件循环）
+        """
+        wait = self._reserve(endpoint, weight, account, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def try_acquire(self, endpoint: str, weight: float = 1, account: str = "default") -> float:
+        """
+        不等待地获取令牌
+
+        Returns:
+            0 表示已获取；否则为还需等待的秒数（未消耗令牌）
+        """
+        try:
+            self._reserve(endpoint, weight, account, max_wait=0.0)
+        except RateLimitExceeded as e:
+            return e.wait_time
+        return 0.0
+
+    def acquire_available(
+        self, endpoint: str, max_weight: int, account: str = "default"
+    ) -> tuple[int, float]:
+        """
+        立即取走当前可用的至多 max_weight 个令牌（用于分批发送）
+
+        Returns:
+            (取到的令牌数, 取到 0 个时下一个令牌的等待时间估计)
+        """
+        with self._lock:
+            bucket = self._bucket(endpoint, account)
+            now = time.monotonic()
+            granted = bucket.take_available(max_weight, now)
+            if granted:
+                self.metrics["acquired"] += 1
+                return granted, 0.0
+            return 0, bucket.wait_time(1, now)
+
+    def wait_time(self, endpoint: str, weight: float = 1, account: str = "default") -> float:
+        """
+        获取 weight 个令牌还需等待的秒数（不消耗令牌）
+        """
+        with self._lock:
+            return self._bucket(endpoint, account).wait_time(weight, time.monotonic())
+
+    # ------------------------------------------------------------------ 自适应
+
+    def update_from_response(
+        self,
+        endpoint: str,
+        status_code: int,
+        headers: Mapping[str, Any] | None = None,
+        account: str = "default",
+    ):
+        """
+        根据交易所响应收紧限流
+
+        Args:
+            endpoint: 端点
+            status_code: HTTP 状态码（429 时暂停该桶）
+            headers: 响应头（Retry-After、x-ratelimit-remaining、x-ratelimit-reset）
+            account: 账户标识
+        """
+        headers = headers or {}
+        retry_after = _header(headers, "Retry-After")
+        remaining = _header(headers, "X-RateLimit-Remaining")
+        reset = _header(headers, "X-RateLimit-Reset")
+        if status_code != 429 and remaining is None:
+            return
+        # reset 可能是剩余秒数，也可能是 Unix 时间戳（秒或毫秒）
+        if reset is not None and reset > 1e12:
+            reset = reset / 1000.0 - time.time()
+        elif reset is not None and reset > 1e9:
+            reset = reset - time.time()
+
+        with self._lock:
+            bucket = self._bucket(endpoint, account)
+            now = time.monotonic()
+            if status_code == 429:
+                pause = retry_after if retry_after is not None else reset
+                if pause is None or pause <= 0:
+                    pause = bucket.interval
+                bucket.penalize(now + pause, now)
+                self.metrics["throttled"] += 1
+                logger.warning(
+                    f"[RATE_LIMITER] 429 for {endpoint}@{account}, pausing bucket for {pause:.2f}s"
+                )
+                return
+            bucket.sync_remaining(remaining, now)
+            if remaining <= 0 and reset is not None and reset > 0:
+                bucket.penalize(now + reset, now)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        限流指标和各桶的当前令牌数
+        """
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for (rule, account), bucket in self._buckets.items():
+                bucket._refill(now)
+                buckets[f"{rule}@{account}"] = {
+                    "tokens": bucket.tokens,
+                    "capacity": bucket.capacity,
+                    "interval": bucket.interval,
+                    "blocked_for": max(0.0, bucket.blocked_until - now),
+                }
+            return {**self.metrics, "buckets": buckets}
+
+
+_service: RateLimitService | None = None
+_service_lock = threading.Lock()
+
+
+def get_rate_limit_service() -> RateLimitService:
+    """
+    进程内共享的限流服务（默认 OKX 规则）
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RateLimitService()
+        return _service
+
+
 def with_rate_limit(endpoint: str, rate_limiter: RateLimiter):
     """
     装饰器：为函数添加限流
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+滑动窗口计数器
+把时间窗口切成固定宽度的桶组成环形缓冲，维护窗口内的累计值和事件数
+
+- add / total / count 均摊 O(1)：推进时间时只清零过期的桶并从累计值中扣除
+- 内存与事件数无关，只与桶数有关（7天按5分钟分桶约2000个桶）
+- 精度为一个桶宽：事件离开窗口后最多多计 window / buckets 秒（偏保守，限额检查不会提前放行）
+- 非线程安全，由调用方加锁
+"""
+
+import time
+from collections.abc import Callable
+
+
+class SlidingWindowCounter:
+    """
+    环形分桶的滑动窗口计数器
+    """
+
+    def __init__(self, window: float, buckets: int = 60, clock: Callable[[], float] = time.time):
+        """
+        初始化计数器
+
+        Args:
+            window: 窗口长度（秒）
+            buckets: 窗口切分的桶数（精度 = window / buckets）
+            clock: 时间函数，默认 time.time
+        """
+        if window <= 0 or buckets <= 0:
+            raise ValueError("window 和 buckets 必须为正数")
+        self.window = float(window)
+        self.buckets = buckets
+        self.width = self.window / buckets
+        self._clock = clock
+        # 多留一个桶，保证最旧的桶覆盖到 now - window
+        self._size = buckets + 1
+        self._values = [0.0] * self._size
+        self._counts = [0] * self._size
+        self._head: int | None = None
+        self._total = 0.0
+        self._count = 0
+
+    def _advance(self, now: float) -> int:
+        index = int(now // self.width)
+        if self._head is None:
+            self._head = index
+        elif index > self._head:
+            # 清零从旧 head 之后到新 head 的桶（最多一整圈）
+            for i in range(self._head + 1, self._head + 1 + min(index - self._head, self._size)):
+                slot = i % self._size
+                self._total -= self._values[slot]
+                self._count -= self._counts[slot]
+                self._values[slot] = 0.0
+                self._counts[slot] = 0
+            self._head = index
+            if self._count == 0:
+                # 窗口清空时归零，消除浮点累加误差
+                self._total = 0.0
+        return self._head
+
+    def add(self, value: float = 1.0, ts: float | None = None) -> bool:
+        """
+        记录一个事件
+
+        Args:
+            value: 事件的值（计次时为1，计金额时为金额）
+            ts: 事件时间，默认当前时间；晚于当前时间的按当前时间计
+
+        Returns:
+            是否计入（早于窗口的事件忽略）
+        """
+        now = self._clock()
+        head = self._advance(now)
+        index = head if ts is None or ts >= now else int(ts // self.width)
+        if index <= head - self._size:
+            return False
+        slot = index % self._size
+        self._values[slot] += value
+        self._counts[slot] += 1
+        self._total += value
+        self._count += 1
+        return True
+
+    def total(self) -> float:
+        """
+        窗口内事件值之和
+        """
+        self._advance(self._clock())
+        return self._total
+
+    def count(self) -> int:
+        """
+        窗口内事件数
+        """
+        self._advance(self._clock())
+        return self._count
+
+    def reset(self):
+        """
+        清空计数器
+        """
+        self._values = [0.0] * self._size
+        self._counts = [0] * self._size
+        self._head = None
+        self._total = 0.0
+        self._count = 0
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+订单时间窗口跟踪器测试
+覆盖累计金额与窗口内订单始终一致（同时过期）、超限拒绝与重置
+直接导入文件，避免包导入问题
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import order_window_tracker
+from order_window_tracker import OrderWindowTracker
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _tracker(clock, **kwargs):
+    order_window_tracker.time = clock
+    return OrderWindowTracker(**kwargs)
+
+
+def test_total_and_count_expire_together():
+    clock = FakeClock()
+    try:
+        tracker = _tracker(clock, window_seconds=60, max_window_amount=1000.0)
+        for offset in (0.0, 0.5, 30.0):
+            clock.now += offset
+            assert tracker.add_order(100.0, "BTC-USDT", "buy")[0]
+
+        # 第一笔订单刚过期（不足一个分桶宽度），金额与笔数同时扣除
+        clock.now += 30.0 - 0.5 + 0.01
+        stats = tracker.get_stats()
+        assert stats["order_count"] == 2
+        assert stats["current_total"] == 200.0
+        assert sum(o["amount"] for o in tracker.get_window_orders()) == tracker.get_window_total()
+
+        clock.now += 61
+        assert tracker.get_stats()["order_count"] == 0
+        assert tracker.get_window_total() == 0.0
+    finally:
+        order_window_tracker.time = __import__("time")
+
+
+def test_rejects_at_limit_and_reset_clears_both():
+    clock = FakeClock()
+    try:
+        tracker = _tracker(clock, window_seconds=60, max_window_amount=300.0)
+        for amount in (0.1, 0.2, 99.7):
+            tracker.add_order(amount, "ETH-USDT", "sell")
+        allowed, total = tracker.add_order(200.0, "ETH-USDT", "sell")
+        assert not allowed and abs(total - 100.0) < 1e-9
+        assert tracker.add_order(199.0, "ETH-USDT", "sell")[0]
+
+        clock.now += 61
+        # 窗口清空后累计值精确归零（不残留浮点误差）
+        assert tracker.get_window_total() == 0.0
+        tracker.add_order(50.0, "ETH-USDT", "sell")
+        tracker.reset()
+        stats = tracker.get_stats()
+        assert (stats["order_count"], stats["current_total"]) == (0, 0.0)
+    finally:
+        order_window_tracker.time = __import__("time")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
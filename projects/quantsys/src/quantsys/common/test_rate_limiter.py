@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+共享限流服务测试
+覆盖令牌桶预占排队、规则匹配、分批取令牌、超时快速失败以及按响应头自适应收紧
+直接导入文件，避免包导入问题
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from rate_limiter import RateLimitExceeded, RateLimitService, TokenBucket, account_key
+
+
+def _service(capacity=2, interval=1.0):
+    return RateLimitService({"POST /api/v5/trade/order": {"capacity": capacity, "interval": interval}})
+
+
+def test_token_bucket_reservations_queue_in_order():
+    bucket = TokenBucket(capacity=2, interval=1.0)
+    now = bucket.updated
+    assert bucket.reserve(1, now) == 0.0
+    assert bucket.reserve(1, now) == 0.0
+    # 透支后的等待时间按预占顺序累加
+    assert abs(bucket.reserve(1, now) - 0.5) < 1e-9
+    assert abs(bucket.reserve(1, now) - 1.0) < 1e-9
+    assert abs(bucket.wait_time(1, now + 1.0) - 0.5) < 1e-9
+
+
+def test_take_available_grants_whole_tokens_only():
+    bucket = TokenBucket(capacity=5, interval=1.0)
+    now = bucket.updated
+    assert bucket.take_available(3, now) == 3
+    assert bucket.take_available(10, now) == 2
+    assert bucket.take_available(10, now + 0.1) == 0
+    assert bucket.take_available(10, now + 0.3) == 1
+    bucket.penalize(now + 10, now + 0.3)
+    assert bucket.take_available(10, now + 5) == 0
+
+
+def test_rules_match_endpoint_path_then_default():
+    service = _service()
+    service.configure("order_splitter", 7, 1.0)
+    assert service._rule_for("POST /api/v5/trade/order") == "POST /api/v5/trade/order"
+    assert service._rule_for("order_splitter") == "order_splitter"
+    assert service._rule_for("GET /api/v5/market/ticker?instId=ETH-USDT") == "default"
+
+    # 账户之间互不占用额度
+    assert service.acquire_available("POST /api/v5/trade/order", 5, account="a") == (2, 0.0)
+    assert service.acquire_available("POST /api/v5/trade/order", 5, account="b")[0] == 2
+    granted, wait = service.acquire_available("POST /api/v5/trade/order", 5, account="a")
+    assert granted == 0 and 0 < wait <= 0.5
+
+
+def test_configure_rebuilds_buckets_only_when_rule_changes():
+    service = _service()
+    service.acquire_available("POST /api/v5/trade/order", 2)
+    service.configure("POST /api/v5/trade/order", 2, 1.0)
+    assert service.wait_time("POST /api/v5/trade/order") > 0
+    service.configure("POST /api/v5/trade/order", 4, 1.0, replace=False)
+    assert service.wait_time("POST /api/v5/trade/order") > 0
+    service.configure("POST /api/v5/trade/order", 4, 1.0)
+    assert service.wait_time("POST /api/v5/trade/order") == 0.0
+
+
+def test_max_wait_fails_fast_without_consuming():
+    service = _service(capacity=1, interval=10.0)
+    assert service.acquire("POST /api/v5/trade/order") == 0.0
+    try:
+        service.acquire("POST /api/v5/trade/order", max_wait=0.1)
+    except RateLimitExceeded as e:
+        assert 9 < e.wait_time <= 10
+    else:
+        raise AssertionError("acquire beyond max_wait should raise")
+    assert service.try_acquire("POST /api/v5/trade/order") > 9
+    assert service.metrics["rejected"] == 2
+    assert service.metrics["acquired"] == 1
+
+
+def test_concurrent_acquire_respects_rate():
+    service = _service(capacity=2, interval=0.2)
+    times = []
+    lock = threading.Lock()
+
+    def worker():
+        service.acquire("POST /api/v5/trade/order")
+        with lock:
+            times.append(time.monotonic())
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 2 个令牌立即可用，其余 4 个按 0.1 秒一个补充
+    assert time.monotonic() - start >= 0.38
+    assert service.metrics["waited"] == 4
+
+
+def test_acquire_async_does_not_block_loop():
+    service = _service(capacity=1, interval=0.2)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await service.acquire_async("POST /api/v5/trade/order")
+        waited = await service.acquire_async("POST /api/v5/trade/order")
+        task.cancel()
+        return waited, ticks
+
+    waited, ticks = asyncio.run(main())
+    assert waited > 0.15
+    assert ticks >= 5
+
+
+def test_429_pauses_bucket_and_remaining_header_tightens():
+    service = _service(capacity=10, interval=1.0)
+    service.update_from_response("POST /api/v5/trade/order", 429, {"Retry-After": "3"})
+    assert 2.5 < service.wait_time("POST /api/v5/trade/order") <= 3
+    assert service.metrics["throttled"] == 1
+
+    service.update_from_response(
+        "POST /api/v5/trade/order", 200, {"x-ratelimit-remaining": "1"}, account="b"
+    )
+    assert service.acquire_available("POST /api/v5/trade/order", 10, account="b")[0] == 1
+
+    # 剩余额度为 0 且带重置时间戳（毫秒）时暂停到重置
+    reset_ms = (time.time() + 2) * 1000
+    service.update_from_response(
+        "POST /api/v5/trade/order",
+        200,
+        {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset_ms)},
+        account="c",
+    )
+    assert 1.5 < service.wait_time("POST /api/v5/trade/order", account="c") <= 2
+    stats = service.stats()["buckets"]
+    assert stats["POST /api/v5/trade/order@c"]["blocked_for"] > 1.5
+
+
+def test_account_key_hides_api_key():
+    assert account_key(None) == "default"
+    assert account_key("secret") == account_key("secret")
+    assert "secret" not in account_key("secret")
+    assert len(account_key("secret")) == 12
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
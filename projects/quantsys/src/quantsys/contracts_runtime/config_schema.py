@@ -50,6 +50,30 @@ class FactorConfig(BaseModel):
         default=True, description="Whether to use traditional factors"
     )
     dl_factors: bool = Field(default=False, description="Whether to use deep learning factors")
+    value_write_method: Literal["executemany", "copy", "row"] = Field(
+        default="executemany",
+        description="How factor values are written to the database: batched multi-row upsert, "
+        "COPY into a staging table then upsert, or one insert_factor_value call per row",
+    )
+    value_batch_size: int = Field(
+        default=50000, ge=1, description="Rows per factor value write batch"
+    )
+    value_parquet_path: str | None = Field(
+        default=None, description="Also append factor values to Parquet under this directory"
+    )
+    incremental_drift_check_every: int = Field(
+        default=240,
+        ge=0,
+        description="In incremental mode, fully recompute and compare every N new bars (0 disables)",
+    )
+    incremental_drift_tolerance: float = Field(
+        default=1e-8, gt=0, description="Relative/absolute tolerance of the incremental drift check"
+    )
+    incremental_fallback_lookback: int = Field(
+        default=300,
+        ge=1,
+        description="Bars recomputed per update for factors without incremental state",
+    )
 
 
 class StrategyConfig(BaseModel):
@@ -119,6 +143,10 @@ class BacktestConfig(BaseModel):
     funding_rate: float = Field(default=0.0, ge=0, description="Funding rate")
     funding_interval_hours: int = Field(default=8, ge=1, description="Funding interval in hours")
     execution_delay_bars: int = Field(default=1, ge=0, description="Execution delay in bars")
+    execution_mode: Literal["iterrows", "vectorized"] = Field(
+        default="iterrows",
+        description="Bar loop mode (vectorized pre-extracts columns into native lists)",
+    )
     random_seed: int = Field(default=42, ge=0, description="Random seed")
     risk_free_rate: float = Field(default=0.0, ge=0, description="Risk-free rate")
     max_drawdown_limit: float = Field(
@@ -127,6 +155,9 @@ class BacktestConfig(BaseModel):
     risk_per_trade: float = Field(default=0.008, gt=0, le=1, description="Risk per trade")
     max_leverage: float = Field(default=10, ge=1, le=100, description="Maximum leverage")
     data_path: str | None = Field(default=None, description="Data path")
+    data_store_path: str | None = Field(
+        default=None, description="Columnar market data cache directory (Arrow IPC)"
+    )
     use_local_data_only: bool = Field(default=False, description="Use local data only")
 
     @field_validator("timeframe")
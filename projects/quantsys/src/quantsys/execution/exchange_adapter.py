@@ -4,24 +4,33 @@
 实现不同交易所的统一接口，处理签名、请求发送等
 """
 
-import base64
-import hashlib
-import hmac
 import json
 import logging
 import time
 from abc import ABC, abstractmethod
-from datetime import datetime
 from typing import Any
+from urllib.parse import urlsplit
 
 import requests
 
+from ..common.rate_limiter import RateLimitExceeded, account_key, get_rate_limit_service
+from .http_transport import (
+    HmacSigner,
+    get_transport,
+    okx_body_str,
+    okx_request_path,
+    okx_timestamp,
+)
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# OKX 批量下单/撤单接口单次请求的最大订单数
+BATCH_ORDER_LIMIT = 20
+
 
 class ExchangeAdapter(ABC):
     """
@@ -131,6 +140,18 @@ class OKXAdapter(ExchangeAdapter):
         self.backoff_factor = 2.0
         self.max_retry_delay = 10.0
 
+        # 同一主机的 keep-alive 连接池在进程内共享（与 OrderExecution 共用），签名密钥状态预先计算
+        self.request_timeout = 15
+        self.transport = get_transport(self.base_url, verify=verify_ssl, proxy=proxy)
+        self._path_prefix = urlsplit(self.base_url).path.rstrip("/")
+        self._signer = HmacSigner(secret_key)
+
+        # 限流与 OrderExecution、分拆器共用进程内的令牌桶（按端点和账户），
+        # 等待超过 rate_limit_max_wait 秒时直接返回失败和预计等待时间
+        self.rate_limiter = get_rate_limit_service()
+        self.rate_limit_account = account_key(api_key)
+        self.rate_limit_max_wait = 5.0
+
         logger.info(
             f"OKXAdapter initialized (mode: {trading_mode}, region: {region}, base_url: {self.base_url}, simulated: {simulated}, proxy: {proxy}, verify_ssl: {verify_ssl})"
         )
@@ -139,7 +160,7 @@ class OKXAdapter(ExchangeAdapter):
         self._check_time_sync()
 
     def _sign_request(
-        self, method: str, endpoint: str, body: dict[str, Any] = None
+        self, method: str, endpoint: str, body: dict[str, Any] = None, body_str: str | None = None
     ) -> dict[str, str]:
         """
         生成请求签名
@@ -148,28 +169,17 @@ class OKXAdapter(ExchangeAdapter):
             method: HTTP方法
             endpoint: API端点
             body: 请求体
+            body_str: 已序列化的请求体（传入时不再重复序列化 body）
 
         Returns:
             headers: 包含签名的请求头
         """
-        # 处理body：只有非GET请求且有body才需要序列化
-        # GET请求必须使用空字符串作为body
-        if method == "GET":
-            body_str = ""
-        else:
-            # 非GET请求：只有非None且非空的body才需要序列化
-            has_body = body is not None and bool(body)
-            body_str = json.dumps(body, separators=(",", ":")) if has_body else ""
-
-        # 获取当前时间戳（OKX要求ISO8601格式，毫秒精度）
-        timestamp = datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
-
-        # 构造签名字符串：timestamp + method + endpoint + body
-        message = timestamp + method.upper() + endpoint + body_str
+        if body_str is None:
+            body_str = okx_body_str(method, body)
 
-        # 生成签名（OKX要求使用Base64编码）
-        hmac_obj = hmac.new(self.secret_key.encode("utf-8"), message.encode("utf-8"), hashlib.sha256)
-        signature = base64.b64encode(hmac_obj.digest()).decode("utf-8")
+        # 签名字符串 timestamp + method + endpoint + body，Base64 编码（与 OrderExecution 共用）
+        timestamp = okx_timestamp()
+        signature = self._signer.sign_request(timestamp, method, endpoint, body_str)
 
         # 构造请求头 - 严格按照OKX API文档要求的顺序和格式
         headers = {
@@ -245,51 +255,46 @@ class OKXAdapter(ExchangeAdapter):
         """
         attempt = 0
         retry_delay = self.initial_retry_delay
-
-        # 配置请求会话
-        session = requests.Session()
-        # 设置网络配置
-        session.verify = self.verify_ssl
-        if self.proxy:
-            session.proxies = {
-                'http': self.proxy,
-                'https': self.proxy,
-            }
-        # 配置超时和连接池
-        session.timeout = 15  # 增加超时时间
-        session.mount('https://', requests.adapters.HTTPAdapter(
-            pool_connections=10,
-            pool_maxsize=10,
-            max_retries=3,
-        ))
+        limit_key = f"{method} {endpoint}"
+        # 批量接口按订单数计权重
+        weight = len(body) if isinstance(body, list) else 1
 
         while attempt <= self.max_retries:
             try:
                 attempt += 1
-                headers = self._sign_request(method, endpoint, body)
-
-                # 发送请求
-                if method == "GET":
-                    # GET请求：参数放在URL查询字符串中，body为空
-                    response = session.get(
-                        f"{self.base_url}{endpoint}",
-                        headers=headers,
-                        params=params or {},
-                    )
-                else:
-                    # POST/PUT/DELETE请求：body放在请求体中
-                    # 注意：签名时使用的body必须与发送的body完全一致
-                    if body:
-                        response = session.request(
-                            method,
-                            f"{self.base_url}{endpoint}",
-                            headers=headers,
-                            json=body,  # requests会自动序列化为JSON
-                        )
-                    else:
-                        response = session.request(
-                            method, f"{self.base_url}{endpoint}", headers=headers
-                        )
+                self.rate_limiter.acquire(
+                    limit_key,
+                    weight,
+                    account=self.rate_limit_account,
+                    max_wait=self.rate_limit_max_wait,
+                )
+            except RateLimitExceeded as e:
+                logger.warning(f"本地限流，放弃请求: {method} {endpoint}, {e}")
+                return {
+                    "code": "1",
+                    "msg": f"请求被限流，预计 {e.wait_time:.2f} 秒后可重试",
+                    "data": [],
+                    "retry_after": e.wait_time,
+                }
+
+            try:
+                # 签名与发送使用同一份序列化结果，保证服务端验签的内容与签名一致
+                # GET请求：查询参数是签名的 requestPath 的一部分，body为空
+                request_path = okx_request_path(endpoint, params) if method == "GET" else endpoint
+                body_str = okx_body_str(method, body)
+                headers = self._sign_request(method, request_path, body, body_str=body_str)
+
+                # 发送请求（共享连接池，重试复用已建立的连接）
+                response = self.transport.request(
+                    method,
+                    f"{self._path_prefix}{request_path}",
+                    headers=headers,
+                    data=body_str or None,
+                    timeout=self.request_timeout,
+                )
+                self.rate_limiter.update_from_response(
+                    limit_key, response.status_code, response.headers, self.rate_limit_account
+                )
 
                 # 处理响应
                 response.raise_for_status()
@@ -358,13 +363,11 @@ class OKXAdapter(ExchangeAdapter):
                 except (ValueError, AttributeError, json.JSONDecodeError):
                     pass  # 如果无法解析JSON，使用HTTP状态码
 
-                if status_code == 429:  # 限流错误，重试
+                if status_code == 429:  # 限流错误，重试（等待时间由限流桶按 Retry-After 给出）
                     if attempt <= self.max_retries:
                         logger.warning(
-                            f"限流错误，将在 {retry_delay:.2f} 秒后重试 ({attempt}/{self.max_retries})"
+                            f"限流错误，等待限流桶恢复后重试 ({attempt}/{self.max_retries}): {method} {endpoint}"
                         )
-                        time.sleep(retry_delay)
-                        retry_delay = min(retry_delay * self.backoff_factor, self.max_retry_delay)
                         continue
 
                 # 其他HTTP错误，不重试
@@ -403,6 +406,12 @@ class OKXAdapter(ExchangeAdapter):
 
         return {"code": "1", "msg": f"请求失败，已重试 {self.max_retries} 次", "data": []}
 
+    def get_latency_metrics(self) -> dict[str, Any]:
+        """
+        各端点的请求延迟直方图 {"METHOD 路径": 延迟摘要}
+        """
+        return self.transport.latency_stats()
+
     def _should_send_real_request(self) -> bool:
         """判断是否应该发送真实请求"""
         return self.trading_mode == "live"
@@ -431,8 +440,39 @@ class OKXAdapter(ExchangeAdapter):
             result: 订单创建结果
         """
         endpoint = "/api/v5/trade/order"
+        body = self._order_body(symbol, side, order_type, amount, price, params)
 
-        # 构造请求体
+        # 发送请求
+        if self._should_send_real_request():
+            return self._send_request("POST", endpoint, body)
+        else:
+            # Mock模式
+            logger.info(f"{self.trading_mode}模式：模拟下单，不发送真实API请求")
+            return {
+                "code": "0",
+                "msg": f"{self.trading_mode} mode order accepted",
+                "data": [self._mock_order_ack(params)],
+            }
+
+    def _mock_order_ack(self, params: dict[str, Any] | None) -> dict[str, Any]:
+        return {
+            "ordId": f"mock_{int(time.time())}",
+            "clOrdId": params.get("clOrdId", "") if params else "",
+            "state": "live" if self.trading_mode in ["paper", "drill"] else "pending",
+        }
+
+    @staticmethod
+    def _order_body(
+        symbol: str,
+        side: str,
+        order_type: str,
+        amount: float,
+        price: float | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """
+        构造下单请求体（单笔下单与批量下单共用）
+        """
         body = {
             "instId": symbol,
             "side": side,
@@ -455,24 +495,70 @@ class OKXAdapter(ExchangeAdapter):
         if params:
             filtered_params = {k: v for k, v in params.items() if k not in ["strategy_id"]}
             body.update(filtered_params)
+        return body
 
-        # 发送请求
-        if self._should_send_real_request():
-            return self._send_request("POST", endpoint, body)
-        else:
-            # Mock模式
-            logger.info(f"{self.trading_mode}模式：模拟下单，不发送真实API请求")
-            return {
-                "code": "0",
-                "msg": f"{self.trading_mode} mode order accepted",
-                "data": [
+    @staticmethod
+    def _split_batch_result(result: dict[str, Any], count: int) -> list[dict[str, Any]]:
+        """
+        把批量接口的响应拆成逐笔结果，格式与单笔接口相同
+        """
+        items = result.get("data") or []
+        if len(items) != count:
+            # 整个请求失败（无逐笔数据）：每笔都返回同一错误
+            failure = {"code": result.get("code") or "1", "msg": result.get("msg", ""), "data": []}
+            return [dict(failure) for _ in range(count)]
+        results = []
+        for item in items:
+            s_code = str(item.get("sCode", "0")) if isinstance(item, dict) else "1"
+            results.append(
+                {
+                    "code": s_code,
+                    "msg": item.get("sMsg", "") if isinstance(item, dict) else "",
+                    "data": [item],
+                }
+            )
+        return results
+
+    def place_orders(self, orders: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        批量下单，每 BATCH_ORDER_LIMIT 笔一个请求
+
+        Args:
+            orders: 订单列表，每项包含 symbol/side/order_type/amount/price/params
+
+        Returns:
+            results: 与 orders 一一对应的逐笔结果，格式与 place_order 相同
+        """
+        endpoint = "/api/v5/trade/batch-orders"
+        results = []
+        for start in range(0, len(orders), BATCH_ORDER_LIMIT):
+            chunk = orders[start : start + BATCH_ORDER_LIMIT]
+            if self._should_send_real_request():
+                body = [
+                    self._order_body(
+                        o["symbol"],
+                        o["side"],
+                        o["order_type"],
+                        o["amount"],
+                        o.get("price"),
+                        o.get("params"),
+                    )
+                    for o in chunk
+                ]
+                results.extend(
+                    self._split_batch_result(self._send_request("POST", endpoint, body), len(chunk))
+                )
+            else:
+                logger.info(f"{self.trading_mode}模式：模拟批量下单 {len(chunk)} 笔，不发送真实API请求")
+                results.extend(
                     {
-                        "ordId": f"mock_{int(time.time())}",
-                        "clOrdId": params.get("clOrdId", "") if params else "",
-                        "state": "live" if self.trading_mode in ["paper", "drill"] else "pending",
+                        "code": "0",
+                        "msg": f"{self.trading_mode} mode order accepted",
+                        "data": [self._mock_order_ack(o.get("params"))],
                     }
-                ],
-            }
+                    for o in chunk
+                )
+        return results
 
     def cancel_order(self, symbol: str, order_id: str) -> dict[str, Any]:
         """
@@ -498,6 +584,40 @@ class OKXAdapter(ExchangeAdapter):
                 "data": [{"ordId": order_id, "sCode": "0", "sMsg": "Cancel request processed"}],
             }
 
+    def cancel_orders(self, symbol: str, order_ids: list[str]) -> list[dict[str, Any]]:
+        """
+        批量撤单，每 BATCH_ORDER_LIMIT 笔一个请求
+
+        Args:
+            symbol: 交易对
+            order_ids: 交易所订单ID列表
+
+        Returns:
+            results: 与 order_ids 一一对应的逐笔结果，格式与 cancel_order 相同
+        """
+        endpoint = "/api/v5/trade/cancel-batch-orders"
+        results = []
+        for start in range(0, len(order_ids), BATCH_ORDER_LIMIT):
+            chunk = order_ids[start : start + BATCH_ORDER_LIMIT]
+            if self._should_send_real_request():
+                body = [{"instId": symbol, "ordId": order_id} for order_id in chunk]
+                results.extend(
+                    self._split_batch_result(self._send_request("POST", endpoint, body), len(chunk))
+                )
+            else:
+                logger.info(f"{self.trading_mode}模式：模拟批量撤单 {len(chunk)} 笔，不发送真实API请求")
+                results.extend(
+                    {
+                        "code": "0",
+                        "msg": f"{self.trading_mode} mode cancel accepted",
+                        "data": [
+                            {"ordId": order_id, "sCode": "0", "sMsg": "Cancel request processed"}
+                        ],
+                    }
+                    for order_id in chunk
+                )
+        return results
+
     def get_order(self, symbol: str, order_id: str) -> dict[str, Any]:
         """
         查询订单
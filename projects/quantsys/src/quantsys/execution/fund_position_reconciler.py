@@ -20,7 +20,9 @@ from .reconciliation import (
     ExchangeStandardizer,
     ReconciliationConfig,
     ReconciliationEngine,
+    ReconciliationIndex,
     ReconciliationReport,
+    order_key,
 )
 from .trade_ledger import TradeLedger
 
@@ -81,6 +83,7 @@ class FundPositionReconciler:
         self.default_config = {
             "exchange": "okx",
             "reconcile_interval": 30,  # 对账间隔（秒）
+            "full_reconcile_interval": 300,  # 全量比对间隔（秒），其余周期只比对内容有变化的持仓/订单
             "output_dir": "reports/fund_position_reconcile",
             "ledger_path": "data/trade_ledger.json",
             "auto_reconcile": True,
@@ -108,6 +111,10 @@ class FundPositionReconciler:
         # 对账引擎
         self.engine = ReconciliationEngine(self.recon_config)
         self.standardizer = ExchangeStandardizer()
+        # 按持仓/订单的比对字段索引上一轮的比对结果，增量对账只重新比对变化的条目
+        self.index = ReconciliationIndex(self.engine)
+        self.last_full_reconcile_time = 0.0
+        self.force_full_reconcile = True
 
         # 交易账本
         self.ledger = TradeLedger(self.actual_config["ledger_path"])
@@ -273,13 +280,31 @@ class FundPositionReconciler:
         local_positions = self.standardizer.standardize_positions(local_state["positions"])
         local_orders = self.standardizer.standardize_orders(local_state["orders"])
 
+        # 全量比对：到达全量间隔或上一轮有漂移时清空索引，其余周期只比对字段有变化的条目
+        now = time.time()
+        if (
+            self.force_full_reconcile
+            or now - self.last_full_reconcile_time >= self.actual_config["full_reconcile_interval"]
+        ):
+            self.index.clear()
+            self.last_full_reconcile_time = now
+
         # 执行对账
         balance_diffs = self.engine.reconcile_balance(exchange_balance, local_balance)
-        position_diffs = self.engine.reconcile_positions(exchange_positions, local_positions)
-        order_diffs = self.engine.reconcile_orders(exchange_orders, local_orders)
+        position_diffs = self.index.update(
+            "POSITION",
+            {pos.symbol: pos for pos in exchange_positions},
+            {pos.symbol: pos for pos in local_positions},
+        )
+        order_diffs = self.index.update(
+            "ORDER",
+            {order_key(order): order for order in exchange_orders},
+            {order_key(order): order for order in local_orders},
+        )
 
-        # 合并所有差异
+        # 合并所有差异；有差异时下一轮全量比对确认
         all_diffs = balance_diffs + position_diffs + order_diffs
+        self.force_full_reconcile = len(all_diffs) > 0
 
         # 更新对账状态
         self.status.last_reconcile_time = time.time()
@@ -509,6 +534,8 @@ class FundPositionReconciler:
             "failed_reconciles": self.status.failed_reconciles,
             "success_rate": (self.status.total_reconciles - self.status.failed_reconciles)
             / max(self.status.total_reconciles, 1),
+            "entities_compared": self.index.compared,
+            "entities_skipped": self.index.skipped,
             "config": {
                 "balance_threshold": self.thresholds.balance_threshold,
                 "position_threshold": self.thresholds.position_threshold,
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+交易所 HTTP 传输层
+OrderExecution 与 ExchangeAdapter 共用的连接池、签名和延迟统计
+
+- 每个主机（scheme://host + 证书校验 + 代理）一个共享 requests.Session，连接池复用 keep-alive 连接，
+  重试不再重新握手 TCP/TLS
+- HmacSigner 预先计算密钥的 HMAC 内部状态，每次签名只复制状态并处理消息；
+  okx_timestamp/okx_request_path/okx_body_str 与 HmacSigner.sign_request
+  是两个客户端共用的 OKX 签名规则
+- 按 "METHOD 路径" 统计请求延迟直方图（固定对数分桶，记录开销为常数）
+"""
+
+import base64
+import hmac
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图分桶上界（毫秒），最后一个桶收纳更慢的请求
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+
+
+class LatencyHistogram:
+    """
+    固定分桶的延迟直方图
+    """
+
+    def __init__(self, buckets_ms: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * len(buckets_ms)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float, error: bool = False):
+        """
+        记录一次请求耗时
+        """
+        ms = seconds * 1000.0
+        self.counts[bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if error:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        分位数（返回所在分桶的上界，最后一个桶返回最大值）
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets_ms, self.counts, strict=True):
+            seen += n
+            if n and seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        统计摘要
+        """
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": {
+                ("inf" if bound == float("inf") else f"le_{bound:g}ms"): n
+                for bound, n in zip(self.buckets_ms, self.counts, strict=True)
+            },
+        }
+
+
+class HmacSigner:
+    """
+    HMAC-SHA256 + Base64 签名（OKX 格式），密钥状态只计算一次
+    """
+
+    def __init__(self, secret_key: str):
+        # 字符串 digestmod 走 OpenSSL 的 HMAC 实现，copy() 直接复制已处理密钥的内外层状态
+        self._base = hmac.new(secret_key.encode("utf-8"), digestmod="sha256")
+
+    def sign(self, message: str) -> str:
+        """
+        对消息签名，返回 Base64 字符串
+        """
+        mac = self._base.copy()
+        mac.update(message.encode("utf-8"))
+        return base64.b64encode(mac.digest()).decode("utf-8")
+
+    def sign_request(
+        self, timestamp: str, method: str, request_path: str, body_str: str = ""
+    ) -> str:
+        """
+        OKX 请求签名：timestamp + METHOD + requestPath + body
+        """
+        return self.sign(timestamp + method.upper() + request_path + body_str)
+
+
+def okx_timestamp() -> str:
+    """
+    OKX 签名时间戳（UTC ISO8601，毫秒精度）
+    """
+    return datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+
+def okx_request_path(endpoint: str, params: dict[str, Any] | None = None) -> str:
+    """
+    签名和发送共用的请求路径：GET 的查询参数属于 requestPath，按发送顺序拼在路径后
+    """
+    return f"{endpoint}?{urlencode(params)}" if params else endpoint
+
+
+def okx_body_str(method: str, body: Any = None) -> str:
+    """
+    签名和发送共用的请求体序列化结果
+
+    GET 请求和空请求体为空字符串，其余为紧凑 JSON（服务端按原始字节验签）
+    """
+    if method.upper() == "GET" or not body:
+        return ""
+    return json.dumps(body, separators=(",", ":"))
+
+
+class HttpTransport:
+    """
+    单个主机的持久连接传输
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_maxsize: int = 10,
+        verify: bool = True,
+        proxy: str | None = None,
+        timeout: float = 10,
+    ):
+        """
+        初始化传输
+
+        Args:
+            base_url: 主机地址，如 https://www.okx.com
+            pool_maxsize: 连接池保留的最大 keep-alive 连接数
+            verify: 是否校验SSL证书
+            proxy: 代理服务器地址（可选）
+            timeout: 默认超时（秒）
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._histograms: dict[str, LatencyHistogram] = {}
+
+        self.session = requests.Session()
+        self.session.verify = verify
+        if proxy:
+            self.session.proxies = {"http": proxy, "https": proxy}
+        # 重试由调用方的退避逻辑处理，连接池这一层不再重试
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        headers: dict[str, str] | None = None,
+        params: dict[str, Any] | None = None,
+        data: str | bytes | None = None,
+        timeout: float | None = None,
+    ) -> requests.Response:
+        """
+        发送请求并记录延迟
+
+        Args:
+            method: HTTP方法
+            endpoint: API路径（以 / 开头）
+            headers: 请求头
+            params: 查询参数
+            data: 请求体（已序列化，保证与签名内容一致）
+            timeout: 超时（秒），默认使用 self.timeout
+        """
+        start = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}{endpoint}",
+                headers=headers,
+                params=params,
+                data=data,
+                timeout=self.timeout if timeout is None else timeout,
+            )
+            error = response.status_code >= 400
+            return response
+        finally:
+            self._record(
+                f"{method.upper()} {endpoint.split('?', 1)[0]}", time.perf_counter() - start, error
+            )
+
+    def _record(self, key: str, seconds: float, error: bool):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(seconds, error)
+
+    def latency_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        各端点的延迟统计 {"METHOD 路径": 摘要}
+        """
+        with self._lock:
+            return {key: h.snapshot() for key, h in sorted(self._histograms.items())}
+
+    def reset_stats(self):
+        """
+        清空延迟统计
+        """
+        with self._lock:
+            self._histograms.clear()
+
+    def close(self):
+        """
+        关闭连接池
+        """
+        self.session.close()
+
+
+_transports: dict[tuple, HttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(
+    base_url: str, verify: bool = True, proxy: str | None = None, pool_maxsize: int = 10
+) -> HttpTransport:
+    """
+    获取主机对应的共享传输（同一进程内同一主机、证书校验和代理设置只建一个连接池）
+    """
+    parts = urlsplit(base_url)
+    key = (parts.scheme, parts.netloc, verify, proxy)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = HttpTransport(
+                f"{parts.scheme}://{parts.netloc}",
+                pool_maxsize=pool_maxsize,
+                verify=verify,
+                proxy=proxy,
+            )
+            _transports[key] = transport
+            logger.info(
+                f"创建HTTP连接池: {parts.scheme}://{parts.netloc} (pool_maxsize={pool_maxsize})"
+            )
+        return transport
+
+
+def close_transports():
+    """
+    关闭并移除全部共享传输
+    """
+    with _transports_lock:
+        transports = list(_transports.values())
+        _transports.clear()
+    for transport in transports:
+        transport.close()
@@ -11,6 +11,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Any
 
+from .order_store import OrderStore, order_store_path
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -135,12 +137,20 @@ class IntentManager:
 
     def _load_consumed_intents_from_ledger(self) -> None:
         """
-        从订单账本加载已消费的intent
+        从订单账本加载已消费的intent（存在 SQLite 订单账本时从中读取，见 order_store）
         """
-        if os.path.exists(self.ledger_file):
+        store_path = order_store_path(self.ledger_file)
+        if os.path.exists(store_path) or os.path.exists(self.ledger_file):
             try:
-                with open(self.ledger_file, encoding="utf-8") as f:
-                    ledger_data = json.load(f)
+                if os.path.exists(store_path):
+                    store = OrderStore(store_path, cache_size=0)
+                    try:
+                        ledger_data = store.all_orders()
+                    finally:
+                        store.close()
+                else:
+                    with open(self.ledger_file, encoding="utf-8") as f:
+                        ledger_data = json.load(f)
 
                 # 遍历账本中的订单，提取intent_id
                 for order in ledger_data:
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+账本分段日志模块
+追加写入的 JSONL 分段日志，供交易账本持久化事件流
+
+- 每条记录一行 JSON，带单调递增序号 seq，追加写入成本与日志长度无关
+- 组提交：写入后立即 flush 到操作系统，fsync 按时间间隔或待提交条数批量执行
+- 分段轮转：当前分段超过 segment_max_bytes 后切换到新分段，文件名为分段首条 seq
+- 状态快照：原子写入 snapshot-<seq>.json，重放可从最近快照开始
+- 崩溃恢复：打开时截断最后一个分段末尾未写完整的行
+- 单一写入方：写入方打开时对目录加排他 flock，第二个写入方（含同进程内的另一个实例）
+  直接报错，避免两个实例分配重复的 seq
+- 只读打开：供其他进程读取，不截断、不写入、不加锁；prune 删除已被快照覆盖的旧分段
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from itertools import pairwise
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SYNC_MODES = ("group", "always", "none")
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".jsonl"
+_SNAPSHOT_PREFIX = "snapshot-"
+_SNAPSHOT_SUFFIX = ".json"
+_LOCK_NAME = "writer.lock"
+_SEQ_PREFIX = '{"seq": '
+
+
+def _record_seq(line: str) -> int:
+    # append 写入的记录以 {"seq": N, 开头，跳过的记录不必解析整行
+    if line.startswith(_SEQ_PREFIX):
+        end = line.find(",", len(_SEQ_PREFIX))
+        if end > 0:
+            return int(line[len(_SEQ_PREFIX) : end])
+    return json.loads(line)["seq"]
+
+
+def _fsync_dir(directory: str):
+    # 新建/重命名文件后同步目录项（Windows 不支持对目录 fsync）
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SegmentLog:
+    """
+    追加写入的分段日志
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        sync: str = "group",
+        group_commit_interval: float = 0.05,
+        group_commit_size: int = 256,
+        keep_snapshots: int = 3,
+        read_only: bool = False,
+    ):
+        """
+        初始化分段日志
+
+        Args:
+            directory: 日志目录
+            segment_max_bytes: 单个分段的最大字节数，超过后轮转
+            sync: fsync 策略，group（组提交）/ always（每条 fsync）/ none（交给操作系统）
+            group_commit_interval: 组提交的最长等待时间（秒）
+            group_commit_size: 待提交记录达到该条数时立即 fsync
+            keep_snapshots: 保留的快照个数
+            read_only: 只读打开（其他进程正在写入时读取），不截断尾部、不允许写入
+        """
+        if sync not in SYNC_MODES:
+            raise ValueError(f"不支持的同步策略: {sync}，可选 {SYNC_MODES}")
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.sync = sync
+        self.group_commit_interval = group_commit_interval
+        self.group_commit_size = group_commit_size
+        self.keep_snapshots = keep_snapshots
+        self.read_only = read_only
+
+        self.last_seq = 0
+        self.commits = 0
+        self._lock = threading.RLock()
+        self._file = None
+        self._segment_path = None
+        self._segment_bytes = 0
+        self._pending = 0
+        self._closed = False
+        self._lock_file = None
+
+        if not read_only:
+            os.makedirs(self.directory, exist_ok=True)
+            self._acquire_writer_lock()
+        try:
+            self._open_tail()
+        except BaseException:
+            self._release_writer_lock()
+            raise
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if self.sync == "group" and not read_only:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="ledger-log-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    # ------------------------------------------------------------------ 文件管理
+
+    def _acquire_writer_lock(self):
+        """获取写锁，保证同一目录只有一个写入方"""
+        if fcntl is None:
+            return
+        self._lock_file = open(os.path.join(self.directory, _LOCK_NAME), "w")  # noqa: SIM115
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(f"账本日志已被其他写入方锁定: {self.directory}") from e
+
+    def _release_writer_lock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _segment_name(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{first_seq:012d}{_SEGMENT_SUFFIX}")
+
+    def segments(self) -> list[tuple[int, str]]:
+        """
+        按首条 seq 排序的分段列表 [(first_seq, path)]
+        """
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for name in os.listdir(self.directory):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+                first_seq = int(name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)])
+                result.append((first_seq, os.path.join(self.directory, name)))
+        return sorted(result)
+
+    def _open_tail(self):
+        segments = self.segments()
+        if not segments:
+            if not self.read_only:
+                self._open_segment(1)
+            return
+
+        first_seq, path = segments[-1]
+        # 找到最后一条完整记录，截断崩溃时写了一半的行
+        good_offset = 0
+        last_seq = first_seq - 1
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    last_seq = json.loads(line)["seq"]
+                except (ValueError, KeyError):
+                    break
+                good_offset += len(line)
+        self.last_seq = last_seq
+        if self.read_only:
+            # 写入方可能正在追加，末尾不完整的行留给它处理
+            return
+        if good_offset < os.path.getsize(path):
+            logger.warning(f"截断分段 {path} 末尾不完整的记录，保留 {good_offset} 字节")
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+
+        self._segment_path = path
+        self._segment_bytes = good_offset
+        self._file = open(path, "ab")
+
+    def refresh(self) -> int:
+        """
+        只读打开时重新扫描最后一个分段，读取写入方追加后的 last_seq
+
+        Returns:
+            刷新后的 last_seq
+        """
+        if self.read_only:
+            with self._lock:
+                self._open_tail()
+        return self.last_seq
+
+    def _open_segment(self, first_seq: int):
+        self._segment_path = self._segment_name(first_seq)
+        self._file = open(self._segment_path, "ab")
+        self._segment_bytes = 0
+        if self.sync != "none":
+            _fsync_dir(self.directory)
+
+    def _rotate(self):
+        self._commit_locked()
+        self._file.close()
+        self._open_segment(self.last_seq + 1)
+        logger.info(f"账本日志轮转到新分段: {self._segment_path}")
+
+    # ------------------------------------------------------------------ 写入
+
+    def append(self, record: dict[str, Any]) -> int:
+        """
+        追加一条记录，返回分配的 seq
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("日志已关闭")
+            if self.read_only:
+                raise ValueError("日志以只读方式打开")
+            if self._segment_bytes >= self.segment_max_bytes:
+                self._rotate()
+            seq = self.last_seq + 1
+            line = json.dumps({"seq": seq, **record}, ensure_ascii=False, default=str)
+            data = (line + "\n").encode("utf-8")
+            self._file.write(data)
+            # 进入操作系统缓冲，进程崩溃不丢；掉电持久性由 fsync 保证
+            self._file.flush()
+            self.last_seq = seq
+            self._segment_bytes += len(data)
+            self._pending += 1
+            if self.sync == "always" or (
+                self.sync == "group" and self._pending >= self.group_commit_size
+            ):
+                self._commit_locked()
+            return seq
+
+    def _commit_locked(self):
+        if self._pending == 0 or self._file is None:
+            return
+        self._file.flush()
+        if self.sync != "none":
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self.commits += 1
+
+    def commit(self):
+        """
+        立即提交（fsync）所有待提交记录
+        """
+        with self._lock:
+            self._commit_locked()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.group_commit_interval):
+            try:
+                self.commit()
+            except (OSError, ValueError) as e:
+                logger.error(f"账本日志组提交失败: {e}")
+
+    def close(self):
+        """
+        提交并关闭日志，释放写锁
+        """
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        with self._lock:
+            if self._closed:
+                return
+            self._commit_locked()
+            if self._file is not None:
+                self._file.close()
+            self._release_writer_lock()
+            self._closed = True
+
+    # ------------------------------------------------------------------ 读取
+
+    def read(self, after_seq: int = 0) -> Iterator[dict[str, Any]]:
+        """
+        按 seq 顺序读取 seq > after_seq 的记录，跳过不包含这些记录的分段
+
+        需要的分段已被 prune 删除时（只读方与写入方并发）抛出 FileNotFoundError，
+        调用方应刷新 last_seq 后从更新的快照重新读取，而不是得到缺了一段的记录。
+        """
+        with self._lock:
+            if not self._closed and self._file is not None:
+                self._file.flush()
+            segments = self.segments()
+            last_seq = self.last_seq
+
+        if segments and segments[0][0] > after_seq + 1 and after_seq < last_seq:
+            raise FileNotFoundError(
+                f"seq {after_seq + 1} 所在的日志分段已被删除（最早分段从 {segments[0][0]} 开始）"
+            )
+        for i, (_, path) in enumerate(segments):
+            next_first = segments[i + 1][0] if i + 1 < len(segments) else None
+            if next_first is not None and next_first <= after_seq + 1:
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    seq = _record_seq(line)
+                    if seq > last_seq:
+                        return
+                    if seq > after_seq:
+                        yield json.loads(line)
+
+    # ------------------------------------------------------------------ 快照
+
+    def _snapshots(self) -> list[tuple[int, str]]:
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for name in os.listdir(self.directory):
+            if name.startswith(_SNAPSHOT_PREFIX) and name.endswith(_SNAPSHOT_SUFFIX):
+                seq = int(name[len(_SNAPSHOT_PREFIX) : -len(_SNAPSHOT_SUFFIX)])
+                result.append((seq, os.path.join(self.directory, name)))
+        return sorted(result)
+
+    def write_snapshot(self, state: dict[str, Any], seq: int | None = None) -> str:
+        """
+        原子写入状态快照，快照对应的日志记录先行提交
+
+        Args:
+            state: 截至 seq 的状态
+            seq: 快照对应的最后一条记录，默认当前 last_seq
+
+        Returns:
+            快照文件路径
+        """
+        if self.read_only:
+            raise ValueError("日志以只读方式打开")
+        with self._lock:
+            self._commit_locked()
+            seq = self.last_seq if seq is None else seq
+
+        path = os.path.join(self.directory, f"{_SNAPSHOT_PREFIX}{seq:012d}{_SNAPSHOT_SUFFIX}")
+        tmp_path = path + ".tmp"
+        payload = {"seq": seq, "created_at": time.time(), "state": state}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, default=str)
+            f.flush()
+            if self.sync != "none":
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if self.sync != "none":
+            _fsync_dir(self.directory)
+
+        if self.keep_snapshots > 0:
+            for _, old_path in self._snapshots()[: -self.keep_snapshots]:
+                os.remove(old_path)
+        return path
+
+    def latest_snapshot(self) -> dict[str, Any] | None:
+        """
+        最近一个可读的快照 {"seq", "created_at", "state"}，没有时返回 None
+        """
+        for seq, path in reversed(self._snapshots()):
+            if seq > self.last_seq:
+                logger.warning(f"快照 {path} 超出日志末尾 seq={self.last_seq}，忽略")
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"读取快照失败 {path}: {e}")
+        return None
+
+    def snapshot_seqs(self) -> list[int]:
+        """
+        现有快照对应的 seq（升序）
+        """
+        return [seq for seq, _ in self._snapshots()]
+
+    def prune(self, before_seq: int) -> int:
+        """
+        删除记录全部不大于 before_seq 的旧分段（当前写入的分段保留）
+
+        调用方应传入仍需保留的最早快照的 seq，删除后只能从该快照或之后的快照重放。
+
+        Returns:
+            删除的分段数
+        """
+        if self.read_only:
+            raise ValueError("日志以只读方式打开")
+        with self._lock:
+            segments = self.segments()
+            removed = 0
+            for (_, path), (next_first, _) in pairwise(segments):
+                if next_first > before_seq + 1:
+                    break
+                os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"已删除 {removed} 个被快照覆盖的日志分段（seq <= {before_seq}）")
+        return removed
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+账本事件时间索引
+按自然日（本地时间）把账本事件分区存放，供复盘按时间范围读取
+
+- 每日一个分区：day-YYYYMMDD.jsonl 存事件，day-YYYYMMDD.idx 存 (timestamp, seq, offset, length)
+- 内存中按日缓存按时间排序的偏移索引，范围查询二分定位后按偏移读取，只打开涉及的分区
+- 增量同步：index.json 记录已索引到的账本 seq，sync 只读取账本中之后的事件
+- 索引是派生数据：写入不 fsync，崩溃后超出 last_seq 的分区尾部在下次加载时截断
+"""
+
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any
+
+from .trade_ledger import LedgerEvent, TradeLedger
+
+logger = logging.getLogger(__name__)
+
+_DAY_PREFIX = "day-"
+_DATA_SUFFIX = ".jsonl"
+_INDEX_SUFFIX = ".idx"
+_MANIFEST = "index.json"
+# iter_range 每批解码的事件数
+_DECODE_BATCH = 4096
+
+
+def day_key(timestamp: float) -> str:
+    """
+    时间戳所在的本地自然日，格式 YYYYMMDD
+    """
+    return datetime.fromtimestamp(timestamp).strftime("%Y%m%d")
+
+
+class _DayIndex:
+    """
+    单个分区的偏移索引（按追加顺序记录，查询前按 (timestamp, seq) 排序）
+    """
+
+    __slots__ = ("lengths", "offsets", "ordered", "seqs", "size", "timestamps")
+
+    def __init__(self):
+        self.timestamps: list[float] = []
+        self.seqs: list[int] = []
+        self.offsets: list[int] = []
+        self.lengths: list[int] = []
+        self.size = 0
+        self.ordered = True
+
+    def add(self, timestamp: float, seq: int, offset: int, length: int):
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            self.ordered = False
+        self.timestamps.append(timestamp)
+        self.seqs.append(seq)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.size = offset + length
+
+    def sort(self):
+        if self.ordered:
+            return
+        # 时间相同的事件保持账本顺序
+        order = sorted(range(len(self.seqs)), key=lambda i: (self.timestamps[i], self.seqs[i]))
+        for name in ("timestamps", "seqs", "offsets", "lengths"):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in order])
+        self.ordered = True
+
+
+class LedgerTimeIndex:
+    """
+    按日分区的账本事件索引
+    """
+
+    def __init__(self, directory: str, read_only: bool = False):
+        """
+        初始化时间索引
+
+        Args:
+            directory: 索引目录
+            read_only: 只读打开（如并行复盘的子进程），不同步、不截断分区
+        """
+        self.directory = directory
+        self.read_only = read_only
+        self.last_seq = 0
+        self.source: str | None = None
+        self._days: dict[str, _DayIndex] = {}
+
+        if not read_only:
+            os.makedirs(self.directory, exist_ok=True)
+        self._load_manifest()
+        self._day_keys = self._list_days()
+
+    # ------------------------------------------------------------------ 文件管理
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{_DAY_PREFIX}{key}{suffix}")
+
+    def _list_days(self) -> list[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[len(_DAY_PREFIX) : -len(_DATA_SUFFIX)]
+            for name in os.listdir(self.directory)
+            if name.startswith(_DAY_PREFIX) and name.endswith(_DATA_SUFFIX)
+        )
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, _MANIFEST)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.last_seq = manifest["last_seq"]
+            self.source = manifest.get("source")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"读取时间索引清单失败 {path}: {e}，将重建索引")
+            self.last_seq = 0
+            self.source = None
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, _MANIFEST)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_seq": self.last_seq, "source": self.source}, f)
+        os.replace(tmp_path, path)
+
+    def _day(self, key: str) -> _DayIndex:
+        day = self._days.get(key)
+        if day is None:
+            day = self._load_day(key)
+            self._days[key] = day
+        return day
+
+    def _load_day(self, key: str) -> _DayIndex:
+        day = _DayIndex()
+        index_path = self._path(key, _INDEX_SUFFIX)
+        if not os.path.exists(index_path):
+            return day
+
+        good_bytes = 0
+        with open(index_path, "rb") as f:
+            for line in f:
+                parts = line.split(b"\t")
+                if not line.endswith(b"\n") or len(parts) != 4:
+                    break
+                seq = int(parts[1])
+                # 清单未记录的 seq 是同步中途崩溃留下的，不可见
+                if seq > self.last_seq:
+                    break
+                day.add(float(parts[0]), seq, int(parts[2]), int(parts[3]))
+                good_bytes += len(line)
+
+        if not self.read_only:
+            data_path = self._path(key, _DATA_SUFFIX)
+            if good_bytes < os.path.getsize(index_path):
+                with open(index_path, "r+b") as f:
+                    f.truncate(good_bytes)
+            if os.path.exists(data_path) and day.size < os.path.getsize(data_path):
+                logger.warning(f"截断时间索引分区 {data_path} 未提交的尾部")
+                with open(data_path, "r+b") as f:
+                    f.truncate(day.size)
+        return day
+
+    def clear(self):
+        """
+        删除全部分区
+        """
+        if self.read_only:
+            raise ValueError("只读索引不能修改")
+        for key in self._day_keys:
+            for suffix in (_DATA_SUFFIX, _INDEX_SUFFIX):
+                path = self._path(key, suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+        self._days = {}
+        self._day_keys = []
+        self.last_seq = 0
+        self._save_manifest()
+
+    # ------------------------------------------------------------------ 同步
+
+    def sync(self, ledger: TradeLedger) -> int:
+        """
+        把账本中尚未索引的事件追加到各日分区
+
+        账本换成另一个、或事件数少于已索引数（账本被重建）时先清空索引。
+
+        Returns:
+            本次新索引的事件数
+        """
+        if self.read_only:
+            raise ValueError("只读索引不能同步")
+        source = os.path.abspath(
+            ledger.segment_dir if ledger.storage == "segment" else ledger.ledger_path
+        )
+        if source != self.source or ledger.event_count < self.last_seq:
+            if self.last_seq:
+                logger.warning(f"账本与时间索引不一致（{source}），重建索引")
+            self.source = source
+            self.clear()
+        if ledger.event_count == self.last_seq:
+            return 0
+
+        handles: dict[str, tuple[Any, Any]] = {}
+        added = 0
+        with ExitStack() as stack:
+            for seq, record in ledger.read_events(self.last_seq):
+                key = day_key(record["timestamp"])
+                day = self._day(key)
+                if key not in handles:
+                    if day.size == 0 and key not in self._day_keys:
+                        self._day_keys.append(key)
+                        self._day_keys.sort()
+                    handles[key] = (
+                        stack.enter_context(open(self._path(key, _DATA_SUFFIX), "ab")),
+                        stack.enter_context(open(self._path(key, _INDEX_SUFFIX), "ab")),
+                    )
+                data_file, index_file = handles[key]
+                data = (
+                    json.dumps({"seq": seq, **record}, ensure_ascii=False, default=str) + "\n"
+                ).encode("utf-8")
+                offset = day.size
+                data_file.write(data)
+                index_file.write(
+                    f"{record['timestamp']!r}\t{seq}\t{offset}\t{len(data)}\n".encode("ascii")
+                )
+                day.add(record["timestamp"], seq, offset, len(data))
+                self.last_seq = seq
+                added += 1
+        # 分区关闭后再更新清单；中途失败时已写入的尾部在下次加载时截断
+        self._save_manifest()
+
+        if added:
+            logger.info(f"时间索引新增 {added} 个事件，已索引到 seq={self.last_seq}")
+        return added
+
+    # ------------------------------------------------------------------ 查询
+
+    def days(self) -> list[str]:
+        """
+        有事件的自然日列表（YYYYMMDD，升序）
+        """
+        return list(self._day_keys)
+
+    def _keys_between(self, start_ts: float, end_ts: float) -> list[str]:
+        lo = bisect_left(self._day_keys, day_key(start_ts))
+        hi = bisect_right(self._day_keys, day_key(end_ts))
+        return self._day_keys[lo:hi]
+
+    def _day_range(self, key: str, start_ts: float, end_ts: float) -> tuple[_DayIndex, int, int]:
+        day = self._day(key)
+        day.sort()
+        lo = bisect_left(day.timestamps, start_ts)
+        hi = bisect_left(day.timestamps, end_ts)
+        return day, lo, hi
+
+    def seqs_between(self, start_ts: float, end_ts: float) -> list[int]:
+        """
+        时间范围内事件的账本序号，按时间排序（只查内存索引，不读事件）
+        """
+        if end_ts <= start_ts:
+            return []
+        seqs: list[int] = []
+        for key in self._keys_between(start_ts, end_ts):
+            day, lo, hi = self._day_range(key, start_ts, end_ts)
+            seqs.extend(day.seqs[lo:hi])
+        return seqs
+
+    def iter_range(self, start_ts: float, end_ts: float) -> Iterator[LedgerEvent]:
+        """
+        按时间顺序流式读取 start_ts <= timestamp < end_ts 的事件（同一时间按账本顺序）
+        """
+        if end_ts <= start_ts:
+            return
+        for key in self._keys_between(start_ts, end_ts):
+            day, lo, hi = self._day_range(key, start_ts, end_ts)
+            if lo >= hi:
+                continue
+            with open(self._path(key, _DATA_SUFFIX), "rb") as f:
+                for batch in range(lo, hi, _DECODE_BATCH):
+                    stop = min(batch + _DECODE_BATCH, hi)
+                    offsets = day.offsets[batch:stop]
+                    ends = [o + n for o, n in zip(offsets, day.lengths[batch:stop], strict=True)]
+                    # 一次读出这批事件所在的字节区间，拼成 JSON 数组一次解码
+                    first = min(offsets)
+                    f.seek(first)
+                    chunk = f.read(max(ends) - first)
+                    lines = [
+                        chunk[o - first : e - first] for o, e in zip(offsets, ends, strict=True)
+                    ]
+                    for record in json.loads(b"[" + b",".join(lines) + b"]"):
+                        yield LedgerEvent.from_dict(record)
+
+    def count_range(self, start_ts: float, end_ts: float) -> int:
+        """
+        时间范围内的事件数（只读索引，不读事件）
+        """
+        if end_ts <= start_ts:
+            return 0
+        total = 0
+        for key in self._keys_between(start_ts, end_ts):
+            _, lo, hi = self._day_range(key, start_ts, end_ts)
+            total += max(hi - lo, 0)
+        return total
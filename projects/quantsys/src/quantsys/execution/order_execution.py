@@ -4,10 +4,10 @@
 实现与交易所API的交互，处理订单的创建、取消和查询
 """
 
-import hashlib
-import hmac
+import asyncio
 import json
 import logging
+import sys
 import time
 from datetime import datetime
 from typing import Any
@@ -20,17 +20,30 @@ from src.quantsys.common.risk_manager import RiskManager, RiskVerdict
 from src.quantsys.execution.readiness import ExecutionReadiness
 from src.quantsys.risk import RiskEngine
 
+from ..common.rate_limiter import RateLimitExceeded, account_key, get_rate_limit_service
 from .account_service import AccountService
-from .exchange_adapter import ExchangeAdapterFactory
+from .exchange_adapter import BATCH_ORDER_LIMIT, ExchangeAdapterFactory
 from .execution_context import ExecutionContext
+from .http_transport import (
+    HmacSigner,
+    get_transport,
+    okx_body_str,
+    okx_request_path,
+    okx_timestamp,
+)
 from .guards.risk_guard import GuardBlockedError, OrderIntent, RiskGuard, RiskVerdict
 from .order_executor import OrderExecutor
 
 # 导入订单ID管理和状态机
 from .order_ids import OrderIdManager
-from .order_splitter import OrderSplitter
+from .order_splitter import OrderSplitter, run_coroutine
 from .order_validator import OrderValidator
-from .reconciliation import ReconciliationReport, reconcile
+from .reconciliation import (
+    IncrementalReconciler,
+    ReconciliationConfig,
+    ReconciliationReport,
+    reconcile,
+)
 from .risk_gate import RiskGate
 
 # 配置日志
@@ -42,6 +55,40 @@ logger = logging.getLogger(__name__)
 # 限制公开接口：只允许 execution wrapper 方法调用
 __all__ = ["OrderExecution"]
 
+# 允许直接发送请求的调用者（execution wrapper 方法）
+_ALLOWED_REQUEST_CALLERS = frozenset(
+    {
+        "place_order",
+        "cancel_order",
+        "cancel_all_orders",
+        "modify_order",
+        "_execute_single_order",
+        "place_market_order",
+        "place_limit_order",
+        "_cancel_order_batch",
+        "get_open_orders",
+        "fetch_my_trades",
+    }
+)
+
+# OKX 成交明细（近三天）单页条数上限，以及一次查询最多翻页数
+FILLS_PAGE_LIMIT = 100
+FILLS_MAX_PAGES = 20
+
+
+def _standard_fill(fill: dict[str, Any]) -> dict[str, Any]:
+    """OKX 成交明细转换为对账使用的字段（id/orderId/symbol/side/price/amount/timestamp）"""
+    return {
+        "id": fill.get("tradeId", ""),
+        "orderId": fill.get("ordId", ""),
+        "clientOrderId": fill.get("clOrdId", ""),
+        "symbol": fill.get("instId", ""),
+        "side": fill.get("side", ""),
+        "price": float(fill.get("fillPx") or 0.0),
+        "amount": float(fill.get("fillSz") or 0.0),
+        "timestamp": int(fill.get("ts") or 0),
+    }
+
 
 class OrderExecution:
     """
@@ -211,6 +258,17 @@ class OrderExecution:
         else:
             raise ValueError(f"不支持的交易所: {self.exchange}")
 
+        # 与 ExchangeAdapter 共用同一主机的 keep-alive 连接池；签名密钥状态预先计算
+        http_config = config.get("http", {})
+        self.request_timeout = http_config.get("timeout", 10)
+        self.transport = get_transport(
+            self.base_url,
+            verify=http_config.get("verify_ssl", True),
+            proxy=http_config.get("proxy"),
+            pool_maxsize=http_config.get("pool_maxsize", 10),
+        )
+        self._signer = HmacSigner(self.secret_key)
+
         # 重试配置
         retry_config = config.get("retry", {})
         self.max_retries = retry_config.get("max_retries", 3)
@@ -220,6 +278,12 @@ class OrderExecution:
         self.max_retry_delay = retry_config.get("max_retry_delay", 30.0)  # 最大重试延迟（秒）
         self.backoff_factor = retry_config.get("backoff_factor", 2.0)  # 退避因子
 
+        # 限流：与 ExchangeAdapter、分拆器共用进程内的令牌桶（按端点和账户），
+        # 需要等待超过 rate_limit_max_wait 秒时不再排队，直接返回失败和预计等待时间
+        self.rate_limiter = get_rate_limit_service()
+        self.rate_limit_account = account_key(self.api_key)
+        self.rate_limit_max_wait = retry_config.get("rate_limit_max_wait", 5.0)
+
         # 重试指标
         self.retry_metrics = {
             "total_attempts": 0,
@@ -370,7 +434,7 @@ class OrderExecution:
         logger.info(f"Audit event recorded: {event.get('event_type')}")
 
     def _sign_request(
-        self, method: str, endpoint: str, body: dict[str, Any] = None
+        self, method: str, endpoint: str, body: dict[str, Any] = None, body_str: str | None = None
     ) -> dict[str, str]:
         """
         生成请求签名
@@ -379,26 +443,17 @@ class OrderExecution:
             method: HTTP方法
             endpoint: API端点
             body: 请求体
+            body_str: 已序列化的请求体（传入时不再重复序列化 body）
 
         Returns:
             headers: 包含签名的请求头
         """
-        body = body or {}
+        if body_str is None:
+            body_str = okx_body_str(method, body)
 
-        # 获取当前时间戳
-        timestamp = str(datetime.utcnow().isoformat()[:-3]) + "Z"
-
-        # 构造签名字符串
-        message = timestamp + method.upper() + endpoint + json.dumps(body)
-
-        # 生成签名（OKX要求使用Base64编码）
-        import base64
-
-        signature = base64.b64encode(
-            hmac.new(
-                self.secret_key.encode("utf-8"), message.encode("utf-8"), hashlib.sha256
-            ).digest()
-        ).decode("utf-8")
+        # 签名字符串 timestamp + method + endpoint + body，Base64 编码（与 OKXAdapter 共用）
+        timestamp = okx_timestamp()
+        signature = self._signer.sign_request(timestamp, method, endpoint, body_str)
 
         # 构造请求头
         headers = {
@@ -451,28 +506,12 @@ class OrderExecution:
         retry_delay = self.initial_retry_delay
 
         # 二次门禁：检查是否是从 execution wrapper 调用的
-        import inspect
-
-        caller_frame = inspect.currentframe().f_back
-        caller_name = caller_frame.f_code.co_name if caller_frame else "unknown"
-        caller_function = caller_frame.f_code.co_name if caller_frame else "unknown"
-
-        # 允许的调用者列表（execution wrapper 方法）
-        allowed_callers = [
-            "place_order",
-            "cancel_order",
-            "cancel_all_orders",
-            "modify_order",
-            "_execute_single_order",
-            "place_market_order",
-            "place_limit_order",
-        ]
+        # （只取直接调用者的代码对象名，不构造 inspect 帧信息）
+        caller_name = sys._getframe(1).f_code.co_name
 
         # 如果不是从允许的调用者调用，则拒绝
-        is_allowed = any(caller in allowed_callers for caller in [caller_name, caller_function])
-
-        if not is_allowed:
-            error_msg = f"BYPASS DETECTED: Direct call to _send_request_with_retry from {caller_name}.{caller_function} is not allowed"
+        if caller_name not in _ALLOWED_REQUEST_CALLERS:
+            error_msg = f"BYPASS DETECTED: Direct call to _send_request_with_retry from {caller_name} is not allowed"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
 
@@ -486,27 +525,48 @@ class OrderExecution:
         }
         self.event_log.append(event)
 
+        limit_key = f"{method} {endpoint}"
+        # 批量接口按订单数计权重
+        weight = len(body) if isinstance(body, list) else 1
+
         while attempt <= self.max_retries:
+            throttled = False
             try:
                 attempt += 1
-                headers = self._sign_request(method, endpoint, body)
-
-                # 发送请求
-                if method == "GET":
-                    response = requests.get(
-                        f"{self.base_url}{endpoint}",
-                        headers=headers,
-                        params=body,  # GET请求使用params
-                        timeout=10,  # 10秒超时
-                    )
-                else:
-                    response = requests.request(
-                        method,
-                        f"{self.base_url}{endpoint}",
-                        headers=headers,
-                        json=body,
-                        timeout=10,  # 10秒超时
-                    )
+                self.rate_limiter.acquire(
+                    limit_key,
+                    weight,
+                    account=self.rate_limit_account,
+                    max_wait=self.rate_limit_max_wait,
+                )
+            except RateLimitExceeded as e:
+                self._record_error(attempt, method, endpoint, "RATE_LIMITED", str(e), retry=False)
+                self.retry_metrics["failed_attempts"] += 1
+                return {
+                    "code": "1",
+                    "msg": f"请求被限流，预计 {e.wait_time:.2f} 秒后可重试",
+                    "data": [],
+                    "retry_after": e.wait_time,
+                }
+
+            try:
+                # 签名与发送使用同一份序列化结果；连接池复用 keep-alive 连接
+                # GET请求的参数放在查询字符串中并计入签名的 requestPath，body为空
+                request_path = okx_request_path(endpoint, body) if method == "GET" else endpoint
+                body_str = okx_body_str(method, body)
+                headers = self._sign_request(method, request_path, body, body_str=body_str)
+
+                # 发送请求（发送的路径和请求体与签名内容一致）
+                response = self.transport.request(
+                    method,
+                    request_path,
+                    headers=headers,
+                    data=body_str or None,
+                    timeout=self.request_timeout,
+                )
+                self.rate_limiter.update_from_response(
+                    limit_key, response.status_code, response.headers, self.rate_limit_account
+                )
 
                 # 处理响应
                 response.raise_for_status()  # 抛出HTTP错误
@@ -541,9 +601,10 @@ class OrderExecution:
                 # HTTP错误处理
                 status_code = e.response.status_code if hasattr(e, "response") else 0
 
-                if status_code == 429:  # 限流错误
+                if status_code == 429:  # 限流错误（等待时间由限流桶按 Retry-After 给出）
                     error_type = "HTTP_429_TOO_MANY_REQUESTS"
                     self._record_error(attempt, method, endpoint, error_type, str(e))
+                    throttled = True
                 elif 500 <= status_code < 600:  # 服务器错误
                     error_type = f"HTTP_{status_code}_SERVER_ERROR"
                     self._record_error(attempt, method, endpoint, error_type, str(e))
@@ -560,6 +621,9 @@ class OrderExecution:
                 break
 
             # 检查是否需要重试
+            if throttled:
+                # 下一次 acquire 会等到限流桶恢复，不再叠加指数退避
+                continue
             if attempt <= self.max_retries:
                 # 计算重试延迟
                 logger.warning(
@@ -1411,31 +1475,27 @@ class OrderExecution:
         logger.info(f"撤销所有订单: {symbol}")
 
         if self.exchange == "okx":
-            endpoint = "/api/v5/trade/cancel-batch-orders"
-            body = {"instId": symbol}
-
             # 根据交易模式决定是否发送真实请求
             if self.trading_mode == "live":
-                # LIVE模式：发送真实API请求
-                result = self._send_request_with_retry("POST", endpoint, body)
+                # LIVE模式：交易所挂单与本地账本未完成订单的并集，每 BATCH_ORDER_LIMIT 笔一个批量撤单请求，各批并发发送
+                open_orders = self._collect_cancel_all_orders(symbol)
+                result = run_coroutine(self._cancel_orders_async(symbol, open_orders))
             else:
                 # DRY_RUN或PAPER模式：模拟撤销所有订单结果
                 logger.info(f"{self.trading_mode}模式：模拟撤销所有订单，不发送真实API请求")
                 # 获取所有未完成订单并模拟撤销结果
-                order_ledger = self.order_id_manager.get_order_ledger()
                 mock_results = []
-                for order in order_ledger:
-                    if order["symbol"] == symbol and order["status"] in ["OPEN", "PARTIAL"]:
-                        mock_results.append(
-                            {
-                                "ordId": order.get(
-                                    "exchange_order_id", f"mock_{order['clientOrderId'][:16]}"
-                                ),
-                                "clOrdId": order["clientOrderId"],
-                                "sCode": "0",
-                                "sMsg": "Cancel request processed",
-                            }
-                        )
+                for order in self.order_id_manager.get_open_orders(symbol):
+                    mock_results.append(
+                        {
+                            "ordId": order.get(
+                                "exchange_order_id", f"mock_{order['clientOrderId'][:16]}"
+                            ),
+                            "clOrdId": order["clientOrderId"],
+                            "sCode": "0",
+                            "sMsg": "Cancel request processed",
+                        }
+                    )
                 result = {
                     "code": "0",
                     "msg": f"{self.trading_mode} mode cancel all accepted",
@@ -1444,11 +1504,11 @@ class OrderExecution:
 
             logger.info(f"撤销所有订单结果: {result}")
 
-            # 更新本地订单状态
-            if result.get("code") == "0" and result.get("data"):
+            # 更新本地订单状态（部分批次失败时，成功撤销的订单同样更新）
+            if result.get("data"):
                 for data_item in result["data"]:
                     client_order_id = data_item.get("clOrdId", "")
-                    if client_order_id:
+                    if client_order_id and str(data_item.get("sCode", "0")) == "0":
                         # 更新订单状态为CANCELED
                         self.order_id_manager.update_order_status(
                             client_order_id, "CANCELED", data_item.get("ordId")
@@ -1458,6 +1518,56 @@ class OrderExecution:
 
         return {}
 
+    def _collect_cancel_all_orders(self, symbol: str) -> list[dict[str, Any]]:
+        """
+        全部撤单的目标订单：交易所未成交订单（orders-pending）合并本地账本中的未完成订单
+
+        交易所挂单为准（包括本地账本缺失的订单），本地未完成订单按交易所订单ID去重后补入；
+        查询挂单失败时只撤本地订单。
+        """
+        targets: dict[str, dict[str, Any]] = {}
+        pending = self.get_open_orders(symbol)
+        if pending.get("code") == "0":
+            for item in pending.get("data") or []:
+                if item.get("ordId"):
+                    targets[item["ordId"]] = {
+                        "exchange_order_id": item["ordId"],
+                        "clientOrderId": item.get("clOrdId", ""),
+                    }
+        else:
+            logger.warning(f"查询未成交订单失败，仅撤销本地账本中的订单: {pending}")
+
+        for order in self.order_id_manager.get_open_orders(symbol):
+            if order.get("exchange_order_id"):
+                targets.setdefault(order["exchange_order_id"], order)
+        return list(targets.values())
+
+    def _cancel_order_batch(self, symbol: str, orders: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        发送一个批量撤单请求（至多 BATCH_ORDER_LIMIT 笔）
+        """
+        body = [{"instId": symbol, "ordId": order["exchange_order_id"]} for order in orders]
+        return self._send_request_with_retry("POST", "/api/v5/trade/cancel-batch-orders", body)
+
+    async def _cancel_orders_async(
+        self, symbol: str, orders: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """
+        并发发送各批撤单请求，合并为一个结果（任一批失败时 code 取该批的错误码）
+        """
+        batches = [
+            orders[i : i + BATCH_ORDER_LIMIT] for i in range(0, len(orders), BATCH_ORDER_LIMIT)
+        ]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._cancel_order_batch, symbol, batch) for batch in batches)
+        )
+        failed = [r for r in results if r.get("code") != "0"]
+        return {
+            "code": failed[0].get("code", "1") if failed else "0",
+            "msg": failed[0].get("msg", "") if failed else "",
+            "data": [item for r in results for item in r.get("data") or []],
+        }
+
     def get_order(self, symbol: str, order_id: str) -> dict[str, Any]:
         """
         查询订单状态
@@ -1761,12 +1871,7 @@ class OrderExecution:
         logger.info(f"改价/重挂订单: {symbol} {order_id} -> 新价格: {new_price}")
 
         # 1. 获取原订单信息
-        original_order = None
-        order_ledger = self.order_id_manager.get_order_ledger()
-        for order in order_ledger:
-            if order["exchange_order_id"] == order_id or order["clientOrderId"] == order_id:
-                original_order = order
-                break
+        original_order = self.order_id_manager.get_order_by_order_id(order_id)
 
         if not original_order:
             logger.error(f"原订单不存在: {order_id}")
@@ -1903,13 +2008,28 @@ class OrderExecution:
             local_state: 本地状态字典，包含balance、positions、orders和fills
             symbol_map: 本地符号到交易所符号的映射
             now_ts: 当前时间戳（毫秒）
-            config: 对账配置
+            config: 对账配置（incremental=True 时增量对账，full_interval_ms 为全量对账间隔）
 
         Returns:
             ReconciliationReport: 对账结果报告
         """
         logger.info("执行交易所与本地状态对账")
 
+        if config.get("incremental"):
+            # 增量对账：保留上一轮的交易所镜像、游标和比对字段，只拉取增量
+            if getattr(self, "_incremental_reconciler", None) is None:
+                self._incremental_reconciler = IncrementalReconciler(
+                    ReconciliationConfig(
+                        balance_threshold=config.get("balance_threshold", 0.01),
+                        position_threshold=config.get("position_threshold", 0.001),
+                        price_threshold=config.get("price_threshold", 0.001),
+                        max_fills_check=config.get("max_fills_check", 50),
+                        symbol_map=symbol_map,
+                    ),
+                    full_interval_ms=config.get("full_interval_ms", 300_000),
+                )
+            return self._incremental_reconciler.reconcile(self, local_state, symbol_map, now_ts)
+
         # 直接调用reconcile函数，使用当前实例作为exchange_client
         return reconcile(self, local_state, symbol_map, now_ts, config)
 
@@ -1922,6 +2042,24 @@ class OrderExecution:
         """
         return self.retry_metrics
 
+    def get_latency_metrics(self) -> dict[str, Any]:
+        """
+        获取各端点的请求延迟直方图（连接池与 ExchangeAdapter 共用，统计也共用）
+
+        Returns:
+            latency_metrics: {"METHOD 路径": 延迟摘要}
+        """
+        return self.transport.latency_stats()
+
+    def get_rate_limit_metrics(self) -> dict[str, Any]:
+        """
+        获取共享限流服务的指标（获取/等待/拒绝/被交易所限流次数及各令牌桶余量）
+
+        Returns:
+            rate_limit_metrics: 限流指标
+        """
+        return self.rate_limiter.stats()
+
     def fetch_balance(self) -> dict[str, Any]:
         """
         获取账户余额（为了兼容reconcile函数）
@@ -1949,15 +2087,41 @@ class OrderExecution:
         """
         return self.get_open_orders("") if callable(getattr(self, "get_open_orders", None)) else []
 
-    def fetch_my_trades(self) -> list[dict[str, Any]]:
+    def fetch_my_trades(self, since: int | None = None) -> list[dict[str, Any]]:
         """
         获取成交记录（为了兼容reconcile函数）
 
+        LIVE 模式查询 OKX 近三天成交明细（/api/v5/trade/fills），按 billId 向更早的记录翻页；
+        其他模式不发送请求，返回空列表。
+
+        Args:
+            since: 只返回该时间戳（毫秒）之后的成交（OKX begin 参数），供增量对账使用
+
         Returns:
-            trades: 成交记录列表
-        """
-        # 简化实现，返回空列表
-        return []
+            trades: 成交记录列表（新的在前）
+
+        Raises:
+            RuntimeError: 查询失败（对账按失败处理并在下一轮全量对账，不把失败当作没有成交）
+        """
+        if self.exchange != "okx" or self.trading_mode != "live":
+            return []
+
+        params = {"limit": str(FILLS_PAGE_LIMIT)}
+        if since is not None:
+            params["begin"] = str(int(since))
+        trades = []
+        for _ in range(FILLS_MAX_PAGES):
+            result = self._send_request_with_retry("GET", "/api/v5/trade/fills", params)
+            if result.get("code") != "0":
+                raise RuntimeError(f"查询成交记录失败: {result.get('msg', result)}")
+            page = result.get("data") or []
+            trades.extend(_standard_fill(fill) for fill in page)
+            if len(page) < FILLS_PAGE_LIMIT or not page[-1].get("billId"):
+                break
+            params = {**params, "after": page[-1]["billId"]}
+        else:
+            logger.warning(f"成交记录超过 {FILLS_MAX_PAGES} 页，只返回最近 {len(trades)} 条")
+        return trades
 
     def _check_real_order_limits(self, symbol: str, side: str, amount: float, price: float) -> None:
         """
@@ -83,11 +83,8 @@ class OrderExecutor:
                 order={"symbol": symbol, "side": side, "amount": amount, "price": price},
             )
 
-        # 2. 生成clientOrderId
-        strategy_id = params.get("strategy_id", "default")
-        client_order_id = self.order_id_manager.generate_client_order_id(
-            strategy_id=strategy_id, symbol=symbol, side=side, price=price or 0.0, amount=amount
-        )
+        # 2. 生成clientOrderId（调用方已指定时沿用，如分拆子订单，重试时保持不变）
+        client_order_id = self._client_order_id(symbol, side, amount, price, params)
 
         logger.info(
             f"执行订单: {side} {order_type} {symbol} {amount} {price}, clientOrderId: {client_order_id}"
@@ -178,6 +175,117 @@ class OrderExecutor:
                 cause=e,
             )
 
+    def _client_order_id(
+        self, symbol: str, side: str, amount: float, price: float | None, params: dict[str, Any]
+    ) -> str:
+        if params.get("clOrdId"):
+            return params["clOrdId"]
+        return self.order_id_manager.generate_client_order_id(
+            strategy_id=params.get("strategy_id", "default"),
+            symbol=symbol,
+            side=side,
+            price=price or 0.0,
+            amount=amount,
+        )
+
+    def execute_orders(self, orders: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        批量执行订单：逐笔验证、生成clientOrderId并做幂等性检查后，通过交易所批量接口一次发送
+
+        Args:
+            orders: 订单列表，每项包含 symbol/side/order_type/amount/price/params
+
+        Returns:
+            results: 与 orders 一一对应的结果，格式与 execute_order 成功时相同；
+                失败的订单返回 {"code": 非"0", "msg": 原因, "data": [...]}
+        """
+        results: list[dict[str, Any] | None] = [None] * len(orders)
+        to_send: list[tuple[int, str, dict[str, Any]]] = []
+
+        for i, order in enumerate(orders):
+            symbol, side, amount = order["symbol"], order["side"], order["amount"]
+            order_type, price = order["order_type"], order.get("price")
+            params = dict(order.get("params") or {})
+
+            validation = self.order_validator.validate_order(
+                symbol, side, order_type, amount, price
+            )
+            if not validation.valid:
+                results[i] = {"code": "1", "msg": f"订单验证失败: {validation.errors}", "data": []}
+                continue
+
+            client_order_id = self._client_order_id(symbol, side, amount, price, params)
+            if self.order_id_manager.check_order_exists(client_order_id):
+                existing_order = self.order_id_manager.get_order_by_client_id(client_order_id)
+                results[i] = {
+                    "code": "0",
+                    "msg": "Order already exists",
+                    "data": [
+                        {
+                            "ordId": existing_order.get("exchange_order_id"),
+                            "clOrdId": client_order_id,
+                            "state": existing_order.get("status", "unknown").lower(),
+                        }
+                    ],
+                }
+                continue
+
+            self.order_id_manager.add_order(
+                client_order_id=client_order_id,
+                symbol=symbol,
+                side=side,
+                order_type=order_type,
+                amount=amount,
+                price=price,
+                strategy_version=params.get("strategy_version"),
+                factor_version=params.get("factor_version"),
+                run_id=params.get("run_id"),
+                feature_snapshot_hash=params.get("feature_snapshot_hash"),
+            )
+            params["clOrdId"] = client_order_id
+            self.order_id_manager.update_order_status(client_order_id, "SENT")
+            to_send.append((i, client_order_id, {**order, "params": params}))
+
+        if not to_send:
+            return results
+
+        batch = [order for _, _, order in to_send]
+        try:
+            if hasattr(self.exchange_adapter, "place_orders"):
+                sent = self.exchange_adapter.place_orders(batch)
+            else:
+                sent = [
+                    self.exchange_adapter.place_order(
+                        symbol=o["symbol"],
+                        side=o["side"],
+                        order_type=o["order_type"],
+                        amount=o["amount"],
+                        price=o.get("price"),
+                        params=o["params"],
+                    )
+                    for o in batch
+                ]
+        except Exception as e:
+            logger.error(f"批量下单失败: {e}")
+            sent = [{"code": "1", "msg": f"Order execution failed: {e}", "data": []}] * len(batch)
+
+        for (i, client_order_id, _), result in zip(to_send, sent, strict=True):
+            if result.get("code") == "0" and result.get("data"):
+                self.order_id_manager.update_order_status(
+                    client_order_id=client_order_id,
+                    status="ACK",
+                    exchange_order_id=result["data"][0].get("ordId"),
+                )
+            else:
+                self.order_id_manager.update_order_status(client_order_id, "REJECTED")
+            results[i] = result
+
+        logger.info(
+            f"批量执行订单 {len(orders)} 笔，发送 {len(to_send)} 笔，"
+            f"成功 {sum(1 for r in results if r.get('code') == '0')} 笔"
+        )
+        return results
+
     @handle_execution_errors
     def cancel_order(self, symbol: str, order_id: str) -> dict[str, Any]:
         """
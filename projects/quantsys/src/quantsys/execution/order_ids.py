@@ -2,14 +2,19 @@
 """
 订单ID管理模块
 实现clientOrderId生成规则和幂等性检查
+
+订单账本保存在 SQLite（见 order_store），按 clientOrderId 等字段走索引查询，
+首次启动时导入旧的 JSON 账本
 """
 
 import hashlib
 import json
 import logging
 import os
+import threading
 import time
 from datetime import datetime
+from functools import wraps
 from typing import Any
 
 # 配置日志
@@ -20,38 +25,55 @@ logger = logging.getLogger("order_ids")
 
 # 导入订单状态机
 from .order_state_machine import OrderStateMachine
+from .order_store import OrderStore, order_store_path
 from .trade_ledger import TradeLedger
 
+# 视为有效（阻止重复下单）的订单状态
+ACTIVE_ORDER_STATUSES = ("CREATED", "SENT", "ACK", "OPEN", "PARTIAL", "FILLED")
+# 交易所挂单中、可撤销的订单状态
+OPEN_ORDER_STATUSES = ("OPEN", "PARTIAL")
+
+
+def _synchronized(method):
+    # 账本写入包含 TaskHub 镜像文件的读改写，多线程（并发下单/撤单）时需串行
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class OrderIdManager:
     """
     订单ID管理器，负责生成稳定的clientOrderId和幂等性检查
     """
 
-    def __init__(self, system_id: str = "quantsys"):
+    def __init__(
+        self,
+        system_id: str = "quantsys",
+        order_ledger_path: str = "data/order_ledger.json",
+        cache_size: int = 4096,
+    ):
         """
         初始化订单ID管理器
 
         Args:
             system_id: 系统标识，用于clientOrderId生成
+            order_ledger_path: 旧 JSON 订单账本路径；SQLite 账本为同名 .db 文件
+            cache_size: clientOrderId 查询的 LRU 缓存容量
         """
         self.system_id = system_id
-        self.order_ledger_path = "data/order_ledger.json"  # 订单账本路径
-        self._init_order_ledger()
+        self.order_ledger_path = order_ledger_path  # 旧 JSON 订单账本路径（仅用于导入）
+        self.order_store_path = order_store_path(order_ledger_path)
+        self.order_store = OrderStore(
+            self.order_store_path, json_path=order_ledger_path, cache_size=cache_size
+        )
+        self._lock = threading.RLock()
 
         # 初始化交易账本
         self.trade_ledger = TradeLedger()
 
-    def _init_order_ledger(self):
-        """
-        初始化订单账本
-        """
-        if not os.path.exists(self.order_ledger_path):
-            # 确保data目录存在
-            os.makedirs(os.path.dirname(self.order_ledger_path), exist_ok=True)
-            with open(self.order_ledger_path, "w") as f:
-                json.dump([], f)
-
     def generate_client_order_id(
         self,
         strategy_id: str,
@@ -93,23 +115,21 @@ class OrderIdManager:
 
     def get_order_ledger(self) -> list:
         """
-        获取订单账本
+        获取订单账本（全部订单，按写入顺序）
 
         Returns:
             order_ledger: 订单账本列表
         """
-        with open(self.order_ledger_path) as f:
-            return json.load(f)
+        return self.order_store.all_orders()
 
     def save_order_ledger(self, order_ledger: list):
         """
-        保存订单账本
+        用给定列表整体替换订单账本
 
         Args:
             order_ledger: 订单账本列表
         """
-        with open(self.order_ledger_path, "w") as f:
-            json.dump(order_ledger, f, indent=2)
+        self.order_store.replace_all(order_ledger)
 
     def check_order_exists(self, client_order_id: str) -> bool:
         """
@@ -121,16 +141,22 @@ class OrderIdManager:
         Returns:
             exists: 是否存在有效订单
         """
-        order_ledger = self.get_order_ledger()
+        return self.order_store.exists(client_order_id, ACTIVE_ORDER_STATUSES)
 
-        for order in order_ledger:
-            if order["clientOrderId"] == client_order_id:
-                status = order["status"]
-                # 检查是否处于有效状态
-                if status in ["CREATED", "SENT", "ACK", "OPEN", "PARTIAL", "FILLED"]:
-                    return True
+    def get_open_orders(self, symbol: str | None = None) -> list[dict[str, Any]]:
+        """
+        获取未完成（OPEN/PARTIAL）订单，走状态索引，不加载整个账本
 
-        return False
+        Args:
+            symbol: 交易对，None 表示全部
+
+        Returns:
+            orders: 订单列表（按写入顺序）
+        """
+        orders = self.order_store.find_by_status(OPEN_ORDER_STATUSES)
+        if symbol is None:
+            return orders
+        return [order for order in orders if order.get("symbol") == symbol]
 
     def get_order_by_client_id(self, client_order_id: str) -> dict[str, Any] | None:
         """
@@ -142,13 +168,19 @@ class OrderIdManager:
         Returns:
             order: 订单信息，如果不存在返回None
         """
-        order_ledger = self.get_order_ledger()
+        return self.order_store.get(client_order_id)
+
+    def get_order_by_order_id(self, order_id: str) -> dict[str, Any] | None:
+        """
+        根据交易所订单ID或clientOrderId获取订单
 
-        for order in order_ledger:
-            if order["clientOrderId"] == client_order_id:
-                return order
+        Args:
+            order_id: 交易所订单ID或客户端订单ID
 
-        return None
+        Returns:
+            order: 订单信息，如果不存在返回None
+        """
+        return self.order_store.find_by_order_id(order_id)
 
     def get_orders_by_feature_snapshot_hash(
         self, feature_snapshot_hash: str
@@ -162,12 +194,7 @@ class OrderIdManager:
         Returns:
             orders: 相关订单列表
         """
-        order_ledger = self.get_order_ledger()
-        return [
-            order
-            for order in order_ledger
-            if order.get("feature_snapshot_hash") == feature_snapshot_hash
-        ]
+        return self.order_store.find("feature_snapshot_hash", feature_snapshot_hash)
 
     def get_orders_by_run_id(self, run_id: str) -> list[dict[str, Any]]:
         """
@@ -179,8 +206,7 @@ class OrderIdManager:
         Returns:
             orders: 相关订单列表
         """
-        order_ledger = self.get_order_ledger()
-        return [order for order in order_ledger if order.get("run_id") == run_id]
+        return self.order_store.find("run_id", run_id)
 
     def get_orders_by_strategy_version(self, strategy_version: str) -> list[dict[str, Any]]:
         """
@@ -192,10 +218,7 @@ class OrderIdManager:
         Returns:
             orders: 相关订单列表
         """
-        order_ledger = self.get_order_ledger()
-        return [
-            order for order in order_ledger if order.get("strategy_version") == strategy_version
-        ]
+        return self.order_store.find("strategy_version", strategy_version)
 
     def get_orders_by_factor_version(self, factor_version: str) -> list[dict[str, Any]]:
         """
@@ -207,8 +230,7 @@ class OrderIdManager:
         Returns:
             orders: 相关订单列表
         """
-        order_ledger = self.get_order_ledger()
-        return [order for order in order_ledger if order.get("factor_version") == factor_version]
+        return self.order_store.find("factor_version", factor_version)
 
     def get_feature_snapshot_hash_by_order_id(self, client_order_id: str) -> str | None:
         """
@@ -368,6 +390,7 @@ class OrderIdManager:
         except Exception as e:
             logger.error(f"保存订单trace文件失败: {e}")
 
+    @_synchronized
     def add_order(
         self,
         client_order_id: str,
@@ -399,8 +422,6 @@ class OrderIdManager:
         Returns:
             order: 添加的订单信息
         """
-        order_ledger = self.get_order_ledger()
-
         # 检查订单是否已存在
         if self.check_order_exists(client_order_id):
             existing_order = self.get_order_by_client_id(client_order_id)
@@ -429,8 +450,7 @@ class OrderIdManager:
         }
 
         # 添加到账本
-        order_ledger.append(order)
-        self.save_order_ledger(order_ledger)
+        self.order_store.insert(order)
 
         # 保存trace文件
         self._save_trace_file(order)
@@ -463,6 +483,7 @@ class OrderIdManager:
 
         return order
 
+    @_synchronized
     def update_order_status(
         self, client_order_id: str, status: str, exchange_order_id: str | None = None
     ) -> bool:
@@ -477,51 +498,51 @@ class OrderIdManager:
         Returns:
             success: 更新是否成功
         """
-        order_ledger = self.get_order_ledger()
-
-        for i, order in enumerate(order_ledger):
-            if order["clientOrderId"] == client_order_id:
-                # 检查状态转换是否有效
-                if not OrderStateMachine.is_valid_transition(order["status"], status):
-                    logger.error(f"无效的状态转换: {order['status']} -> {status}")
-                    return False
+        entry = self.order_store.last_entry(client_order_id)
+        if entry is None:
+            return False
+        seq, order = entry
 
-                # 更新状态
-                order["status"] = status
-                order["update_ts"] = time.time()
-                if exchange_order_id:
-                    order["exchange_order_id"] = exchange_order_id
+        # 检查状态转换是否有效
+        if not OrderStateMachine.is_valid_transition(order["status"], status):
+            logger.error(f"无效的状态转换: {order['status']} -> {status}")
+            return False
 
-                # 保存更新后的账本
-                self.save_order_ledger(order_ledger)
+        # 更新状态
+        order["status"] = status
+        order["update_ts"] = time.time()
+        if exchange_order_id:
+            order["exchange_order_id"] = exchange_order_id
 
-                # 更新trace文件
-                self._save_trace_file(order)
+        # 保存更新后的账本
+        self.order_store.update(seq, order)
 
-                # 记录到交易账本
-                self.trade_ledger.record_order_updated(order)
+        # 更新trace文件
+        self._save_trace_file(order)
 
-                # 更新TaskHub订单状态
-                taskhub_orders_path = os.path.join("taskhub", "index", "orders.json")
-                if os.path.exists(taskhub_orders_path):
-                    with open(taskhub_orders_path, encoding="utf-8") as f:
-                        taskhub_orders = json.load(f)
+        # 记录到交易账本
+        self.trade_ledger.record_order_updated(order)
 
-                    # 更新对应订单
-                    for j, taskhub_order in enumerate(taskhub_orders):
-                        if taskhub_order["clientOrderId"] == client_order_id:
-                            taskhub_orders[j] = order
-                            break
+        # 更新TaskHub订单状态
+        taskhub_orders_path = os.path.join("taskhub", "index", "orders.json")
+        if os.path.exists(taskhub_orders_path):
+            with open(taskhub_orders_path, encoding="utf-8") as f:
+                taskhub_orders = json.load(f)
 
-                    # 写入TaskHub
-                    with open(taskhub_orders_path, "w", encoding="utf-8") as f:
-                        json.dump(taskhub_orders, f, indent=2, ensure_ascii=False)
+            # 更新对应订单
+            for j, taskhub_order in enumerate(taskhub_orders):
+                if taskhub_order["clientOrderId"] == client_order_id:
+                    taskhub_orders[j] = order
+                    break
 
-                logger.info(f"订单状态已更新: {client_order_id} -> {status}")
-                return True
+            # 写入TaskHub
+            with open(taskhub_orders_path, "w", encoding="utf-8") as f:
+                json.dump(taskhub_orders, f, indent=2, ensure_ascii=False)
 
-        return False
+        logger.info(f"订单状态已更新: {client_order_id} -> {status}")
+        return True
 
+    @_synchronized
     def update_order_fill(
         self, client_order_id: str, fill_amount: float, fill_price: float
     ) -> bool:
@@ -536,63 +557,62 @@ class OrderIdManager:
         Returns:
             success: 更新是否成功
         """
-        order_ledger = self.get_order_ledger()
-
-        for i, order in enumerate(order_ledger):
-            if order["clientOrderId"] == client_order_id:
-                # 保存旧的成交信息
-                old_fill_amount = order["fill_amount"]
+        entry = self.order_store.last_entry(client_order_id)
+        if entry is None:
+            return False
+        seq, order = entry
 
-                # 更新成交信息
-                order["fill_amount"] = fill_amount
-                order["fill_price"] = fill_price
+        # 保存旧的成交信息
+        old_fill_amount = order["fill_amount"]
 
-                # 更新状态
-                if fill_amount >= order["amount"]:
-                    order["status"] = "FILLED"
-                else:
-                    order["status"] = "PARTIAL"
-
-                order["update_ts"] = time.time()
+        # 更新成交信息
+        order["fill_amount"] = fill_amount
+        order["fill_price"] = fill_price
 
-                # 保存更新后的账本
-                self.save_order_ledger(order_ledger)
+        # 更新状态
+        if fill_amount >= order["amount"]:
+            order["status"] = "FILLED"
+        else:
+            order["status"] = "PARTIAL"
 
-                # 更新trace文件
-                self._save_trace_file(order)
+        order["update_ts"] = time.time()
 
-                # 记录到交易账本
-                self.trade_ledger.record_order_updated(order)
+        # 保存更新后的账本
+        self.order_store.update(seq, order)
 
-                # 记录成交事件（仅当有新的成交量时）
-                if fill_amount > old_fill_amount:
-                    new_fill_amount = fill_amount - old_fill_amount
-                    fill_data = {
-                        "symbol": order["symbol"],
-                        "side": order["side"],
-                        "fillAmount": new_fill_amount,
-                        "fillPrice": fill_price,
-                        "clientOrderId": client_order_id,
-                        "fillTime": time.time(),
-                    }
-                    self.trade_ledger.record_fill(fill_data)
-
-                # 更新TaskHub订单状态
-                taskhub_orders_path = os.path.join("taskhub", "index", "orders.json")
-                if os.path.exists(taskhub_orders_path):
-                    with open(taskhub_orders_path, encoding="utf-8") as f:
-                        taskhub_orders = json.load(f)
+        # 更新trace文件
+        self._save_trace_file(order)
 
-                    # 更新对应订单
-                    for j, taskhub_order in enumerate(taskhub_orders):
-                        if taskhub_order["clientOrderId"] == client_order_id:
-                            taskhub_orders[j] = order
-                            break
+        # 记录到交易账本
+        self.trade_ledger.record_order_updated(order)
+
+        # 记录成交事件（仅当有新的成交量时）
+        if fill_amount > old_fill_amount:
+            new_fill_amount = fill_amount - old_fill_amount
+            fill_data = {
+                "symbol": order["symbol"],
+                "side": order["side"],
+                "fillAmount": new_fill_amount,
+                "fillPrice": fill_price,
+                "clientOrderId": client_order_id,
+                "fillTime": time.time(),
+            }
+            self.trade_ledger.record_fill(fill_data)
+
+        # 更新TaskHub订单状态
+        taskhub_orders_path = os.path.join("taskhub", "index", "orders.json")
+        if os.path.exists(taskhub_orders_path):
+            with open(taskhub_orders_path, encoding="utf-8") as f:
+                taskhub_orders = json.load(f)
 
-                    # 写入TaskHub
-                    with open(taskhub_orders_path, "w", encoding="utf-8") as f:
-                        json.dump(taskhub_orders, f, indent=2, ensure_ascii=False)
+            # 更新对应订单
+            for j, taskhub_order in enumerate(taskhub_orders):
+                if taskhub_order["clientOrderId"] == client_order_id:
+                    taskhub_orders[j] = order
+                    break
 
-                return True
+            # 写入TaskHub
+            with open(taskhub_orders_path, "w", encoding="utf-8") as f:
+                json.dump(taskhub_orders, f, indent=2, ensure_ascii=False)
 
-        return False
+        return True
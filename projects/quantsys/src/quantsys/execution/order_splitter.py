@@ -4,14 +4,18 @@
 实现大订单的智能分拆功能，支持多种分拆策略和约束条件
 """
 
+import asyncio
 import json
 import logging
 import os
 import time
+from collections.abc import Coroutine
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 
+from ..common.rate_limiter import RateLimitService, get_rate_limit_service
 from .execution_context import ExecutionContext
 from .guards.risk_guard import OrderIntent, RiskGuard
 
@@ -22,6 +26,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def run_coroutine(coro: Coroutine) -> Any:
+    """
+    在同步代码中运行协程；当前线程已有事件循环时（如在异步服务中被调用）改在独立线程中运行
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
 @dataclass
 class SplitOrderConfig:
     """
@@ -46,6 +62,12 @@ class SplitOrderConfig:
     retry_interval: float = 5.0
     # 幂等性检查开关
     enable_idempotency: bool = True
+    # 并发执行分拆订单（fixed_size 策略；TWAP 按时间间隔逐笔执行）
+    concurrent_execution: bool = True
+    # 并发执行时同时在途的请求数
+    max_concurrency: int = 8
+    # 执行器支持批量下单时每批的订单数（1 表示逐笔发送）
+    batch_size: int = 20
 
 
 @dataclass
@@ -71,12 +93,15 @@ class OrderSplitter:
     订单分拆管理器
     """
 
-    def __init__(self, config: dict[str, Any] | None = None):
+    def __init__(
+        self, config: dict[str, Any] | None = None, rate_limiter: RateLimitService | None = None
+    ):
         """
         初始化订单分拆管理器
 
         Args:
             config: 分拆配置
+            rate_limiter: 限流服务，默认使用进程内共享的限流服务
         """
         # 使用默认配置或传入的配置
         default_config = SplitOrderConfig()
@@ -87,9 +112,12 @@ class OrderSplitter:
         risk_guard_enabled = risk_guard_config.get("enabled", True)
         self.risk_guard = RiskGuard(enabled=risk_guard_enabled)
 
-        # 订单速率控制计数器
-        self.order_rate_counter = 0
-        self.rate_window_start = time.time()
+        # 订单速率控制：max_order_rate 笔/分钟的令牌桶，同一速率配置的分拆器共享额度
+        self.rate_limiter = rate_limiter or get_rate_limit_service()
+        self.rate_limit_key = f"order_splitter/{self.config.max_order_rate}"
+        self.rate_limiter.configure(
+            self.rate_limit_key, capacity=self.config.max_order_rate, interval=60.0, replace=False
+        )
 
         # 创建幂等性检查存储目录
         self.idempotency_dir = "data/idempotency"
@@ -104,30 +132,28 @@ class OrderSplitter:
         Returns:
             bool: 是否允许下单
         """
-        current_time = time.time()
-        time_since_window_start = current_time - self.rate_window_start
-
-        # 如果超过1分钟，重置计数器
-        if time_since_window_start > 60:
-            self.rate_window_start = current_time
-            self.order_rate_counter = 0
-            return True
-
-        # 检查是否超过速率限制
-        if self.order_rate_counter >= self.config.max_order_rate:
+        wait = self.rate_limiter.wait_time(self.rate_limit_key)
+        if wait > 0:
             logger.warning(
-                f"订单速率超过限制: {self.order_rate_counter}/{self.config.max_order_rate} 订单/分钟"
+                f"订单速率超过限制: {self.config.max_order_rate} 订单/分钟，需等待 {wait:.1f} 秒"
             )
             return False
-
         return True
 
+    def _reserve_rate_budget(self, count: int) -> tuple[int, float]:
+        """
+        立即预占至多 count 笔下单额度
+
+        Returns:
+            (实际获得的额度, 额度为 0 时下一笔额度的等待时间估计)
+        """
+        return self.rate_limiter.acquire_available(self.rate_limit_key, count)
+
     def _wait_for_rate_limit(self) -> None:
         """
-        等待直到满足速率限制
+        占用一笔下单额度，额度不足时等待到令牌补充
         """
-        while not self._check_rate_limit():
-            time.sleep(0.5)
+        self.rate_limiter.acquire(self.rate_limit_key)
 
     def _get_market_depth(self, symbol: str) -> dict[str, float]:
         """
@@ -248,13 +274,18 @@ class OrderSplitter:
                 adjusted_price = self._adjust_price_for_slippage(symbol, side, price)
 
             # 创建分拆订单
+            child_params = params.copy()
+            original_order_id = params.get("original_order_id")
+            if original_order_id and "clOrdId" not in params:
+                # 子订单的 clientOrderId 由原始订单ID和序号确定，重试和并发发送时保持幂等
+                child_params["clOrdId"] = f"{original_order_id}-s{i}"
             split_order = {
                 "symbol": symbol,
                 "side": side,
                 "order_type": order_type,
                 "amount": current_amount,
                 "price": adjusted_price,
-                "params": params.copy(),
+                "params": child_params,
                 "split_index": i,
                 "total_splits": adjusted_num_splits,
             }
@@ -285,6 +316,13 @@ class OrderSplitter:
                 failure_reason="没有可执行的分拆订单",
             )
 
+        if (
+            self.config.concurrent_execution
+            and self.config.split_strategy != "twap"
+            and len(split_orders) > 1
+        ):
+            return run_coroutine(self.execute_split_orders_async(order_executor, split_orders))
+
         original_order_id = split_orders[0]["params"].get("original_order_id", "unknown")
         executed_orders = []
         failed_count = 0
@@ -323,9 +361,6 @@ class OrderSplitter:
                             }
                         )
                         logger.info(f"第 {i + 1}/{len(split_orders)} 笔分拆订单执行成功")
-
-                        # 更新速率计数器
-                        self.order_rate_counter += 1
                     else:
                         retries += 1
                         logger.warning(
@@ -360,6 +395,130 @@ class OrderSplitter:
                 logger.info(f"等待 {self.config.min_order_interval} 秒后执行下一笔分拆订单")
                 time.sleep(self.config.min_order_interval)
 
+        return self._split_result(original_order_id, split_orders, executed_orders, failed_count)
+
+    async def _send_split_chunk(
+        self,
+        order_executor: Any,
+        chunk: list[dict[str, Any]],
+        semaphore: asyncio.Semaphore,
+    ) -> list[dict[str, Any]]:
+        """
+        在线程中发送一组分拆订单（执行器是同步接口），返回逐笔结果
+        """
+        async with semaphore:
+            try:
+                if len(chunk) > 1:
+                    return await asyncio.to_thread(order_executor.execute_orders, chunk)
+                order = chunk[0]
+                result = await asyncio.to_thread(
+                    order_executor.place_order,
+                    symbol=order["symbol"],
+                    side=order["side"],
+                    order_type=order["order_type"],
+                    amount=order["amount"],
+                    price=order["price"],
+                    params=order["params"],
+                )
+                return [result]
+            except Exception as e:
+                return [{"code": "1", "msg": str(e), "data": []} for _ in chunk]
+
+    async def execute_split_orders_async(
+        self, order_executor: Any, split_orders: list[dict[str, Any]]
+    ) -> SplitOrderResult:
+        """
+        并发执行分拆订单
+
+        按速率窗口的剩余额度分波发送；执行器支持 execute_orders 时每 batch_size 笔合并为一个批量请求，
+        各批/各笔最多 max_concurrency 个同时在途。失败的子订单用同一 clientOrderId 重试。
+
+        Args:
+            order_executor: 订单执行器实例
+            split_orders: 分拆订单列表
+
+        Returns:
+            SplitOrderResult: 订单执行结果
+        """
+        if not split_orders:
+            return SplitOrderResult(
+                original_order_id="",
+                split_orders=[],
+                status="failed",
+                failure_reason="没有可执行的分拆订单",
+            )
+
+        original_order_id = split_orders[0]["params"].get("original_order_id", "unknown")
+        total = len(split_orders)
+        batch_size = (
+            max(1, self.config.batch_size) if hasattr(order_executor, "execute_orders") else 1
+        )
+        semaphore = asyncio.Semaphore(max(1, self.config.max_concurrency))
+        executed: list[dict[str, Any] | None] = [None] * total
+        retries = [0] * total
+        pending = list(range(total))
+
+        logger.info(f"开始并发执行分拆订单，共 {total} 笔，批大小 {batch_size}")
+
+        while pending:
+            granted, wait = self._reserve_rate_budget(len(pending))
+            if granted == 0:
+                logger.warning(
+                    f"订单速率超过限制: {self.config.max_order_rate} 订单/分钟，"
+                    f"等待 {wait:.1f} 秒后继续"
+                )
+                await asyncio.sleep(wait)
+                continue
+            wave, pending = pending[:granted], pending[granted:]
+            chunks = [wave[i : i + batch_size] for i in range(0, len(wave), batch_size)]
+            outcomes = await asyncio.gather(
+                *(
+                    self._send_split_chunk(
+                        order_executor, [split_orders[i] for i in chunk], semaphore
+                    )
+                    for chunk in chunks
+                )
+            )
+
+            retry = []
+            for chunk, results in zip(chunks, outcomes, strict=True):
+                for i, result in zip(chunk, results, strict=True):
+                    if result.get("code") == "0":
+                        executed[i] = {
+                            "order_info": split_orders[i],
+                            "execution_result": result,
+                            "status": "success",
+                            "executed_at": time.time(),
+                        }
+                        continue
+                    retries[i] += 1
+                    logger.warning(
+                        f"第 {i + 1}/{total} 笔分拆订单执行失败，重试 {retries[i]}/{self.config.max_retries}: {result.get('msg', '')}"
+                    )
+                    if retries[i] < self.config.max_retries:
+                        retry.append(i)
+                    else:
+                        executed[i] = {
+                            "order_info": split_orders[i],
+                            "execution_result": None,
+                            "status": "failed",
+                            "executed_at": time.time(),
+                            "failure_reason": f"超过最大重试次数 {self.config.max_retries}",
+                        }
+            if retry:
+                await asyncio.sleep(self.config.retry_interval)
+                pending = retry + pending
+
+        failed_count = sum(1 for order in executed if order["status"] == "failed")
+        return self._split_result(original_order_id, split_orders, executed, failed_count)
+
+    def _split_result(
+        self,
+        original_order_id: str,
+        split_orders: list[dict[str, Any]],
+        executed_orders: list[dict[str, Any]],
+        failed_count: int,
+    ) -> SplitOrderResult:
         # 确定分拆结果状态
         if failed_count == 0:
             status = "success"
@@ -703,11 +862,11 @@ class OrderSplitter:
             test_config = {
                 "max_order_rate": 2  # 每分钟2笔订单
             }
-            splitter = OrderSplitter(test_config)
+            splitter = OrderSplitter(test_config, rate_limiter=RateLimitService({}))
 
-            # 模拟速率限制
-            splitter.order_rate_counter = 2
-            splitter.rate_window_start = time.time()
+            # 用完本分钟的额度
+            splitter._wait_for_rate_limit()
+            splitter._wait_for_rate_limit()
 
             # 检查速率限制
             rate_check = splitter._check_rate_limit()
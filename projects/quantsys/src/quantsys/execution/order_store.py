@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+订单账本存储模块
+以 SQLite 保存订单账本，查询走索引，不再每次整文件读取后线性扫描
+
+- 每个订单原样保存为一条 JSON 文本（导入/导出无损），seq 保持写入顺序
+- clientOrderId、exchange_order_id、run_id、strategy_version、factor_version、
+  feature_snapshot_hash 以及订单状态建二级索引（未完成订单查询不扫描整个账本）
+- 进程内 LRU 缓存 clientOrderId -> 该 ID 的全部订单（包括“不存在”），幂等检查命中缓存时不访问数据库；
+  其他连接提交写入后（PRAGMA data_version 变化）缓存整体失效
+- 首次打开时一次性导入旧 JSON 账本，原文件保留不动；是否已导入记录在 meta 表
+  （imported_from），判断与导入在同一个 BEGIN IMMEDIATE 事务中完成，多进程同时启动
+  也只导入一次，账本被清空后也不会再次导入
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from typing import Any
+
+logger = logging.getLogger("order_store")
+
+# 建索引的订单字段 -> 列名
+INDEXED_FIELDS = {
+    "clientOrderId": "client_order_id",
+    "exchange_order_id": "exchange_order_id",
+    "run_id": "run_id",
+    "strategy_version": "strategy_version",
+    "factor_version": "factor_version",
+    "feature_snapshot_hash": "feature_snapshot_hash",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_order_id TEXT,
+    exchange_order_id TEXT,
+    status TEXT,
+    run_id TEXT,
+    strategy_version TEXT,
+    factor_version TEXT,
+    feature_snapshot_hash TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_orders_{column} ON orders ({column});\n"
+    for column in ("status", *INDEXED_FIELDS.values())
+)
+
+_COLUMNS = ("status", *INDEXED_FIELDS.values())
+
+
+def order_store_path(json_path: str) -> str:
+    """
+    JSON 订单账本对应的 SQLite 账本路径（同名 .db 文件）
+    """
+    return f"{os.path.splitext(json_path)[0]}.db"
+
+
+def _index_value(value: Any) -> Any:
+    # 索引列只存标量，其余类型（列表、字典等）不参与索引查询
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return None
+
+
+def _row_values(order: Any) -> tuple:
+    if not isinstance(order, dict):
+        return (None,) * len(_COLUMNS)
+    return (
+        _index_value(order.get("status")),
+        *(_index_value(order.get(field)) for field in INDEXED_FIELDS),
+    )
+
+
+class OrderStore:
+    """
+    SQLite 订单账本
+    """
+
+    def __init__(self, db_path: str, json_path: str | None = None, cache_size: int = 4096):
+        """
+        初始化订单账本存储
+
+        Args:
+            db_path: SQLite 数据库路径
+            json_path: 旧 JSON 账本路径，尚未导入过时从中导入
+            cache_size: clientOrderId LRU 缓存容量（0 表示不缓存）
+        """
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._cache: OrderedDict[str, list[tuple[int, Any]]] = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._data_version = self._read_data_version()
+
+        if json_path:
+            self._import_legacy_once(json_path)
+
+    # ------------------------------------------------------------------ 缓存
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_cache(self):
+        # 本连接的写入会同步更新缓存；data_version 只在其他连接提交后变化
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    def _cache_put(self, client_order_id: str, entries: list[tuple[int, Any]]):
+        if self.cache_size <= 0:
+            return
+        self._cache[client_order_id] = entries
+        self._cache.move_to_end(client_order_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _entries(self, client_order_id: str) -> list[tuple[int, Any]]:
+        self._check_cache()
+        entries = self._cache.get(client_order_id)
+        if entries is not None:
+            self._cache.move_to_end(client_order_id)
+            self.cache_hits += 1
+            return entries
+        self.cache_misses += 1
+        rows = self._conn.execute(
+            "SELECT seq, data FROM orders WHERE client_order_id = ? ORDER BY seq",
+            (client_order_id,),
+        ).fetchall()
+        entries = [(seq, json.loads(data)) for seq, data in rows]
+        self._cache_put(client_order_id, entries)
+        return entries
+
+    def clear_cache(self):
+        """
+        清空 LRU 缓存
+        """
+        with self._lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------ 查询
+
+    def count(self) -> int:
+        """
+        订单记录数
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def iter_orders(self) -> Iterator[Any]:
+        """
+        按写入顺序逐条读取全部订单
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM orders ORDER BY seq").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def all_orders(self) -> list[Any]:
+        """
+        全部订单，与旧 JSON 账本的列表内容和顺序相同
+        """
+        return list(self.iter_orders())
+
+    def first_entry(self, client_order_id: str) -> tuple[int, dict[str, Any]] | None:
+        """
+        clientOrderId 对应的第一条订单
+
+        Returns:
+            (seq, 订单副本)，不存在时返回 None
+        """
+        with self._lock:
+            entries = self._entries(client_order_id)
+            if not entries:
+                return None
+            seq, order = entries[0]
+            return seq, dict(order)
+
+    def last_entry(self, client_order_id: str) -> tuple[int, dict[str, Any]] | None:
+        """
+        clientOrderId 对应的最后一条订单（被拒后用同一ID重新提交时为最新一次提交）
+
+        Returns:
+            (seq, 订单副本)，不存在时返回 None
+        """
+        with self._lock:
+            entries = self._entries(client_order_id)
+            if not entries:
+                return None
+            seq, order = entries[-1]
+            return seq, dict(order)
+
+    def get(self, client_order_id: str) -> dict[str, Any] | None:
+        """
+        clientOrderId 对应的第一条订单（副本）
+        """
+        entry = self.first_entry(client_order_id)
+        return entry[1] if entry else None
+
+    def exists(self, client_order_id: str, statuses) -> bool:
+        """
+        是否存在该 clientOrderId 且状态属于 statuses 的订单
+        """
+        with self._lock:
+            return any(
+                order.get("status") in statuses for _, order in self._entries(client_order_id)
+            )
+
+    def find(self, field: str, value: Any) -> list[dict[str, Any]]:
+        """
+        按索引字段查询订单，按写入顺序返回
+
+        Args:
+            field: INDEXED_FIELDS 中的订单字段名
+            value: 字段值
+        """
+        column = INDEXED_FIELDS.get(field)
+        if column is None:
+            raise ValueError(f"字段未建索引: {field}，可选 {list(INDEXED_FIELDS)}")
+        if value is None:
+            condition, params = f"{column} IS NULL", ()
+        else:
+            condition, params = f"{column} = ?", (value,)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM orders WHERE {condition} ORDER BY seq", params
+            ).fetchall()
+        # 索引列有类型转换（TEXT 亲和性），再按原值精确比较，与 order.get(field) == value 一致
+        orders = (json.loads(data) for (data,) in rows)
+        return [order for order in orders if isinstance(order, dict) and order.get(field) == value]
+
+    def find_by_status(self, statuses) -> list[dict[str, Any]]:
+        """
+        按状态查询订单（走 status 索引），按写入顺序返回
+
+        Args:
+            statuses: 订单状态集合
+        """
+        statuses = tuple(statuses)
+        if not statuses:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM orders WHERE status IN ({', '.join('?' * len(statuses))}) "
+                "ORDER BY seq",
+                statuses,
+            ).fetchall()
+        orders = (json.loads(data) for (data,) in rows)
+        return [
+            order for order in orders if isinstance(order, dict) and order.get("status") in statuses
+        ]
+
+    def find_by_order_id(self, order_id: str) -> dict[str, Any] | None:
+        """
+        按交易所订单ID或clientOrderId查询，返回写入顺序上的第一条
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM orders WHERE seq = ("
+                " SELECT MIN(seq) FROM ("
+                "  SELECT seq FROM orders WHERE exchange_order_id = ?"
+                "  UNION ALL SELECT seq FROM orders WHERE client_order_id = ?))",
+                (order_id, order_id),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ------------------------------------------------------------------ 写入
+
+    def _insert(self, order: Any) -> int:
+        cursor = self._conn.execute(
+            f"INSERT INTO orders ({', '.join(_COLUMNS)}, data) VALUES "
+            f"({', '.join('?' * (len(_COLUMNS) + 1))})",
+            (*_row_values(order), json.dumps(order, ensure_ascii=False)),
+        )
+        return cursor.lastrowid
+
+    def insert(self, order: dict[str, Any]) -> int:
+        """
+        追加一条订单，返回 seq
+        """
+        with self._lock:
+            self._check_cache()
+            seq = self._insert(order)
+            client_order_id = _index_value(order.get("clientOrderId"))
+            entries = self._cache.get(client_order_id)
+            if entries is not None:
+                self._cache_put(client_order_id, [*entries, (seq, dict(order))])
+            elif client_order_id is not None:
+                # 新订单的幂等检查和后续状态更新大多紧接着发生
+                self._cache_put(client_order_id, [(seq, dict(order))])
+            return seq
+
+    def update(self, seq: int, order: dict[str, Any]):
+        """
+        覆盖 seq 对应的订单
+        """
+        with self._lock:
+            self._check_cache()
+            row = self._conn.execute(
+                "SELECT client_order_id FROM orders WHERE seq = ?", (seq,)
+            ).fetchone()
+            old_id = row[0] if row else None
+            self._conn.execute(
+                f"UPDATE orders SET {', '.join(f'{c} = ?' for c in _COLUMNS)}, data = ? "
+                "WHERE seq = ?",
+                (*_row_values(order), json.dumps(order, ensure_ascii=False), seq),
+            )
+            new_id = _index_value(order.get("clientOrderId"))
+            entries = self._cache.get(new_id)
+            if old_id == new_id and entries is not None:
+                self._cache[new_id] = [(s, dict(order) if s == seq else o) for s, o in entries]
+            else:
+                # clientOrderId 被改写：两个 ID 的缓存都作废
+                self._cache.pop(old_id, None)
+                self._cache.pop(new_id, None)
+
+    def replace_all(self, orders: list[Any]):
+        """
+        用给定列表整体替换账本（对应旧的整文件保存）
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM orders")
+                for order in orders:
+                    self._insert(order)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.clear()
+
+    @staticmethod
+    def _read_json_orders(json_path: str) -> list[Any] | None:
+        """
+        读取旧 JSON 账本；文件不存在时返回空列表，读取失败或格式错误时返回 None
+        """
+        if not os.path.exists(json_path):
+            return []
+        try:
+            with open(json_path, encoding="utf-8") as f:
+                orders = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取旧订单账本失败 {json_path}: {e}")
+            return None
+        if not isinstance(orders, list):
+            logger.error(f"旧订单账本格式错误，应为列表: {json_path}")
+            return None
+        return orders
+
+    def _mark_imported(self, json_path: str, count: int):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            ("imported_from", json.dumps({"path": json_path, "count": count})),
+        )
+
+    def _import_legacy_once(self, json_path: str) -> int:
+        """
+        尚未记录导入标记时导入旧 JSON 账本
+
+        标记检查、读取与写入在同一个 BEGIN IMMEDIATE 事务中：并发启动的其他进程在此等待，
+        提交后看到标记直接跳过。数据库中已有订单（未经导入写入）时只记录标记、不导入。
+        读取失败时不记录标记，下次启动重试。
+
+        Returns:
+            导入的订单数
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                marker = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'imported_from'"
+                ).fetchone()
+                if marker is not None:
+                    self._conn.execute("COMMIT")
+                    return 0
+                has_orders = self._conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone()
+                orders = [] if has_orders else self._read_json_orders(json_path)
+                if orders is None:
+                    self._conn.execute("COMMIT")
+                    return 0
+                for order in orders:
+                    self._insert(order)
+                self._mark_imported(json_path, len(orders))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.clear()
+        if orders:
+            logger.info(f"已从 {json_path} 导入 {len(orders)} 条订单到 {self.db_path}")
+        return len(orders)
+
+    def import_json(self, json_path: str) -> int:
+        """
+        在一个事务中导入 JSON 账本（列表中的每一项原样保存，顺序不变），并记录导入标记
+
+        Returns:
+            导入的订单数
+        """
+        orders = self._read_json_orders(json_path)
+        if not orders:
+            return 0
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for order in orders:
+                    self._insert(order)
+                self._mark_imported(json_path, len(orders))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.clear()
+        logger.info(f"已从 {json_path} 导入 {len(orders)} 条订单到 {self.db_path}")
+        return len(orders)
+
+    def export_json(self, json_path: str):
+        """
+        导出为旧格式的 JSON 账本
+        """
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.all_orders(), f, indent=2)
+
+    def close(self):
+        """
+        关闭数据库连接
+        """
+        with self._lock:
+            self._conn.close()
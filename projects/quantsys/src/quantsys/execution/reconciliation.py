@@ -9,6 +9,7 @@ identifying discrepancies and generating actionable reports.
 
 from __future__ import annotations
 
+import inspect
 from dataclasses import dataclass
 from enum import Enum
 from typing import Any
@@ -311,6 +312,31 @@ class ExchangeStandardizer:
         return sorted(standardized, key=lambda x: x.timestamp, reverse=True)
 
 
+# Fields compared per entity; an entity's content key covers exactly these, so an
+# unchanged key on both sides means an unchanged diff result
+_POSITION_FIELDS = ("side", "size", "entry_price")
+_ORDER_FIELDS = ("symbol", "side", "type", "price", "amount", "status")
+_FILL_FIELDS = ("symbol", "side", "price", "amount", "order_id")
+_KEY_FIELDS = {"POSITION": _POSITION_FIELDS, "ORDER": _ORDER_FIELDS, "FILL": _FILL_FIELDS}
+
+
+def order_key(order: Order) -> str:
+    """Order identity used for matching: client order id if available, otherwise id."""
+    return order.client_order_id if order.client_order_id else order.id
+
+
+def content_key(category: str, entity: Any) -> tuple | None:
+    """
+    Content key of an entity: the tuple of its compared fields (None when absent).
+
+    The tuple itself is stored and compared by equality rather than reduced through
+    hash(), whose collisions (e.g. hash(-1.0) == hash(-2.0)) would hide a change.
+    """
+    if entity is None:
+        return None
+    return tuple(getattr(entity, field) for field in _KEY_FIELDS[category])
+
+
 class ReconciliationEngine:
     """Engine for reconciling exchange state with local state."""
 
@@ -353,88 +379,138 @@ class ReconciliationEngine:
 
         return diffs
 
-    def reconcile_positions(
-        self, exchange_positions: list[Position], local_positions: list[Position]
+    def diff_position(
+        self, symbol: str, exchange_pos: Position | None, local_pos: Position | None
     ) -> list[ReconciliationDiff]:
-        """Reconcile position information."""
+        """Compare one position between exchange and local state."""
+        if exchange_pos is None or local_pos is None:
+            if exchange_pos is None and local_pos is None:
+                return []
+            # Position exists on only one side
+            return [
+                ReconciliationDiff(
+                    category="POSITION",
+                    key=symbol,
+                    exchange_value=exchange_pos,
+                    local_value=local_pos,
+                    field="existence",
+                )
+            ]
+
         diffs = []
         size_threshold = self.config.position_threshold
         price_threshold = self.config.price_threshold
 
-        # Create position maps for easy comparison
-        exchange_pos_map = {pos.symbol: pos for pos in exchange_positions}
-        local_pos_map = {pos.symbol: pos for pos in local_positions}
+        # Check side
+        if exchange_pos.side != local_pos.side:
+            diffs.append(
+                ReconciliationDiff(
+                    category="POSITION",
+                    key=symbol,
+                    exchange_value=exchange_pos.side,
+                    local_value=local_pos.side,
+                    field="side",
+                )
+            )
 
-        # Check all positions from exchange
-        for symbol, exchange_pos in exchange_pos_map.items():
-            if symbol not in local_pos_map:
-                # Position exists on exchange but not locally
+        # Check size
+        if abs(exchange_pos.size - local_pos.size) > size_threshold:
+            diffs.append(
+                ReconciliationDiff(
+                    category="POSITION",
+                    key=symbol,
+                    exchange_value=exchange_pos.size,
+                    local_value=local_pos.size,
+                    field="size",
+                    threshold=size_threshold,
+                )
+            )
+
+        # Check entry price (allow small percentage difference)
+        if exchange_pos.entry_price > 0 and local_pos.entry_price > 0:
+            price_diff = (
+                abs(exchange_pos.entry_price - local_pos.entry_price) / exchange_pos.entry_price
+            )
+            if price_diff > price_threshold:
                 diffs.append(
                     ReconciliationDiff(
                         category="POSITION",
                         key=symbol,
-                        exchange_value=exchange_pos,
-                        local_value=None,
-                        field="existence",
+                        exchange_value=exchange_pos.entry_price,
+                        local_value=local_pos.entry_price,
+                        field="entry_price",
+                        threshold=price_threshold,
                     )
                 )
-            else:
-                # Compare position details
-                local_pos = local_pos_map[symbol]
 
-                # Check side
-                if exchange_pos.side != local_pos.side:
-                    diffs.append(
-                        ReconciliationDiff(
-                            category="POSITION",
-                            key=symbol,
-                            exchange_value=exchange_pos.side,
-                            local_value=local_pos.side,
-                            field="side",
-                        )
-                    )
+        return diffs
 
-                # Check size
-                if abs(exchange_pos.size - local_pos.size) > size_threshold:
-                    diffs.append(
-                        ReconciliationDiff(
-                            category="POSITION",
-                            key=symbol,
-                            exchange_value=exchange_pos.size,
-                            local_value=local_pos.size,
-                            field="size",
-                            threshold=size_threshold,
-                        )
-                    )
+    def reconcile_positions(
+        self, exchange_positions: list[Position], local_positions: list[Position]
+    ) -> list[ReconciliationDiff]:
+        """Reconcile position information."""
+        diffs = []
 
-                # Check entry price (allow small percentage difference)
-                if exchange_pos.entry_price > 0 and local_pos.entry_price > 0:
-                    price_diff = (
-                        abs(exchange_pos.entry_price - local_pos.entry_price)
-                        / exchange_pos.entry_price
-                    )
-                    if price_diff > price_threshold:
-                        diffs.append(
-                            ReconciliationDiff(
-                                category="POSITION",
-                                key=symbol,
-                                exchange_value=exchange_pos.entry_price,
-                                local_value=local_pos.entry_price,
-                                field="entry_price",
-                                threshold=price_threshold,
-                            )
-                        )
+        # Create position maps for easy comparison
+        exchange_pos_map = {pos.symbol: pos for pos in exchange_positions}
+        local_pos_map = {pos.symbol: pos for pos in local_positions}
+
+        # Check all positions from exchange
+        for symbol, exchange_pos in exchange_pos_map.items():
+            diffs.extend(self.diff_position(symbol, exchange_pos, local_pos_map.get(symbol)))
 
         # Check for positions that exist locally but not on exchange
-        for symbol in local_pos_map:
+        for symbol, local_pos in local_pos_map.items():
             if symbol not in exchange_pos_map:
+                diffs.extend(self.diff_position(symbol, None, local_pos))
+
+        return diffs
+
+    def diff_order(
+        self, key: str, exchange_order: Order | None, local_order: Order | None
+    ) -> list[ReconciliationDiff]:
+        """Compare one order between exchange and local state."""
+        if exchange_order is None or local_order is None:
+            if exchange_order is None and local_order is None:
+                return []
+            # Order exists on only one side
+            return [
+                ReconciliationDiff(
+                    category="ORDER",
+                    key=key,
+                    exchange_value=exchange_order,
+                    local_value=local_order,
+                    field="existence",
+                )
+            ]
+
+        diffs = []
+        # Compare critical fields
+        for field in _ORDER_FIELDS:
+            exchange_val = getattr(exchange_order, field)
+            local_val = getattr(local_order, field)
+
+            if isinstance(exchange_val, float) and isinstance(local_val, float):
+                # Allow small difference for price/amount
+                if abs(exchange_val - local_val) > 0.0001:
+                    diffs.append(
+                        ReconciliationDiff(
+                            category="ORDER",
+                            key=key,
+                            exchange_value=exchange_val,
+                            local_value=local_val,
+                            field=field,
+                            threshold=0.0001,
+                        )
+                    )
+            elif exchange_val != local_val:
                 diffs.append(
                     ReconciliationDiff(
-                        category="POSITION",
-                        key=symbol,
-                        exchange_value=None,
-                        local_value=local_pos_map[symbol],
-                        field="existence",
+                        category="ORDER",
+                        key=key,
+                        exchange_value=exchange_val,
+                        local_value=local_val,
+                        field=field,
                     )
                 )
 
@@ -447,68 +523,51 @@ class ReconciliationEngine:
         diffs = []
 
         # Create order maps (use client_order_id if available, otherwise id)
-        def get_order_key(order: Order) -> str:
-            return order.client_order_id if order.client_order_id else order.id
-
-        exchange_order_map = {get_order_key(order): order for order in exchange_orders}
-        local_order_map = {get_order_key(order): order for order in local_orders}
+        exchange_order_map = {order_key(order): order for order in exchange_orders}
+        local_order_map = {order_key(order): order for order in local_orders}
 
         # Check all orders from exchange
         for key, exchange_order in exchange_order_map.items():
-            if key not in local_order_map:
-                # Order exists on exchange but not locally
-                diffs.append(
-                    ReconciliationDiff(
-                        category="ORDER",
-                        key=key,
-                        exchange_value=exchange_order,
-                        local_value=None,
-                        field="existence",
-                    )
-                )
-            else:
-                # Compare order details
-                local_order = local_order_map[key]
-
-                # Compare critical fields
-                for field in ["symbol", "side", "type", "price", "amount", "status"]:
-                    exchange_val = getattr(exchange_order, field)
-                    local_val = getattr(local_order, field)
-
-                    if isinstance(exchange_val, float) and isinstance(local_val, float):
-                        # Allow small difference for price/amount
-                        if abs(exchange_val - local_val) > 0.0001:
-                            diffs.append(
-                                ReconciliationDiff(
-                                    category="ORDER",
-                                    key=key,
-                                    exchange_value=exchange_val,
-                                    local_value=local_val,
-                                    field=field,
-                                    threshold=0.0001,
-                                )
-                            )
-                    elif exchange_val != local_val:
-                        diffs.append(
-                            ReconciliationDiff(
-                                category="ORDER",
-                                key=key,
-                                exchange_value=exchange_val,
-                                local_value=local_val,
-                                field=field,
-                            )
-                        )
+            diffs.extend(self.diff_order(key, exchange_order, local_order_map.get(key)))
 
         # Check for orders that exist locally but not on exchange
-        for key in local_order_map:
+        for key, local_order in local_order_map.items():
             if key not in exchange_order_map:
+                diffs.extend(self.diff_order(key, None, local_order))
+
+        return diffs
+
+    def diff_fill(
+        self, fill_id: str, exchange_fill: Fill | None, local_fill: Fill | None
+    ) -> list[ReconciliationDiff]:
+        """Compare one fill; fills missing on either side are not drift (may be new)."""
+        if exchange_fill is None or local_fill is None:
+            return []
+
+        diffs = []
+        for field in _FILL_FIELDS:
+            exchange_val = getattr(exchange_fill, field)
+            local_val = getattr(local_fill, field)
+
+            if isinstance(exchange_val, float) and isinstance(local_val, float):
+                if abs(exchange_val - local_val) > 0.0001:
+                    diffs.append(
+                        ReconciliationDiff(
+                            category="FILL",
+                            key=fill_id,
+                            exchange_value=exchange_val,
+                            local_value=local_val,
+                            field=field,
+                        )
+                    )
+            elif exchange_val != local_val:
                 diffs.append(
                     ReconciliationDiff(
-                        category="ORDER",
-                        key=key,
-                        exchange_value=None,
-                        local_value=local_order_map[key],
-                        field="existence",
+                        category="FILL",
+                        key=fill_id,
+                        exchange_value=exchange_val,
+                        local_value=local_val,
+                        field=field,
                     )
                 )
 
@@ -528,43 +587,25 @@ class ReconciliationEngine:
         exchange_fill_map = {fill.id: fill for fill in exchange_fills}
         local_fill_map = {fill.id: fill for fill in local_fills}
 
-        # Check for duplicate fills or missing fills
+        # Fills that exist on exchange but not locally could be new fills, so only
+        # fills present on both sides are compared
         for fill_id, exchange_fill in exchange_fill_map.items():
-            if fill_id not in local_fill_map:
-                # Fill exists on exchange but not locally (could be new fill)
-                continue
-
-            # Compare fill details
-            local_fill = local_fill_map[fill_id]
-
-            for field in ["symbol", "side", "price", "amount", "order_id"]:
-                exchange_val = getattr(exchange_fill, field)
-                local_val = getattr(local_fill, field)
-
-                if isinstance(exchange_val, float) and isinstance(local_val, float):
-                    if abs(exchange_val - local_val) > 0.0001:
-                        diffs.append(
-                            ReconciliationDiff(
-                                category="FILL",
-                                key=fill_id,
-                                exchange_value=exchange_val,
-                                local_value=local_val,
-                                field=field,
-                            )
-                        )
-                elif exchange_val != local_val:
-                    diffs.append(
-                        ReconciliationDiff(
-                            category="FILL",
-                            key=fill_id,
-                            exchange_value=exchange_val,
-                            local_value=local_val,
-                            field=field,
-                        )
-                    )
+            diffs.extend(self.diff_fill(fill_id, exchange_fill, local_fill_map.get(fill_id)))
 
         return diffs
 
+    def diff_entity(
+        self, category: str, key: str, exchange_value: Any, local_value: Any
+    ) -> list[ReconciliationDiff]:
+        """Compare one POSITION/ORDER/FILL entity."""
+        if category == "POSITION":
+            return self.diff_position(key, exchange_value, local_value)
+        if category == "ORDER":
+            return self.diff_order(key, exchange_value, local_value)
+        if category == "FILL":
+            return self.diff_fill(key, exchange_value, local_value)
+        raise ValueError(f"Unknown reconciliation category: {category}")
+
     def generate_recommended_action(
         self, drift_type: DriftType, diff_count: int
     ) -> RecommendedAction:
@@ -583,6 +624,349 @@ class ReconciliationEngine:
         return action_map.get(drift_type, RecommendedAction.BLOCK)
 
 
+class ReconciliationIndex:
+    """
+    Content-indexed reconciliation state for incremental cycles.
+
+    Keeps, per category and entity key, the content keys of the exchange and local
+    sides seen in the previous cycle together with the diffs they produced. An update
+    only re-compares entities whose content changed on either side; the others reuse their
+    cached diffs, so the result equals a full comparison of the same inputs.
+    """
+
+    CATEGORIES = ("POSITION", "ORDER", "FILL")
+
+    def __init__(self, engine: ReconciliationEngine):
+        self.engine = engine
+        self._contents: dict[str, dict[str, tuple[tuple | None, tuple | None]]] = {
+            category: {} for category in self.CATEGORIES
+        }
+        self._diffs: dict[str, dict[str, list[ReconciliationDiff]]] = {
+            category: {} for category in self.CATEGORIES
+        }
+        self.compared = 0
+        self.skipped = 0
+
+    def clear(self):
+        """Forget all content keys and cached diffs."""
+        for category in self.CATEGORIES:
+            self._contents[category].clear()
+            self._diffs[category].clear()
+
+    def update(
+        self, category: str, exchange_map: dict[str, Any], local_map: dict[str, Any]
+    ) -> list[ReconciliationDiff]:
+        """
+        Reconcile the current entities of one category.
+
+        Args:
+            category: POSITION, ORDER or FILL
+            exchange_map: Exchange entities by key
+            local_map: Local entities by key
+
+        Returns:
+            All diffs of the category (re-computed for changed entities, cached otherwise)
+        """
+        contents = self._contents[category]
+        cache = self._diffs[category]
+
+        for key in contents.keys() - exchange_map.keys() - local_map.keys():
+            # Gone from both sides
+            del contents[key]
+            cache.pop(key, None)
+
+        for key in exchange_map.keys() | local_map.keys():
+            exchange_value = exchange_map.get(key)
+            local_value = local_map.get(key)
+            current = (content_key(category, exchange_value), content_key(category, local_value))
+            if contents.get(key) == current:
+                self.skipped += 1
+                continue
+            contents[key] = current
+            self.compared += 1
+            diffs = self.engine.diff_entity(category, key, exchange_value, local_value)
+            if diffs:
+                cache[key] = diffs
+            else:
+                cache.pop(key, None)
+
+        return [diff for diffs in cache.values() for diff in diffs]
+
+
+_CLOSED_ORDER_STATUSES = frozenset(
+    {"CLOSED", "FILLED", "CANCELED", "CANCELLED", "REJECTED", "EXPIRED"}
+)
+
+
+def _accepts_since(func: Any) -> bool:
+    try:
+        return "since" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _recent_fills(fills: list[Fill], limit: int) -> list[Fill]:
+    return sorted(fills, key=lambda fill: fill.timestamp, reverse=True)[:limit]
+
+
+class IncrementalReconciler:
+    """
+    Periodic reconciliation that fetches only exchange deltas between full passes.
+
+    The exchange side is mirrored in memory from the last full snapshot. Incremental
+    cycles advance a fill cursor (newest fill timestamp) and an order cursor (start time
+    of the previous fetch) and fetch only fills/orders changed since then; balance and
+    positions are re-fetched only when new fills or order changes arrived, since the
+    compared fields (size, side, entry price, balances) only move with trading activity.
+    Entities are compared through a ReconciliationIndex, so unchanged ones are skipped.
+
+    A full pass (all four fetches, index rebuilt) runs on the first cycle, every
+    ``full_interval_ms``, after any cycle that reported drift or failed, and whenever
+    the client cannot fetch deltas (``fetch_my_trades(since=...)``). Exchange-side
+    events that are not trades (e.g. an order cancelled on the exchange when the client
+    has no ``fetch_orders(since=...)``, funding, transfers) are caught by the scheduled
+    full pass.
+    """
+
+    def __init__(
+        self,
+        config: ReconciliationConfig,
+        full_interval_ms: int = 300_000,
+        cursor_overlap_ms: int = 1000,
+    ):
+        """
+        Args:
+            config: Reconciliation thresholds
+            full_interval_ms: Maximum time between full passes
+            cursor_overlap_ms: Overlap re-fetched before each cursor (deltas are idempotent)
+        """
+        self.config = config
+        self.engine = ReconciliationEngine(config)
+        self.index = ReconciliationIndex(self.engine)
+        self.full_interval_ms = full_interval_ms
+        self.cursor_overlap_ms = cursor_overlap_ms
+
+        self.exchange_balance: Balance | None = None
+        self.exchange_positions: dict[str, Position] = {}
+        self.exchange_orders: dict[str, Order] = {}
+        self.exchange_fills: dict[str, Fill] = {}
+        self.fill_cursor = 0
+        self.order_cursor = 0
+        self.last_full_ts = 0
+        self.force_full = True
+        self.last_mode = ""
+        self.metrics = {"full": 0, "incremental": 0, "fetches": 0, "failures": 0}
+
+    def needs_full(self, exchange_client: Any, now_ts: int) -> bool:
+        """Whether the next cycle must be a full pass."""
+        return (
+            self.force_full
+            or now_ts - self.last_full_ts >= self.full_interval_ms
+            or not _accepts_since(getattr(exchange_client, "fetch_my_trades", None))
+        )
+
+    def _fetch(self, exchange_client: Any, name: str, default: Any, **kwargs) -> Any:
+        func = getattr(exchange_client, name, None)
+        if func is None:
+            return default
+        self.metrics["fetches"] += 1
+        return func(**kwargs)
+
+    def _apply_orders(self, raw_orders: Any):
+        # Delta orders: open ones are upserted, closed ones are removed from the mirror
+        if isinstance(raw_orders, dict) and raw_orders.get("code") == "0":
+            raw_orders = raw_orders.get("data", [])
+        for raw in raw_orders or []:
+            if not isinstance(raw, dict):
+                continue
+            standardized = self.engine.standardizer.standardize_orders([raw])
+            if standardized and standardized[0].status not in _CLOSED_ORDER_STATUSES:
+                self.exchange_orders[order_key(standardized[0])] = standardized[0]
+            else:
+                key = (
+                    raw.get("clOrdId")
+                    or raw.get("clientOrderId")
+                    or raw.get("ordId")
+                    or raw.get("id", "")
+                )
+                self.exchange_orders.pop(key, None)
+
+    def _apply_fills(self, fills: list[Fill]):
+        for fill in fills:
+            self.exchange_fills[fill.id] = fill
+            self.fill_cursor = max(self.fill_cursor, fill.timestamp)
+        if len(self.exchange_fills) > self.config.max_fills_check:
+            recent = _recent_fills(list(self.exchange_fills.values()), self.config.max_fills_check)
+            self.exchange_fills = {fill.id: fill for fill in recent}
+
+    def _fetch_full(self, exchange_client: Any, now_ts: int):
+        standardizer = self.engine.standardizer
+        balance = standardizer.standardize_balance(
+            self._fetch(exchange_client, "fetch_balance", {})
+        )
+        positions = standardizer.standardize_positions(
+            self._fetch(exchange_client, "fetch_positions", [])
+        )
+        orders = standardizer.standardize_orders(
+            self._fetch(exchange_client, "fetch_open_orders", [])
+        )
+        fills = standardizer.standardize_fills(self._fetch(exchange_client, "fetch_my_trades", []))
+
+        self.exchange_balance = balance
+        self.exchange_positions = {pos.symbol: pos for pos in positions}
+        self.exchange_orders = {order_key(order): order for order in orders}
+        self.exchange_fills = {}
+        self.fill_cursor = 0
+        self._apply_fills(fills)
+        self.order_cursor = now_ts
+        self.index.clear()
+
+    def _fetch_delta(self, exchange_client: Any, now_ts: int):
+        standardizer = self.engine.standardizer
+        fills = standardizer.standardize_fills(
+            self._fetch(
+                exchange_client,
+                "fetch_my_trades",
+                [],
+                since=max(0, self.fill_cursor - self.cursor_overlap_ms),
+            )
+        )
+        # Fills older than the retained window are re-fetched overlap, not new activity
+        floor = (
+            min(fill.timestamp for fill in self.exchange_fills.values())
+            if len(self.exchange_fills) >= self.config.max_fills_check
+            else float("-inf")
+        )
+        new_fills = [
+            fill for fill in fills if fill.id not in self.exchange_fills and fill.timestamp >= floor
+        ]
+        self._apply_fills(fills)
+
+        fetch_orders = getattr(exchange_client, "fetch_orders", None)
+        if fetch_orders is not None and _accepts_since(fetch_orders):
+            raw_orders = self._fetch(
+                exchange_client,
+                "fetch_orders",
+                [],
+                since=max(0, self.order_cursor - self.cursor_overlap_ms),
+            )
+            orders_changed = bool(
+                raw_orders.get("data") if isinstance(raw_orders, dict) else raw_orders
+            )
+            self._apply_orders(raw_orders)
+        else:
+            # No order delta API: the open-order list is the cheapest complete view
+            orders = standardizer.standardize_orders(
+                self._fetch(exchange_client, "fetch_open_orders", [])
+            )
+            current = {order_key(order): order for order in orders}
+            orders_changed = current != self.exchange_orders
+            self.exchange_orders = current
+        self.order_cursor = now_ts
+
+        if new_fills or orders_changed:
+            self.exchange_balance = standardizer.standardize_balance(
+                self._fetch(exchange_client, "fetch_balance", {})
+            )
+            positions = standardizer.standardize_positions(
+                self._fetch(exchange_client, "fetch_positions", [])
+            )
+            self.exchange_positions = {pos.symbol: pos for pos in positions}
+
+    def reconcile(
+        self,
+        exchange_client: Any,
+        local_state: dict[str, Any],
+        symbol_map: dict[str, str],
+        now_ts: int,
+    ) -> ReconciliationReport:
+        """
+        Run one reconciliation cycle (full or incremental).
+
+        Args:
+            exchange_client: Exchange client (fetch_balance/positions/open_orders/my_trades,
+                optionally fetch_orders(since=...))
+            local_state: Local state dictionary (balance, positions, orders, fills)
+            symbol_map: Mapping from local symbols to exchange symbols
+            now_ts: Current timestamp in milliseconds
+
+        Returns:
+            ReconciliationReport: Result of the reconciliation
+        """
+        symbols = list(symbol_map.values())
+        full = self.needs_full(exchange_client, now_ts)
+        self.last_mode = "full" if full else "incremental"
+
+        try:
+            if full:
+                self._fetch_full(exchange_client, now_ts)
+            else:
+                self._fetch_delta(exchange_client, now_ts)
+        except Exception as e:
+            self.force_full = True
+            self.metrics["failures"] += 1
+            return _failure_report(
+                "exchange_fetch_failed",
+                f"Failed to fetch exchange data: {e}",
+                SnapshotMeta(timestamp=now_ts, symbols=[], source="exchange", version="1.0"),
+                SnapshotMeta(timestamp=now_ts, symbols=symbols, source="local"),
+            )
+
+        exchange_symbols = list(
+            set(self.exchange_positions) | {order.symbol for order in self.exchange_orders.values()}
+        )
+        exchange_meta = SnapshotMeta(timestamp=now_ts, symbols=exchange_symbols, source="exchange")
+
+        try:
+            standardizer = self.engine.standardizer
+            local_balance = standardizer.standardize_balance(local_state.get("balance", {}))
+            local_positions = standardizer.standardize_positions(local_state.get("positions", []))
+            local_orders = standardizer.standardize_orders(local_state.get("orders", []))
+            local_fills = standardizer.standardize_fills(local_state.get("fills", []))
+        except Exception as e:
+            self.force_full = True
+            self.metrics["failures"] += 1
+            return _failure_report(
+                "local_data_invalid",
+                f"Invalid local state: {e}",
+                exchange_meta,
+                SnapshotMeta(timestamp=now_ts, symbols=[], source="local", version="1.0"),
+            )
+        local_meta = SnapshotMeta(timestamp=now_ts, symbols=symbols, source="local")
+
+        balance_diffs = self.engine.reconcile_balance(self.exchange_balance, local_balance)
+        position_diffs = self.index.update(
+            "POSITION", self.exchange_positions, {pos.symbol: pos for pos in local_positions}
+        )
+        order_diffs = self.index.update(
+            "ORDER", self.exchange_orders, {order_key(order): order for order in local_orders}
+        )
+        limit = self.config.max_fills_check
+        fill_diffs = self.index.update(
+            "FILL",
+            {fill.id: fill for fill in _recent_fills(list(self.exchange_fills.values()), limit)},
+            {fill.id: fill for fill in local_fills[:limit]},
+        )
+
+        report = _build_report(
+            self.engine,
+            balance_diffs,
+            position_diffs,
+            order_diffs,
+            fill_diffs,
+            exchange_meta,
+            local_meta,
+        )
+        if full:
+            self.last_full_ts = now_ts
+            self.metrics["full"] += 1
+        else:
+            self.metrics["incremental"] += 1
+        # Confirm drift against a fresh full snapshot on the next cycle
+        self.force_full = not report.ok
+        return report
+
+
 class OrderReconciliation:
     """
     订单对账类
@@ -874,7 +1258,6 @@ def reconcile(
     )
 
     engine = ReconciliationEngine(recon_config)
-    all_diffs = []
 
     # Get symbols to reconcile
     symbols = list(symbol_map.values())
@@ -966,12 +1349,47 @@ def reconcile(
     order_diffs = engine.reconcile_orders(exchange_orders, local_orders)
     fill_diffs = engine.reconcile_fills(exchange_fills, local_fills)
 
-    all_diffs.extend(balance_diffs)
-    all_diffs.extend(position_diffs)
-    all_diffs.extend(order_diffs)
-    all_diffs.extend(fill_diffs)
+    # 4-7. Determine drift type, recommended action and summary
+    return _build_report(
+        engine, balance_diffs, position_diffs, order_diffs, fill_diffs, exchange_meta, local_meta
+    )
+
+
+def _failure_report(
+    key: str, summary: str, exchange_meta: SnapshotMeta, local_meta: SnapshotMeta
+) -> ReconciliationReport:
+    return ReconciliationReport(
+        ok=False,
+        drift_type=DriftType.UNKNOWN,
+        diffs=[
+            ReconciliationDiff(
+                category="UNKNOWN",
+                key=key,
+                exchange_value=None,
+                local_value=None,
+                field="error",
+                threshold=None,
+            )
+        ],
+        exchange_snapshot_meta=exchange_meta,
+        local_snapshot_meta=local_meta,
+        recommended_action=RecommendedAction.BLOCK,
+        summary=summary,
+    )
+
+
+def _build_report(
+    engine: ReconciliationEngine,
+    balance_diffs: list[ReconciliationDiff],
+    position_diffs: list[ReconciliationDiff],
+    order_diffs: list[ReconciliationDiff],
+    fill_diffs: list[ReconciliationDiff],
+    exchange_meta: SnapshotMeta,
+    local_meta: SnapshotMeta,
+) -> ReconciliationReport:
+    all_diffs = balance_diffs + position_diffs + order_diffs + fill_diffs
 
-    # 4. Determine drift type
+    # Determine drift type
     drift_type = DriftType.UNKNOWN
     if balance_diffs:
         drift_type = DriftType.BALANCE
@@ -982,16 +1400,15 @@ def reconcile(
     elif fill_diffs:
         drift_type = DriftType.FILL
 
-    # 5. Generate recommended action
+    # Generate recommended action
     ok = len(all_diffs) == 0
     recommended_action = engine.generate_recommended_action(drift_type, len(all_diffs))
 
-    # 6. Create summary
+    # Create summary
     summary = f"Reconciliation {'PASSED' if ok else 'FAILED'}: {len(all_diffs)} differences found"
     if not ok:
         summary += f" (Type: {drift_type.value})"
 
-    # 7. Create and return report
     return ReconciliationReport(
         ok=ok,
         drift_type=drift_type,
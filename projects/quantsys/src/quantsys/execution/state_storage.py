@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 """
 统一状态存储接口
-提供统一的状态存储接口，支持数据库和文件两种存储方式
+提供统一的状态存储接口，支持文件、WAL（内存状态 + 预写日志）和数据库（SQLite）三种存储方式
 """
 
+import copy
 import json
 import logging
+import sqlite3
+import threading
 from abc import ABC, abstractmethod
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+from .ledger_log import SegmentLog
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -168,69 +178,376 @@ class FileStateStorage(StateStorage):
         return self._read_json(self.portfolio_file)
 
 
+def _order_id(order: dict[str, Any]) -> str | None:
+    return order.get("order_id") or order.get("clOrdId") or order.get("ordId")
+
+
+def _detach(value: Any) -> Any:
+    """按 JSON 语义复制（与文件存储读回的结果一致，且与调用方对象解耦）"""
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+class WalStateStorage(StateStorage):
+    """
+    WAL状态存储实现
+    状态常驻内存，每次修改追加一条预写日志（组提交批量fsync），
+    定期原子写入快照并删除已被快照覆盖的日志分段；启动时从最近快照恢复再重放日志。
+    同一目录只允许一个写入方（文件锁），其他进程可只读打开。
+    """
+
+    def __init__(
+        self,
+        storage_dir: str = "data/state",
+        sync: str = "group",
+        group_commit_interval: float = 0.05,
+        snapshot_every: int = 10000,
+        segment_max_bytes: int = 16 * 1024 * 1024,
+        read_only: bool = False,
+    ):
+        """
+        初始化WAL状态存储
+
+        Args:
+            storage_dir: 存储目录（日志与快照位于其下的 wal 子目录）
+            sync: 日志fsync策略，group / always / none
+            group_commit_interval: 组提交间隔（秒）
+            snapshot_every: 每多少次修改写一次快照（0 表示只在关闭时写）
+            segment_max_bytes: 单个日志分段的最大字节数
+            read_only: 只读打开，不加写锁、不写日志
+        """
+        self.storage_dir = Path(storage_dir)
+        self.snapshot_every = snapshot_every
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        self._orders: dict[str, dict[str, Any]] = {}
+        self._positions: dict[str, dict[str, Any]] = {}
+        self._portfolio: dict[str, Any] = {}
+        self._dirty = 0
+        self._lock_file = None
+
+        if not read_only:
+            self.storage_dir.mkdir(parents=True, exist_ok=True)
+            self._acquire_writer_lock()
+        self._log = SegmentLog(
+            str(self.storage_dir / "wal"),
+            segment_max_bytes=segment_max_bytes,
+            sync=sync,
+            group_commit_interval=group_commit_interval,
+            read_only=read_only,
+        )
+        self._recover()
+
+        logger.info(
+            f"WalStateStorage initialized: {self.storage_dir} "
+            f"(orders={len(self._orders)}, positions={len(self._positions)}, "
+            f"seq={self._log.last_seq})"
+        )
+
+    def _acquire_writer_lock(self):
+        """获取写锁，保证同一目录只有一个写入方"""
+        if fcntl is None:
+            return
+        self._lock_file = open(self.storage_dir / "wal.lock", "w")  # noqa: SIM115
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(
+                f"State storage is locked by another writer: {self.storage_dir}"
+            ) from e
+
+    def _recover(self):
+        """从最近快照恢复状态，再重放快照之后的日志"""
+        attempts = 3 if self.read_only else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                self._recover_once()
+                return
+            except FileNotFoundError as e:
+                # 只读方与写入方并发：快照之后的分段被 prune 删除，刷新末尾后从更新的快照重来
+                if attempt == attempts:
+                    raise
+                logger.warning(f"WAL segment pruned during recovery, retrying: {e}")
+                self._log.refresh()
+
+    def _recover_once(self):
+        self._orders, self._positions, self._portfolio = {}, {}, {}
+        self._dirty = 0
+        snapshot = self._log.latest_snapshot()
+        after_seq = 0
+        if snapshot is not None:
+            state = snapshot["state"]
+            self._orders = state["orders"]
+            self._positions = state["positions"]
+            self._portfolio = state["portfolio"]
+            after_seq = snapshot["seq"]
+        elif self._log.last_seq == 0:
+            self._import_files()
+
+        for record in self._log.read(after_seq):
+            self._apply(record)
+            self._dirty += 1
+
+    def _import_files(self):
+        """
+        日志为空时导入文件存储留下的 orders/positions/portfolio.json
+
+        只读打开时只加载到内存，快照留给写入方在首次打开时写入。
+        """
+        imported = False
+        for name, attr in (
+            ("orders.json", "_orders"),
+            ("positions.json", "_positions"),
+            ("portfolio.json", "_portfolio"),
+        ):
+            path = self.storage_dir / name
+            if not path.exists():
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    setattr(self, attr, json.load(f))
+                imported = True
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Failed to import {path}: {e}")
+        if imported and not self.read_only:
+            self._log.write_snapshot(self._state())
+            logger.info(f"Imported file state storage from {self.storage_dir}")
+
+    def _state(self) -> dict[str, Any]:
+        return {"orders": self._orders, "positions": self._positions, "portfolio": self._portfolio}
+
+    def _apply(self, record: dict[str, Any]):
+        """把一条日志记录应用到内存状态"""
+        op = record["op"]
+        if op == "save_order":
+            self._orders[record["order_id"]] = record["order"]
+        elif op == "update_order":
+            order = self._orders.get(record["order_id"])
+            if order is not None:
+                order.update(record["updates"])
+        elif op == "save_position":
+            self._positions[record["symbol"]] = record["position"]
+        elif op == "save_portfolio":
+            self._portfolio = record["portfolio"]
+        else:
+            logger.warning(f"Unknown WAL record op: {op}")
+
+    def _write(self, record: dict[str, Any]):
+        """先写日志再修改内存状态，调用方持有锁"""
+        if self.read_only:
+            raise ValueError("State storage is opened read-only")
+        self._log.append(record)
+        self._apply(record)
+        self._dirty += 1
+        if self.snapshot_every and self._dirty >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self) -> str:
+        """立即写入状态快照，并删除已被保留快照覆盖的日志分段"""
+        with self._lock:
+            path = self._log.write_snapshot(self._state())
+            self._dirty = 0
+            snapshot_seqs = self._log.snapshot_seqs()
+            if snapshot_seqs:
+                self._log.prune(snapshot_seqs[0])
+            return path
+
+    def flush(self):
+        """提交（fsync）所有已写入的日志"""
+        if not self.read_only:
+            self._log.commit()
+
+    def close(self):
+        """写入快照并关闭日志、释放写锁"""
+        with self._lock:
+            if not self.read_only and self._dirty:
+                self.snapshot()
+            self._log.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def save_order(self, order: dict[str, Any]) -> bool:
+        """保存订单"""
+        order_id = _order_id(order)
+        if not order_id:
+            return False
+        with self._lock:
+            self._write({"op": "save_order", "order_id": order_id, "order": _detach(order)})
+        return True
+
+    def get_order(self, order_id: str) -> dict[str, Any] | None:
+        """获取订单"""
+        with self._lock:
+            return copy.deepcopy(self._orders.get(order_id))
+
+    def update_order(self, order_id: str, updates: dict[str, Any]) -> bool:
+        """更新订单"""
+        with self._lock:
+            if order_id not in self._orders:
+                return False
+            updates = {**_detach(updates), "updated_at": datetime.now().isoformat()}
+            self._write({"op": "update_order", "order_id": order_id, "updates": updates})
+        return True
+
+    def save_position(self, symbol: str, position: dict[str, Any]) -> bool:
+        """保存持仓"""
+        with self._lock:
+            self._write({"op": "save_position", "symbol": symbol, "position": _detach(position)})
+        return True
+
+    def get_position(self, symbol: str) -> dict[str, Any] | None:
+        """获取持仓"""
+        with self._lock:
+            return copy.deepcopy(self._positions.get(symbol))
+
+    def get_all_positions(self) -> dict[str, dict[str, Any]]:
+        """获取所有持仓"""
+        with self._lock:
+            return copy.deepcopy(self._positions)
+
+    def save_portfolio(self, portfolio: dict[str, Any]) -> bool:
+        """保存组合状态"""
+        with self._lock:
+            self._write({"op": "save_portfolio", "portfolio": _detach(portfolio)})
+        return True
+
+    def get_portfolio(self) -> dict[str, Any] | None:
+        """获取组合状态"""
+        with self._lock:
+            return copy.deepcopy(self._portfolio)
+
+
 class DatabaseStateStorage(StateStorage):
     """
     数据库状态存储实现
-    使用数据库存储状态（用于生产环境）
+    使用SQLite存储状态（用于生产环境）；每条记录一行JSON，
+    SQL为固定的参数化语句，由连接的语句缓存复用编译结果
     """
 
-    def __init__(self, db_connection: Any):
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS state_orders (
+        order_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS state_positions (
+        symbol TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS state_portfolio (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        data TEXT NOT NULL
+    );
+    """
+    _UPSERT_ORDER = "INSERT OR REPLACE INTO state_orders (order_id, data) VALUES (?, ?)"
+    _SELECT_ORDER = "SELECT data FROM state_orders WHERE order_id = ?"
+    _UPDATE_ORDER = "UPDATE state_orders SET data = ? WHERE order_id = ?"
+    _UPSERT_POSITION = "INSERT OR REPLACE INTO state_positions (symbol, data) VALUES (?, ?)"
+    _SELECT_POSITION = "SELECT data FROM state_positions WHERE symbol = ?"
+    _SELECT_POSITIONS = "SELECT symbol, data FROM state_positions"
+    _UPSERT_PORTFOLIO = "INSERT OR REPLACE INTO state_portfolio (id, data) VALUES (1, ?)"
+    _SELECT_PORTFOLIO = "SELECT data FROM state_portfolio WHERE id = 1"
+
+    def __init__(self, db_connection: sqlite3.Connection | str):
         """
         初始化数据库状态存储
 
         Args:
-            db_connection: 数据库连接对象
+            db_connection: SQLite连接对象或数据库文件路径
         """
+        if isinstance(db_connection, (str, Path)):
+            Path(db_connection).parent.mkdir(parents=True, exist_ok=True)
+            db_connection = sqlite3.connect(
+                str(db_connection), check_same_thread=False, isolation_level=None
+            )
+            db_connection.execute("PRAGMA journal_mode=WAL")
+            db_connection.execute("PRAGMA synchronous=NORMAL")
         self.db = db_connection
+        self._lock = threading.RLock()
+        self.db.executescript(self._SCHEMA)
         logger.info("DatabaseStateStorage initialized")
 
+    def _execute(self, sql: str, params: tuple = ()):
+        """在一个事务中执行写语句"""
+        with self._lock:
+            try:
+                with self.db:
+                    self.db.execute(sql, params)
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"DatabaseStateStorage write failed: {e}")
+                return False
+
+    def _fetch_json(self, sql: str, params: tuple = ()) -> Any:
+        with self._lock:
+            row = self.db.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
     def save_order(self, order: dict[str, Any]) -> bool:
         """保存订单到数据库"""
-        # TODO: 实现数据库保存逻辑
-        logger.warning("DatabaseStateStorage.save_order not implemented")
-        return False
+        order_id = _order_id(order)
+        if not order_id:
+            return False
+        return self._execute(self._UPSERT_ORDER, (order_id, json.dumps(order, ensure_ascii=False)))
 
     def get_order(self, order_id: str) -> dict[str, Any] | None:
         """从数据库获取订单"""
-        # TODO: 实现数据库查询逻辑
-        logger.warning("DatabaseStateStorage.get_order not implemented")
-        return None
+        return self._fetch_json(self._SELECT_ORDER, (order_id,))
 
     def update_order(self, order_id: str, updates: dict[str, Any]) -> bool:
-        """更新数据库中的订单"""
-        # TODO: 实现数据库更新逻辑
-        logger.warning("DatabaseStateStorage.update_order not implemented")
-        return False
+        """更新数据库中的订单（读-改-写在同一个写事务中）"""
+        with self._lock:
+            try:
+                # 显式 BEGIN IMMEDIATE，防止其他写入方在读与写之间修改同一订单
+                self.db.execute("BEGIN IMMEDIATE")
+                row = self.db.execute(self._SELECT_ORDER, (order_id,)).fetchone()
+                if row is None:
+                    self.db.execute("ROLLBACK")
+                    return False
+                order = json.loads(row[0])
+                order.update(updates)
+                order["updated_at"] = datetime.now().isoformat()
+                self.db.execute(
+                    self._UPDATE_ORDER, (json.dumps(order, ensure_ascii=False), order_id)
+                )
+                self.db.execute("COMMIT")
+                return True
+            except sqlite3.Error as e:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                logger.error(f"DatabaseStateStorage update_order failed: {e}")
+                return False
 
     def save_position(self, symbol: str, position: dict[str, Any]) -> bool:
         """保存持仓到数据库"""
-        # TODO: 实现数据库保存逻辑
-        logger.warning("DatabaseStateStorage.save_position not implemented")
-        return False
+        return self._execute(
+            self._UPSERT_POSITION, (symbol, json.dumps(position, ensure_ascii=False))
+        )
 
     def get_position(self, symbol: str) -> dict[str, Any] | None:
         """从数据库获取持仓"""
-        # TODO: 实现数据库查询逻辑
-        logger.warning("DatabaseStateStorage.get_position not implemented")
-        return None
+        return self._fetch_json(self._SELECT_POSITION, (symbol,))
 
     def get_all_positions(self) -> dict[str, dict[str, Any]]:
         """从数据库获取所有持仓"""
-        # TODO: 实现数据库查询逻辑
-        logger.warning("DatabaseStateStorage.get_all_positions not implemented")
-        return {}
+        with self._lock:
+            rows = self.db.execute(self._SELECT_POSITIONS).fetchall()
+        return {symbol: json.loads(data) for symbol, data in rows}
 
     def save_portfolio(self, portfolio: dict[str, Any]) -> bool:
         """保存组合状态到数据库"""
-        # TODO: 实现数据库保存逻辑
-        logger.warning("DatabaseStateStorage.save_portfolio not implemented")
-        return False
+        return self._execute(self._UPSERT_PORTFOLIO, (json.dumps(portfolio, ensure_ascii=False),))
 
     def get_portfolio(self) -> dict[str, Any] | None:
         """从数据库获取组合状态"""
-        # TODO: 实现数据库查询逻辑
-        logger.warning("DatabaseStateStorage.get_portfolio not implemented")
-        return None
+        portfolio = self._fetch_json(self._SELECT_PORTFOLIO)
+        return {} if portfolio is None else portfolio
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.db.close()
 
 
 class StateStorageFactory:
@@ -245,8 +562,11 @@ class StateStorageFactory:
         创建状态存储实例
 
         Args:
-            storage_type: 存储类型，"file" 或 "database"
+            storage_type: 存储类型，"file"、"wal" 或 "database"
             **kwargs: 其他参数
+                file: storage_dir
+                wal: storage_dir、sync、snapshot_every、read_only
+                database: db_connection（SQLite连接）或 db_path
 
         Returns:
             StateStorage: 状态存储实例
@@ -254,10 +574,17 @@ class StateStorageFactory:
         if storage_type == "file":
             storage_dir = kwargs.get("storage_dir", "data/state")
             return FileStateStorage(storage_dir)
+        elif storage_type == "wal":
+            return WalStateStorage(
+                kwargs.get("storage_dir", "data/state"),
+                sync=kwargs.get("sync", "group"),
+                snapshot_every=kwargs.get("snapshot_every", 10000),
+                read_only=kwargs.get("read_only", False),
+            )
         elif storage_type == "database":
-            db_connection = kwargs.get("db_connection")
+            db_connection = kwargs.get("db_connection") or kwargs.get("db_path")
             if not db_connection:
-                raise ValueError("Database storage requires db_connection parameter")
+                raise ValueError("Database storage requires db_connection or db_path parameter")
             return DatabaseStateStorage(db_connection)
         else:
             raise ValueError(f"Unknown storage type: {storage_type}")
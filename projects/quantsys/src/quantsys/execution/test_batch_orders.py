@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+批量下单测试
+覆盖分拆订单按速率额度分波、按 batch_size 合并批量请求、
+失败子订单沿用同一 clientOrderId 重试、批量响应逐笔更新订单账本（ACK/REJECTED）
+以及适配器按 BATCH_ORDER_LIMIT 分块
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.exchange_adapter import BATCH_ORDER_LIMIT, OKXAdapter
+from quantsys.execution.order_executor import OrderExecutor
+from quantsys.execution.order_ids import ACTIVE_ORDER_STATUSES
+from quantsys.execution.order_splitter import OrderSplitter
+
+
+class FakeRateLimiter:
+    """
+    按脚本给出每一波的下单额度，之后不限
+    """
+
+    def __init__(self, grants=()):
+        self.grants = list(grants)
+        self.requests = []
+
+    def configure(self, name, capacity, interval, replace=True):
+        pass
+
+    def acquire_available(self, key, count):
+        self.requests.append(count)
+        granted = min(count, self.grants.pop(0)) if self.grants else count
+        return granted, 0.0 if granted else 0.01
+
+
+class FakeExecutor:
+    """
+    记录每个请求发送的 clientOrderId
+    fail_once 中的订单第一次失败，always_fail 中的订单一直失败
+    """
+
+    def __init__(self, fail_once=(), always_fail=()):
+        self.fail_once = set(fail_once)
+        self.always_fail = set(always_fail)
+        self.requests = []
+        self.attempts = {}
+
+    def _result(self, params):
+        client_order_id = params["clOrdId"]
+        attempt = self.attempts[client_order_id] = self.attempts.get(client_order_id, 0) + 1
+        if client_order_id in self.always_fail or (
+            client_order_id in self.fail_once and attempt == 1
+        ):
+            return {"code": "51000", "msg": "busy", "data": []}
+        return {"code": "0", "msg": "", "data": [{"ordId": f"x-{client_order_id}"}]}
+
+    def place_order(self, symbol, side, order_type, amount, price=None, params=None):
+        self.requests.append([params["clOrdId"]])
+        return self._result(params)
+
+    def execute_orders(self, orders):
+        self.requests.append([order["params"]["clOrdId"] for order in orders])
+        return [self._result(order["params"]) for order in orders]
+
+
+class SingleOrderExecutor:
+    """
+    不支持批量接口的执行器
+    """
+
+    def __init__(self):
+        self.executor = FakeExecutor()
+        self.requests = self.executor.requests
+
+    def place_order(self, *args, **kwargs):
+        return self.executor.place_order(*args, **kwargs)
+
+
+class FakeOrderIds:
+    """
+    内存订单账本，记录每笔订单的状态变化
+    """
+
+    def __init__(self):
+        self.orders = {}
+        self.history = {}
+
+    def generate_client_order_id(self, strategy_id, symbol, side, price, amount):
+        return f"gen-{symbol}-{side}-{amount}"
+
+    def check_order_exists(self, client_order_id):
+        order = self.orders.get(client_order_id)
+        return order is not None and order["status"] in ACTIVE_ORDER_STATUSES
+
+    def get_order_by_client_id(self, client_order_id):
+        return self.orders.get(client_order_id)
+
+    def add_order(self, client_order_id, symbol, side, order_type, amount, price, **fields):
+        self.orders[client_order_id] = {"clientOrderId": client_order_id, "status": "CREATED"}
+        self.history[client_order_id] = ["CREATED"]
+
+    def update_order_status(self, client_order_id, status, exchange_order_id=None):
+        self.orders[client_order_id]["status"] = status
+        if exchange_order_id:
+            self.orders[client_order_id]["exchange_order_id"] = exchange_order_id
+        self.history[client_order_id].append(status)
+        return True
+
+
+class FakeBatchAdapter:
+    """
+    批量下单适配器：rejected 中的订单在批量响应里返回 sCode 错误
+    """
+
+    exchange = "fake"
+
+    def __init__(self, rejected=(), error=None):
+        self.rejected = set(rejected)
+        self.error = error
+        self.batches = []
+
+    def place_orders(self, orders):
+        self.batches.append([order["params"]["clOrdId"] for order in orders])
+        if self.error:
+            raise self.error
+        results = []
+        for order in orders:
+            client_order_id = order["params"]["clOrdId"]
+            if client_order_id in self.rejected:
+                results.append({"code": "51008", "msg": "insufficient balance", "data": []})
+            else:
+                results.append(
+                    {"code": "0", "msg": "", "data": [{"ordId": f"x-{client_order_id}"}]}
+                )
+        return results
+
+
+def _splitter(tmp, grants=(), **config):
+    config = {"max_retries": 3, "retry_interval": 0, "max_concurrency": 1, **config}
+    cwd = os.getcwd()
+    # 分拆器在当前目录下创建 data/idempotency
+    os.chdir(tmp)
+    try:
+        return OrderSplitter(config, rate_limiter=FakeRateLimiter(grants))
+    finally:
+        os.chdir(cwd)
+
+
+def _children(splitter, count=9):
+    return splitter.split_order(
+        "ETH-USDT", "buy", "market", float(count), params={"original_order_id": "o1"}
+    )
+
+
+def _order(client_order_id=None, side="buy", amount=1.0, **params):
+    if client_order_id:
+        params["clOrdId"] = client_order_id
+    return {
+        "symbol": "ETH-USDT",
+        "side": side,
+        "order_type": "limit",
+        "amount": amount,
+        "price": 100.0,
+        "params": params,
+    }
+
+
+def test_split_waves_follow_rate_budget_and_batch_size():
+    with tempfile.TemporaryDirectory() as tmp:
+        splitter = _splitter(tmp, grants=[4, 0, 3], max_single_order_amount=1.0, batch_size=2)
+        children = _children(splitter)
+        assert [c["params"]["clOrdId"] for c in children] == [f"o1-s{i}" for i in range(9)]
+
+        executor = FakeExecutor()
+        result = splitter.execute_split_orders(executor, children)
+
+        # 额度 4 → 0（等待）→ 3 → 剩余 2 笔全部放行；每波内按 batch_size 合并
+        assert splitter.rate_limiter.requests == [9, 5, 5, 2]
+        assert executor.requests == [
+            ["o1-s0", "o1-s1"],
+            ["o1-s2", "o1-s3"],
+            ["o1-s4", "o1-s5"],
+            ["o1-s6"],
+            ["o1-s7", "o1-s8"],
+        ]
+        assert result.status == "success" and result.original_order_id == "o1"
+        assert [o["order_info"]["params"]["clOrdId"] for o in result.split_orders] == [
+            f"o1-s{i}" for i in range(9)
+        ]
+
+
+def test_failed_children_retry_with_same_client_order_id():
+    with tempfile.TemporaryDirectory() as tmp:
+        splitter = _splitter(tmp, max_single_order_amount=1.0, batch_size=4)
+        children = _children(splitter)
+        executor = FakeExecutor(fail_once={"o1-s1", "o1-s6"}, always_fail={"o1-s8"})
+        result = splitter.execute_split_orders(executor, children)
+
+        assert executor.requests[:3] == [
+            ["o1-s0", "o1-s1", "o1-s2", "o1-s3"],
+            ["o1-s4", "o1-s5", "o1-s6", "o1-s7"],
+            ["o1-s8"],
+        ]
+        # 失败的子订单在下一波用同一 clOrdId 重发，交易所据此去重
+        assert executor.requests[3] == ["o1-s1", "o1-s6", "o1-s8"]
+        assert executor.attempts["o1-s1"] == executor.attempts["o1-s6"] == 2
+        assert executor.attempts["o1-s8"] == 3
+        assert all(executor.attempts[f"o1-s{i}"] == 1 for i in (0, 2, 3, 4, 5, 7))
+
+        assert result.status == "partial"
+        statuses = [o["status"] for o in result.split_orders]
+        assert statuses == ["success"] * 8 + ["failed"]
+        assert result.split_orders[8]["failure_reason"] == "超过最大重试次数 3"
+
+
+def test_executor_without_batch_api_sends_single_orders():
+    with tempfile.TemporaryDirectory() as tmp:
+        splitter = _splitter(tmp, grants=[3], max_single_order_amount=1.0, batch_size=4)
+        executor = SingleOrderExecutor()
+        result = splitter.execute_split_orders(executor, _children(splitter, 5))
+        assert executor.requests == [[f"o1-s{i}"] for i in range(5)]
+        assert splitter.rate_limiter.requests == [5, 2]
+        assert result.status == "success"
+
+
+def test_execute_orders_updates_ledger_per_order():
+    order_ids = FakeOrderIds()
+    order_ids.add_order("d", "ETH-USDT", "buy", "limit", 1.0, 100.0)
+    order_ids.update_order_status("d", "ACK", "x-old")
+    adapter = FakeBatchAdapter(rejected={"b"})
+    executor = OrderExecutor(adapter, order_ids)
+
+    orders = [
+        _order("a"),
+        _order("b"),
+        _order("c", side="hold"),
+        _order("d"),
+        _order(amount=2.0, strategy_id="s1"),
+    ]
+    results = executor.execute_orders(orders)
+
+    # 验证失败与已存在的订单不发送，其余合并为一个批量请求
+    assert adapter.batches == [["a", "b", "gen-ETH-USDT-buy-2.0"]]
+    assert [r["code"] for r in results] == ["0", "51008", "1", "0", "0"]
+    assert results[3]["msg"] == "Order already exists"
+    assert results[3]["data"][0]["ordId"] == "x-old"
+
+    assert order_ids.history["a"] == ["CREATED", "SENT", "ACK"]
+    assert order_ids.orders["a"]["exchange_order_id"] == "x-a"
+    assert order_ids.history["b"] == ["CREATED", "SENT", "REJECTED"]
+    assert "exchange_order_id" not in order_ids.orders["b"]
+    assert "c" not in order_ids.orders
+    assert order_ids.history["d"] == ["CREATED", "ACK"]
+    assert order_ids.orders["gen-ETH-USDT-buy-2.0"]["status"] == "ACK"
+    # 调用方的订单参数不被修改
+    assert "clOrdId" not in orders[4]["params"]
+
+
+def test_execute_orders_rejects_whole_batch_on_adapter_error():
+    order_ids = FakeOrderIds()
+    executor = OrderExecutor(FakeBatchAdapter(error=ConnectionError("reset")), order_ids)
+    results = executor.execute_orders([_order("a"), _order("b")])
+    assert all(r["code"] == "1" and "reset" in r["msg"] for r in results)
+    assert order_ids.history["a"] == order_ids.history["b"] == ["CREATED", "SENT", "REJECTED"]
+
+
+def test_adapter_chunks_batches_at_limit():
+    adapter = OKXAdapter("api-key", "secret", "pass", trading_mode="live")
+    requests = []
+
+    def fake_send_request(method, endpoint, body=None, params=None):
+        requests.append((method, endpoint, body))
+        if endpoint.endswith("cancel-batch-orders"):
+            return {"code": "0", "data": [{"ordId": o["ordId"], "sCode": "0"} for o in body]}
+        if len(requests) == 3:
+            # 整个请求失败：该块的每笔都返回同一错误
+            return {"code": "50011", "msg": "too many requests", "data": []}
+        data = [
+            {"clOrdId": o["clOrdId"], "ordId": f"x{o['clOrdId']}", "sCode": "0", "sMsg": ""}
+            for o in body
+        ]
+        data[7] = {"clOrdId": body[7]["clOrdId"], "sCode": "51008", "sMsg": "insufficient"}
+        return {"code": "1", "msg": "partial failure", "data": data}
+
+    adapter._send_request = fake_send_request
+    count = 2 * BATCH_ORDER_LIMIT + 5
+    orders = [_order(f"c{i}") for i in range(count)]
+    orders = [{**order, "params": {"clOrdId": order["params"]["clOrdId"]}} for order in orders]
+    results = adapter.place_orders(orders)
+
+    assert [len(body) for _, _, body in requests] == [BATCH_ORDER_LIMIT, BATCH_ORDER_LIMIT, 5]
+    assert all(method == "POST" for method, _, _ in requests)
+    assert [o["clOrdId"] for _, _, body in requests for o in body] == [
+        f"c{i}" for i in range(count)
+    ]
+    assert len(results) == count
+    for i, result in enumerate(results):
+        if i >= 2 * BATCH_ORDER_LIMIT:
+            assert result["code"] == "50011" and result["data"] == []
+        elif i % BATCH_ORDER_LIMIT == 7:
+            assert result["code"] == "51008" and result["msg"] == "insufficient"
+        else:
+            assert result["code"] == "0" and result["data"][0]["ordId"] == f"xc{i}"
+
+    requests.clear()
+    order_ids = [str(i) for i in range(BATCH_ORDER_LIMIT + 3)]
+    results = adapter.cancel_orders("ETH-USDT", order_ids)
+    assert [len(body) for _, _, body in requests] == [BATCH_ORDER_LIMIT, 3]
+    assert requests[1][2][0] == {"instId": "ETH-USDT", "ordId": str(BATCH_ORDER_LIMIT)}
+    assert [r["data"][0]["ordId"] for r in results] == order_ids
+
+    # 非 live 模式不发送请求，逐笔返回模拟结果
+    requests.clear()
+    adapter.trading_mode = "drill"
+    assert len(adapter.place_orders(orders)) == count
+    assert len(adapter.cancel_orders("ETH-USDT", order_ids)) == len(order_ids)
+    assert requests == []
+
+
+def test_executor_ledger_follows_adapter_batch_response():
+    adapter = OKXAdapter("api-key", "secret", "pass", trading_mode="live")
+
+    def fake_send_request(method, endpoint, body=None, params=None):
+        data = [
+            {"clOrdId": o["clOrdId"], "ordId": f"x{o['clOrdId']}", "sCode": "0"} for o in body
+        ]
+        data[1] = {"clOrdId": body[1]["clOrdId"], "sCode": "51121", "sMsg": "lot size"}
+        return {"code": "1", "msg": "partial failure", "data": data}
+
+    adapter._send_request = fake_send_request
+    order_ids = FakeOrderIds()
+    executor = OrderExecutor(adapter, order_ids)
+    count = BATCH_ORDER_LIMIT + 2
+    executor.execute_orders([_order(f"c{i}") for i in range(count)])
+
+    rejected = {"c1", f"c{BATCH_ORDER_LIMIT + 1}"}
+    for i in range(count):
+        order = order_ids.orders[f"c{i}"]
+        if f"c{i}" in rejected:
+            assert order["status"] == "REJECTED" and "exchange_order_id" not in order
+        else:
+            assert order["status"] == "ACK" and order["exchange_order_id"] == f"xc{i}"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
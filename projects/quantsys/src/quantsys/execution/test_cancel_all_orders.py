@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+全部撤单目标测试
+LIVE 模式下撤单集合 = 交易所未成交订单 ∪ 本地账本未完成订单（按交易所订单ID去重）
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution import order_execution
+from quantsys.execution.order_execution import OrderExecution
+
+
+class LocalOrders:
+    def __init__(self, orders):
+        self.orders = orders
+
+    def get_open_orders(self, symbol=None):
+        return [o for o in self.orders if symbol is None or o["symbol"] == symbol]
+
+
+def _execution(pending, local):
+    execution = OrderExecution.__new__(OrderExecution)
+    execution.get_open_orders = lambda symbol: pending
+    execution.order_id_manager = LocalOrders(local)
+    return execution
+
+
+def _local(client_order_id, exchange_order_id, symbol="ETH-USDT"):
+    return {
+        "clientOrderId": client_order_id,
+        "exchange_order_id": exchange_order_id,
+        "symbol": symbol,
+        "status": "OPEN",
+    }
+
+
+def test_exchange_orders_merged_with_local_orders():
+    pending = {
+        "code": "0",
+        "data": [
+            {"ordId": "x1", "clOrdId": "a", "instId": "ETH-USDT"},
+            # 本地账本缺失的挂单同样撤销
+            {"ordId": "x9", "clOrdId": "", "instId": "ETH-USDT"},
+        ],
+    }
+    local = [_local("a", "x1"), _local("b", "x2"), _local("c", None), _local("d", "x4", "BTC-USDT")]
+
+    targets = _execution(pending, local)._collect_cancel_all_orders("ETH-USDT")
+    assert [t["exchange_order_id"] for t in targets] == ["x1", "x9", "x2"]
+    assert [t["clientOrderId"] for t in targets] == ["a", "", "b"]
+
+
+def test_pending_query_failure_falls_back_to_local_orders():
+    pending = {"code": "50011", "msg": "rate limited", "data": []}
+    targets = _execution(pending, [_local("a", "x1")])._collect_cancel_all_orders("ETH-USDT")
+    assert [t["exchange_order_id"] for t in targets] == ["x1"]
+
+
+def test_pending_query_may_send_requests():
+    # 全部撤单前查询交易所挂单，get_open_orders 须在请求调用方白名单内
+    assert "get_open_orders" in order_execution._ALLOWED_REQUEST_CALLERS
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+HTTP 传输层测试
+覆盖 HmacSigner 与 hmac.new 结果一致、延迟直方图分桶与分位数、同一主机共享传输，
+OrderExecution 与 OKXAdapter 使用同一套签名规则，以及 GET 请求按带查询串的路径签名
+"""
+
+import base64
+import hashlib
+import hmac
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution import exchange_adapter, http_transport, order_execution
+from quantsys.execution.exchange_adapter import OKXAdapter
+from quantsys.execution.http_transport import (
+    HmacSigner,
+    HttpTransport,
+    LatencyHistogram,
+    get_transport,
+    okx_body_str,
+    okx_request_path,
+)
+from quantsys.execution.order_execution import OrderExecution
+
+SECRET = "secret-key"
+TIMESTAMP = "2024-01-02T03:04:05.678Z"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.payload = payload or {"code": "0", "msg": "", "data": []}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, endpoint, headers=None, params=None, data=None, timeout=None):
+        self.requests.append(
+            {"method": method, "path": endpoint, "headers": headers, "params": params, "data": data}
+        )
+        return FakeResponse()
+
+
+class FakeRateLimiter:
+    def acquire(self, key, weight=1, account="", max_wait=None):
+        return 0.0
+
+    def update_from_response(self, key, status_code, headers, account=""):
+        pass
+
+
+def _expected_signature(message, secret=SECRET):
+    digest = hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def _adapter():
+    return OKXAdapter("api-key", SECRET, "pass", base_url="https://www.okx.com")
+
+
+def _execution():
+    execution = OrderExecution.__new__(OrderExecution)
+    execution.api_key = "api-key"
+    execution.passphrase = "pass"
+    execution._signer = HmacSigner(SECRET)
+    return execution
+
+
+def _sent_signature_matches(request):
+    headers = request["headers"]
+    message = headers["OK-ACCESS-TIMESTAMP"] + request["method"] + request["path"]
+    return headers["OK-ACCESS-SIGN"] == _expected_signature(message + (request["data"] or ""))
+
+
+def test_hmac_signer_matches_hmac_new():
+    signer = HmacSigner(SECRET)
+    for message in ("", "GET/api/v5/account/balance", "签名 ✓" * 50, TIMESTAMP * 200):
+        assert signer.sign(message) == _expected_signature(message)
+    # 复制的内部状态不会被上一次签名污染
+    assert signer.sign("a") == signer.sign("a") == _expected_signature("a")
+    assert HmacSigner("other").sign("a") == _expected_signature("a", "other")
+
+    body = '{"instId":"ETH-USDT"}'
+    assert signer.sign_request(TIMESTAMP, "post", "/api/v5/trade/order", body) == (
+        _expected_signature(TIMESTAMP + "POST/api/v5/trade/order" + body)
+    )
+
+
+def test_okx_body_str_is_compact_and_empty_for_get():
+    assert okx_body_str("GET", {"instId": "ETH-USDT"}) == ""
+    assert okx_body_str("get", {"instId": "ETH-USDT"}) == ""
+    assert okx_body_str("POST", None) == ""
+    assert okx_body_str("POST", {}) == ""
+    assert okx_body_str("POST", {"instId": "ETH-USDT", "sz": "1"}) == (
+        '{"instId":"ETH-USDT","sz":"1"}'
+    )
+    assert okx_body_str("POST", [{"ordId": "1"}, {"ordId": "2"}]) == (
+        '[{"ordId":"1"},{"ordId":"2"}]'
+    )
+
+
+def test_clients_sign_requests_identically():
+    originals = exchange_adapter.okx_timestamp, order_execution.okx_timestamp
+    exchange_adapter.okx_timestamp = order_execution.okx_timestamp = lambda: TIMESTAMP
+    try:
+        adapter, execution = _adapter(), _execution()
+        cases = [
+            ("POST", "/api/v5/trade/order", {"instId": "ETH-USDT", "side": "buy"}),
+            ("POST", "/api/v5/trade/cancel-batch-orders", [{"instId": "ETH-USDT", "ordId": "1"}]),
+            ("POST", "/api/v5/trade/cancel-all-after", None),
+            ("GET", "/api/v5/account/balance", None),
+        ]
+        for method, endpoint, body in cases:
+            expected = _expected_signature(
+                TIMESTAMP + method + endpoint + okx_body_str(method, body)
+            )
+            adapter_headers = adapter._sign_request(method, endpoint, body)
+            execution_headers = execution._sign_request(method, endpoint, body)
+            assert adapter_headers["OK-ACCESS-SIGN"] == expected, (method, endpoint)
+            assert execution_headers["OK-ACCESS-SIGN"] == expected, (method, endpoint)
+            assert execution_headers["OK-ACCESS-TIMESTAMP"] == TIMESTAMP
+    finally:
+        exchange_adapter.okx_timestamp, order_execution.okx_timestamp = originals
+
+    timestamp = http_transport.okx_timestamp()
+    assert timestamp.endswith("Z") and len(timestamp) == len(TIMESTAMP)
+
+
+def test_get_requests_sign_query_string():
+    assert okx_request_path("/api/v5/trade/fills") == "/api/v5/trade/fills"
+    assert okx_request_path("/api/v5/trade/fills", {}) == "/api/v5/trade/fills"
+    assert okx_request_path("/api/v5/trade/order", {"instId": "BTC-USD-SWAP", "ordId": "1"}) == (
+        "/api/v5/trade/order?instId=BTC-USD-SWAP&ordId=1"
+    )
+
+    execution = _execution()
+    execution.exchange, execution.trading_mode = "okx", "live"
+    execution.event_log = []
+    execution.retry_metrics = defaultdict(int)
+    execution.max_retries, execution.initial_retry_delay = 0, 0.0
+    execution.rate_limiter, execution.rate_limit_account = FakeRateLimiter(), "acct"
+    execution.rate_limit_max_wait, execution.request_timeout = 1.0, 1.0
+    execution.transport = RecordingTransport()
+    assert execution.fetch_my_trades(since=1_700_000_000_000) == []
+
+    # 签名消息为 timestamp + GET + 带查询串的路径，body 为空；发送的就是签名的路径
+    (request,) = execution.transport.requests
+    assert request["path"] == "/api/v5/trade/fills?limit=100&begin=1700000000000"
+    assert request["params"] is None and request["data"] is None
+    assert _sent_signature_matches(request)
+
+    adapter = _adapter()
+    adapter.trading_mode = "live"
+    adapter.rate_limiter = FakeRateLimiter()
+    adapter.transport = RecordingTransport()
+    adapter.get_order("ETH-USDT", "123")
+    adapter.place_order("ETH-USDT", "buy", "limit", 1.0, 100.0, {"clOrdId": "c1"})
+    get, post = adapter.transport.requests
+    assert get["path"] == "/api/v5/trade/order?instId=ETH-USDT&ordId=123"
+    assert get["params"] is None and get["data"] is None
+    assert post["path"] == "/api/v5/trade/order" and post["data"].startswith('{"instId":')
+    assert _sent_signature_matches(get) and _sent_signature_matches(post)
+
+
+def test_latency_histogram_buckets_and_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) == 0.0
+
+    # 分桶上界为闭区间：正好 1ms 落在 le_1ms
+    for seconds in (0.0005, 0.001, 0.003, 0.003, 0.004, 0.015, 0.080, 0.080, 0.090, 12.0):
+        histogram.record(seconds)
+    histogram.record(0.3, error=True)
+
+    stats = histogram.snapshot()
+    assert stats["count"] == 11 and stats["errors"] == 1
+    assert stats["max_ms"] == 12000.0
+    buckets = stats["buckets"]
+    assert buckets["le_1ms"] == 2 and buckets["le_5ms"] == 3 and buckets["le_20ms"] == 1
+    assert buckets["le_100ms"] == 3 and buckets["le_500ms"] == 1 and buckets["inf"] == 1
+    assert sum(buckets.values()) == 11
+
+    # 分位数返回所在分桶的上界，最后一个桶返回最大值
+    assert histogram.percentile(0.1) == 1
+    assert stats["p50_ms"] == 20
+    assert stats["p90_ms"] == 500
+    assert stats["p99_ms"] == 12000.0
+    assert abs(stats["mean_ms"] - histogram.total_ms / 11) < 1e-12
+
+    # 全部落在首个分桶时不超过实际最大值
+    small = LatencyHistogram()
+    small.record(0.0002)
+    assert small.percentile(0.99) == 0.2
+
+
+def test_same_host_shares_transport():
+    http_transport.close_transports()
+    try:
+        adapter = _adapter()
+        execution_transport = get_transport("https://www.okx.com", verify=False)
+        assert adapter.transport is execution_transport
+        assert get_transport("https://www.okx.com/api/v5", verify=False) is execution_transport
+        assert get_transport("https://www.okx.com", verify=True) is not execution_transport
+        assert get_transport("https://eea.okx.com", verify=False) is not execution_transport
+        assert execution_transport.base_url == "https://www.okx.com"
+        assert _adapter().transport is adapter.transport
+    finally:
+        http_transport.close_transports()
+    assert get_transport("https://www.okx.com", verify=False) is not execution_transport
+    http_transport.close_transports()
+
+
+def test_transport_records_latency_per_endpoint():
+    transport = HttpTransport("https://example.com/")
+    calls = []
+
+    def fake_request(method, url, **kwargs):
+        calls.append((method, url, kwargs))
+        return FakeResponse(429 if "fail" in url else 200)
+
+    transport.session.request = fake_request
+    transport.request("GET", "/api/v5/market/ticker?instId=ETH-USDT", timeout=3)
+    transport.request("get", "/api/v5/market/ticker", params={"instId": "BTC-USDT"})
+    transport.request("POST", "/api/v5/fail", data="{}")
+
+    assert calls[0][1] == "https://example.com/api/v5/market/ticker?instId=ETH-USDT"
+    assert calls[0][2]["timeout"] == 3 and calls[1][2]["timeout"] == transport.timeout
+    stats = transport.latency_stats()
+    assert list(stats) == ["GET /api/v5/market/ticker", "POST /api/v5/fail"]
+    assert stats["GET /api/v5/market/ticker"]["count"] == 2
+    assert stats["POST /api/v5/fail"]["errors"] == 1
+    transport.reset_stats()
+    assert transport.latency_stats() == {}
+    transport.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
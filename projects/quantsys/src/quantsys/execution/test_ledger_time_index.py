@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+账本时间索引测试
+覆盖增量同步、崩溃残留尾部截断、跨日范围查询、更换账本后的重建以及多日复盘
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.ledger_time_index import LedgerTimeIndex, day_key
+from src.quantsys.execution.trading_replay import TradingReplayManager
+
+
+def _ts(day, hour, minute=0):
+    return time.mktime(datetime(2024, 3, day, hour, minute).timetuple())
+
+
+def _record(seq, timestamp):
+    return {
+        "event_id": f"e{seq}",
+        "event_type": "order_created",
+        "timestamp": timestamp,
+        "event_data": {"clientOrderId": f"c{seq}", "symbol": "ETH-USDT"},
+    }
+
+
+class ListLedger:
+    """
+    只提供 sync 所需接口的内存账本
+    """
+
+    storage = "json"
+
+    def __init__(self, path, timestamps=()):
+        self.ledger_path = path
+        self.records = [_record(i + 1, ts) for i, ts in enumerate(timestamps)]
+
+    def append(self, *timestamps):
+        for ts in timestamps:
+            self.records.append(_record(len(self.records) + 1, ts))
+
+    @property
+    def event_count(self):
+        return len(self.records)
+
+    def read_events(self, after_seq=0):
+        for seq, record in enumerate(self.records[after_seq:], start=after_seq + 1):
+            yield seq, dict(record)
+
+
+def _ids(events):
+    return [event.event_id for event in events]
+
+
+def test_incremental_sync_and_cross_day_range():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LedgerTimeIndex(os.path.join(tmp, "index"))
+        # 乱序写入：同一天内时间倒退的事件在查询时按时间排序
+        ledger = ListLedger(os.path.join(tmp, "a.json"), [_ts(1, 10), _ts(1, 23, 30), _ts(1, 9)])
+        assert index.sync(ledger) == 3
+        assert index.sync(ledger) == 0
+
+        ledger.append(_ts(2, 0, 30), _ts(3, 12), _ts(3, 12))
+        assert index.sync(ledger) == 3
+        assert index.days() == [day_key(_ts(d, 12)) for d in (1, 2, 3)]
+
+        events = list(index.iter_range(_ts(1, 9, 30), _ts(3, 12)))
+        assert _ids(events) == ["e1", "e2", "e4"]
+        assert index.seqs_between(_ts(1, 0), _ts(4, 0)) == [3, 1, 2, 4, 5, 6]
+        assert index.count_range(_ts(3, 0), _ts(4, 0)) == 2
+        assert index.count_range(_ts(4, 0), _ts(3, 0)) == 0
+
+        # 重新打开（从磁盘加载）结果一致
+        reopened = LedgerTimeIndex(os.path.join(tmp, "index"), read_only=True)
+        assert reopened.last_seq == 6
+        expected = ["e3", "e1", "e2", "e4", "e5", "e6"]
+        assert _ids(reopened.iter_range(_ts(1, 0), _ts(4, 0))) == expected
+
+
+def test_uncommitted_tail_is_truncated_on_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "index")
+        ledger = ListLedger(os.path.join(tmp, "a.json"), [_ts(5, 10), _ts(5, 11)])
+        LedgerTimeIndex(directory).sync(ledger)
+
+        key = day_key(_ts(5, 10))
+        data_path = os.path.join(directory, f"day-{key}.jsonl")
+        index_path = os.path.join(directory, f"day-{key}.idx")
+        committed = (os.path.getsize(data_path), os.path.getsize(index_path))
+        # 模拟同步中途崩溃：清单之外的完整索引行 + 写了一半的索引行与事件
+        with open(data_path, "ab") as f:
+            f.write(json.dumps(_record(3, _ts(5, 12))).encode() + b"\n{\"seq\": 4")
+        with open(index_path, "ab") as f:
+            f.write(f"{_ts(5, 12)!r}\t3\t{committed[0]}\t10\n".encode())
+            f.write(b"1709600000.0\t4\t")
+
+        # 分区在首次访问时加载并截断
+        index = LedgerTimeIndex(directory)
+        assert _ids(index.iter_range(_ts(5, 0), _ts(6, 0))) == ["e1", "e2"]
+        assert (os.path.getsize(data_path), os.path.getsize(index_path)) == committed
+
+        ledger.append(_ts(5, 12))
+        assert index.sync(ledger) == 1
+        assert _ids(index.iter_range(_ts(5, 0), _ts(6, 0))) == ["e1", "e2", "e3"]
+
+
+def test_swapped_or_shrunk_ledger_rebuilds_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LedgerTimeIndex(os.path.join(tmp, "index"))
+        index.sync(ListLedger(os.path.join(tmp, "a.json"), [_ts(7, 10), _ts(8, 10)]))
+
+        other = ListLedger(os.path.join(tmp, "b.json"), [_ts(9, 10)])
+        assert index.sync(other) == 1
+        assert index.days() == [day_key(_ts(9, 10))]
+        assert _ids(index.iter_range(_ts(7, 0), _ts(10, 0))) == ["e1"]
+
+        # 同一路径但事件数少于已索引数（账本被重建）
+        rebuilt = ListLedger(os.path.join(tmp, "b.json"))
+        index.sync(other)
+        assert index.sync(rebuilt) == 0
+        assert index.last_seq == 0
+        assert index.days() == []
+
+
+def test_run_replays_reads_each_day_from_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger_path = os.path.join(tmp, "trade_ledger.json")
+        # 旧 JSON 账本会在首次打开时导入分段日志
+        with open(ledger_path, "w", encoding="utf-8") as f:
+            records = [_record(1, _ts(10, 23, 59)), _record(2, _ts(11, 0, 1)), _record(3, _ts(11, 8))]
+            json.dump(records, f)
+        config = {
+            "ledger_path": ledger_path,
+            "evidence_path": os.path.join(tmp, "evidence"),
+            "reports_path": os.path.join(tmp, "reports"),
+            "signal_path": os.path.join(tmp, "signals"),
+            "position_target_path": os.path.join(tmp, "targets"),
+        }
+        days = [date(2024, 3, 10), date(2024, 3, 11), date(2024, 3, 12)]
+
+        # 复盘证据固定写到相对路径 data/evidence/replay，切到临时目录避免写进源码树
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            # 账本日志只允许一个写入方，换用新的管理器前先关闭
+            manager = TradingReplayManager(config)
+            sequential = manager.run_replays(days)
+            manager.close()
+            manager = TradingReplayManager(config)
+            parallel = manager.run_replays(days, max_workers=2)
+            manager.close()
+        finally:
+            os.chdir(cwd)
+        assert [r["total_events"] for r in sequential] == [1, 2, 0]
+        assert [r["date"] for r in parallel] == [d.isoformat() for d in days]
+        assert [r["total_events"] for r in parallel] == [1, 2, 0]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
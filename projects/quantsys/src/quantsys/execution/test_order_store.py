@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+SQLite 订单账本测试
+覆盖索引查询（含按状态查询未完成订单）、LRU 缓存跨连接失效以及旧 JSON 账本的一次性导入
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.order_store import OrderStore
+
+
+def _order(client_order_id, status="OPEN", **fields):
+    return {"clientOrderId": client_order_id, "status": status, **fields}
+
+
+def _write_json(path, orders):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(orders, f)
+
+
+def _open_and_count(db_path, json_path, queue):
+    store = OrderStore(db_path, json_path=json_path)
+    queue.put(store.count())
+    store.close()
+
+
+def test_indexed_queries_follow_insert_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OrderStore(os.path.join(tmp, "orders.db"))
+        store.insert(_order("a", status="REJECTED", run_id="r1"))
+        seq = store.insert(_order("a", run_id="r1", exchange_order_id="x1"))
+        store.insert(_order("b", run_id="r2", exchange_order_id="x2"))
+
+        assert store.get("a")["status"] == "REJECTED"
+        assert store.last_entry("a")[0] == seq
+        assert store.exists("a", ("OPEN",))
+        assert not store.exists("c", ("OPEN",))
+        assert [o["clientOrderId"] for o in store.find("run_id", "r1")] == ["a", "a"]
+        assert store.find_by_order_id("x2")["clientOrderId"] == "b"
+
+        store.update(seq, _order("a", status="FILLED", run_id="r1"))
+        assert store.last_entry("a")[1]["status"] == "FILLED"
+        assert store.find_by_order_id("x1") is None
+        try:
+            store.find("symbol", "ETH-USDT")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("find on an unindexed field should raise")
+
+
+def test_find_by_status_uses_status_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OrderStore(os.path.join(tmp, "orders.db"))
+        store.insert(_order("a"))
+        store.insert(_order("b", status="FILLED"))
+        seq = store.insert(_order("c", status="PARTIAL"))
+        store.update(seq, _order("c", status="CANCELED"))
+        store.insert(_order("d", status="PARTIAL"))
+
+        assert [o["clientOrderId"] for o in store.find_by_status(("OPEN", "PARTIAL"))] == ["a", "d"]
+        assert store.find_by_status(()) == []
+        plan = store._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT data FROM orders WHERE status IN (?, ?)", ("OPEN", "PARTIAL")
+        ).fetchall()
+        assert any("idx_orders_status" in row[-1] for row in plan)
+
+
+def test_cache_invalidated_by_other_connection():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "orders.db")
+        reader = OrderStore(db_path)
+        writer = OrderStore(db_path)
+        assert reader.get("a") is None  # 缓存“不存在”
+        writer.insert(_order("a"))
+        assert reader.get("a")["clientOrderId"] == "a"
+
+
+def test_legacy_json_imported_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "orders.db")
+        json_path = os.path.join(tmp, "orders.json")
+        _write_json(json_path, [_order("a"), _order("b")])
+
+        store = OrderStore(db_path, json_path=json_path)
+        assert [o["clientOrderId"] for o in store.all_orders()] == ["a", "b"]
+        store.close()
+
+        # 账本被清空后，旧 JSON 不会在下次启动时重新导入
+        store = OrderStore(db_path, json_path=json_path)
+        store.replace_all([])
+        store.close()
+        assert OrderStore(db_path, json_path=json_path).count() == 0
+
+
+def test_existing_rows_block_legacy_import():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "orders.db")
+        json_path = os.path.join(tmp, "orders.json")
+        store = OrderStore(db_path)
+        store.insert(_order("live"))
+        store.close()
+
+        _write_json(json_path, [_order("stale")])
+        reopened = OrderStore(db_path, json_path=json_path)
+        assert [o["clientOrderId"] for o in reopened.all_orders()] == ["live"]
+
+
+def test_unreadable_json_is_retried_on_next_start():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "orders.db")
+        json_path = os.path.join(tmp, "orders.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write("[{")
+        OrderStore(db_path, json_path=json_path).close()
+
+        _write_json(json_path, [_order("a")])
+        assert OrderStore(db_path, json_path=json_path).count() == 1
+
+
+def test_concurrent_start_imports_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "orders.db")
+        json_path = os.path.join(tmp, "orders.json")
+        _write_json(json_path, [_order(f"o{i}") for i in range(500)])
+
+        queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_open_and_count, args=(db_path, json_path, queue))
+            for _ in range(4)
+        ]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join(30)
+            assert proc.exitcode == 0
+        assert sorted(queue.get() for _ in procs) == [500] * 4
+        assert OrderStore(db_path).count() == 500
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
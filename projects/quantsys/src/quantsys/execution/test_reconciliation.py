@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+增量对账测试
+覆盖比对字段索引（含 hash 冲突的取值变化）、按游标拉取成交增量以及 OKX 成交明细翻页
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.order_execution import FILLS_PAGE_LIMIT, OrderExecution
+from quantsys.execution.reconciliation import (
+    IncrementalReconciler,
+    Position,
+    ReconciliationConfig,
+    ReconciliationEngine,
+    ReconciliationIndex,
+    content_key,
+)
+
+
+def _position(size, symbol="ETH-USDT"):
+    return Position(symbol=symbol, side="SHORT", size=size, entry_price=100.0, unrealized_pnl=0.0)
+
+
+def _trade(trade_id, ts):
+    return {
+        "id": trade_id,
+        "orderId": f"o{trade_id}",
+        "symbol": "ETH-USDT",
+        "side": "buy",
+        "price": 100.0,
+        "amount": 1.0,
+        "timestamp": ts,
+    }
+
+
+class DeltaClient:
+    """
+    记录 fetch_my_trades 收到的 since 参数
+    """
+
+    def __init__(self):
+        self.trades = []
+        self.since_calls = []
+
+    def fetch_balance(self):
+        return {"total": 100.0, "available": 100.0, "currency": "USDT"}
+
+    def fetch_positions(self):
+        return []
+
+    def fetch_open_orders(self):
+        return []
+
+    def fetch_my_trades(self, since=None):
+        self.since_calls.append(since)
+        return [t for t in self.trades if since is None or t["timestamp"] > since]
+
+
+def test_content_key_detects_values_with_equal_hash():
+    # hash(-1.0) == hash(-2.0)：比对字段须按值比较，不能只比较 hash
+    assert hash(-1.0) == hash(-2.0)
+    assert content_key("POSITION", _position(-1.0)) != content_key("POSITION", _position(-2.0))
+    assert content_key("POSITION", None) is None
+
+    index = ReconciliationIndex(ReconciliationEngine(ReconciliationConfig()))
+    local = {"ETH-USDT": _position(-1.0)}
+    assert index.update("POSITION", {"ETH-USDT": _position(-1.0)}, local) == []
+    diffs = index.update("POSITION", {"ETH-USDT": _position(-2.0)}, local)
+    assert [d.field for d in diffs] == ["size"]
+    assert index.compared == 2
+
+
+def test_incremental_cycles_fetch_trades_since_cursor():
+    client = DeltaClient()
+    client.trades = [_trade("t1", 1_000)]
+    reconciler = IncrementalReconciler(ReconciliationConfig(), cursor_overlap_ms=100)
+    local = {"balance": client.fetch_balance(), "positions": [], "orders": [], "fills": client.trades}
+
+    assert reconciler.reconcile(client, local, {}, now_ts=10_000).ok
+    assert reconciler.last_mode == "full"
+    client.trades.append(_trade("t2", 5_000))
+    local["fills"] = list(client.trades)
+    assert reconciler.reconcile(client, local, {}, now_ts=20_000).ok
+    assert reconciler.last_mode == "incremental"
+    assert client.since_calls[-1] == 900
+    assert reconciler.fill_cursor == 5_000
+
+
+def test_fetch_my_trades_pages_okx_fills():
+    execution = OrderExecution.__new__(OrderExecution)
+    execution.exchange = "okx"
+    execution.trading_mode = "live"
+    requests = []
+
+    def fake_request(method, endpoint, body=None, context=None):
+        requests.append((method, endpoint, dict(body)))
+        first = int(body.get("after", FILLS_PAGE_LIMIT + 5))
+        count = min(FILLS_PAGE_LIMIT, first - 1)
+        data = [
+            {
+                "tradeId": f"t{i}",
+                "billId": str(i),
+                "ordId": f"o{i}",
+                "instId": "ETH-USDT",
+                "side": "sell",
+                "fillPx": "101.5",
+                "fillSz": "0.2",
+                "ts": str(1_700_000_000_000 + i),
+            }
+            for i in range(first - 1, first - 1 - count, -1)
+        ]
+        return {"code": "0", "data": data}
+
+    execution._send_request_with_retry = fake_request
+    trades = execution.fetch_my_trades(since=1_700_000_000_000)
+    assert len(trades) == FILLS_PAGE_LIMIT + 4
+    assert trades[0] == {
+        "id": f"t{FILLS_PAGE_LIMIT + 4}",
+        "orderId": f"o{FILLS_PAGE_LIMIT + 4}",
+        "clientOrderId": "",
+        "symbol": "ETH-USDT",
+        "side": "sell",
+        "price": 101.5,
+        "amount": 0.2,
+        "timestamp": 1_700_000_000_000 + FILLS_PAGE_LIMIT + 4,
+    }
+    assert [r[2].get("after") for r in requests] == [None, "5"]
+    assert all(r[2]["begin"] == "1700000000000" for r in requests)
+
+    execution._send_request_with_retry = lambda *a, **k: {"code": "50011", "msg": "busy"}
+    try:
+        execution.fetch_my_trades()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("failed fills query should raise")
+
+    execution.trading_mode = "paper"
+    assert execution.fetch_my_trades() == []
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+状态存储测试
+覆盖三种后端的一致行为、WAL 重启恢复、只读方导入文件存储以及与 prune 并发时的恢复
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.state_storage import StateStorageFactory, WalStateStorage
+
+
+def _order(order_id, status="OPEN", **fields):
+    return {"order_id": order_id, "status": status, **fields}
+
+
+def _create(backend, root):
+    if backend == "database":
+        return StateStorageFactory.create("database", db_path=str(Path(root) / "state.db"))
+    return StateStorageFactory.create(backend, storage_dir=str(Path(root) / backend), sync="none")
+
+
+def _close(storage):
+    close = getattr(storage, "close", None)
+    if close is not None:
+        close()
+
+
+def _writer(directory, **kwargs):
+    return WalStateStorage(directory, sync="none", snapshot_every=0, **kwargs)
+
+
+class RacingReader(WalStateStorage):
+    """
+    在首次恢复前让写入方推进并 prune，模拟只读方与写入方并发
+    """
+
+    race = None
+
+    def _recover_once(self):
+        race, RacingReader.race = RacingReader.race, None
+        if race is not None:
+            race()
+        super()._recover_once()
+
+
+def test_backends_agree():
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("file", "wal", "database"):
+            storage = _create(backend, tmp)
+            assert storage.save_order(_order("a", price=1.5))
+            assert not storage.update_order("missing", {"status": "FILLED"})
+            assert storage.update_order("a", {"status": "FILLED"})
+            storage.save_position("ETH-USDT", {"qty": 2.0})
+            storage.save_portfolio({"equity": 100.0})
+
+            order = storage.get_order("a")
+            assert (order["status"], order["price"]) == ("FILLED", 1.5), backend
+            assert storage.get_all_positions() == {"ETH-USDT": {"qty": 2.0}}, backend
+            assert storage.get_portfolio() == {"equity": 100.0}, backend
+            _close(storage)
+
+
+def test_wal_recovers_from_snapshot_and_log():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = _writer(tmp)
+        for i in range(5):
+            storage.save_order(_order(f"o{i}"))
+        storage.snapshot()
+        storage.update_order("o1", {"status": "FILLED"})
+        storage.save_position("ETH-USDT", {"qty": 1.0})
+        storage.flush()
+
+        # 只读方在写入方运行时读取到快照 + 日志
+        reader = WalStateStorage(tmp, read_only=True)
+        assert reader.get_order("o1")["status"] == "FILLED"
+        assert reader.get_position("ETH-USDT") == {"qty": 1.0}
+        try:
+            reader.save_order(_order("x"))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("read-only storage should reject writes")
+        storage.close()
+
+        reopened = _writer(tmp)
+        assert len([i for i in range(5) if reopened.get_order(f"o{i}")]) == 5
+        assert reopened.get_order("o1")["status"] == "FILLED"
+        reopened.close()
+
+
+def test_second_writer_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = _writer(tmp)
+        try:
+            _writer(tmp)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("second writer should be rejected")
+        finally:
+            storage.close()
+
+
+def test_read_only_reader_sees_file_backend_state():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = StateStorageFactory.create("file", storage_dir=tmp)
+        files.save_order(_order("legacy"))
+        files.save_position("BTC-USDT", {"qty": 0.5})
+
+        reader = WalStateStorage(tmp, read_only=True)
+        assert reader.get_order("legacy")["status"] == "OPEN"
+        assert reader.get_position("BTC-USDT") == {"qty": 0.5}
+        # 只读方不写快照，也不创建日志目录
+        assert not (Path(tmp) / "wal").exists()
+
+        writer = _writer(tmp)
+        assert writer.get_order("legacy")["status"] == "OPEN"
+        writer.close()
+        assert WalStateStorage(tmp, read_only=True).get_position("BTC-USDT") == {"qty": 0.5}
+
+
+def test_read_only_reader_survives_concurrent_prune():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = _writer(tmp, segment_max_bytes=256)
+        for i in range(20):
+            writer.save_order(_order(f"o{i}"))
+        writer.snapshot()
+        for i in range(20, 40):
+            writer.save_order(_order(f"o{i}"))
+        writer.flush()
+
+        def advance_and_prune():
+            # 只读方已记下日志末尾；写入方继续写入并滚动出 3 个新快照，旧快照与分段被删除
+            for round_ in range(3):
+                for i in range(10):
+                    writer.update_order(f"o{i}", {"status": f"R{round_}"})
+                writer.snapshot()
+
+        RacingReader.race = advance_and_prune
+        reader = RacingReader(tmp, read_only=True)
+        assert RacingReader.race is None
+        assert len(reader._orders) == 40
+        assert reader.get_order("o0")["status"] == "R2"
+        assert reader.get_order("o39")["status"] == "OPEN"
+        writer.close()
+
+
+def test_snapshot_prunes_covered_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = _writer(tmp, segment_max_bytes=256)
+        for round_ in range(5):
+            for i in range(10):
+                writer.save_order(_order(f"o{i}", status=f"R{round_}"))
+            writer.snapshot()
+        assert len(writer._log.snapshot_seqs()) == 3
+        assert writer._log.segments()[0][0] > 1
+        writer.close()
+        assert WalStateStorage(tmp, read_only=True).get_order("o9")["status"] == "R4"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
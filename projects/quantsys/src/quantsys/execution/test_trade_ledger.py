@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+交易账本测试
+覆盖分段日志的尾部截断、分段轮转与按 seq 跳读、重启与重放后的状态一致、
+从快照启动时事件的延迟加载、旧 JSON 账本只导入一次以及单一写入方
+"""
+
+import copy
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.trade_ledger import EventType, TradeLedger
+from quantsys.monitor.live_metrics import LiveMetrics
+
+
+def _ledger(tmp, **kwargs):
+    kwargs.setdefault("sync", "none")
+    return TradeLedger(os.path.join(tmp, "trade_ledger.json"), **kwargs)
+
+
+def _trade(ledger, n, symbol="ETH-USDT"):
+    """
+    记录一个订单及其两笔成交（每笔成交另外派生持仓、PNL 事件）
+    """
+    order_id = f"order-{n}"
+    ledger.record_order_created(
+        {
+            "clientOrderId": order_id,
+            "symbol": symbol,
+            "side": "buy" if n % 3 else "sell",
+            "amount": 1.0,
+            "price": 100.0 + n,
+            "status": "CREATED",
+        }
+    )
+    for i in range(2):
+        ledger.record_fill(
+            {
+                "symbol": symbol,
+                "side": "buy" if n % 3 else "sell",
+                "fillAmount": 0.5,
+                "fillPrice": 100.0 + n + i * 0.1,
+                "clientOrderId": order_id,
+            }
+        )
+    ledger.record_order_updated({"clientOrderId": order_id, "status": "FILLED"})
+
+
+def _logged_state(state):
+    """
+    去掉成交后由成本计算器附加、不写入事件日志的成本分解
+    """
+    state = copy.deepcopy(state)
+    for fill in state["fills"].values():
+        fill.pop("cost_breakdown", None)
+    for order in state["orders"].values():
+        order.pop("cost_breakdowns", None)
+    return json.loads(json.dumps(state))
+
+
+def test_torn_tail_is_truncated_on_reopen():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = _ledger(tmp)
+        _trade(ledger, 1)
+        count = ledger.event_count
+        state = _logged_state(ledger.current_state)
+        ledger.close()
+
+        # 进程在写一条记录的中途崩溃
+        _, path = ledger._log.segments()[-1]
+        with open(path, "ab") as f:
+            f.write(b'{"seq": %d, "event_type": "fill_cr' % (count + 1))
+
+        ledger = _ledger(tmp)
+        assert ledger.event_count == count
+        assert _logged_state(ledger.current_state) == state
+        ledger.record_order_updated({"clientOrderId": "order-1", "status": "CLOSED"})
+        seqs = [seq for seq, _ in ledger.read_events()]
+        assert seqs == list(range(1, count + 2))
+        ledger.close()
+
+
+def test_segment_rotation_and_read_skips_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = _ledger(tmp, segment_max_bytes=2048, snapshot_every=0)
+        for n in range(12):
+            _trade(ledger, n)
+        segments = ledger._log.segments()
+        assert len(segments) > 3
+        assert [first for first, _ in segments][0] == 1
+
+        records = list(ledger.read_events())
+        assert [seq for seq, _ in records] == list(range(1, ledger.event_count + 1))
+        assert all("seq" not in event for _, event in records)
+
+        # read(after_seq) 只打开包含 after_seq 之后记录的分段：之前的分段即使损坏也不影响
+        after_seq = segments[2][0] + 1
+        for _, path in segments[:2]:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("not json\n")
+        tail = list(ledger.read_events(after_seq))
+        assert [seq for seq, _ in tail] == list(range(after_seq + 1, ledger.event_count + 1))
+        assert tail == records[after_seq:]
+        assert list(ledger.read_events(ledger.event_count)) == []
+        ledger.close()
+
+
+def test_reload_and_replay_match_live_state():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = _ledger(tmp, snapshot_every=7, segment_max_bytes=4096)
+        for n in range(10):
+            _trade(ledger, n, symbol="ETH-USDT" if n % 2 else "BTC-USDT")
+        live = _logged_state(ledger.current_state)
+        count = ledger.event_count
+        snapshot_seq = max(ledger._log.snapshot_seqs())
+        assert 0 < snapshot_seq < count
+
+        result = ledger.replay()
+        assert result["replayed_events"] == count and result["snapshot_seq"] == 0
+        assert _logged_state(ledger.current_state) == live
+        result = ledger.replay(from_snapshot=True)
+        assert result["snapshot_seq"] == snapshot_seq
+        assert result["replayed_events"] == count - snapshot_seq
+        assert _logged_state(ledger.current_state) == live
+        ledger.close()
+
+        reopened = _ledger(tmp, snapshot_every=7)
+        assert reopened.event_count == count
+        assert _logged_state(reopened.current_state) == live
+        assert reopened.get_fills_by_order("order-3") == [
+            fill for fill in reopened.current_state["fills"].values()
+            if fill["clientOrderId"] == "order-3"
+        ]
+        reopened.replay()
+        assert _logged_state(reopened.current_state) == live
+        reopened.close()
+
+
+def test_events_are_lazy_after_snapshot_start():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = _ledger(tmp, snapshot_every=0)
+        for n in range(3):
+            _trade(ledger, n)
+        ledger.snapshot()
+        _trade(ledger, 3)
+        event_ids = [event.event_id for event in ledger.events]
+        ledger.close()
+
+        ledger = _ledger(tmp, snapshot_every=0)
+        assert not ledger.events_loaded
+        # 流式读取不加载全部事件
+        assert len(list(ledger.read_events())) == len(event_ids)
+        assert not ledger.events_loaded
+
+        ledger.record_order_updated({"clientOrderId": "order-0", "status": "CLOSED"})
+        assert not ledger.events_loaded
+        events = ledger.events
+        assert ledger.events_loaded
+        assert [event.event_id for event in events[:-1]] == event_ids
+        assert events[-1].event_type == EventType.ORDER_UPDATED
+        assert len(events) == ledger.event_count
+        ledger.close()
+
+
+def test_legacy_json_is_imported_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = _ledger(tmp, storage="json")
+        _trade(legacy, 1)
+        _trade(legacy, 2)
+        count = legacy.event_count
+        state = _logged_state(legacy.current_state)
+        legacy_path = legacy.ledger_path
+        with open(legacy_path, encoding="utf-8") as f:
+            legacy_content = f.read()
+
+        ledger = _ledger(tmp)
+        assert ledger.event_count == count
+        assert _logged_state(ledger.current_state) == state
+        ledger.record_order_updated({"clientOrderId": "order-1", "status": "CLOSED"})
+        ledger.close()
+
+        # 再次打开不重复导入；旧文件保持不动
+        ledger = _ledger(tmp)
+        assert ledger.event_count == count + 1
+        assert [seq for seq, _ in ledger.read_events()] == list(range(1, count + 2))
+        ledger.close()
+        with open(legacy_path, encoding="utf-8") as f:
+            assert f.read() == legacy_content
+
+
+def test_second_writer_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = _ledger(tmp)
+        _trade(ledger, 1)
+        try:
+            _ledger(tmp)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("second writer should be rejected")
+
+        # 只读方（LiveMetrics）在写入方打开时可以读取日志
+        metrics = LiveMetrics(data_dir=tmp, metrics_dir=tmp)
+        assert len(metrics.trades) == ledger.event_count
+        assert all("seq" not in trade for trade in metrics.trades)
+        assert metrics._count_weekly_trades() == ledger.event_count
+
+        ledger.close()
+        reopened = _ledger(tmp)
+        assert reopened.event_count == ledger.event_count
+        reopened.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
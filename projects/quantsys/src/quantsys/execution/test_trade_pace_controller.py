@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+交易节奏控制器测试
+覆盖日志重放计数、旧 JSON 迁移、重置以及窗口外记录的压缩（快照 + 删除旧分段）
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.execution.trade_pace_controller import TradePaceController
+
+
+def _config(tmp, **overrides):
+    return {
+        "trade_record_path": os.path.join(tmp, "trade_records.json"),
+        "state_file_path": os.path.join(tmp, "reports", "pace_state.json"),
+        **overrides,
+    }
+
+
+def _trade(days_ago):
+    open_time = datetime.utcnow() - timedelta(days=days_ago)
+    return {"symbol": "ETH-USDT", "open_time": open_time.isoformat() + "Z"}
+
+
+def test_counts_survive_restart_and_cooldown():
+    with tempfile.TemporaryDirectory() as tmp:
+        controller = TradePaceController(_config(tmp))
+        controller.add_trade_record(_trade(10))
+        controller.add_trade_record(_trade(1))
+        controller.add_trade_record(_trade(0))
+        assert controller.check_pace()["count"] == 2
+        controller.add_trade_record(_trade(0))
+        controller.trade_log.close()
+
+        reopened = TradePaceController(_config(tmp))
+        assert len(reopened.trade_records) == 4
+        assert reopened.check_pace()["action"] == "COOLDOWN"
+        assert not reopened.is_new_position_allowed()
+
+        reopened.reset_trade_records()
+        reopened.trade_log.close()
+        assert TradePaceController(_config(tmp)).check_pace()["count"] == 0
+
+
+def test_legacy_json_is_migrated_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        config = _config(tmp)
+        with open(config["trade_record_path"], "w", encoding="utf-8") as f:
+            json.dump([_trade(2), _trade(30)], f)
+
+        controller = TradePaceController(config)
+        assert controller.check_pace()["count"] == 1
+        controller.add_trade_record(_trade(0))
+        controller.trade_log.close()
+        assert len(TradePaceController(config).trade_records) == 3
+
+
+def test_compaction_drops_expired_records_and_old_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        config = _config(tmp, compact_every=20, trade_log_segment_bytes=512)
+        controller = TradePaceController(config)
+        for _ in range(45):
+            controller.add_trade_record(_trade(30))
+        controller.add_trade_record(_trade(1))
+
+        # 每 20 条压缩一次：窗口外的记录被丢弃，被快照覆盖的分段被删除
+        assert len(controller.trade_records) == 6
+        assert controller.trade_log.segments()[0][0] > 1
+        assert controller.check_pace()["count"] == 1
+        controller.trade_log.close()
+
+        reopened = TradePaceController(config)
+        assert reopened.trade_records == controller.trade_records
+        assert reopened.check_pace()["count"] == 1
+
+        assert reopened.compact() == 5
+        assert reopened.trade_records == [controller.trade_records[-1]]
+        reopened.trade_log.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
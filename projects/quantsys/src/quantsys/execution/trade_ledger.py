@@ -4,6 +4,11 @@
 记录order→fill→position→pnl的事件流
 支持重放(replay)核验对账
 输出ledger_report
+
+存储方式：
+- segment（默认）：追加写入的分段日志（见 ledger_log），组提交 fsync、定期快照，
+  记录事件的成本与账本长度无关；重放可从最近快照开始
+- json：每次记录事件时重写整个 JSON 文件（旧格式）
 """
 
 import hashlib
@@ -11,10 +16,12 @@ import json
 import logging
 import os
 import time
+from collections.abc import Iterator
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 
+from ..execution.ledger_log import SegmentLog
 from ..execution.trade_cost import TradeCostCalculator
 
 # 配置日志
@@ -24,6 +31,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+LEDGER_STORAGES = ("segment", "json")
+
+
 # 事件类型枚举
 class EventType:
     ORDER_CREATED = "order_created"
@@ -76,18 +86,51 @@ class TradeLedger:
     """
 
     def __init__(
-        self, ledger_path: str = "data/trade_ledger.json", cost_config: dict[str, Any] | None = None
+        self,
+        ledger_path: str = "data/trade_ledger.json",
+        cost_config: dict[str, Any] | None = None,
+        storage: str = "segment",
+        segment_dir: str | None = None,
+        snapshot_every: int = 10000,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        sync: str = "group",
     ):
         """
         初始化交易账本
 
         Args:
-            ledger_path: 账本文件路径
+            ledger_path: 账本文件路径（json 存储的文件；segment 存储时用于导入旧账本）
             cost_config: 成本计算配置
-        """
+            storage: 存储方式，segment（分段日志）/ json（整文件重写）
+            segment_dir: 分段日志目录，默认为 ledger_path 去掉扩展名加 _segments
+            snapshot_every: 每记录多少个事件写一次状态快照（0 表示不自动快照）
+            segment_max_bytes: 单个日志分段的最大字节数
+            sync: 日志 fsync 策略，group / always / none
+        """
+        if storage not in LEDGER_STORAGES:
+            raise ValueError(f"不支持的账本存储方式: {storage}，可选 {LEDGER_STORAGES}")
         self.ledger_path = ledger_path
-        self.events: list[LedgerEvent] = []
-        self.current_state: dict[str, Any] = {
+        self.storage = storage
+        self.segment_dir = segment_dir or f"{os.path.splitext(ledger_path)[0]}_segments"
+        self.snapshot_every = snapshot_every
+        self._events: list[LedgerEvent] | None = []
+        self._event_count = 0
+        self._replaying = False
+        self._fills_by_order: dict[str, list[str]] = {}  # clientOrderId -> [fill_id]
+        self.current_state: dict[str, Any] = self._empty_state()
+
+        # 初始化成本计算器
+        self.cost_calculator = TradeCostCalculator(cost_config)
+
+        # 初始化账本目录和文件
+        self._log: SegmentLog | None = None
+        self._init_ledger(segment_max_bytes, sync)
+        # 加载现有事件
+        self._load_events()
+
+    @staticmethod
+    def _empty_state() -> dict[str, Any]:
+        return {
             "orders": {},  # clientOrderId -> order_data
             "fills": {},  # fill_id -> fill_data
             "positions": {},  # symbol -> position_data
@@ -95,18 +138,54 @@ class TradeLedger:
             "last_event_time": 0.0,
         }
 
-        # 初始化成本计算器
-        self.cost_calculator = TradeCostCalculator(cost_config)
+    @property
+    def events(self) -> list[LedgerEvent]:
+        """
+        全部事件；segment 存储从快照启动时首次访问才读取日志
+        """
+        if self._events is None:
+            self._events = [LedgerEvent.from_dict(record) for record in self._log.read()]
+        return self._events
 
-        # 初始化账本目录和文件
-        self._init_ledger()
-        # 加载现有事件
-        self._load_events()
+    @property
+    def events_loaded(self) -> bool:
+        """
+        全部事件是否已在内存中（访问 events 不需要读日志）
+        """
+        return self._events is not None
 
-    def _init_ledger(self):
+    @property
+    def event_count(self) -> int:
+        """
+        已记录的事件数（即最后一个事件的序号）
+        """
+        return self._event_count
+
+    def read_events(self, after_seq: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+        """
+        按记录顺序流式读取序号大于 after_seq 的事件（序号从 1 开始）
+
+        segment 存储直接读日志，不加载全部事件
+
+        Yields:
+            (序号, 事件字典)
+        """
+        if after_seq >= self._event_count:
+            return
+        if self._log is not None:
+            for record in self._log.read(after_seq):
+                yield record.pop("seq"), record
+            return
+        for seq, event in enumerate(self.events[after_seq:], start=after_seq + 1):
+            yield seq, event.to_dict()
+
+    def _init_ledger(self, segment_max_bytes: int, sync: str):
         """
         初始化账本目录和文件
         """
+        if self.storage == "segment":
+            self._log = SegmentLog(self.segment_dir, segment_max_bytes=segment_max_bytes, sync=sync)
+            return
         dir_name = os.path.dirname(self.ledger_path)
         if dir_name:
             os.makedirs(dir_name, exist_ok=True)
@@ -118,22 +197,120 @@ class TradeLedger:
         """
         加载现有事件
         """
+        if self.storage == "segment":
+            self._load_segments()
+            return
         try:
             with open(self.ledger_path) as f:
                 event_dicts = json.load(f)
 
+            self._replaying = True
             for event_dict in event_dicts:
                 event = LedgerEvent.from_dict(event_dict)
-                self.events.append(event)
+                self._events.append(event)
                 self._apply_event(event)
+            self._event_count = len(self._events)
 
             logger.info(f"成功加载 {len(self.events)} 个事件")
         except Exception as e:
             logger.error(f"加载事件失败: {e}")
+        finally:
+            self._replaying = False
+
+    def _load_segments(self):
+        """
+        从最近快照恢复状态，再应用快照之后的日志
+        """
+        if self._log.last_seq == 0:
+            self._import_json_ledger()
+        snapshot_seq = self._restore_snapshot()
+        if snapshot_seq:
+            # 快照之前的事件在首次访问 events 时再读取
+            self._events = None
+        tail = self._apply_log(snapshot_seq)
+        if self._events is not None:
+            self._events.extend(tail)
+        self._event_count = self._log.last_seq
+        logger.info(
+            f"成功加载 {self._event_count} 个事件（快照 seq={snapshot_seq}，重放 {len(tail)} 个）"
+        )
+
+    def _import_json_ledger(self):
+        """
+        分段日志为空时导入旧 JSON 账本中的事件（原文件保留不动）
+        """
+        if not os.path.exists(self.ledger_path):
+            return
+        try:
+            with open(self.ledger_path) as f:
+                event_dicts = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取旧账本失败: {e}")
+            return
+        for event_dict in event_dicts:
+            self._log.append(event_dict)
+        self._log.commit()
+        if event_dicts:
+            logger.info(f"已从 {self.ledger_path} 导入 {len(event_dicts)} 个事件到分段日志")
+
+    def _restore_snapshot(self) -> int:
+        snapshot = self._log.latest_snapshot()
+        if snapshot is None:
+            return 0
+        self.current_state = snapshot["state"]
+        self._rebuild_indexes()
+        return snapshot["seq"]
+
+    def _rebuild_indexes(self):
+        self._fills_by_order = {}
+        for fill_id, fill in self.current_state["fills"].items():
+            self._fills_by_order.setdefault(fill["clientOrderId"], []).append(fill_id)
+
+    def _apply_log(self, after_seq: int) -> list[LedgerEvent]:
+        """
+        应用 seq > after_seq 的日志事件（不产生新事件）
+        """
+        applied = []
+        self._replaying = True
+        try:
+            for record in self._log.read(after_seq):
+                event = LedgerEvent.from_dict(record)
+                self._apply_event(event)
+                applied.append(event)
+        finally:
+            self._replaying = False
+        return applied
+
+    def snapshot(self) -> str | None:
+        """
+        立即写入当前状态快照
+
+        Returns:
+            快照文件路径；json 存储时返回 None
+        """
+        if self._log is None:
+            return None
+        path = self._log.write_snapshot(self.current_state)
+        logger.info(f"账本快照已保存: {path}")
+        return path
+
+    def flush(self):
+        """
+        提交（fsync）所有已记录的事件
+        """
+        if self._log is not None:
+            self._log.commit()
+
+    def close(self):
+        """
+        提交并关闭账本日志
+        """
+        if self._log is not None:
+            self._log.close()
 
     def _save_events(self):
         """
-        保存事件到文件
+        保存事件到文件（json 存储）
         """
         try:
             event_dicts = [event.to_dict() for event in self.events]
@@ -166,11 +343,10 @@ class TradeLedger:
 
         elif event_type == EventType.FILL_CREATED:
             # 处理成交创建事件
-            fill_id = event_data.get(
-                "fillId",
-                f"fill_{time.time()}_{hashlib.md5(str(event_data).encode()).hexdigest()[:8]}",
-            )
+            fill_id = event_data.get("fillId") or self._generate_fill_id(event_data)
             event_data["fillId"] = fill_id
+            if fill_id not in self.current_state["fills"]:
+                self._fills_by_order.setdefault(event_data["clientOrderId"], []).append(fill_id)
             self.current_state["fills"][fill_id] = event_data
 
             # 更新持仓
@@ -191,6 +367,10 @@ class TradeLedger:
             self.current_state["last_event_time"], event.timestamp
         )
 
+    @staticmethod
+    def _generate_fill_id(fill_data: dict[str, Any]) -> str:
+        return f"fill_{time.time()}_{hashlib.md5(str(fill_data).encode()).hexdigest()[:8]}"
+
     def _update_position(self, fill_data: dict[str, Any]):
         """
         根据成交数据更新持仓
@@ -257,8 +437,9 @@ class TradeLedger:
         # 计算PNL
         self._calculate_pnl(symbol)
 
-        # 记录持仓更新事件
-        self.record_event(EventType.POSITION_UPDATED, position)
+        # 记录持仓更新事件（重放时日志中已有对应事件）
+        if not self._replaying:
+            self.record_event(EventType.POSITION_UPDATED, position)
 
     def _calculate_pnl(self, symbol: str):
         """
@@ -302,8 +483,9 @@ class TradeLedger:
         # 保存PNL数据
         self.current_state["pnl"][symbol] = pnl_data
 
-        # 记录PNL计算事件
-        self.record_event(EventType.PNL_CALCULATED, pnl_data)
+        # 记录PNL计算事件（重放时日志中已有对应事件）
+        if not self._replaying:
+            self.record_event(EventType.PNL_CALCULATED, pnl_data)
 
     def record_event(self, event_type: str, event_data: dict[str, Any]):
         """
@@ -313,17 +495,30 @@ class TradeLedger:
             event_type: 事件类型
             event_data: 事件数据
         """
+        # 成交ID在写入日志前确定，重放时得到相同的ID
+        if event_type == EventType.FILL_CREATED and not event_data.get("fillId"):
+            event_data["fillId"] = self._generate_fill_id(event_data)
+
         # 创建事件
         event = LedgerEvent(event_type=event_type, event_data=event_data)
 
         # 添加到事件列表
-        self.events.append(event)
+        if self._events is not None:
+            self._events.append(event)
+        self._event_count += 1
+
+        # 追加到分段日志（先于应用事件，保证派生的持仓/PNL事件排在其后）
+        if self._log is not None:
+            self._log.append(event.to_dict())
 
         # 应用事件到当前状态
         self._apply_event(event)
 
-        # 保存事件到文件
-        self._save_events()
+        if self._log is None:
+            # 保存事件到文件
+            self._save_events()
+        elif self.snapshot_every and self._event_count % self.snapshot_every == 0:
+            self.snapshot()
 
         logger.info(f"记录事件: {event_type}，事件ID: {event.event_id}")
 
@@ -390,9 +585,12 @@ class TradeLedger:
 
                 logger.info(f"已计算并添加交易成本分解: {cost_breakdown.trade_id}")
 
-    def replay(self) -> dict[str, Any]:
+    def replay(self, from_snapshot: bool = False) -> dict[str, Any]:
         """
-        重放所有事件，重新计算状态
+        重放事件，重新计算状态
+
+        Args:
+            from_snapshot: 从最近快照开始，只重放快照之后的日志（仅 segment 存储）
 
         Returns:
             result: 重放结果，包含统计信息
@@ -400,21 +598,31 @@ class TradeLedger:
         logger.info("开始重放事件...")
 
         # 重置当前状态
-        self.current_state = {
-            "orders": {},
-            "fills": {},
-            "positions": {},
-            "pnl": {},
-            "last_event_time": 0.0,
-        }
+        self.current_state = self._empty_state()
+        self._fills_by_order = {}
+
+        if self._log is not None:
+            snapshot_seq = self._restore_snapshot() if from_snapshot else 0
+            replayed = len(self._apply_log(snapshot_seq))
+            logger.info(f"事件重放完成，快照 seq={snapshot_seq}，共处理 {replayed} 个事件")
+            return {
+                "total_events": self._event_count,
+                "replayed_events": replayed,
+                "snapshot_seq": snapshot_seq,
+                "replay_time": time.time(),
+                "final_state": self.current_state,
+            }
 
         # 保存原始事件列表（不包含重放过程中生成的新事件）
         original_events = self.events.copy()
 
-        # 应用所有原始事件
-        for event in original_events:
-            # 直接应用事件，不生成新事件
-            self._apply_event(event)
+        # 应用所有原始事件，不生成新事件
+        self._replaying = True
+        try:
+            for event in original_events:
+                self._apply_event(event)
+        finally:
+            self._replaying = False
 
         logger.info(f"事件重放完成，共处理 {len(original_events)} 个事件")
 
@@ -433,7 +641,7 @@ class TradeLedger:
         """
         report = {
             "generated_at": time.time(),
-            "total_events": len(self.events),
+            "total_events": self._event_count,
             "orders": {
                 "total": len(self.current_state["orders"]),
                 "by_status": self._get_orders_by_status(),
@@ -544,10 +752,11 @@ class TradeLedger:
         Returns:
             fills: 成交记录列表
         """
+        fills = self.current_state["fills"]
         return [
-            fill
-            for fill in self.current_state["fills"].values()
-            if fill["clientOrderId"] == client_order_id
+            fills[fill_id]
+            for fill_id in self._fills_by_order.get(client_order_id, [])
+            if fill_id in fills
         ]
 
     def save_cost_breakdowns(self, output_path: str | None = None) -> None:
@@ -658,7 +867,7 @@ class TradeLedger:
         evidence = {
             "saved_at": time.time(),
             "ledger_path": self.ledger_path,
-            "total_events": len(self.events),
+            "total_events": self._event_count,
             "current_state": self.current_state,
             "test_result": self.self_test(),
         }
@@ -2,14 +2,22 @@
 """
 实盘交易节奏控制器
 实现周频1-3次的交易节奏控制，避免过度交易
+
+开仓记录追加写入分段日志（每条记录 fsync），启动时从最近快照重放；
+过去 lookback_days 天的开仓次数由内存中的滑动窗口计数器维护，check_pace 不再逐条解析时间；
+每追加 compact_every 条记录丢弃统计窗口之外的旧记录，写入快照并删除被快照覆盖的日志分段
 """
 
 import json
 import logging
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
+from ..common.sliding_window import SlidingWindowCounter
+from .ledger_log import SegmentLog
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -36,11 +44,17 @@ class TradePaceController:
         self.lookback_days = self.config.get("lookback_days", 7)  # 统计窗口，默认7天
         self.max_trades = self.config.get("max_trades", 3)  # 最大交易次数，默认3次
         self.min_trades = self.config.get("min_trades", 1)  # 最小交易次数，默认1次
+        # 每追加多少条日志记录压缩一次（丢弃窗口外记录并写快照）
+        self.compact_every = self.config.get("compact_every", 100)
 
-        # 交易记录文件路径
+        # 交易记录文件路径（旧版整文件JSON，首次启动时迁移到日志）
         self.trade_record_path = self.config.get(
             "trade_record_path", os.path.join("data", "trade_records.json")
         )
+        # 交易记录追加日志目录
+        self.trade_log_dir = self.config.get(
+            "trade_log_dir", os.path.splitext(self.trade_record_path)[0] + "_log"
+        )
 
         # 状态文件路径
         self.state_file_path = self.config.get(
@@ -51,37 +65,114 @@ class TradePaceController:
         os.makedirs(os.path.dirname(self.trade_record_path), exist_ok=True)
         os.makedirs(os.path.dirname(self.state_file_path), exist_ok=True)
 
+        # 过去 lookback_days 天的开仓次数（5分钟一个桶）
+        self._open_counter = SlidingWindowCounter(
+            self.lookback_days * 86400, buckets=self.lookback_days * 24 * 12
+        )
+
         # 初始化交易记录
+        self.trade_log = SegmentLog(
+            self.trade_log_dir,
+            segment_max_bytes=self.config.get("trade_log_segment_bytes", 1024 * 1024),
+            sync="always",
+        )
+        self._appended = 0  # 最近一次快照之后追加的日志记录数
         self.trade_records = self._load_trade_records()
 
         logger.info("交易节奏控制器初始化完成")
 
+    @staticmethod
+    def _open_timestamp(trade: dict[str, Any]) -> float | None:
+        """
+        交易记录的开仓时间（UTC时间戳），无法解析时返回None
+        """
+        open_time_str = trade.get("open_time", trade.get("timestamp", ""))
+        if not open_time_str:
+            return None
+        try:
+            open_time = datetime.fromisoformat(open_time_str.replace("Z", ""))
+        except ValueError as e:
+            logger.error(f"解析交易时间失败: {e}")
+            return None
+        if open_time.tzinfo is None:
+            open_time = open_time.replace(tzinfo=timezone.utc)
+        return open_time.timestamp()
+
+    def _count_open(self, trade: dict[str, Any]) -> None:
+        ts = self._open_timestamp(trade)
+        if ts is not None:
+            self._open_counter.add(1, ts=ts)
+
     def _load_trade_records(self) -> list:
         """
-        加载交易记录
+        加载交易记录（从最近快照重放日志；日志为空时迁移旧版JSON文件）
 
         Returns:
             list: 交易记录列表
         """
-        try:
-            if os.path.exists(self.trade_record_path):
+        records = []
+        after_seq = 0
+        snapshot = self.trade_log.latest_snapshot()
+        if snapshot is not None:
+            records = snapshot["state"]["trades"]
+            after_seq = snapshot["seq"]
+        for entry in self.trade_log.read(after_seq):
+            self._appended += 1
+            if entry.get("type") == "reset":
+                records = []
+            elif entry.get("type") == "trade":
+                records.append(entry["trade"])
+
+        if self.trade_log.last_seq == 0 and os.path.exists(self.trade_record_path):
+            try:
                 with open(self.trade_record_path, encoding="utf-8") as f:
-                    return json.load(f)
-        except (OSError, json.JSONDecodeError) as e:
-            logger.error(f"加载交易记录失败: {e}")
+                    records = json.load(f)
+                for trade in records:
+                    self.trade_log.append({"type": "trade", "trade": trade})
+                self._appended = len(records)
+                logger.info(f"已将 {len(records)} 条交易记录迁移到日志 {self.trade_log_dir}")
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"加载交易记录失败: {e}")
+                records = []
+
+        self._open_counter.reset()
+        for trade in records:
+            self._count_open(trade)
+        self.trade_records = records
+        if self._appended >= self.compact_every:
+            self.compact()
+        return self.trade_records
+
+    def compact(self, now: float | None = None) -> int:
+        """
+        压缩交易记录：丢弃开仓时间早于统计窗口的记录，写入快照并删除被快照覆盖的日志分段
 
-        # 返回空列表作为默认值
-        return []
+        Args:
+            now: 当前时间戳，默认 time.time()
 
-    def _save_trade_records(self) -> None:
-        """
-        保存交易记录
+        Returns:
+            int: 丢弃的记录数
         """
+        cutoff = (time.time() if now is None else now) - self.lookback_days * 86400
+        kept = []
+        for trade in self.trade_records:
+            ts = self._open_timestamp(trade)
+            if ts is not None and ts >= cutoff:
+                kept.append(trade)
+        dropped = len(self.trade_records) - len(kept)
+        self.trade_records = kept
+
         try:
-            with open(self.trade_record_path, "w", encoding="utf-8") as f:
-                json.dump(self.trade_records, f, indent=2, ensure_ascii=False)
-        except OSError as e:
-            logger.error(f"保存交易记录失败: {e}")
+            self.trade_log.write_snapshot({"trades": kept})
+            snapshot_seqs = self.trade_log.snapshot_seqs()
+            if snapshot_seqs:
+                self.trade_log.prune(snapshot_seqs[0])
+            self._appended = 0
+        except (OSError, ValueError) as e:
+            logger.error(f"压缩交易记录失败: {e}")
+        if dropped:
+            logger.info(f"已丢弃 {dropped} 条统计窗口之外的交易记录")
+        return dropped
 
     def add_trade_record(self, trade_info: dict[str, Any]) -> None:
         """
@@ -98,11 +189,16 @@ class TradePaceController:
         if "open_time" not in trade_info:
             trade_info["open_time"] = datetime.utcnow().isoformat() + "Z"
 
-        # 添加到交易记录
+        # 追加到日志（只写这一条），再更新内存记录和计数
+        try:
+            self.trade_log.append({"type": "trade", "trade": trade_info})
+            self._appended += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"保存交易记录失败: {e}")
         self.trade_records.append(trade_info)
-
-        # 保存到文件
-        self._save_trade_records()
+        self._count_open(trade_info)
+        if self._appended >= self.compact_every:
+            self.compact()
 
         logger.info(f"添加交易记录: {trade_info}")
 
@@ -113,25 +209,7 @@ class TradePaceController:
         Returns:
             int: 开仓次数
         """
-        # 计算时间窗口
-        now = datetime.utcnow()
-        window_start = now - timedelta(days=self.lookback_days)
-
-        # 统计开仓次数
-        count = 0
-        for trade in self.trade_records:
-            try:
-                # 解析开仓时间
-                open_time_str = trade.get("open_time", trade.get("timestamp", ""))
-                if open_time_str:
-                    open_time = datetime.fromisoformat(open_time_str.replace("Z", ""))
-                    if open_time >= window_start:
-                        count += 1
-            except ValueError as e:
-                logger.error(f"解析交易时间失败: {e}")
-                continue
-
-        return count
+        return self._open_counter.count()
 
     def check_pace(self) -> dict[str, Any]:
         """
@@ -233,7 +311,12 @@ class TradePaceController:
         重置交易记录
         """
         self.trade_records = []
-        self._save_trade_records()
+        self._open_counter.reset()
+        try:
+            self.trade_log.append({"type": "reset"})
+            self._appended += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"保存交易记录失败: {e}")
         logger.info("交易记录已重置")
 
 
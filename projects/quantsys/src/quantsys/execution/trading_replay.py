@@ -2,19 +2,40 @@
 """
 实盘回放/复盘工具
 从ledger+evidence重放某日交易，输出复盘报告（信号→目标仓位→订单→成交→PNL），用于事故调查。
+
+当日事件通过按日分区的时间索引读取（见 ledger_time_index），不再逐日扫描整个账本；
+多日复盘可用 run_replays 在进程池中并行，账本只重放一次。
 """
 
 from __future__ import annotations
 
 import json
+import os
 import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any
 
+from src.quantsys.execution.ledger_time_index import LedgerTimeIndex
 from src.quantsys.execution.trade_ledger import EventType, LedgerEvent, TradeLedger
 
+# 进程池 worker 内的复盘管理器与账本最终状态（由 initializer 设置）
+_worker_state: dict[str, Any] = {}
+
+
+def _init_replay_worker(config: dict[str, Any], final_state: dict[str, Any]):
+    _worker_state["manager"] = TradingReplayManager(config, read_only_index=True)
+    _worker_state["final_state"] = final_state
+
+
+def _replay_date_in_worker(replay_date: date) -> dict[str, Any]:
+    return _worker_state["manager"].run_replay(
+        replay_date, final_state=_worker_state["final_state"]
+    )
+
 
 @dataclass
 class ReplayEvent:
@@ -47,12 +68,13 @@ class TradingReplayManager:
     """
     实盘回放/复盘管理器"""
 
-    def __init__(self, config: dict[str, Any] | None = None):
+    def __init__(self, config: dict[str, Any] | None = None, read_only_index: bool = False):
         """
         初始化回放管理器
 
         Args:
-            config: 配置信息
+            config: 配置信息；event_index_path 为时间索引目录，默认为账本路径去掉扩展名加 _time_index
+            read_only_index: 只读使用已同步的时间索引，不打开账本（并行复盘的子进程）
         """
         self.config = config or {
             "ledger_path": "data/trade_ledger.json",
@@ -63,7 +85,13 @@ class TradingReplayManager:
         }
 
         # 初始化组件
-        self.ledger = TradeLedger(self.config["ledger_path"])
+        self.read_only_index = read_only_index
+        self._ledger = None if read_only_index else TradeLedger(self.config["ledger_path"])
+        index_path = (
+            self.config.get("event_index_path")
+            or f"{os.path.splitext(self.config['ledger_path'])[0]}_time_index"
+        )
+        self.event_index = LedgerTimeIndex(index_path, read_only=read_only_index)
 
         # 创建报告目录
         self.reports_dir = Path(self.config["reports_path"])
@@ -75,6 +103,57 @@ class TradingReplayManager:
         self.replay_steps: list[ReplayStep] = []
         self.final_state: dict[str, Any] = {}
 
+    @property
+    def ledger(self) -> TradeLedger:
+        """
+        交易账本（只读索引模式下首次访问时才打开）
+        """
+        if self._ledger is None:
+            self._ledger = TradeLedger(self.config["ledger_path"])
+        return self._ledger
+
+    def close(self):
+        """
+        关闭账本，释放账本日志的写锁（同一账本同时只能有一个写入方）
+        """
+        if self._ledger is not None:
+            self._ledger.close()
+            self._ledger = None
+
+    def sync_event_index(self) -> int:
+        """
+        把账本新增事件同步到时间索引
+
+        Returns:
+            新索引的事件数
+        """
+        if self.read_only_index:
+            return 0
+        return self.event_index.sync(self.ledger)
+
+    def iter_events(self, start_ts: float, end_ts: float) -> Iterator[LedgerEvent]:
+        """
+        按时间顺序流式读取 [start_ts, end_ts) 内的事件，只读取涉及的日分区
+
+        Args:
+            start_ts: 起始时间戳（含）
+            end_ts: 结束时间戳（不含）
+        """
+        self.sync_event_index()
+        return self.event_index.iter_range(start_ts, end_ts)
+
+    def get_events_between(self, start_ts: float, end_ts: float) -> list[LedgerEvent]:
+        """
+        获取 [start_ts, end_ts) 内的事件，按时间排序（同一时间按账本顺序）
+
+        账本事件已在内存中时按索引给出的序号直接取，否则从日分区读取
+        """
+        if self._ledger is not None and self._ledger.events_loaded:
+            self.sync_event_index()
+            events = self._ledger.events
+            return [events[seq - 1] for seq in self.event_index.seqs_between(start_ts, end_ts)]
+        return list(self.iter_events(start_ts, end_ts))
+
     def _get_events_for_date(self, replay_date: date) -> list[LedgerEvent]:
         """
         获取指定日期的所有事件
@@ -89,15 +168,8 @@ class TradingReplayManager:
         start_ts = time.mktime(replay_date.timetuple())
         end_ts = start_ts + 86400  # 一天后的时间戳
 
-        # 过滤事件
-        filtered_events = [
-            event for event in self.ledger.events if start_ts <= event.timestamp < end_ts
-        ]
-
-        # 按时间排序
-        filtered_events.sort(key=lambda x: x.timestamp)
-
-        return filtered_events
+        # 从时间索引读取（已按时间排序）
+        return self.get_events_between(start_ts, end_ts)
 
     def _load_evidence_for_date(self, replay_date: date) -> dict[str, Any]:
         """
@@ -236,12 +308,15 @@ class TradingReplayManager:
 
         return replay_steps
 
-    def run_replay(self, replay_date: date) -> dict[str, Any]:
+    def run_replay(
+        self, replay_date: date, final_state: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
         """
         运行实盘回放
 
         Args:
             replay_date: 要回放的日期
+            final_state: 已重放得到的账本最终状态；为 None 时重放账本
 
         Returns:
             Dict[str, Any]: 回放结果
@@ -264,12 +339,16 @@ class TradingReplayManager:
         )
 
         # 步骤3: 重放ledger事件
-        print("步骤3: 重放ledger事件...")
-        replay_result = self.ledger.replay()
-        print(f"✓ 事件重放完成，共处理 {replay_result['total_events']} 个事件")
+        if final_state is None:
+            print("步骤3: 重放ledger事件...")
+            replay_result = self.ledger.replay()
+            print(f"✓ 事件重放完成，共处理 {replay_result['total_events']} 个事件")
+            final_state = replay_result["final_state"]
+        else:
+            print("步骤3: 使用已重放的账本状态")
 
         # 保存最终状态
-        self.final_state = replay_result["final_state"]
+        self.final_state = final_state
 
         # 步骤4: 创建复盘步骤
         print("步骤4: 创建复盘步骤...")
@@ -303,6 +382,33 @@ class TradingReplayManager:
             "evidence_path": str(evidence_path),
         }
 
+    def run_replays(self, replay_dates: list[date], max_workers: int = 1) -> list[dict[str, Any]]:
+        """
+        回放多个日期
+
+        账本只重放一次，各日期共享最终状态；每日事件由时间索引读取，
+        日期之间互不依赖，max_workers > 1 时在进程池中并行（子进程只读索引，不打开账本）。
+
+        Args:
+            replay_dates: 要回放的日期列表
+            max_workers: 进程数
+
+        Returns:
+            List[Dict[str, Any]]: 与 replay_dates 顺序一致的回放结果
+        """
+        self.sync_event_index()
+        final_state = self.ledger.replay()["final_state"]
+
+        if max_workers <= 1 or len(replay_dates) <= 1:
+            return [self.run_replay(replay_date, final_state) for replay_date in replay_dates]
+
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_replay_worker,
+            initargs=(self.config, final_state),
+        ) as executor:
+            return list(executor.map(_replay_date_in_worker, replay_dates))
+
     def generate_replay_report(self) -> dict[str, Any]:
         """
         生成复盘报告
@@ -7,12 +7,16 @@
 import logging
 import random
 from collections.abc import Callable
+from functools import partial
 
 import numpy as np
 import pandas as pd
 from ..data.database_manager import DatabaseManager
 from tqdm import tqdm
 
+from .factor_mining import BatchExpressionEvaluator, GreedyCorrelationPruner, rank_ic_matrix
+from .factor_value_writer import FactorValueWriter
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -20,6 +24,56 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# 算子使用模块级函数而非 lambda，以便随表达式图发送到进程池
+def _log(x):
+    return np.log(x)
+
+
+def _abs(x):
+    return np.abs(x)
+
+
+def _sqrt(x):
+    return np.sqrt(x)
+
+
+def _zscore(x):
+    std = x.std()
+    return (x - x.mean()) / std if std > 0 else 0
+
+
+def _rank(x):
+    return x.rank(pct=True)
+
+
+def _rolling(x, window, method):
+    return getattr(x.rolling(window=window), method)()
+
+
+def _add(x, y):
+    return x + y
+
+
+def _sub(x, y):
+    return x - y
+
+
+def _mul(x, y):
+    return x * y
+
+
+def _protected_div(x, y):
+    return x / (y + 1e-8)  # 避免除以零
+
+
+def _maximum(x, y):
+    return np.maximum(x, y)
+
+
+def _minimum(x, y):
+    return np.minimum(x, y)
+
+
 class AutoFactorGenerator:
     """
     自动因子生成器
@@ -27,7 +81,12 @@ class AutoFactorGenerator:
     """
 
     def __init__(
-        self, base_features: pd.DataFrame, symbol: str = "ETH/USDT", timeframe: str = "1h"
+        self,
+        base_features: pd.DataFrame,
+        symbol: str = "ETH/USDT",
+        timeframe: str = "1h",
+        max_workers: int = 1,
+        batch_size: int = 256,
     ):
         """
         初始化自动因子生成器
@@ -36,10 +95,14 @@ class AutoFactorGenerator:
             base_features: 基础特征矩阵
             symbol: 交易对
             timeframe: 时间周期
+            max_workers: 批量求值的进程数（1 表示在当前进程内求值）
+            batch_size: 每个进程任务包含的候选表达式数
         """
         self.base_features = base_features
         self.symbol = symbol
         self.timeframe = timeframe
+        self.max_workers = max_workers
+        self.batch_size = batch_size
         self.generated_factors = pd.DataFrame()
         self.factor_scores = {}  # 存储因子得分
 
@@ -75,18 +138,18 @@ class AutoFactorGenerator:
             unary_ops: 一元算子字典，键为算子名称，值为算子函数
         """
         return {
-            "log": lambda x: np.log(x),
-            "abs": lambda x: np.abs(x),
-            "sqrt": lambda x: np.sqrt(x),
-            "rank": lambda x: x.rank(pct=True),
-            "zscore": lambda x: (x - x.mean()) / x.std() if x.std() > 0 else 0,
-            "rolling_mean_12h": lambda x: x.rolling(window=12).mean(),
-            "rolling_mean_24h": lambda x: x.rolling(window=24).mean(),
-            "rolling_std_12h": lambda x: x.rolling(window=12).std(),
-            "rolling_std_48h": lambda x: x.rolling(window=48).std(),
-            "rolling_max_12h": lambda x: x.rolling(window=12).max(),
-            "rolling_min_12h": lambda x: x.rolling(window=12).min(),
-            "rolling_sum_12h": lambda x: x.rolling(window=12).sum(),
+            "log": _log,
+            "abs": _abs,
+            "sqrt": _sqrt,
+            "rank": _rank,
+            "zscore": _zscore,
+            "rolling_mean_12h": partial(_rolling, window=12, method="mean"),
+            "rolling_mean_24h": partial(_rolling, window=24, method="mean"),
+            "rolling_std_12h": partial(_rolling, window=12, method="std"),
+            "rolling_std_48h": partial(_rolling, window=48, method="std"),
+            "rolling_max_12h": partial(_rolling, window=12, method="max"),
+            "rolling_min_12h": partial(_rolling, window=12, method="min"),
+            "rolling_sum_12h": partial(_rolling, window=12, method="sum"),
         }
 
     def _define_binary_ops(self) -> dict[str, Callable]:
@@ -97,12 +160,12 @@ class AutoFactorGenerator:
             binary_ops: 二元算子字典，键为算子名称，值为算子函数
         """
         return {
-            "+": lambda x, y: x + y,
-            "-": lambda x, y: x - y,
-            "*": lambda x, y: x * y,
-            "/": lambda x, y: x / (y + 1e-8),  # 避免除以零
-            "max": lambda x, y: np.maximum(x, y),
-            "min": lambda x, y: np.minimum(x, y),
+            "+": _add,
+            "-": _sub,
+            "*": _mul,
+            "/": _protected_div,
+            "max": _maximum,
+            "min": _minimum,
         }
 
     def generate_factor_expressions(self, n_factors: int = 100) -> list[str]:
@@ -229,6 +292,62 @@ class AutoFactorGenerator:
             logger.error(f"计算IC失败: {e}")
             return 0
 
+    def _create_evaluator(self) -> BatchExpressionEvaluator:
+        """
+        以当前算子表构建批量求值器
+
+        与 evaluate_factor_expression 的 eval 环境一致：一元算子和 max/min 按函数名调用，
+        中缀 +、-、*、/ 为普通算术运算。
+        """
+        functions = dict(self.unary_ops)
+        for op_name, op_func in self.binary_ops.items():
+            if op_name.isidentifier():
+                functions[op_name] = op_func
+        return BatchExpressionEvaluator(
+            functions, max_workers=self.max_workers, batch_size=self.batch_size
+        )
+
+    def evaluate_factor_expressions(self, expressions: list[str]) -> pd.DataFrame:
+        """
+        批量计算因子表达式的值
+
+        所有表达式编译进一张共享表达式图，相同的子表达式（如多个候选共用的 rolling_std_12h(close)）
+        只计算一次；max_workers > 1 时按批在进程池中求值。
+
+        Args:
+            expressions: 因子表达式列表
+
+        Returns:
+            factor_matrix: 因子值矩阵，列顺序与 expressions 一致，列名为表达式；求值失败的列为 NaN
+        """
+        evaluator = self._create_evaluator()
+        with tqdm(total=len(expressions), desc="计算因子") as progress:
+            values, errors = evaluator.evaluate(
+                self.base_features, expressions, on_batch=progress.update
+            )
+        for expr, error in errors.items():
+            logger.error(f"评估因子表达式失败: {expr}, 错误: {error}")
+        logger.info(f"批量求值统计: {evaluator.last_stats}")
+        return pd.DataFrame(values, index=self.base_features.index, columns=expressions)
+
+    def calculate_factor_ics(self, factor_matrix: pd.DataFrame, labels: pd.Series) -> pd.Series:
+        """
+        以矩阵运算计算所有因子的信息系数(IC)，结果与逐列 calculate_factor_ic 一致
+
+        Args:
+            factor_matrix: 因子值矩阵
+            labels: 标签序列（未来收益率）
+
+        Returns:
+            ics: 各因子的IC
+        """
+        common_index = factor_matrix.index.intersection(labels.index)
+        ics = rank_ic_matrix(
+            factor_matrix.loc[common_index].to_numpy(dtype=np.float64),
+            labels.loc[common_index].to_numpy(dtype=np.float64),
+        )
+        return pd.Series(ics, index=factor_matrix.columns)
+
     def generate_factors(self, n_factors: int = 100, labels: pd.Series = None) -> pd.DataFrame:
         """
         生成因子
@@ -244,31 +363,32 @@ class AutoFactorGenerator:
 
         # 生成因子表达式
         factor_expressions = self.generate_factor_expressions(n_factors)
+        factor_names = [f"factor_{i + 1}" for i in range(len(factor_expressions))]
 
-        # 计算因子值
-        generated_factors = pd.DataFrame()
-        self.factor_scores = {}
-
+        # 计算因子值（重复表达式只求值、打分一次）
         logger.info("计算因子值...")
-        for i, expr in tqdm(
-            enumerate(factor_expressions), desc="计算因子", total=len(factor_expressions)
-        ):
-            factor_name = f"factor_{i + 1}"
-            # logger.info(f"计算因子 {factor_name}: {expr}")
-
-            # 计算因子值
-            factor_values = self.evaluate_factor_expression(expr)
-            generated_factors[factor_name] = factor_values
-
-            # 计算因子得分
-            if labels is not None:
-                ic = self.calculate_factor_ic(factor_values, labels)
+        unique_expressions = list(dict.fromkeys(factor_expressions))
+        unique_factors = self.evaluate_factor_expressions(unique_expressions)
+        generated_factors = unique_factors[factor_expressions]
+        generated_factors.columns = factor_names
+
+        # 计算因子得分
+        self.factor_scores = {}
+        if labels is not None:
+            ics = self.calculate_factor_ics(unique_factors, labels)
+            for factor_name, expr in zip(factor_names, factor_expressions):
+                ic = float(ics[expr])
                 self.factor_scores[factor_name] = {"expression": expr, "ic": ic, "abs_ic": abs(ic)}
-                # 每10个因子打印一次IC值
-                if (i + 1) % 10 == 0 or i == len(factor_expressions) - 1:
-                    logger.info(f"因子 {factor_name} 的IC: {ic:.4f}")
+            logger.info(f"IC计算完成，平均绝对IC: {ics.abs().mean():.4f}")
 
-            # 将因子保存到因子库
+        # 将因子保存到因子库
+        value_writer = FactorValueWriter(db_manager=self.db_manager)
+        try:
+            value_writer.ensure_unique_key()
+        except Exception as e:
+            logger.error(f"创建因子值唯一索引失败，批量 upsert 将无法执行: {e}")
+        saved = 0
+        for factor_name, expr in zip(factor_names, factor_expressions):
             try:
                 # 插入因子信息到factors表
                 factor_id = self.db_manager.insert_factor(
@@ -277,21 +397,18 @@ class AutoFactorGenerator:
                     type="ai_ml",  # AI/ML因子类型
                     calculation_method=expr,
                 )
-
-                # 保存因子值到factor_values表
-                for timestamp, value in factor_values.items():
-                    if not pd.isna(value):
-                        self.db_manager.insert_factor_value(
-                            timestamp=timestamp,
-                            symbol=self.symbol,
-                            timeframe=self.timeframe,
-                            factor_id=factor_id,
-                            value=value,
-                        )
-
-                logger.info(f"因子 {factor_name} 已保存到因子库")
+                # 因子值缓冲后按批写入factor_values表
+                value_writer.add(
+                    self.symbol, self.timeframe, factor_id, generated_factors[factor_name]
+                )
+                saved += 1
             except Exception as e:
                 logger.error(f"保存因子 {factor_name} 到因子库失败: {e}")
+        value_writer.flush()
+        if value_writer.pending_rows:
+            logger.error(f"保存因子值到因子库失败: {value_writer.pending_rows} 行未写入")
+        else:
+            logger.info(f"{saved} 个因子已保存到因子库")
 
         logger.info(f"因子生成完成，共生成 {len(generated_factors.columns)} 个因子")
 
@@ -302,6 +419,9 @@ class AutoFactorGenerator:
         """
         过滤因子
 
+        先按IC过滤，再按绝对IC从高到低增量贪心去相关：候选只与已入选因子比较，
+        与任一已入选因子的绝对相关系数超过 max_corr 即被剔除。
+
         Args:
             min_abs_ic: 最小绝对IC值
             max_corr: 最大相关性
@@ -324,19 +444,18 @@ class AutoFactorGenerator:
             logger.warning("没有满足IC条件的因子")
             return self.generated_factors
 
-        # 2. 按相关性过滤
-        filtered_factors = []
+        # 2. 按相关性过滤（IC高者优先入选）
+        high_ic_factors.sort(key=lambda factor: self.factor_scores[factor]["abs_ic"], reverse=True)
+        pruner = GreedyCorrelationPruner(max_corr, len(self.generated_factors))
+        offered = set()
         for factor in high_ic_factors:
-            # 检查与已选因子的相关性
-            if not filtered_factors:
-                filtered_factors.append(factor)
-            else:
-                # 计算与所有已选因子的相关性
-                corr_matrix = self.generated_factors[[factor] + filtered_factors].corr()
-                max_correlation = corr_matrix.loc[factor, filtered_factors].abs().max()
-
-                if max_correlation <= max_corr:
-                    filtered_factors.append(factor)
+            # 表达式相同的重复候选与首个同名候选完全相关，直接跳过
+            expression = self.factor_scores[factor]["expression"]
+            if expression in offered:
+                continue
+            offered.add(expression)
+            pruner.offer(factor, self.generated_factors[factor].to_numpy(dtype=np.float64))
+        filtered_factors = pruner.names
 
         logger.info(
             f"因子过滤完成，从 {len(high_ic_factors)} 个高IC因子中选择了 {len(filtered_factors)} 个低相关性因子"
@@ -394,11 +513,8 @@ class AutoFactorGenerator:
 
         # 选择得分最高的n_best个因子
         if labels is not None:
-            # 计算每个因子的IC值
-            ic_scores = {
-                factor: abs(self.calculate_factor_ic(filtered_factors[factor], labels))
-                for factor in filtered_factors.columns
-            }
+            # 批量计算每个因子的IC值
+            ic_scores = self.calculate_factor_ics(filtered_factors, labels).abs().to_dict()
 
             # 按IC值降序排序
             sorted_factors = sorted(ic_scores.items(), key=lambda x: x[1], reverse=True)
@@ -1,31 +1,80 @@
 #!/usr/bin/env python3
 
 """
-因子计算引擎：按依赖排序批计算，输出统一格式与可用性标记
+因子计算引擎：编译因子公式，按依赖分层并行批计算，输出统一格式与可用性标记
+
+因子规格（dict）字段：
+- code / name: 因子代码与名称
+- formula: 公式表达式（见 factor_expression），可引用行情列、参数和其他因子代码；
+  旧版裸函数名 rolling_mean / rolling_std / returns 等价于 name(dependencies[0], window)
+- dependencies: 依赖的因子代码或行情列
+- window / params: 公式参数，window 缺省或为 "configurable" 时取 20
+- output_col: 输出列名，缺省为 code
 """
 
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from .factor_expression import LEGACY_FORMULAS, ExpressionGraph, FormulaError
 from .factor_registry import FactorRegistry
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_WINDOW = 20
+
+
+@dataclass(frozen=True)
+class AvailabilityMask:
+    """
+    按位压缩的可用性掩码（np.packbits，每 8 个 bar 占 1 字节）
+    """
+
+    bits: np.ndarray
+    length: int
+
+    @classmethod
+    def from_bool(cls, values) -> AvailabilityMask:
+        values = np.asarray(values, dtype=bool)
+        return cls(np.packbits(values), len(values))
+
+    @classmethod
+    def full(cls, length: int, available: bool) -> AvailabilityMask:
+        return cls.from_bool(np.full(length, available))
+
+    def to_numpy(self) -> np.ndarray:
+        return np.unpackbits(self.bits, count=self.length).astype(bool)
+
+    def to_series(self, index) -> pd.Series:
+        return pd.Series(self.to_numpy(), index=index)
+
+    def count(self) -> int:
+        return int(np.unpackbits(self.bits, count=self.length).sum())
+
+    def __and__(self, other: AvailabilityMask) -> AvailabilityMask:
+        return AvailabilityMask(self.bits & other.bits, self.length)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.bits.nbytes)
+
 
 class FactorEngine:
-    """因子计算引擎，按依赖顺序批量计算"""
+    """因子计算引擎，编译公式并按依赖分层批量计算"""
 
-    def __init__(self, registry_path: str = None):
+    def __init__(self, registry_path: str = None, max_workers: int = 1):
         """初始化因子引擎"""
         self.registry = FactorRegistry(registry_path) if registry_path else None
+        self.max_workers = max_workers
         self.factor_specs: dict[str, dict[str, Any]] = {}
-        self.availability_masks: dict[str, pd.Series] = {}
+        self.availability_masks: dict[str, AvailabilityMask] = {}
 
     def register_factor(self, spec: dict[str, Any]):
         """注册因子规格"""
@@ -41,7 +90,7 @@ class FactorEngine:
         deps = set()
         spec = self.factor_specs[code]
 
-        for dep in spec.dependencies:
+        for dep in spec.get("dependencies", []):
             deps.add(dep)
             if dep in self.factor_specs:
                 deps.update(self._get_dependencies(dep))
@@ -50,15 +99,16 @@ class FactorEngine:
 
     def _topological_sort(self) -> list[str]:
         """对因子进行拓扑排序，确保依赖先计算"""
-        # 构建依赖图
-        graph = {code: spec["dependencies"] for code, spec in self.factor_specs.items()}
-
-        # 计算入度
-        in_degree = dict.fromkeys(graph, 0)
-        for code in graph:
-            for dep in graph[code]:
-                if dep in in_degree:
-                    in_degree[dep] += 1
+        # 入度 = 尚未排出的已注册依赖数
+        in_degree = {
+            code: sum(dep in self.factor_specs for dep in spec.get("dependencies", []))
+            for code, spec in self.factor_specs.items()
+        }
+        dependents: dict[str, list[str]] = {code: [] for code in self.factor_specs}
+        for code, spec in self.factor_specs.items():
+            for dep in spec.get("dependencies", []):
+                if dep in dependents:
+                    dependents[dep].append(code)
 
         # 拓扑排序
         result = []
@@ -68,11 +118,10 @@ class FactorEngine:
             code = queue.pop(0)
             result.append(code)
 
-            for neighbor in graph[code]:
-                if neighbor in in_degree:
-                    in_degree[neighbor] -= 1
-                    if in_degree[neighbor] == 0:
-                        queue.append(neighbor)
+            for neighbor in dependents[code]:
+                in_degree[neighbor] -= 1
+                if in_degree[neighbor] == 0:
+                    queue.append(neighbor)
 
         # 检查是否有环
         if len(result) != len(self.factor_specs):
@@ -80,60 +129,175 @@ class FactorEngine:
 
         return result
 
-    def calculate(self, data: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-        """批量计算因子，返回结果和可用性掩码"""
+    @staticmethod
+    def _spec_params(spec: dict[str, Any]) -> dict[str, float]:
+        window = spec.get("window", DEFAULT_WINDOW)
+        try:
+            window = int(window)
+        except (TypeError, ValueError):
+            window = DEFAULT_WINDOW
+        return {"window": window, **spec.get("params", {})}
+
+    @staticmethod
+    def _spec_formula(spec: dict[str, Any]) -> str:
+        formula = (spec.get("formula") or "").strip()
+        dependencies = spec.get("dependencies", [])
+        if formula in LEGACY_FORMULAS:
+            if not dependencies:
+                raise FormulaError(f"公式 {formula} 需要至少一个依赖")
+            if formula == "returns":
+                return f"returns({dependencies[0]})"
+            return f"{formula}({dependencies[0]}, window)"
+        if not formula:
+            if not dependencies:
+                raise FormulaError("缺少公式和依赖")
+            # 与旧版默认行为一致：直接输出第一个依赖
+            return dependencies[0]
+        return formula
+
+    def _resolvable(self, name, params, output_cols, columns) -> bool:
+        return name in params or name in self.factor_specs or name in output_cols or name in columns
+
+    def compile(self, columns) -> tuple[ExpressionGraph, dict[str, int], dict[str, str]]:
+        """
+        把所有已注册因子编译进一张共享表达式图
+
+        Returns:
+            (表达式图, 因子代码 -> 根节点, 编译失败的因子代码 -> 错误信息)
+        """
+        graph = ExpressionGraph()
+        columns = set(columns)
+        roots: dict[str, int] = {}
+        errors: dict[str, str] = {}
+        output_cols = {
+            spec.get("output_col", code): code for code, spec in self.factor_specs.items()
+        }
+        compiling: list[str] = []
+
+        def compile_factor(code: str) -> int:
+            if code in roots:
+                return roots[code]
+            if code in errors:
+                raise FormulaError(f"依赖因子 {code} 不可用: {errors[code]}")
+            if code in compiling:
+                raise FormulaError(f"因子依赖存在环: {' -> '.join([*compiling, code])}")
+
+            spec = self.factor_specs[code]
+            params = self._spec_params(spec)
+
+            def resolve(name: str) -> int:
+                if name in params:
+                    return graph.add("const", float(params[name]))
+                if name in self.factor_specs:
+                    return compile_factor(name)
+                if name in output_cols:
+                    return compile_factor(output_cols[name])
+                if name in columns:
+                    return graph.add("column", name)
+                raise FormulaError(f"因子 {code} 依赖 {name} 不存在")
+
+            compiling.append(code)
+            try:
+                for dep in spec.get("dependencies", []):
+                    if (
+                        dep not in self.factor_specs
+                        and dep not in output_cols
+                        and dep not in columns
+                    ):
+                        raise FormulaError(f"因子 {code} 依赖 {dep} 不存在")
+                formula = self._spec_formula(spec)
+                if formula.isidentifier() and not self._resolvable(
+                    formula, params, output_cols, columns
+                ):
+                    # 旧版占位公式名（无法解析为表达式）：与原默认行为一致，输出第一个依赖
+                    logger.warning(f"因子 {code} 公式 {formula} 无法解析，按旧版规则输出第一个依赖")
+                    formula = spec.get("dependencies", [formula])[0]
+                roots[code] = graph.compile(formula, resolve)
+            except FormulaError as exc:
+                errors[code] = str(exc)
+                raise
+            finally:
+                compiling.pop()
+            return roots[code]
+
+        for code in self.factor_specs:
+            try:
+                compile_factor(code)
+            except FormulaError as exc:
+                errors.setdefault(code, str(exc))
+
+        return graph, roots, errors
+
+    def calculate(
+        self, data: pd.DataFrame, max_workers: int | None = None
+    ) -> tuple[pd.DataFrame, dict[str, AvailabilityMask]]:
+        """
+        批量计算因子，返回结果和按位压缩的可用性掩码
+
+        所有因子公式编译进同一张表达式图，公共子表达式只计算一次；
+        图按依赖深度分层，同层节点在 max_workers 个线程中并行求值。
+        编译或求值失败的因子输出全 NaN 的 float64 列，可用性全为 False。
+        """
+        max_workers = self.max_workers if max_workers is None else max_workers
         logger.info(f"开始计算 {len(self.factor_specs)} 个因子")
 
-        # 拓扑排序
+        # 拓扑排序（同时检查注册依赖是否成环）
         sorted_codes = self._topological_sort()
         logger.info(f"因子计算顺序: {', '.join(sorted_codes)}")
 
-        # 准备结果和掩码
-        result = pd.DataFrame(index=data.index)
-        availability = pd.DataFrame(index=data.index, columns=sorted_codes, dtype=bool)
-        availability[:] = True
+        graph, roots, errors = self.compile(data.columns)
+        for code, message in errors.items():
+            logger.error(f"因子 {code} 编译失败，跳过计算: {message}")
+        levels = graph.levels(roots.values())
+        logger.info(
+            f"表达式图: {len(graph.nodes)} 个节点, {len(levels)} 层, "
+            f"公共子表达式复用 {graph.shared_hits} 次"
+        )
 
-        # 计算每个因子
-        for code in tqdm(sorted_codes):
+        with tqdm(total=len(levels)) as progress:
+            values = graph.evaluate(
+                data, roots, max_workers=max_workers, on_level=lambda _: progress.update(1)
+            )
+
+        # 准备结果和掩码
+        columns = {}
+        self.availability_masks = {}
+        for code in sorted_codes:
             spec = self.factor_specs[code]
-            logger.info(f"计算因子: {spec['code']} ({spec['name']})")
-
-            # 检查依赖是否可用
-            dep_available = True
-            for dep in spec["dependencies"]:
-                if dep not in result.columns and dep not in data.columns:
-                    logger.error(f"因子 {code} 依赖 {dep} 不存在，跳过计算")
-                    availability[code] = False
-                    dep_available = False
-                    break
-
-            if not dep_available:
+            output_col = spec.get("output_col", code)
+            value = values.get(code)
+
+            if code in errors or isinstance(value, Exception):
+                # 编译失败与求值失败输出同样的列：全 NaN 的 float64，可用性全为 False
+                if code not in errors:
+                    logger.error(f"计算因子 {code} 失败: {value}")
+                self.availability_masks[code] = AvailabilityMask.full(len(data), False)
+                columns[output_col] = pd.Series(np.nan, index=data.index, name=output_col)
                 continue
+            if not isinstance(value, pd.Series):
+                # 常量公式
+                value = pd.Series(value, index=data.index, dtype=np.float64)
 
-            # 简单的因子计算示例（实际实现需要根据formula进行）
-            try:
-                # 这里使用简单的计算作为示例，实际应该根据formula解析执行
-                if spec["formula"] == "rolling_mean":
-                    result[spec["output_col"]] = data[spec["dependencies"][0]].rolling(20).mean()
-                elif spec["formula"] == "rolling_std":
-                    result[spec["output_col"]] = data[spec["dependencies"][0]].rolling(20).std()
-                elif spec["formula"] == "returns":
-                    result[spec["output_col"]] = data[spec["dependencies"][0]].pct_change()
-                else:
-                    # 默认计算
-                    result[spec["output_col"]] = data[spec["dependencies"][0]]
-
-                # 计算可用性掩码
-                availability[code] = result[spec["output_col"]].notna()
-            except Exception as e:
-                logger.error(f"计算因子 {code} 失败: {e}")
-                availability[code] = False
-                result[spec["output_col"]] = None
-
-        return result, availability
+            columns[output_col] = value.rename(output_col)
+            self.availability_masks[code] = AvailabilityMask.from_bool(value.notna().to_numpy())
+
+        result = pd.DataFrame(columns, index=data.index)
+        return result, self.availability_masks
+
+    @staticmethod
+    def availability_frame(
+        availability: dict[str, AvailabilityMask], index: pd.Index
+    ) -> pd.DataFrame:
+        """展开为 bool DataFrame（兼容按列读取掩码的调用方）"""
+        return pd.DataFrame(
+            {code: mask.to_numpy() for code, mask in availability.items()}, index=index
+        )
 
     def save_results(
-        self, result: pd.DataFrame, availability: pd.DataFrame, output_dir: str = "factors"
+        self,
+        result: pd.DataFrame,
+        availability: dict[str, AvailabilityMask] | pd.DataFrame,
+        output_dir: str = "factors",
     ):
         """保存计算结果到文件"""
         output_path = Path(output_dir)
@@ -144,9 +308,29 @@ class FactorEngine:
         result.to_parquet(result_path)
         logger.info(f"因子结果已保存到: {result_path}")
 
-        # 保存可用性掩码
+        # 保存可用性掩码：每个因子一行，bits 为 packbits 字节
+        if isinstance(availability, pd.DataFrame):
+            availability = {
+                code: AvailabilityMask.from_bool(availability[code].to_numpy(dtype=bool))
+                for code in availability.columns
+            }
         availability_path = output_path / "availability_mask.parquet"
-        availability.to_parquet(availability_path)
+        pd.DataFrame(
+            {
+                "code": list(availability),
+                "length": [mask.length for mask in availability.values()],
+                "bits": [mask.bits.tobytes() for mask in availability.values()],
+            }
+        ).to_parquet(availability_path)
         logger.info(f"可用性掩码已保存到: {availability_path}")
 
         return result_path, availability_path
+
+    @staticmethod
+    def load_availability(path) -> dict[str, AvailabilityMask]:
+        """读取 save_results 保存的可用性掩码"""
+        frame = pd.read_parquet(path)
+        return {
+            row.code: AvailabilityMask(np.frombuffer(row.bits, dtype=np.uint8), int(row.length))
+            for row in frame.itertuples(index=False)
+        }
@@ -15,6 +15,7 @@ import numpy as np
 import pandas as pd
 
 from src.quantsys.factors.factor_registry import FactorMeta, FactorRegistry
+from src.quantsys.factors.rank_ic import rolling_spearman, spearman_ic_matrix
 
 PROMPT_POLICY = "因子评价仅限统计相关性与分层表现，不得引用回测交易结果或策略执行逻辑。"
 
@@ -37,16 +38,22 @@ class FactorEvaluator:
         return close.pct_change(periods=horizon).shift(-horizon)
 
     def _compute_ic(self, factor: pd.Series, returns: pd.Series) -> float:
-        aligned = pd.concat([factor, returns], axis=1).dropna()
-        if len(aligned) < 3:
-            return float("nan")
-        return float(aligned.iloc[:, 0].corr(aligned.iloc[:, 1], method="spearman"))
+        aligned = pd.concat([factor, returns], axis=1)
+        return float(spearman_ic_matrix(aligned.iloc[:, [0]], aligned.iloc[:, [1]])[0, 0])
+
+    def _decay_targets(self, returns: pd.Series) -> pd.DataFrame:
+        # Column 0 is the unshifted return, column lag is returns.shift(-lag)
+        return pd.concat(
+            [returns.shift(-lag) for lag in range(self.decay_lags + 1)],
+            axis=1,
+            keys=range(self.decay_lags + 1),
+        )
 
     def _decay_profile(self, factor: pd.Series, returns: pd.Series) -> dict[str, float]:
-        profile = {}
-        for lag in range(1, self.decay_lags + 1):
-            profile[str(lag)] = self._compute_ic(factor, returns.shift(-lag))
-        return profile
+        targets = self._decay_targets(returns).iloc[:, 1:]
+        aligned = pd.concat([factor, targets], axis=1)
+        ics = spearman_ic_matrix(aligned.iloc[:, [0]], aligned.iloc[:, 1:])[0]
+        return {str(lag): float(ic) for lag, ic in zip(targets.columns, ics)}
 
     def _layered_returns(self, factor: pd.Series, returns: pd.Series) -> dict[str, Any]:
         aligned = pd.concat([factor, returns], axis=1).dropna()
@@ -65,10 +72,7 @@ class FactorEvaluator:
         aligned = pd.concat([factor, returns], axis=1).dropna()
         if len(aligned) < self.rolling_window:
             return {"mean_ic": float("nan"), "std_ic": float("nan"), "ic_ir": float("nan")}
-        ic_values = []
-        for i in range(self.rolling_window, len(aligned) + 1):
-            window = aligned.iloc[i - self.rolling_window : i]
-            ic_values.append(window.iloc[:, 0].corr(window.iloc[:, 1], method="spearman"))
+        ic_values = rolling_spearman(aligned.iloc[:, 0], aligned.iloc[:, 1], self.rolling_window)
         ic_series = pd.Series(ic_values).dropna()
         if ic_series.empty:
             return {"mean_ic": float("nan"), "std_ic": float("nan"), "ic_ir": float("nan")}
@@ -125,6 +129,13 @@ class FactorEvaluator:
         series.name = factor_code
         return series
 
+    def _resolve_factor_codes(
+        self, factor_functions: dict[str, Any], factor_codes: Iterable[str] | None
+    ) -> list[str]:
+        if factor_codes is not None:
+            return list(factor_codes)
+        return [code for code in self.registry.list_registered() if code in factor_functions]
+
     def _apply_availability_lag(self, factor: pd.Series, meta: FactorMeta) -> pd.Series:
         if meta.availability_lag < 0:
             raise ValueError("availability_lag must be >= 0")
@@ -136,10 +147,17 @@ class FactorEvaluator:
         self,
         df: pd.DataFrame,
         factor_functions: dict[str, Any],
-        factor_codes: Iterable[str],
+        factor_codes: Iterable[str] | None,
         symbol: str,
         timeframe: str,
     ) -> dict[str, Any]:
+        """
+        Evaluate factors on one symbol/timeframe.
+
+        factor_codes=None scores every registered factor that has an entry in
+        factor_functions. ICs and decay profiles of all factors, horizons and lags
+        are computed together by rank_ic.spearman_ic_matrix.
+        """
         df = df.copy()
         df.index = pd.to_datetime(df.index)
         close = df["close"]
@@ -160,48 +178,95 @@ class FactorEvaluator:
             "factors": {},
         }
 
+        factor_codes = self._resolve_factor_codes(factor_functions, factor_codes)
+        metas = {}
+        leakage_checks = {}
+        factor_series = {}
         for factor_code in factor_codes:
             meta = self.registry.get_meta(factor_code)
             factor_func = factor_functions[factor_code]
-            leakage = self._detect_future_leakage(factor_code, factor_func, df)
+            leakage_checks[factor_code] = self._detect_future_leakage(factor_code, factor_func, df)
             factor_values = factor_func(df.copy())
-            factor_series = self._extract_series(factor_code, factor_values)
-            factor_series = self._apply_availability_lag(factor_series, meta)
+            series = self._extract_series(factor_code, factor_values)
+            factor_series[factor_code] = self._apply_availability_lag(series, meta)
+            metas[factor_code] = meta
+
+        # Score every factor x horizon x decay lag as one rank-IC matrix job
+        horizons = [int(horizon) for horizon in self.horizons]
+        forward_returns = {
+            horizon: self._get_forward_returns(close, horizon) for horizon in horizons
+        }
+        targets = pd.concat(
+            [self._decay_targets(forward_returns[horizon]) for horizon in horizons],
+            axis=1,
+            keys=horizons,
+        ).reindex(close.index)
+        factors = pd.DataFrame(
+            {code: series.reindex(close.index) for code, series in factor_series.items()},
+            index=close.index,
+            columns=list(factor_codes),
+        )
+        ic_matrix = pd.DataFrame(
+            spearman_ic_matrix(factors, targets), index=factors.columns, columns=targets.columns
+        )
 
+        for factor_code in factor_codes:
+            series = factors[factor_code]
             metrics = {}
-            for horizon in self.horizons:
-                horizon = int(horizon)
-                forward_returns = self._get_forward_returns(close, horizon)
-                ic = self._compute_ic(factor_series, forward_returns)
-                rank_ic = ic
-                decay = self._decay_profile(factor_series, forward_returns)
-                layered = self._layered_returns(factor_series, forward_returns)
-                stability = self._rolling_stability(factor_series, forward_returns)
+            for horizon in horizons:
+                ics = ic_matrix.loc[factor_code, horizon]
+                ic = float(ics[0])
                 metrics[str(horizon)] = {
                     "ic": ic,
-                    "rank_ic": rank_ic,
-                    "decay": decay,
-                    "layered_returns": layered,
-                    "stability": stability,
+                    "rank_ic": ic,
+                    "decay": {str(lag): float(ics[lag]) for lag in ics.index[1:]},
+                    "layered_returns": self._layered_returns(series, forward_returns[horizon]),
+                    "stability": self._rolling_stability(series, forward_returns[horizon]),
                 }
 
             report["factors"][factor_code] = {
-                "meta": asdict(meta),
-                "leakage_check": leakage,
+                "meta": asdict(metas[factor_code]),
+                "leakage_check": leakage_checks[factor_code],
                 "metrics": metrics,
             }
 
         return report
 
-    def write_reports(self, report: dict[str, Any]) -> dict[str, str]:
-        root = Path(__file__).resolve().parents[3]
-        reports_dir = root / "reports"
+    def score_table(self, report: dict[str, Any]) -> pd.DataFrame:
+        """
+        Flatten a report into one row per factor and horizon.
+        """
+        rows = []
+        for code, entry in report["factors"].items():
+            for horizon, metrics in entry["metrics"].items():
+                row = {
+                    "factor": code,
+                    "horizon": int(horizon),
+                    "ic": metrics["ic"],
+                    "rank_ic": metrics["rank_ic"],
+                    **metrics["stability"],
+                    "top_bottom_spread": metrics["layered_returns"]["top_bottom_spread"],
+                    "leakage": entry["leakage_check"].get("leakage", False),
+                }
+                for lag, ic in metrics["decay"].items():
+                    row[f"decay_{lag}"] = ic
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+    def write_reports(
+        self, report: dict[str, Any], reports_dir: str | Path | None = None
+    ) -> dict[str, str]:
+        if reports_dir is None:
+            reports_dir = Path(__file__).resolve().parents[3] / "reports"
+        reports_dir = Path(reports_dir)
         reports_dir.mkdir(parents=True, exist_ok=True)
 
         report_path = reports_dir / "factor_eval_report.json"
         summary_path = reports_dir / "factor_eval_summary.md"
+        scores_path = reports_dir / "factor_eval_scores.csv"
 
         report_path.write_text(json.dumps(report, indent=2, ensure_ascii=True), encoding="utf-8")
+        self.score_table(report).to_csv(scores_path, index=False)
 
         summary_lines = [
             "# Factor Evaluation Summary",
@@ -210,6 +275,7 @@ class FactorEvaluator:
             f"- generated_at: {report['generated_at']}",
             f"- symbol: {report['symbol']}",
             f"- timeframe: {report['timeframe']}",
+            f"- factors: {len(report['factors'])}",
             "",
             "## Top Factors (abs IC)",
         ]
@@ -222,10 +288,16 @@ class FactorEvaluator:
             first_horizon = sorted(metrics.keys(), key=int)[0]
             ic_val = metrics[first_horizon].get("ic")
             rows.append((code, ic_val))
-        rows = sorted(rows, key=lambda x: abs(x[1]) if x[1] is not None else -1, reverse=True)
+        rows = sorted(
+            rows, key=lambda x: abs(x[1]) if x[1] is not None and x[1] == x[1] else -1, reverse=True
+        )
 
         for code, ic_val in rows[:10]:
             summary_lines.append(f"- {code}: ic={ic_val:.6f}")
 
         summary_path.write_text("\n".join(summary_lines), encoding="utf-8")
-        return {"report": str(report_path), "summary": str(summary_path)}
+        return {
+            "report": str(report_path),
+            "summary": str(summary_path),
+            "scores": str(scores_path),
+        }
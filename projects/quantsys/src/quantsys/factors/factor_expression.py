@@ -0,0 +1,303 @@
+"""
+因子公式编译器
+
+把注册表中的因子公式（Python 表达式子集）编译进一张共享的表达式图：
+
+    rolling_mean(close, window) / rolling_std(returns(close), 2 * window)
+
+- 叶子为行情列、数值常量或参数名（参数在编译时替换为常量，因此窗口可参数化）
+- 引用其他因子代码时直接接入该因子的根节点，依赖关系由图结构表达
+- 公共子表达式消除：结构相同的节点（加法、乘法对操作数排序后）只保留一个，
+  多个因子共享同一次计算
+- 按依赖深度分层，同层节点互不依赖，可并行求值；中间结果在最后一个使用者求值后释放
+"""
+
+from __future__ import annotations
+
+import ast
+import inspect
+import logging
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def _window(value) -> int:
+    window = int(value)
+    if window != value or window < 1:
+        raise FormulaError(f"窗口参数必须为正整数: {value}")
+    return window
+
+
+def _rank(x, window):
+    return x.rolling(_window(window)).rank(pct=True)
+
+
+def _zscore(x, window):
+    rolling = x.rolling(_window(window))
+    return (x - rolling.mean()) / rolling.std()
+
+
+# 函数名 -> 实现；窗口/阶数参数须为常量
+FUNCTIONS = {
+    "rolling_mean": lambda x, window: x.rolling(_window(window)).mean(),
+    "rolling_std": lambda x, window: x.rolling(_window(window)).std(),
+    "rolling_sum": lambda x, window: x.rolling(_window(window)).sum(),
+    "rolling_min": lambda x, window: x.rolling(_window(window)).min(),
+    "rolling_max": lambda x, window: x.rolling(_window(window)).max(),
+    "rolling_median": lambda x, window: x.rolling(_window(window)).median(),
+    "rank": _rank,
+    "zscore": _zscore,
+    "ema": lambda x, span: x.ewm(span=_window(span), adjust=False).mean(),
+    "delay": lambda x, periods=1: x.shift(_window(periods)),
+    "delta": lambda x, periods=1: x.diff(_window(periods)),
+    "returns": lambda x, periods=1: x.pct_change(_window(periods)),
+    "corr": lambda x, y, window: x.rolling(_window(window)).corr(y),
+    "cov": lambda x, y, window: x.rolling(_window(window)).cov(y),
+    "abs": lambda x: np.abs(x),
+    "log": lambda x: np.log(x),
+    "sqrt": lambda x: np.sqrt(x),
+    "sign": lambda x: np.sign(x),
+}
+
+# 旧版规格中的裸函数名公式，等价于 name(dependencies[0], window)
+LEGACY_FORMULAS = {"rolling_mean", "rolling_std", "returns"}
+
+_BINARY_OPS = {
+    ast.Add: ("add", operator.add),
+    ast.Sub: ("sub", operator.sub),
+    ast.Mult: ("mul", operator.mul),
+    ast.Div: ("div", operator.truediv),
+    ast.Pow: ("pow", operator.pow),
+}
+
+_COMPARE_OPS = {
+    ast.Gt: ("gt", operator.gt),
+    ast.GtE: ("ge", operator.ge),
+    ast.Lt: ("lt", operator.lt),
+    ast.LtE: ("le", operator.le),
+}
+
+_COMMUTATIVE = {"add", "mul"}
+
+_OPERATORS = {name: func for name, func in (*_BINARY_OPS.values(), *_COMPARE_OPS.values())}
+
+
+@dataclass(frozen=True)
+class ExprNode:
+    """
+    表达式图节点
+
+    kind: column（行情列）/ const（常量）/ call（函数）/ op（二元运算、比较）/ neg
+    """
+
+    kind: str
+    value: object
+    args: tuple[int, ...] = ()
+
+
+class ExpressionGraph:
+    """
+    多个因子公式共享的表达式图（hash-consing 实现公共子表达式消除）
+
+    Args:
+        functions: 可调用的函数表，默认 FUNCTIONS
+        operators: 运算符实现覆盖（add/sub/mul/div/pow/gt/ge/lt/le），如保护除法
+    """
+
+    def __init__(self, functions: dict | None = None, operators: dict | None = None):
+        self.functions = FUNCTIONS if functions is None else functions
+        self.operators = {**_OPERATORS, **(operators or {})}
+        self.nodes: list[ExprNode] = []
+        self._index: dict[ExprNode, int] = {}
+        self.shared_hits = 0
+
+    def add(self, kind: str, value, args: tuple[int, ...] = ()) -> int:
+        if kind == "op" and value in _COMMUTATIVE:
+            args = tuple(sorted(args))
+        node = ExprNode(kind, value, args)
+        node_id = self._index.get(node)
+        if node_id is not None:
+            self.shared_hits += 1
+            return node_id
+        self.nodes.append(node)
+        self._index[node] = len(self.nodes) - 1
+        return len(self.nodes) - 1
+
+    # ------------------------------------------------------------------ 编译
+
+    def compile(self, formula: str, resolve_name) -> int:
+        """
+        编译公式，返回根节点编号
+
+        Args:
+            resolve_name: 名称解析回调，name -> 节点编号
+        """
+        try:
+            tree = ast.parse(formula.strip(), mode="eval")
+        except SyntaxError as exc:
+            raise FormulaError(f"公式语法错误: {formula}: {exc.msg}") from exc
+        return self._compile_node(tree.body, resolve_name)
+
+    def _compile_node(self, node, resolve_name) -> int:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            if isinstance(node.value, bool):
+                raise FormulaError(f"不支持的常量: {node.value!r}")
+            return self.add("const", float(node.value))
+        if isinstance(node, ast.Name):
+            return resolve_name(node.id)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self._compile_node(node.operand, resolve_name)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if self.nodes[operand].kind == "const":
+                return self.add("const", -self.nodes[operand].value)
+            return self.add("neg", None, (operand,))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            left = self._compile_node(node.left, resolve_name)
+            right = self._compile_node(node.right, resolve_name)
+            return self._fold("op", _BINARY_OPS[type(node.op)][0], (left, right))
+        if (
+            isinstance(node, ast.Compare)
+            and len(node.ops) == 1
+            and type(node.ops[0]) in _COMPARE_OPS
+        ):
+            left = self._compile_node(node.left, resolve_name)
+            right = self._compile_node(node.comparators[0], resolve_name)
+            return self.add("op", _COMPARE_OPS[type(node.ops[0])][0], (left, right))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return self._compile_call(node, resolve_name)
+        raise FormulaError(f"不支持的表达式: {ast.unparse(node)}")
+
+    def _compile_call(self, node: ast.Call, resolve_name) -> int:
+        name = node.func.id
+        func = self.functions.get(name)
+        if func is None:
+            raise FormulaError(f"未知函数: {name}")
+        if node.keywords:
+            raise FormulaError(f"函数 {name} 只支持位置参数")
+        args = tuple(self._compile_node(arg, resolve_name) for arg in node.args)
+        try:
+            inspect.signature(func).bind(*args)
+        except TypeError as exc:
+            raise FormulaError(f"函数 {name} 参数个数错误: {len(args)}") from exc
+        return self.add("call", name, args)
+
+    def _fold(self, kind: str, op: str, args: tuple[int, ...]) -> int:
+        # 常量折叠：2 * window 这类参数表达式在编译期求值
+        if all(self.nodes[arg].kind == "const" for arg in args):
+            values = [self.nodes[arg].value for arg in args]
+            return self.add("const", float(self.operators[op](*values)))
+        return self.add(kind, op, args)
+
+    # ------------------------------------------------------------------ 求值
+
+    def _required(self, roots) -> list[int]:
+        seen: set[int] = set()
+        stack = list(roots)
+        while stack:
+            node_id = stack.pop()
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            stack.extend(self.nodes[node_id].args)
+        return sorted(seen)
+
+    def levels(self, roots) -> list[list[int]]:
+        """
+        按依赖深度分层（叶子为第 0 层）
+        """
+        depth: dict[int, int] = {}
+        # 节点编号总是大于其参数编号，按编号顺序即为拓扑序
+        for node_id in self._required(roots):
+            args = self.nodes[node_id].args
+            depth[node_id] = 1 + max((depth[a] for a in args), default=-1)
+        grouped: dict[int, list[int]] = {}
+        for node_id, level in depth.items():
+            grouped.setdefault(level, []).append(node_id)
+        return [grouped[level] for level in sorted(grouped)]
+
+    def _evaluate_node(self, node_id: int, data: pd.DataFrame, values: dict):
+        node = self.nodes[node_id]
+        if node.kind == "const":
+            return node.value
+        if node.kind == "column":
+            return data[node.value].astype(np.float64)
+        args = [values[arg] for arg in node.args]
+        if node.kind == "neg":
+            return -args[0]
+        if node.kind == "op":
+            result = self.operators[node.value](*args)
+            if node.value in ("gt", "ge", "lt", "le") and isinstance(result, pd.Series):
+                result = result.astype(np.float64)
+            return result
+        return self.functions[node.value](*args)
+
+    def evaluate(
+        self, data: pd.DataFrame, roots: dict[str, int], max_workers: int = 1, on_level=None
+    ) -> dict[str, object]:
+        """
+        逐层求值，同层节点在线程池中并行（pandas/numpy 的向量运算大多释放 GIL）
+
+        单个节点求值失败时，依赖它的根返回对应异常对象而不是中断整个计算。
+
+        Returns:
+            根名称 -> 求值结果（Series / 常量 / Exception）
+        """
+        levels = self.levels(roots.values())
+        consumers: dict[int, int] = {}
+        for level in levels:
+            for node_id in level:
+                for arg in self.nodes[node_id].args:
+                    consumers[arg] = consumers.get(arg, 0) + 1
+        keep = set(roots.values())
+
+        values: dict[int, object] = {}
+        errors: dict[int, Exception] = {}
+
+        def run(node_id):
+            failed = next((errors[a] for a in self.nodes[node_id].args if a in errors), None)
+            if failed is not None:
+                return node_id, None, failed
+            try:
+                return node_id, self._evaluate_node(node_id, data, values), None
+            except Exception as exc:  # 记录后由依赖它的根各自报告
+                return node_id, None, exc
+
+        executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        try:
+            for level in levels:
+                if executor is not None and len(level) > 1:
+                    outcomes = list(executor.map(run, level))
+                else:
+                    outcomes = [run(node_id) for node_id in level]
+                for node_id, value, error in outcomes:
+                    if error is not None:
+                        errors[node_id] = error
+                    else:
+                        values[node_id] = value
+                # 释放不再被使用的中间结果
+                for node_id in level:
+                    for arg in self.nodes[node_id].args:
+                        consumers[arg] -= 1
+                        if consumers[arg] == 0 and arg not in keep:
+                            values.pop(arg, None)
+                if on_level is not None:
+                    on_level(level)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return {
+            name: errors[node_id] if node_id in errors else values[node_id]
+            for name, node_id in roots.items()
+        }
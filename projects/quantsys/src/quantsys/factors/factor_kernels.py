@@ -0,0 +1,154 @@
+"""
+因子计算内核
+
+替代 factor_library 中逐行循环 / rolling().apply 的实现：
+- rolling_ols_slope: 滚动窗口 OLS 斜率（固定权重线性滤波，等价于逐窗口 np.polyfit）
+- rolling_mad: 滚动平均绝对偏差，exact=True 为精确值，exact=False 为 O(n) 近似
+- parabolic_sar: 抛物线转向，递归状态机（安装 numba 时 JIT 编译）
+- obv: 成交量净额，符号 × 成交量的累加（闭式）
+
+所有内核输入输出均为 numpy 数组，不依赖索引。
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+
+def _as_float_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def rolling_ols_slope(values, window: int) -> np.ndarray:
+    """
+    滚动窗口内对 x = 0..window-1 做最小二乘拟合的斜率
+
+    slope = Σ (x_k - x̄) · y_k / Σ (x_k - x̄)²，权重只与窗口长度有关，
+    因此整个序列是一次定长卷积。窗口内含 NaN 时结果为 NaN，前 window-1 个值为 NaN。
+
+    注：未采用累积和差分形式（Σ t·y 的前缀和），长序列上前缀和量级过大，
+    相减时有效位数损失明显；定长权重卷积的误差与 np.polyfit 同量级。
+    """
+    y = _as_float_array(values)
+    n = len(y)
+    out = np.full(n, np.nan)
+    if window < 2:
+        # 与 rolling(window).apply(get_slope) 一致：单点窗口斜率为 0
+        out[~np.isnan(y)] = 0.0
+        return out
+    if n < window:
+        return out
+
+    x = np.arange(window, dtype=np.float64)
+    centered = x - x.mean()
+    weights = centered / np.dot(centered, centered)
+    # np.correlate(valid) 输出长度 n - window + 1，对应以第 window-1 个点结尾的窗口
+    out[window - 1 :] = np.correlate(y, weights, mode="valid")
+    return out
+
+
+def rolling_mad(values, window: int, exact: bool = True) -> np.ndarray:
+    """
+    滚动平均绝对偏差 mean(|x - mean(x)|)
+
+    exact=True: 基于滑动窗口视图的向量化精确计算，O(n·window)
+    exact=False: 流式近似 sqrt(2/π) · σ（σ 为总体标准差，正态分布下为无偏估计），O(n)
+    """
+    y = _as_float_array(values)
+    n = len(y)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    if exact:
+        windows = sliding_window_view(y, window)
+        means = windows.mean(axis=1, keepdims=True)
+        out[window - 1 :] = np.abs(windows - means).mean(axis=1)
+        return out
+
+    csum = np.concatenate(([0.0], np.cumsum(y)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(y * y)))
+    total = csum[window:] - csum[:-window]
+    total_sq = csum_sq[window:] - csum_sq[:-window]
+    mean = total / window
+    variance = np.maximum(total_sq / window - mean * mean, 0.0)
+    out[window - 1 :] = math.sqrt(2.0 / math.pi) * np.sqrt(variance)
+    return out
+
+
+def _parabolic_sar_loop(high, low, close, af_start, af_max):
+    n = len(close)
+    sar = close.copy()
+    ep = close.copy()
+    af = np.full(n, af_start)
+    trend = 1
+    for i in range(1, n):
+        sar[i] = sar[i - 1] + af[i - 1] * (ep[i - 1] - sar[i - 1])
+        if trend == 1:
+            if low[i] < sar[i]:
+                trend = -1
+                sar[i] = ep[i - 1]
+                ep[i] = low[i]
+                af[i] = af_start
+            elif high[i] > ep[i - 1]:
+                ep[i] = high[i]
+                af[i] = min(af[i - 1] + af_start, af_max)
+            else:
+                ep[i] = ep[i - 1]
+                af[i] = af[i - 1]
+        else:
+            if high[i] > sar[i]:
+                trend = 1
+                sar[i] = ep[i - 1]
+                ep[i] = high[i]
+                af[i] = af_start
+            elif low[i] < ep[i - 1]:
+                ep[i] = low[i]
+                af[i] = min(af[i - 1] + af_start, af_max)
+            else:
+                ep[i] = ep[i - 1]
+                af[i] = af[i - 1]
+    return sar
+
+
+_parabolic_sar_kernel = (
+    njit(cache=True)(_parabolic_sar_loop) if NUMBA_AVAILABLE else _parabolic_sar_loop
+)
+
+
+def parabolic_sar(high, low, close, af: float = 0.02, af_max: float = 0.2) -> np.ndarray:
+    """
+    抛物线转向指标，初始趋势为多头，SAR/EP 以收盘价初始化
+    """
+    return _parabolic_sar_kernel(
+        _as_float_array(high),
+        _as_float_array(low),
+        _as_float_array(close),
+        float(af),
+        float(af_max),
+    )
+
+
+def obv(close, volume) -> np.ndarray:
+    """
+    成交量净额：收盘价上涨累加成交量、下跌累减、持平不变，首值为 0
+    """
+    close = _as_float_array(close)
+    volume = _as_float_array(volume)
+    if len(close) == 0:
+        return np.zeros(0)
+
+    change = np.diff(close)
+    signed = np.where(change > 0, volume[1:], np.where(change < 0, -volume[1:], 0.0))
+    return np.concatenate(([0.0], np.cumsum(signed)))
@@ -10,7 +10,11 @@ from plotly.subplots import make_subplots
 
 from ..common.config_loader import ConfigLoader
 from ..data.database_manager import DatabaseManager
+from . import factor_kernels
+from .factor_primitives import FactorPrimitives
 from .factor_registry import FactorRegistry, UnregisteredFactorError
+from .factor_value_writer import FactorValueWriter
+from .incremental_factors import IncrementalFactorUpdater
 
 # 配置日志
 logging.basicConfig(
@@ -56,6 +60,17 @@ class FactorLibrary:
         # 数据源管理器
         self.data_source_manager = None
 
+        # 当前批量计算共享的因子中间量（calculate_factors 期间绑定）
+        self._active_primitives = None
+
+        # 当前批量计算共享的因子值写入缓冲（calculate_factors 期间绑定）
+        self._active_value_writer = None
+        # upsert 所需的唯一索引是否已确认存在（每个实例只建一次）
+        self._value_key_ensured = False
+
+        # 增量因子更新器：(symbol, timeframe) -> (请求的因子集合, 更新器)
+        self._incremental_updaters = {}
+
         # 数据可用性管理
         from ..data.availability import DataAvailability
 
@@ -547,8 +562,18 @@ class FactorLibrary:
                 raise ValueError(f"factor output missing column: {factor_code}")
         else:
             raise ValueError("unsupported factor output type")
-        series.name = factor_code
-        return series
+        # rename 返回新对象，避免改写共享中间量的名称
+        return series.rename(factor_code)
+
+    def _primitives(self, df) -> FactorPrimitives:
+        """
+        获取 df 对应的中间量缓存：calculate_factors 期间返回共享缓存，
+        否则返回仅供本次调用使用的新缓存（结果与直接计算一致）
+        """
+        active = getattr(self, "_active_primitives", None)
+        if active is not None and active.df is df:
+            return active
+        return FactorPrimitives(df)
 
     def _apply_availability_lag(self, series: pd.Series, availability_lag: int) -> pd.Series:
         if availability_lag < 0:
@@ -596,10 +621,23 @@ class FactorLibrary:
                 return {"leakage": True, "reason": "future_shift_match", "mean_abs_diff": mean_abs}
         return {"leakage": False, "reason": "ok", "max_diff": float(max_diff)}
 
-    def calculate_factors(self, symbol, timeframe, factors=None, limit=365):
+    def calculate_factors(self, symbol, timeframe, factors=None, limit=365, incremental=False):
         """
         计算指定交易对和时间周期的因子值
+
+        incremental=True 时，首次调用全量计算并建立增量状态，之后的调用只拉取上次之后的新 bar，
+        逐 bar 更新因子并写入新值（见 incremental_factors.IncrementalFactorUpdater）
         """
+        factors_to_calculate = factors if factors else list(self.factors.keys())
+
+        if incremental:
+            requested, updater = self._incremental_updaters.get((symbol, timeframe), (None, None))
+            if updater is not None and requested == frozenset(factors_to_calculate):
+                new_bars = self.db_manager.get_trading_data(
+                    symbol, timeframe, updater.last_timestamp, datetime.now()
+                )
+                return updater.update(new_bars)
+
         # 获取交易数据
         end_time = datetime.now()
         start_time = end_time - pd.Timedelta(days=limit)
@@ -609,28 +647,91 @@ class FactorLibrary:
             logger.warning(f"未找到交易数据: {symbol} {timeframe}")
             return
 
-        # 选择要计算的因子
-        factors_to_calculate = factors if factors else list(self.factors.keys())
-
         logger.info(f"开始计算因子: {symbol} {timeframe} - 因子数量: {len(factors_to_calculate)}")
 
-        # 计算每个因子
+        # 同一份行情上的所有因子共享滚动均值/极值、真实波幅、收益率等中间量
+        self._active_primitives = FactorPrimitives(df)
+        # 所有因子的取值汇入同一个写入缓冲，按批写库
+        self._active_value_writer = self._create_value_writer()
+        try:
+            factor_ids = self._calculate_factor_list(symbol, timeframe, df, factors_to_calculate)
+            # 写入失败按批次记录，未写出的行不影响其他批次
+            self._active_value_writer.flush()
+            if self._active_value_writer.pending_rows:
+                logger.error(
+                    f"因子值未能全部写入: {symbol} {timeframe} - "
+                    f"{self._active_value_writer.pending_rows} 行写入失败"
+                )
+        finally:
+            logger.info(f"因子中间量缓存: {self._active_primitives.stats()}")
+            self._active_primitives = None
+            self._active_value_writer = None
+
+        if incremental:
+            self._start_incremental_updater(symbol, timeframe, df, factors_to_calculate, factor_ids)
+
+    def _start_incremental_updater(self, symbol, timeframe, df, requested, factor_ids):
+        """
+        以刚完成全量计算的行情建立增量更新器
+        """
+        factor_config = self.config.get("factor") or {}
+        updater = IncrementalFactorUpdater(
+            self,
+            symbol,
+            timeframe,
+            factor_ids,
+            drift_check_every=factor_config.get("incremental_drift_check_every", 240),
+            drift_tolerance=factor_config.get("incremental_drift_tolerance", 1e-8),
+            fallback_lookback=factor_config.get("incremental_fallback_lookback", 300),
+        )
+        updater.seed(df)
+        self._incremental_updaters[(symbol, timeframe)] = (frozenset(requested), updater)
+        logger.info(
+            f"增量因子更新已建立: {symbol} {timeframe} - 状态因子 {len(updater.stateful_factors)} 个, "
+            f"窗口重算因子 {len(updater.fallback_factors)} 个"
+        )
+
+    def _compute_factor_series(self, factor_code, df):
+        """
+        计算单个因子并应用可用性延迟
+        """
+        factor_values = self.factors[factor_code]["func"](df)
+        factor_values = self._extract_factor_series(factor_code, factor_values)
+        meta = self._get_factor_meta(factor_code)
+        return self._apply_availability_lag(factor_values, meta.availability_lag)
+
+    def _compute_factor_frame(self, df, factor_codes):
+        """
+        在同一份行情上全量计算多个因子（共享中间量），返回以因子代码为列的 DataFrame
+        """
+        self._active_primitives = FactorPrimitives(df)
+        try:
+            return pd.DataFrame(
+                {code: self._compute_factor_series(code, df) for code in factor_codes},
+                index=df.index,
+            )
+        finally:
+            self._active_primitives = None
+
+    def _calculate_factor_list(self, symbol, timeframe, df, factors_to_calculate):
+        """
+        依次计算并存储因子
+
+        Returns:
+            成功计算的因子代码 -> 因子ID
+        """
+        factor_ids = {}
         for factor_code in factors_to_calculate:
             if factor_code in self.factors:
                 try:
                     logger.debug(f"正在计算因子: {factor_code}")
                     factor_func = self.factors[factor_code]["func"]
-                    meta = self._get_factor_meta(factor_code)
                     leakage = self._detect_future_leakage(factor_code, factor_func, df)
                     if leakage.get("leakage"):
                         raise RuntimeError(f"future leakage detected: {factor_code} - {leakage}")
 
                     # 计算因子值
-                    factor_values = factor_func(df)
-                    factor_values = self._extract_factor_series(factor_code, factor_values)
-                    factor_values = self._apply_availability_lag(
-                        factor_values, meta.availability_lag
-                    )
+                    factor_values = self._compute_factor_series(factor_code, df)
 
                     # 获取因子ID
                     factor_id = self.db_manager.get_factor_id(factor_code)
@@ -644,6 +745,7 @@ class FactorLibrary:
 
                     # 存储因子值
                     self._store_factor_values(symbol, timeframe, factor_id, factor_values)
+                    factor_ids[factor_code] = factor_id
 
                     logger.info(f"因子计算完成: {factor_code} - {symbol} {timeframe}")
 
@@ -651,14 +753,50 @@ class FactorLibrary:
                     logger.error(f"计算因子失败: {factor_code} - {symbol} {timeframe}: {e}")
             else:
                 logger.error(f"未知因子: {factor_code}")
+        return factor_ids
+
+    def _create_value_writer(self):
+        """
+        按 factor 配置创建因子值写入器：
+        - value_write_method: executemany（默认）/ copy / row（逐行 insert_factor_value）
+        - value_batch_size: 每批行数
+        - value_parquet_path: 设置后同时追加写入 Parquet
+        """
+        factor_config = self.config.get("factor") or {}
+        storage = None
+        parquet_path = factor_config.get("value_parquet_path")
+        if parquet_path:
+            from .factor_storage import FactorStorage
+
+            storage = FactorStorage(parquet_path)
+        writer = FactorValueWriter(
+            db_manager=self.db_manager,
+            method=factor_config.get("value_write_method", "executemany"),
+            batch_size=factor_config.get("value_batch_size", 50000),
+            storage=storage,
+        )
+        if self.db_manager is not None and writer.method != "row" and not self._value_key_ensured:
+            # 批量路径使用 ON CONFLICT (timestamp, symbol, timeframe, factor_id)，需要唯一索引
+            try:
+                writer.ensure_unique_key()
+                self._value_key_ensured = True
+            except Exception as e:
+                logger.error(f"创建因子值唯一索引失败，批量 upsert 将无法执行: {e}")
+        return writer
 
     def _store_factor_values(self, symbol, timeframe, factor_id, factor_values):
         """
-        存储因子值到数据库
+        存储因子值到数据库（upsert，键为 timestamp/symbol/timeframe/factor_id）
         """
-        for timestamp, value in factor_values.items():
-            if not np.isnan(value):
-                self.db_manager.insert_factor_value(timestamp, symbol, timeframe, factor_id, value)
+        writer = self._active_value_writer
+        if writer is not None:
+            writer.add(symbol, timeframe, factor_id, factor_values)
+            return
+        writer = self._create_value_writer()
+        writer.add(symbol, timeframe, factor_id, factor_values)
+        writer.flush()
+        if writer.pending_rows:
+            logger.error(f"因子值写入失败: {factor_id} - {symbol} {timeframe}")
 
     def get_factor_values(self, factor_code, symbol, timeframe, start_time, end_time):
         meta = self._get_factor_meta(factor_code)
@@ -681,21 +819,22 @@ class FactorLibrary:
         """
         计算移动平均线
         """
-        return df["close"].rolling(window=window).mean()
+        return self._primitives(df).rolling("close", window, "mean")
 
     def calculate_ema(self, df, window=20):
         """
         计算指数移动平均线
         """
-        return df["close"].ewm(span=window, adjust=False).mean()
+        return self._primitives(df).ewm_mean("close", window)
 
     def calculate_bb(self, df, window=20, std=2):
         """
         计算布林带
         返回中间带、上带和下带
         """
-        ma = df["close"].rolling(window=window).mean()
-        std_dev = df["close"].rolling(window=window).std()
+        p = self._primitives(df)
+        ma = p.rolling("close", window, "mean")
+        std_dev = p.rolling("close", window, "std")
         upper_band = ma + (std_dev * std)
         lower_band = ma - (std_dev * std)
 
@@ -709,7 +848,7 @@ class FactorLibrary:
         """
         计算相对强弱指数
         """
-        delta = df["close"].diff()
+        delta = self._primitives(df).series("delta")
         gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
         loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
         rs = gain / loss
@@ -721,8 +860,9 @@ class FactorLibrary:
         计算MACD指标
         返回MACD信号线
         """
-        ema_fast = df["close"].ewm(span=fast, adjust=False).mean()
-        ema_slow = df["close"].ewm(span=slow, adjust=False).mean()
+        p = self._primitives(df)
+        ema_fast = p.ewm_mean("close", fast)
+        ema_slow = p.ewm_mean("close", slow)
         macd_line = ema_fast - ema_slow
         signal_line = macd_line.ewm(span=signal, adjust=False).mean()
         macd_histogram = macd_line - signal_line
@@ -734,8 +874,9 @@ class FactorLibrary:
         计算随机振荡器
         返回%D值
         """
-        low_min = df["low"].rolling(window=k_window).min()
-        high_max = df["high"].rolling(window=k_window).max()
+        p = self._primitives(df)
+        low_min = p.rolling("low", k_window, "min")
+        high_max = p.rolling("high", k_window, "max")
         k_value = ((df["close"] - low_min) / (high_max - low_min)) * 100
         d_value = k_value.rolling(window=d_window).mean()
 
@@ -745,8 +886,9 @@ class FactorLibrary:
         """
         计算随机振荡器K值
         """
-        low_min = df["low"].rolling(window=window).min()
-        high_max = df["high"].rolling(window=window).max()
+        p = self._primitives(df)
+        low_min = p.rolling("low", window, "min")
+        high_max = p.rolling("high", window, "max")
         k_value = ((df["close"] - low_min) / (high_max - low_min)) * 100
 
         return k_value
@@ -755,7 +897,7 @@ class FactorLibrary:
         """
         计算标准差
         """
-        return df["close"].rolling(window=window).std()
+        return self._primitives(df).rolling("close", window, "std")
 
     def calculate_price_rate_of_change(self, df, window=12):
         """
@@ -767,11 +909,7 @@ class FactorLibrary:
         """
         计算平均真实范围
         """
-        high_low = df["high"] - df["low"]
-        high_close = np.abs(df["high"] - df["close"].shift())
-        low_close = np.abs(df["low"] - df["close"].shift())
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = true_range.rolling(window=window).mean()
+        atr = self._primitives(df).rolling("true_range", window, "mean")
 
         return atr
 
@@ -779,9 +917,13 @@ class FactorLibrary:
         """
         计算商品通道指数
         """
-        typical_price = (df["high"] + df["low"] + df["close"]) / 3
-        sma = typical_price.rolling(window=window).mean()
-        mad = typical_price.rolling(window=window).apply(lambda x: np.mean(np.abs(x - x.mean())))
+        p = self._primitives(df)
+        typical_price = p.series("typical_price")
+        sma = p.rolling("typical_price", window, "mean")
+        mad = pd.Series(
+            factor_kernels.rolling_mad(typical_price.to_numpy(), window, exact=True),
+            index=df.index,
+        )
         cci = (typical_price - sma) / (0.015 * mad)
 
         return cci
@@ -798,24 +940,12 @@ class FactorLibrary:
         """
         计算平均方向指数
         """
-        # 计算真实波动幅度
-        high_low = df["high"] - df["low"]
-        high_close = np.abs(df["high"] - df["close"].shift())
-        low_close = np.abs(df["low"] - df["close"].shift())
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-
-        # 计算上涨和下跌幅度
-        up_move = df["high"] - df["high"].shift()
-        down_move = df["low"].shift() - df["low"]
-
-        # 计算+DM和-DM
-        plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0)
-        minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0)
+        p = self._primitives(df)
 
         # 计算平滑的+DM、-DM和TR
-        smoothed_plus_dm = plus_dm.rolling(window=window).mean()
-        smoothed_minus_dm = minus_dm.rolling(window=window).mean()
-        smoothed_tr = true_range.rolling(window=window).mean()
+        smoothed_plus_dm = p.rolling("plus_dm", window, "mean")
+        smoothed_minus_dm = p.rolling("minus_dm", window, "mean")
+        smoothed_tr = p.rolling("true_range", window, "mean")
 
         # 计算+DI和-DI
         plus_di = (smoothed_plus_dm / smoothed_tr) * 100
@@ -834,28 +964,20 @@ class FactorLibrary:
         """
         计算成交量移动平均线
         """
-        return df["volume"].rolling(window=window).mean()
+        return self._primitives(df).rolling("volume", window, "mean")
 
     def calculate_obv(self, df):
         """
         计算成交量净额
         """
-        obv = pd.Series(0, index=df.index)
-        for i in range(1, len(df)):
-            if df["close"].iloc[i] > df["close"].iloc[i - 1]:
-                obv.iloc[i] = obv.iloc[i - 1] + df["volume"].iloc[i]
-            elif df["close"].iloc[i] < df["close"].iloc[i - 1]:
-                obv.iloc[i] = obv.iloc[i - 1] - df["volume"].iloc[i]
-            else:
-                obv.iloc[i] = obv.iloc[i - 1]
-
-        return obv
+        values = factor_kernels.obv(df["close"].to_numpy(), df["volume"].to_numpy())
+        return pd.Series(values, index=df.index)
 
     def calculate_vwap(self, df):
         """
         计算成交量加权平均价格
         """
-        typical_price = (df["high"] + df["low"] + df["close"]) / 3
+        typical_price = self._primitives(df).series("typical_price")
         vwap = (typical_price * df["volume"]).cumsum() / df["volume"].cumsum()
 
         return vwap
@@ -864,7 +986,7 @@ class FactorLibrary:
         """
         计算资金流量指数
         """
-        typical_price = (df["high"] + df["low"] + df["close"]) / 3
+        typical_price = self._primitives(df).series("typical_price")
         money_flow = typical_price * df["volume"]
 
         positive_flow = money_flow.where(typical_price > typical_price.shift(), 0)
@@ -895,8 +1017,7 @@ class FactorLibrary:
         """
         计算波动率
         """
-        returns = df["close"].pct_change()
-        volatility = returns.rolling(window=window).std() * np.sqrt(252)
+        volatility = self._primitives(df).rolling("returns", window, "std") * np.sqrt(252)
 
         return volatility
 
@@ -904,8 +1025,7 @@ class FactorLibrary:
         """
         计算收益波动率
         """
-        returns = df["close"].pct_change()
-        volatility = returns.rolling(window=window).std()
+        volatility = self._primitives(df).rolling("returns", window, "std")
 
         return volatility
 
@@ -913,9 +1033,8 @@ class FactorLibrary:
         """
         计算历史波动率
         """
-        returns = df["close"].pct_change()
         # 年化波动率，假设每年252个交易日
-        historical_vol = returns.rolling(window=window).std() * np.sqrt(252)
+        historical_vol = self._primitives(df).rolling("returns", window, "std") * np.sqrt(252)
 
         return historical_vol
 
@@ -923,8 +1042,7 @@ class FactorLibrary:
         """
         计算已实现波动率
         """
-        returns = df["close"].pct_change()
-        realized_vol = returns.rolling(window=window).std()
+        realized_vol = self._primitives(df).rolling("returns", window, "std")
 
         return realized_vol
 
@@ -941,8 +1059,9 @@ class FactorLibrary:
         """
         计算威廉姆斯%R
         """
-        highest_high = df["high"].rolling(window=window).max()
-        lowest_low = df["low"].rolling(window=window).min()
+        p = self._primitives(df)
+        highest_high = p.rolling("high", window, "max")
+        lowest_low = p.rolling("low", window, "min")
         williams_r = ((highest_high - df["close"]) / (highest_high - lowest_low)) * -100
 
         return williams_r
@@ -951,7 +1070,7 @@ class FactorLibrary:
         """
         计算真实强度指数
         """
-        pc = df["close"].diff()
+        pc = self._primitives(df).series("delta")
         m = pc.ewm(span=r, adjust=False).mean()
         dm = np.abs(pc).ewm(span=r, adjust=False).mean()
         m = m.ewm(span=s, adjust=False).mean()
@@ -980,24 +1099,12 @@ class FactorLibrary:
         计算方向运动指数
         返回+DI和-DI的差值
         """
-        # 计算上涨和下跌幅度
-        up_move = df["high"] - df["high"].shift()
-        down_move = df["low"].shift() - df["low"]
-
-        # 计算+DM和-DM
-        plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0)
-        minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0)
-
-        # 计算真实波动幅度
-        high_low = df["high"] - df["low"]
-        high_close = np.abs(df["high"] - df["close"].shift())
-        low_close = np.abs(df["low"] - df["close"].shift())
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+        p = self._primitives(df)
 
         # 计算+DI和-DI
-        smoothed_true_range = true_range.rolling(window=window).mean()
-        smoothed_plus_dm = plus_dm.rolling(window=window).mean()
-        smoothed_minus_dm = minus_dm.rolling(window=window).mean()
+        smoothed_true_range = p.rolling("true_range", window, "mean")
+        smoothed_plus_dm = p.rolling("plus_dm", window, "mean")
+        smoothed_minus_dm = p.rolling("minus_dm", window, "mean")
 
         plus_di = (smoothed_plus_dm / smoothed_true_range) * 100
         minus_di = (smoothed_minus_dm / smoothed_true_range) * 100
@@ -1008,57 +1115,23 @@ class FactorLibrary:
         """
         计算抛物线转向指标
         """
-        sar = df["close"].copy()
-        ep = df["close"].copy()
-        trend = pd.Series(1, index=df.index)
-        af = pd.Series(af, index=df.index)
-
-        for i in range(1, len(df)):
-            if trend.iloc[i - 1] == 1:
-                sar.iloc[i] = sar.iloc[i - 1] + af.iloc[i - 1] * (ep.iloc[i - 1] - sar.iloc[i - 1])
-
-                if df["low"].iloc[i] < sar.iloc[i]:
-                    trend.iloc[i] = -1
-                    sar.iloc[i] = ep.iloc[i - 1]
-                    ep.iloc[i] = df["low"].iloc[i]
-                    af.iloc[i] = af.iloc[0]
-                else:
-                    trend.iloc[i] = 1
-                    if df["high"].iloc[i] > ep.iloc[i - 1]:
-                        ep.iloc[i] = df["high"].iloc[i]
-                        af.iloc[i] = min(af.iloc[i - 1] + af.iloc[0], af_max)
-                    else:
-                        ep.iloc[i] = ep.iloc[i - 1]
-                        af.iloc[i] = af.iloc[i - 1]
-            else:
-                sar.iloc[i] = sar.iloc[i - 1] + af.iloc[i - 1] * (ep.iloc[i - 1] - sar.iloc[i - 1])
-
-                if df["high"].iloc[i] > sar.iloc[i]:
-                    trend.iloc[i] = 1
-                    sar.iloc[i] = ep.iloc[i - 1]
-                    ep.iloc[i] = df["high"].iloc[i]
-                    af.iloc[i] = af.iloc[0]
-                else:
-                    trend.iloc[i] = -1
-                    if df["low"].iloc[i] < ep.iloc[i - 1]:
-                        ep.iloc[i] = df["low"].iloc[i]
-                        af.iloc[i] = min(af.iloc[i - 1] + af.iloc[0], af_max)
-                    else:
-                        ep.iloc[i] = ep.iloc[i - 1]
-                        af.iloc[i] = af.iloc[i - 1]
-
-        return sar
+        sar = factor_kernels.parabolic_sar(
+            df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), af, af_max
+        )
+        return pd.Series(sar, index=df.index, name=df["close"].name)
 
     def calculate_ichimoku(self, df):
         """
         计算一目均衡表
         返回云区厚度
         """
+        p = self._primitives(df)
+
         # 转换线 (Tenkan-sen)
-        tenkan_sen = (df["high"].rolling(window=9).max() + df["low"].rolling(window=9).min()) / 2
+        tenkan_sen = (p.rolling("high", 9, "max") + p.rolling("low", 9, "min")) / 2
 
         # 基准线 (Kijun-sen)
-        kijun_sen = (df["high"].rolling(window=26).max() + df["low"].rolling(window=26).min()) / 2
+        kijun_sen = (p.rolling("high", 26, "max") + p.rolling("low", 26, "min")) / 2
 
         # 延迟线 (Chikou Span)
         chikou_span = df["close"].shift(-26)
@@ -1067,9 +1140,9 @@ class FactorLibrary:
         senkou_span_a = ((tenkan_sen + kijun_sen) / 2).shift(26)
 
         # 先行上限2 (Senkou Span B)
-        senkou_span_b = (
-            (df["high"].rolling(window=52).max() + df["low"].rolling(window=52).min()) / 2
-        ).shift(26)
+        senkou_span_b = ((p.rolling("high", 52, "max") + p.rolling("low", 52, "min")) / 2).shift(
+            26
+        )
 
         # 云区厚度
         cloud_thickness = np.abs(senkou_span_a - senkou_span_b)
@@ -1078,25 +1151,18 @@ class FactorLibrary:
 
     def calculate_trend_slope(self, df, window=20):
         """
-        计算趋势斜率
+        计算趋势斜率（窗口内 OLS 斜率）
         """
-        import numpy as np
-
-        def get_slope(x):
-            if len(x) < 2:
-                return 0
-            idx = np.arange(len(x))
-            slope, _ = np.polyfit(idx, x, 1)
-            return slope
-
-        return df["close"].rolling(window=window).apply(get_slope)
+        slope = factor_kernels.rolling_ols_slope(df["close"].to_numpy(), window)
+        return pd.Series(slope, index=df.index, name=df["close"].name)
 
     def calculate_ma_crossover(self, df, fast_window=12, slow_window=26):
         """
         计算均线交叉信号
         """
-        fast_ma = df["close"].rolling(window=fast_window).mean()
-        slow_ma = df["close"].rolling(window=slow_window).mean()
+        p = self._primitives(df)
+        fast_ma = p.rolling("close", fast_window, "mean")
+        slow_ma = p.rolling("close", slow_window, "mean")
 
         # 金叉为正，死叉为负
         crossover = fast_ma - slow_ma
@@ -1107,7 +1173,7 @@ class FactorLibrary:
         """
         计算趋势强度
         """
-        ma = df["close"].rolling(window=window).mean()
+        ma = self._primitives(df).rolling("close", window, "mean")
 
         # 计算价格与均线的相对距离，反映趋势强度
         trend_strength = (df["close"] - ma) / ma * 100
@@ -1512,7 +1578,8 @@ class FactorLibrary:
         """
         params = params or {"window": 30}
         # 简化实现：使用价格趋势模拟
-        df["mvrv"] = (df["close"] / df["close"].rolling(window=params["window"]).mean()) * 100
+        ma = self._primitives(df).rolling("close", params["window"], "mean")
+        df["mvrv"] = (df["close"] / ma) * 100
         return df
 
     def calculate_nupl(self, df, params=None):
@@ -1565,7 +1632,7 @@ class FactorLibrary:
         params = params or {"window": 7}
         # 简化实现：使用成交量活跃度模拟
         df["active_addresses"] = (
-            df["volume"].rolling(window=params["window"]).mean() / df["volume"].mean()
+            self._primitives(df).rolling("volume", params["window"], "mean") / df["volume"].mean()
         )
         return df
 
@@ -1585,7 +1652,9 @@ class FactorLibrary:
         """
         params = params or {"window": 8}
         # 简化实现：使用价格波动模拟
-        df["funding_rate"] = df["close"].pct_change().rolling(window=params["window"]).mean() * 100
+        df["funding_rate"] = (
+            self._primitives(df).rolling("returns", params["window"], "mean") * 100
+        )
         return df
 
     def calculate_open_interest(self, df, params=None):
@@ -1594,7 +1663,7 @@ class FactorLibrary:
         """
         params = params or {"window": 24}
         # 简化实现：使用成交量趋势模拟
-        df["open_interest"] = df["volume"].rolling(window=params["window"]).sum()
+        df["open_interest"] = self._primitives(df).rolling("volume", params["window"], "sum")
         return df
 
     def calculate_liquidations(self, df, params=None):
@@ -1615,7 +1684,7 @@ class FactorLibrary:
         params = params or {"window": 14}
         # 简化实现：基于价格动量
         df["long_short_ratio"] = (
-            1 + df["close"].pct_change().rolling(window=params["window"]).mean()
+            1 + self._primitives(df).rolling("returns", params["window"], "mean")
         ) * 100
         return df
 
@@ -1626,7 +1695,9 @@ class FactorLibrary:
         params = params or {"window": 7}
         # 简化实现：使用波动率模拟
         df["stablecoin_premium"] = (
-            df["close"].rolling(window=params["window"]).std() / df["close"].mean() * 100
+            self._primitives(df).rolling("close", params["window"], "std")
+            / df["close"].mean()
+            * 100
         )
         return df
 
@@ -1663,7 +1734,7 @@ class FactorLibrary:
         params = params or {"window": 7}
         # 简化实现：使用价格波动模拟
         df["reddit_activity"] = (
-            df["close"].pct_change().rolling(window=params["window"]).std() * 100
+            self._primitives(df).rolling("returns", params["window"], "std") * 100
         )
         return df
 
@@ -1674,7 +1745,7 @@ class FactorLibrary:
         params = params or {"window": 3}
         # 简化实现：基于价格变化率
         df["news_sentiment"] = (
-            df["close"].pct_change().rolling(window=params["window"]).mean() * 100
+            self._primitives(df).rolling("returns", params["window"], "mean") * 100
         )
         return df
 
@@ -1696,7 +1767,7 @@ class FactorLibrary:
         """
         params = params or {"window": 14}
         # 简化实现：使用波动率模拟
-        df["github_commits"] = df["close"].rolling(window=params["window"]).std()
+        df["github_commits"] = self._primitives(df).rolling("close", params["window"], "std")
         return df
 
     def calculate_community_growth(self, df, params=None):
@@ -1716,9 +1787,10 @@ class FactorLibrary:
         """
         params = params or {"window": 30}
         # 简化实现：基于价格和成交量的复合指标
+        p = self._primitives(df)
         df["alt_rank"] = (
-            df["close"].rolling(window=params["window"]).mean()
-            * df["volume"].rolling(window=params["window"]).mean()
+            p.rolling("close", params["window"], "mean")
+            * p.rolling("volume", params["window"], "mean")
         ) / 1e9
         return df
 
@@ -2275,7 +2347,7 @@ class FactorLibrary:
         公式: SMA(VOLUME,21,2)
         """
         # 计算SMA
-        df["alpha081"] = df["volume"].rolling(window=21).mean()
+        df["alpha081"] = self._primitives(df).rolling("volume", 21, "mean")
         # 二次SMA
         df["alpha081"] = df["alpha081"].rolling(window=2).mean()
         return df
@@ -2285,7 +2357,7 @@ class FactorLibrary:
         计算Alpha 095
         公式: STD(VOLUME,20)
         """
-        df["alpha095"] = df["volume"].rolling(window=20).std()
+        df["alpha095"] = self._primitives(df).rolling("volume", 20, "std")
         return df
 
     def calculate_alpha097(self, df, params=None):
@@ -2293,7 +2365,7 @@ class FactorLibrary:
         计算Alpha 097
         公式: STD(VOLUME,10)
         """
-        df["alpha097"] = df["volume"].rolling(window=10).std()
+        df["alpha097"] = self._primitives(df).rolling("volume", 10, "std")
         return df
 
     def calculate_alpha100(self, df, params=None):
@@ -2419,10 +2491,11 @@ class FactorLibrary:
         计算Alpha 153
         公式: (MEAN(CLOSE,3)+MEAN(CLOSE,6)+MEAN(CLOSE,12)+MEAN(CLOSE,24))/4
         """
-        df["ma3"] = df["close"].rolling(window=3).mean()
-        df["ma6"] = df["close"].rolling(window=6).mean()
-        df["ma12"] = df["close"].rolling(window=12).mean()
-        df["ma24"] = df["close"].rolling(window=24).mean()
+        p = self._primitives(df)
+        df["ma3"] = p.rolling("close", 3, "mean")
+        df["ma6"] = p.rolling("close", 6, "mean")
+        df["ma12"] = p.rolling("close", 12, "mean")
+        df["ma24"] = p.rolling("close", 24, "mean")
         df["alpha153"] = (df["ma3"] + df["ma6"] + df["ma12"] + df["ma24"]) / 4
         return df
 
@@ -2457,7 +2530,7 @@ class FactorLibrary:
         公式: 3*SMA(CLOSE,13,2)-2*SMA(SMA(CLOSE,13,2),13,2)+SMA(SMA(SMA(LOG(CLOSE),13,2),13,2),13,2)
         """
         # 计算SMA
-        df["sma13"] = df["close"].rolling(window=13).mean()
+        df["sma13"] = self._primitives(df).rolling("close", 13, "mean")
         df["sma13_2"] = df["sma13"].rolling(window=2).mean()
         df["sma13_3"] = df["sma13_2"].rolling(window=13).mean()
         df["log_close"] = np.log(df["close"])
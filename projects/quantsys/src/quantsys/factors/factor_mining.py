@@ -0,0 +1,314 @@
+"""
+批量因子挖掘
+
+面向上万个候选表达式的求值、打分与去相关：
+- BatchExpressionEvaluator：全部候选编译进一张共享表达式图（相同子表达式只算一次），
+  按批在进程池中求值，结果汇总为 (T, K) 的因子矩阵
+- rank_ic_matrix：以矩阵运算一次性计算所有候选的 Rank IC（Spearman）
+- GreedyCorrelationPruner：增量贪心去相关，每个候选只与已入选因子计算成对完整相关系数，
+  不构造 K x K 相关矩阵
+"""
+
+from __future__ import annotations
+
+import logging
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .factor_expression import ExpressionGraph, FormulaError
+from .rank_ic import spearman_ic_matrix
+
+logger = logging.getLogger(__name__)
+
+# 进程池 worker 内的共享状态（由 initializer 设置，每个 worker 只接收一次图和数据）
+_worker_state: dict = {}
+
+
+def _init_worker(nodes, functions, operators, data):
+    graph = ExpressionGraph(functions, operators)
+    graph.nodes = list(nodes)
+    _worker_state["graph"] = graph
+    _worker_state["data"] = data
+
+
+def _evaluate_batch_in_worker(root_ids):
+    return _evaluate_batch(_worker_state["graph"], _worker_state["data"], root_ids)
+
+
+def _evaluate_batch(graph: ExpressionGraph, data: pd.DataFrame, root_ids):
+    """
+    求值一批根节点
+
+    Returns:
+        (根节点编号列表, (T, len(root_ids)) 矩阵, 根节点编号 -> 错误信息)
+    """
+    results = graph.evaluate(data, {node_id: node_id for node_id in root_ids})
+    matrix = np.full((len(data), len(root_ids)), np.nan)
+    errors = {}
+    for col, node_id in enumerate(root_ids):
+        value = results[node_id]
+        if isinstance(value, Exception):
+            errors[node_id] = f"{type(value).__name__}: {value}"
+            continue
+        try:
+            if isinstance(value, pd.Series):
+                matrix[:, col] = value.to_numpy(dtype=np.float64)
+            else:
+                matrix[:, col] = np.broadcast_to(np.asarray(value, dtype=np.float64), len(data))
+        except (TypeError, ValueError) as exc:
+            errors[node_id] = f"{type(exc).__name__}: {exc}"
+    return list(root_ids), matrix, errors
+
+
+class BatchExpressionEvaluator:
+    """
+    候选因子表达式的批量求值器
+
+    Args:
+        functions: 表达式中可调用的函数表（函数名 -> 实现）
+        operators: 运算符实现覆盖，见 ExpressionGraph
+        max_workers: 进程数；<=1 时在当前进程内一次性求值整张图（共享最充分）
+        batch_size: 每个进程任务包含的候选数
+    """
+
+    def __init__(
+        self,
+        functions: dict,
+        operators: dict | None = None,
+        max_workers: int = 1,
+        batch_size: int = 256,
+    ):
+        if batch_size < 1:
+            raise ValueError(f"batch_size 必须为正整数: {batch_size}")
+        self.functions = functions
+        self.operators = operators
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.last_stats: dict = {}
+
+    def compile(self, expressions: list[str], columns) -> tuple[ExpressionGraph, dict, dict]:
+        """
+        把全部表达式编译进一张共享图
+
+        Returns:
+            (graph, 表达式 -> 根节点编号, 表达式 -> 编译错误)
+        """
+        graph = ExpressionGraph(self.functions, self.operators)
+        columns = set(columns)
+
+        def resolve(name):
+            if name not in columns:
+                raise FormulaError(f"未知变量: {name}")
+            return graph.add("column", name)
+
+        roots: dict[str, int] = {}
+        errors: dict[str, str] = {}
+        for expr in dict.fromkeys(expressions):
+            try:
+                roots[expr] = graph.compile(expr, resolve)
+            except FormulaError as exc:
+                errors[expr] = str(exc)
+        return graph, roots, errors
+
+    def _batches(self, graph: ExpressionGraph, root_ids: list[int]) -> list[list[int]]:
+        # 按子节点编号排序，使共享子表达式的候选尽量落在同一批，减少跨进程重复计算
+        ordered = sorted(root_ids, key=lambda node_id: (graph.nodes[node_id].args, node_id))
+        return [
+            ordered[start : start + self.batch_size]
+            for start in range(0, len(ordered), self.batch_size)
+        ]
+
+    def _picklable(self) -> bool:
+        try:
+            pickle.dumps((self.functions, self.operators))
+            return True
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return False
+
+    def evaluate(
+        self, data: pd.DataFrame, expressions: list[str], on_batch=None
+    ) -> tuple[np.ndarray, dict]:
+        """
+        求值全部表达式
+
+        Args:
+            data: 基础特征矩阵，列名即表达式中的变量名
+            expressions: 表达式列表（允许重复，重复项共享同一列结果）
+            on_batch: 每完成一批时回调，参数为该批候选数
+
+        Returns:
+            ((T, len(expressions)) 因子矩阵, 表达式 -> 错误信息)；失败的表达式对应列为 NaN
+        """
+        graph, roots, errors = self.compile(expressions, data.columns)
+        root_ids = sorted(set(roots.values()))
+        columns: dict[int, np.ndarray] = {}
+
+        use_pool = self.max_workers > 1 and len(root_ids) > self.batch_size
+        if use_pool and not self._picklable():
+            logger.warning("因子算子无法序列化，无法使用进程池，改为在当前进程求值")
+            use_pool = False
+
+        node_errors: dict[int, str] = {}
+        if use_pool:
+            batches = self._batches(graph, root_ids)
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(graph.nodes, self.functions, self.operators, data),
+            ) as executor:
+                for ids, matrix, batch_errors in executor.map(_evaluate_batch_in_worker, batches):
+                    for col, node_id in enumerate(ids):
+                        columns[node_id] = matrix[:, col]
+                    node_errors.update(batch_errors)
+                    if on_batch is not None:
+                        on_batch(len(ids))
+        elif root_ids:
+            ids, matrix, node_errors = _evaluate_batch(graph, data, root_ids)
+            for col, node_id in enumerate(ids):
+                columns[node_id] = matrix[:, col]
+            if on_batch is not None:
+                on_batch(len(ids))
+
+        result = np.full((len(data), len(expressions)), np.nan)
+        for col, expr in enumerate(expressions):
+            node_id = roots.get(expr)
+            if node_id is None:
+                continue
+            result[:, col] = columns[node_id]
+            if node_id in node_errors:
+                errors[expr] = node_errors[node_id]
+
+        self.last_stats = {
+            "expressions": len(expressions),
+            "unique_roots": len(root_ids),
+            "graph_nodes": len(graph.nodes),
+            "shared_hits": graph.shared_hits,
+            "workers": self.max_workers if use_pool else 1,
+            "errors": len(errors),
+        }
+        return result, errors
+
+
+def rank_ic_matrix(values: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """
+    批量计算 Rank IC（Spearman 相关系数）
+
+    与逐列 Series.corr(labels, method="spearman") 一致：每列只使用因子与标签同时非 NaN 的行，
+    有效行集合相同的列共享排序，见 rank_ic.spearman_ic_matrix。
+    无法计算（样本不足、常数列）时记为 0。
+
+    Args:
+        values: (T, K) 因子矩阵
+        labels: 长度 T 的标签
+
+    Returns:
+        长度 K 的 IC 数组
+    """
+    labels = np.asarray(labels, dtype=np.float64)
+    if labels.ndim != 1:
+        raise ValueError(f"标签必须为一维: {labels.shape}")
+    ics = spearman_ic_matrix(values, labels[:, None], min_periods=2)[:, 0]
+    return np.nan_to_num(ics, nan=0.0)
+
+
+class GreedyCorrelationPruner:
+    """
+    增量贪心去相关
+
+    候选按调用顺序逐个 offer()，与所有已入选因子的绝对相关系数都不超过 max_corr 时入选
+    （无法计算的相关系数忽略，全部无法计算时剔除）。
+    相关系数按成对完整样本（两者同时有限的行）计算，与 DataFrame.corr() 相同；
+    每个候选的代价为 O(T * 已入选数)，全程不构造候选间的相关矩阵。
+
+    Args:
+        max_corr: 最大允许的绝对相关系数
+        length: 因子序列长度 T
+        capacity: 初始容量（已入选因子数），不足时倍增
+        block_size: 每次比较的已入选因子数
+    """
+
+    def __init__(self, max_corr: float, length: int, capacity: int = 64, block_size: int = 64):
+        self.max_corr = max_corr
+        self.length = length
+        self.block_size = block_size
+        self.names: list = []
+        self._values = np.zeros((capacity, length))
+        self._squares = np.zeros((capacity, length))
+        self._masks = np.zeros((capacity, length))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _grow(self):
+        capacity = 2 * len(self._values)
+        for attr in ("_values", "_squares", "_masks"):
+            old = getattr(self, attr)
+            grown = np.zeros((capacity, self.length))
+            grown[: len(old)] = old
+            setattr(self, attr, grown)
+
+    def _prepare(self, values) -> tuple[np.ndarray, np.ndarray] | None:
+        x = np.asarray(values, dtype=np.float64)
+        mask = np.isfinite(x)
+        if not mask.any():
+            return None
+        # 先减去自身均值，降低单遍公式的抵消误差
+        return np.where(mask, x - x[mask].mean(), 0.0), mask.astype(np.float64)
+
+    def _block_correlations(self, x: np.ndarray, m: np.ndarray, start: int, stop: int):
+        n, sum_x, sum_x2 = np.stack([m, x, x * x]) @ self._masks[start:stop].T
+        sum_y, sum_xy = np.stack([m, x]) @ self._values[start:stop].T
+        sum_y2 = self._squares[start:stop] @ m
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sum_xy - sum_x * sum_y / n
+            var_x = sum_x2 - sum_x**2 / n
+            var_y = sum_y2 - sum_y**2 / n
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[(n < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def correlations(self, values) -> np.ndarray:
+        """
+        候选与各已入选因子的成对完整 Pearson 相关系数（无法计算时为 NaN）
+        """
+        prepared = self._prepare(values)
+        if prepared is None:
+            return np.full(len(self.names), np.nan)
+        return self._block_correlations(*prepared, 0, len(self.names))
+
+    def offer(self, name, values) -> bool:
+        """
+        尝试加入候选，返回是否入选
+
+        已入选因子按入选顺序分块比较，一旦超过阈值立即剔除，被剔除的候选通常只需算一两块。
+        """
+        prepared = self._prepare(values)
+        count = len(self.names)
+        if count:
+            if prepared is None:
+                return False
+            any_finite = False
+            for start in range(0, count, self.block_size):
+                corr = self._block_correlations(
+                    *prepared, start, min(start + self.block_size, count)
+                )
+                finite = np.abs(corr[~np.isnan(corr)])
+                if finite.size and finite.max() > self.max_corr:
+                    return False
+                any_finite = any_finite or finite.size > 0
+            # 与所有已入选因子都无法计算相关系数（如常数列）时同样剔除
+            if not any_finite:
+                return False
+
+        if count == len(self._values):
+            self._grow()
+        x, m = prepared if prepared is not None else (0.0, 0.0)
+        self._masks[count] = m
+        self._values[count] = x
+        self._squares[count] = self._values[count] ** 2
+        self.names.append(name)
+        return True
@@ -0,0 +1,122 @@
+"""
+因子共享中间量
+
+大量因子重复计算相同的滚动均值、滚动极值、真实波幅、收益率等中间量。
+FactorPrimitives 以 (中间量, 窗口, 统计量) 为键缓存这些结果，
+同一份行情数据上的所有因子共享同一次计算。
+
+只对基础行情列（open/high/low/close/volume）及其派生量做缓存：
+因子函数会向 df 写入临时列（如 "volatility"、"ma"），这些列不参与缓存，
+以免被后续因子覆盖后读到过期结果。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+BASE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+ROLLING_STATS = ("mean", "std", "min", "max", "sum")
+
+
+class FactorPrimitives:
+    """
+    绑定到单个 DataFrame 的中间量缓存
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache: dict[tuple, pd.Series] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _memo(self, key: tuple, compute) -> pd.Series:
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        value = compute()
+        self._cache[key] = value
+        return value
+
+    # ------------------------------------------------------------------ 基础序列
+
+    def series(self, name: str) -> pd.Series:
+        """
+        基础列或派生序列：
+        - open/high/low/close/volume: 原始列
+        - returns: close.pct_change()
+        - delta: close.diff()
+        - typical_price: (high + low + close) / 3
+        - true_range: max(high-low, |high-prev_close|, |low-prev_close|)
+        - up_move / down_move: high.diff() / -low.diff()（与 DMI 口径一致）
+        - plus_dm / minus_dm: 方向运动
+        """
+        if name in BASE_COLUMNS:
+            return self.df[name]
+        builder = getattr(self, f"_build_{name}", None)
+        if builder is None:
+            raise KeyError(f"未知的因子中间量: {name}")
+        return self._memo(("series", name), builder)
+
+    def _build_returns(self) -> pd.Series:
+        return self.df["close"].pct_change()
+
+    def _build_delta(self) -> pd.Series:
+        return self.df["close"].diff()
+
+    def _build_typical_price(self) -> pd.Series:
+        return (self.df["high"] + self.df["low"] + self.df["close"]) / 3
+
+    def _build_prev_close(self) -> pd.Series:
+        return self.df["close"].shift()
+
+    def _build_true_range(self) -> pd.Series:
+        prev_close = self.series("prev_close")
+        high_low = self.df["high"] - self.df["low"]
+        high_close = np.abs(self.df["high"] - prev_close)
+        low_close = np.abs(self.df["low"] - prev_close)
+        return pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+
+    def _build_up_move(self) -> pd.Series:
+        return self.df["high"] - self.df["high"].shift()
+
+    def _build_down_move(self) -> pd.Series:
+        return self.df["low"].shift() - self.df["low"]
+
+    def _build_plus_dm(self) -> pd.Series:
+        up_move = self.series("up_move")
+        down_move = self.series("down_move")
+        return up_move.where((up_move > down_move) & (up_move > 0), 0)
+
+    def _build_minus_dm(self) -> pd.Series:
+        up_move = self.series("up_move")
+        down_move = self.series("down_move")
+        return down_move.where((down_move > up_move) & (down_move > 0), 0)
+
+    # ------------------------------------------------------------------ 窗口统计
+
+    def rolling(self, name: str, window: int, stat: str) -> pd.Series:
+        """
+        series(name).rolling(window).<stat>()
+        """
+        if stat not in ROLLING_STATS:
+            raise ValueError(f"不支持的滚动统计量: {stat}")
+        return self._memo(
+            ("rolling", name, window, stat),
+            lambda: getattr(self.series(name).rolling(window=window), stat)(),
+        )
+
+    def ewm_mean(self, name: str, span: int) -> pd.Series:
+        """
+        series(name).ewm(span=span, adjust=False).mean()
+        """
+        return self._memo(
+            ("ewm", name, span),
+            lambda: self.series(name).ewm(span=span, adjust=False).mean(),
+        )
+
+    def stats(self) -> dict:
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
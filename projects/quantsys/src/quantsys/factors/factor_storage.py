@@ -68,6 +68,76 @@ class FactorStorage:
         required_cols = ["timestamp", "factor_value"]
         return df[required_cols]
 
+    def _values_partition(self, symbol, timeframe, month):
+        return (
+            self.base_path
+            / "values"
+            / f"symbol={symbol}/timeframe={timeframe}/month={month}"
+            / "factor_values.parquet"
+        )
+
+    def upsert_factor_values(self, df, symbol, timeframe):
+        """Append long-format factor values (timestamp, factor_id, value), partitioned by month.
+
+        Rows sharing (timestamp, factor_id) with existing data replace it, so re-writing
+        the same batch is idempotent. Returns the number of partitions touched.
+        """
+        required_cols = ["timestamp", "factor_id", "value"]
+        assert all(col in df.columns for col in required_cols), (
+            f"Missing required columns: {set(required_cols) - set(df.columns)}"
+        )
+        if df.empty:
+            return 0
+
+        df = df[required_cols].copy()
+        timestamps = pd.DatetimeIndex(df["timestamp"])
+        if timestamps.tz is not None:
+            timestamps = timestamps.tz_convert(None)
+        df["timestamp"] = timestamps.astype("datetime64[ns]")
+
+        touched = 0
+        for month, part in df.groupby(df["timestamp"].dt.strftime("%Y-%m")):
+            file_path = self._values_partition(symbol, timeframe, month)
+            if file_path.exists():
+                existing = pq.read_table(str(file_path)).to_pandas()
+                part = pd.concat([existing, part], ignore_index=True)
+                part = part.drop_duplicates(subset=["timestamp", "factor_id"], keep="last")
+            part = part.sort_values(["factor_id", "timestamp"]).reset_index(drop=True)
+
+            # Write to a temp file first so readers never see a partial partition
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = file_path.with_suffix(".parquet.tmp")
+            pq.write_table(
+                pa.Table.from_pandas(part, preserve_index=False),
+                str(tmp_path),
+                compression="snappy",
+            )
+            tmp_path.replace(file_path)
+            touched += 1
+        return touched
+
+    def read_factor_values(self, symbol, timeframe, factor_id=None, start=None, end=None):
+        """Read long-format factor values written by upsert_factor_values"""
+        symbol_path = self.base_path / "values" / f"symbol={symbol}/timeframe={timeframe}"
+        if not symbol_path.exists():
+            return pd.DataFrame(columns=["timestamp", "factor_id", "value"])
+
+        filters = []
+        if factor_id is not None:
+            filters.append(("factor_id", "=", factor_id))
+        if start is not None:
+            filters.append(("timestamp", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("timestamp", "<=", pd.Timestamp(end)))
+
+        frames = [
+            pq.read_table(str(path), filters=filters or None).to_pandas()
+            for path in sorted(symbol_path.glob("month=*/factor_values.parquet"))
+        ]
+        if not frames:
+            return pd.DataFrame(columns=["timestamp", "factor_id", "value"])
+        return pd.concat(frames, ignore_index=True)
+
     def apply_retention_policy(self, symbol, max_versions=5):
         """Apply retention policy: keep only the most recent N factor versions"""
         symbol_path = self.base_path / f"symbol={symbol}"
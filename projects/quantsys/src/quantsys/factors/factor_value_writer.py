@@ -0,0 +1,257 @@
+"""
+因子值批量写入
+
+替代逐行 db_manager.insert_factor_value 的写入路径：
+- 数据库：按批 upsert，method="executemany" 使用多行 VALUES（psycopg2.extras.execute_values），
+  method="copy" 先 COPY 到临时表再 INSERT ... SELECT；method="row" 保留逐行写入
+- Parquet：经 FactorStorage.upsert_factor_values 按月分区追加
+- 幂等：以 (timestamp, symbol, timeframe, factor_id) 为键，重复写入覆盖旧值
+- 每个批次记录行数、耗时和吞吐量
+- 失败隔离：单个批次写入失败只记录错误，该批次的行留在缓冲区，下次 flush() 重试
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = ("executemany", "copy", "row")
+
+KEY_COLUMNS = ("timestamp", "symbol", "timeframe", "factor_id")
+
+
+@dataclass(frozen=True)
+class BatchWriteReport:
+    """
+    单个批次的写入结果
+    """
+
+    sink: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+
+def factor_value_rows(factor_values: pd.Series, symbol, timeframe, factor_id) -> pd.DataFrame:
+    """
+    将因子值序列展开为长表行，丢弃 NaN
+    """
+    values = pd.to_numeric(factor_values, errors="coerce")
+    mask = ~np.isnan(values.to_numpy(dtype=np.float64))
+    return pd.DataFrame(
+        {
+            "timestamp": values.index[mask],
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "factor_id": factor_id,
+            "value": values.to_numpy(dtype=np.float64)[mask],
+        }
+    )
+
+
+class FactorValueWriter:
+    """
+    缓冲因子值并按批写入数据库和/或 Parquet
+
+    add() 累积行，缓冲达到 batch_size 时自动 flush；调用方在结束时需 flush()，
+    之后 pending_rows 非零表示仍有未写出的行。
+    """
+
+    def __init__(
+        self,
+        db_manager=None,
+        method: str = "executemany",
+        batch_size: int = 50000,
+        table: str = "factor_values",
+        storage=None,
+        on_batch=None,
+    ):
+        if method not in WRITE_METHODS:
+            raise ValueError(f"不支持的因子值写入方式: {method}，可选 {WRITE_METHODS}")
+        if batch_size < 1:
+            raise ValueError("batch_size 必须为正整数")
+        self.db_manager = db_manager
+        self.method = method
+        self.batch_size = batch_size
+        self.table = table
+        self.storage = storage
+        self.on_batch = on_batch
+        self.reports: list[BatchWriteReport] = []
+        self._pending: list[pd.DataFrame] = []
+        self._pending_rows = 0
+
+    # ------------------------------------------------------------------ buffer
+
+    @property
+    def pending_rows(self) -> int:
+        return self._pending_rows
+
+    def add(self, symbol, timeframe, factor_id, factor_values: pd.Series) -> int:
+        """
+        缓冲一个因子的取值序列，返回缓冲的有效行数
+        """
+        rows = factor_value_rows(factor_values, symbol, timeframe, factor_id)
+        if rows.empty:
+            return 0
+        self._pending.append(rows)
+        self._pending_rows += len(rows)
+        if self._pending_rows >= self.batch_size:
+            self.flush()
+        return len(rows)
+
+    def flush(self) -> list[BatchWriteReport]:
+        """
+        写出缓冲区中的所有行（按 batch_size 切分批次）
+
+        某批次在任一目标上写入失败时记录错误并继续写后续批次；失败批次的行放回缓冲区，
+        下次 flush() 重新写入所有目标（upsert 幂等，已成功的目标重复写入无副作用）。
+        """
+        if not self._pending:
+            return []
+        frame = pd.concat(self._pending, ignore_index=True)
+
+        # 同一批内重复键以最后一次为准，否则 ON CONFLICT DO UPDATE 会因同一行被更新两次而失败
+        frame = frame.drop_duplicates(subset=list(KEY_COLUMNS), keep="last")
+
+        sinks = []
+        if self.db_manager is not None:
+            sinks.append(("database", self._write_database))
+        if self.storage is not None:
+            sinks.append(("parquet", self._write_parquet))
+
+        reports = []
+        failed = []
+        for start in range(0, len(frame), self.batch_size):
+            batch = frame.iloc[start : start + self.batch_size]
+            batch_failed = False
+            for sink, write in sinks:
+                try:
+                    reports.append(self._timed(sink, batch, write))
+                except Exception as e:
+                    logger.error(f"因子值批量写入失败 [{sink}]: {len(batch)} 行保留待重试: {e}")
+                    batch_failed = True
+            if batch_failed:
+                failed.append(batch)
+
+        self._pending = failed
+        self._pending_rows = sum(len(batch) for batch in failed)
+        return reports
+
+    def _timed(self, sink: str, batch: pd.DataFrame, write) -> BatchWriteReport:
+        started = time.perf_counter()
+        write(batch)
+        report = BatchWriteReport(sink, len(batch), time.perf_counter() - started)
+        self.reports.append(report)
+        logger.info(
+            f"因子值批量写入 [{sink}/{self.method if sink == 'database' else 'append'}]: "
+            f"{report.rows} 行, {report.seconds:.3f}s, {report.rows_per_second:.0f} 行/秒"
+        )
+        if self.on_batch is not None:
+            self.on_batch(report)
+        return report
+
+    # ------------------------------------------------------------------ database
+
+    def _upsert_sql(self, source: str) -> str:
+        return (
+            f"INSERT INTO {self.table} (timestamp, symbol, timeframe, factor_id, value) "
+            f"{source} "
+            "ON CONFLICT (timestamp, symbol, timeframe, factor_id) "
+            "DO UPDATE SET value = EXCLUDED.value"
+        )
+
+    def ensure_unique_key(self) -> None:
+        """
+        建立 upsert 所需的唯一索引（已存在时不做任何事）
+        """
+        cursor = self.db_manager.cursor
+        try:
+            cursor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {self.table}_key_uniq "
+                f"ON {self.table} (timestamp, symbol, timeframe, factor_id)"
+            )
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    def _write_database(self, batch: pd.DataFrame) -> None:
+        if self.method == "row":
+            for row in batch.itertuples(index=False):
+                self.db_manager.insert_factor_value(
+                    row.timestamp, row.symbol, row.timeframe, row.factor_id, row.value
+                )
+            return
+
+        cursor = self.db_manager.cursor
+        try:
+            if self.method == "copy":
+                self._copy_upsert(cursor, batch)
+            else:
+                self._values_upsert(cursor, batch)
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    @staticmethod
+    def _records(batch: pd.DataFrame) -> list[tuple]:
+        timestamps = pd.DatetimeIndex(batch["timestamp"]).to_pydatetime()
+        return list(
+            zip(
+                timestamps,
+                batch["symbol"].tolist(),
+                batch["timeframe"].tolist(),
+                batch["factor_id"].tolist(),
+                batch["value"].tolist(),
+            )
+        )
+
+    def _values_upsert(self, cursor, batch: pd.DataFrame) -> None:
+        records = self._records(batch)
+        try:
+            from psycopg2.extras import execute_values
+        except ImportError:
+            cursor.executemany(self._upsert_sql("VALUES (%s, %s, %s, %s, %s)"), records)
+            return
+        execute_values(cursor, self._upsert_sql("VALUES %s"), records, page_size=10000)
+
+    def _copy_upsert(self, cursor, batch: pd.DataFrame) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(self._records(batch))
+        buffer.seek(0)
+
+        staging = f"{self.table}_staging"
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+            f"(LIKE {self.table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(
+            f"COPY {staging} (timestamp, symbol, timeframe, factor_id, value) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        cursor.execute(
+            self._upsert_sql(
+                f"SELECT timestamp, symbol, timeframe, factor_id, value FROM {staging}"
+            )
+        )
+
+    # ------------------------------------------------------------------ parquet
+
+    def _write_parquet(self, batch: pd.DataFrame) -> None:
+        for (symbol, timeframe), part in batch.groupby(["symbol", "timeframe"], sort=False):
+            self.storage.upsert_factor_values(
+                part[["timestamp", "factor_id", "value"]], symbol, timeframe
+            )
@@ -0,0 +1,621 @@
+"""
+增量因子更新
+
+实盘每来一根新 bar，calculate_factors 都会在整个回看窗口上重算所有因子。
+IncrementalFactorUpdater 为常用因子保存流式状态（窗口缓冲、EMA、OBV/VWAP 累计量、SAR 状态机），
+每根新 bar 以 O(1) / O(window) 更新，只写入新产生的因子值：
+
+- 有显式状态的因子：见 STATE_FACTORIES，口径与 FactorLibrary.calculate_* 的默认参数一致
+- 其余因子：在最近 fallback_lookback 根 bar 上调用原因子函数，取新 bar 的值
+- 每 drift_check_every 根 bar 在完整历史上全量重算一次，与增量结果比对；
+  超出容差的因子用全量结果覆盖已写入的值，并重建其状态
+- 历史超过初始长度两倍时，在漂移检查时截断回初始长度并重建全部状态，
+  与重新执行一次 calculate_factors 的窗口口径一致（OBV/VWAP 等累计量随之重新锚定）
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def bar_context(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    """
+    逐 bar 更新所需的基础序列（与 FactorPrimitives 的派生量口径一致）
+    """
+    close = df["close"].to_numpy(dtype=np.float64)
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = close / prev_close - 1
+    # pandas 的 max(axis=1) 跳过 NaN：首根 bar 的真实波幅为 high - low
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return {
+        "open": df["open"].to_numpy(dtype=np.float64) if "open" in df else close,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": df["volume"].to_numpy(dtype=np.float64),
+        "prev_close": prev_close,
+        "delta": close - prev_close,
+        "returns": returns,
+        "true_range": true_range,
+        "typical_price": (high + low + close) / 3,
+    }
+
+
+# ---------------------------------------------------------------------- 流式状态
+
+
+class _Ema:
+    """
+    与 Series.ewm(span, adjust=False).mean() 一致：首个有效值为初值；
+    NaN 处输出上一个值，但旧值权重按经过的 bar 数继续衰减（ignore_na=False）
+    """
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = np.nan
+        self._old_weight = 1.0
+
+    def push(self, x) -> float:
+        if np.isnan(self.value):
+            if not np.isnan(x):
+                self.value = x
+            return self.value
+        self._old_weight *= 1 - self.alpha
+        if not np.isnan(x):
+            self.value = (self._old_weight * self.value + self.alpha * x) / (
+                self._old_weight + self.alpha
+            )
+            self._old_weight = 1.0
+        return self.value
+
+
+class _Window:
+    """
+    定长窗口缓冲，窗口未满或含 NaN 时统计量为 NaN（与 rolling(window) 一致）
+    """
+
+    def __init__(self, size: int):
+        self.values = deque(maxlen=size)
+
+    def push(self, x) -> np.ndarray | None:
+        self.values.append(x)
+        if len(self.values) < self.values.maxlen:
+            return None
+        return np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+
+
+class FactorState(ABC):
+    """
+    单个因子的流式状态
+
+    recursive=True 表示因子值依赖全部历史（EMA、累计量、SAR），重建状态需回放全部历史；
+    否则只需回放最近 warmup 根 bar。
+    """
+
+    recursive = False
+    warmup = 1
+
+    @abstractmethod
+    def update(self, ctx: dict, i: int) -> float:
+        """
+        推进到 bar_context 中的第 i 根 bar，返回该 bar 上的因子原始值（未应用可用性延迟）
+        """
+
+
+class RollingStatState(FactorState):
+    def __init__(self, field: str, window: int, stat: str, scale: float = 1.0):
+        self.field = field
+        self.stat = stat
+        self.scale = scale
+        self.warmup = window
+        self._window = _Window(window)
+
+    def update(self, ctx, i):
+        values = self._window.push(ctx[self.field][i])
+        if values is None:
+            return np.nan
+        if self.stat == "std":
+            value = values.std(ddof=1)
+        else:
+            value = getattr(values, self.stat)()
+        return value * self.scale
+
+
+class LaggedChangeState(FactorState):
+    """
+    与 window 根 bar 之前比较：diff = x - x[-w]，roc = (x - x[-w]) / x[-w] * 100，
+    pct = (x / x[-w] - 1) * 100
+    """
+
+    def __init__(self, field: str, window: int, kind: str):
+        self.field = field
+        self.kind = kind
+        self.warmup = window + 1
+        self._window = _Window(window + 1)
+
+    def update(self, ctx, i):
+        values = self._window.push(ctx[self.field][i])
+        if values is None:
+            return np.nan
+        current, base = values[-1], values[0]
+        if self.kind == "diff":
+            return current - base
+        if self.kind == "roc":
+            return (current - base) / base * 100
+        return (current / base - 1) * 100
+
+
+class EmaState(FactorState):
+    recursive = True
+
+    def __init__(self, field: str, span: int):
+        self.field = field
+        self._ema = _Ema(span)
+
+    def update(self, ctx, i):
+        return self._ema.push(ctx[self.field][i])
+
+
+class MacdState(FactorState):
+    recursive = True
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self._fast = _Ema(fast)
+        self._slow = _Ema(slow)
+        self._signal = _Ema(signal)
+
+    def update(self, ctx, i):
+        close = ctx["close"][i]
+        macd_line = self._fast.push(close) - self._slow.push(close)
+        return macd_line - self._signal.push(macd_line)
+
+
+class TsiState(FactorState):
+    recursive = True
+
+    def __init__(self, r=25, s=13):
+        self._m1, self._m2 = _Ema(r), _Ema(s)
+        self._d1, self._d2 = _Ema(r), _Ema(s)
+
+    def update(self, ctx, i):
+        pc = ctx["delta"][i]
+        m = self._m2.push(self._m1.push(pc))
+        dm = self._d2.push(self._d1.push(abs(pc)))
+        return m / dm * 100
+
+
+class RsiState(FactorState):
+    def __init__(self, window=14):
+        self.warmup = window
+        self._gain = _Window(window)
+        self._loss = _Window(window)
+
+    def update(self, ctx, i):
+        delta = ctx["delta"][i]
+        # delta.where(delta > 0, 0)：NaN 视为 0
+        gains = self._gain.push(delta if delta > 0 else 0.0)
+        losses = self._loss.push(-delta if delta < 0 else 0.0)
+        if gains is None:
+            return np.nan
+        rs = np.float64(gains.mean()) / np.float64(losses.mean())
+        return 100 - (100 / (1 + rs))
+
+
+class CciState(FactorState):
+    def __init__(self, window=20):
+        self.warmup = window
+        self._window = _Window(window)
+
+    def update(self, ctx, i):
+        tp = ctx["typical_price"][i]
+        values = self._window.push(tp)
+        if values is None:
+            return np.nan
+        sma = values.mean()
+        mad = np.abs(values - sma).mean()
+        return (tp - sma) / (0.015 * mad)
+
+
+class RangePositionState(FactorState):
+    """
+    close 在窗口高低点区间中的位置：stoch_k（0~100）或 williams_r（-100~0）
+    """
+
+    def __init__(self, window: int, kind: str):
+        self.kind = kind
+        self.warmup = window
+        self._high = _Window(window)
+        self._low = _Window(window)
+
+    def update(self, ctx, i):
+        highs = self._high.push(ctx["high"][i])
+        lows = self._low.push(ctx["low"][i])
+        if highs is None:
+            return np.nan
+        high_max, low_min = np.float64(highs.max()), np.float64(lows.min())
+        close = ctx["close"][i]
+        if self.kind == "stoch_k":
+            return (close - low_min) / (high_max - low_min) * 100
+        return (high_max - close) / (high_max - low_min) * -100
+
+
+class MaRelationState(FactorState):
+    """
+    trend_strength: (close - ma) / ma * 100；ma_crossover: fast_ma - slow_ma
+    """
+
+    def __init__(self, kind: str, window: int = 20, fast_window: int = 12, slow_window: int = 26):
+        self.kind = kind
+        if kind == "ma_crossover":
+            self._fast = RollingStatState("close", fast_window, "mean")
+            self._slow = RollingStatState("close", slow_window, "mean")
+            self.warmup = max(fast_window, slow_window)
+        else:
+            self._ma = RollingStatState("close", window, "mean")
+            self.warmup = window
+
+    def update(self, ctx, i):
+        if self.kind == "ma_crossover":
+            return self._fast.update(ctx, i) - self._slow.update(ctx, i)
+        ma = np.float64(self._ma.update(ctx, i))
+        return (ctx["close"][i] - ma) / ma * 100
+
+
+class TrendSlopeState(FactorState):
+    def __init__(self, window=20):
+        self.warmup = window
+        self._window = _Window(window)
+        centered = np.arange(window, dtype=np.float64) - (window - 1) / 2
+        self._weights = centered / np.dot(centered, centered)
+
+    def update(self, ctx, i):
+        values = self._window.push(ctx["close"][i])
+        if values is None:
+            return np.nan
+        return float(np.dot(self._weights, values))
+
+
+class ObvState(FactorState):
+    recursive = True
+
+    def __init__(self):
+        self.value = None
+        self._prev_close = np.nan
+
+    def update(self, ctx, i):
+        close = ctx["close"][i]
+        if self.value is None:
+            self.value = 0.0
+        elif close > self._prev_close:
+            self.value += ctx["volume"][i]
+        elif close < self._prev_close:
+            self.value -= ctx["volume"][i]
+        self._prev_close = close
+        return self.value
+
+
+class VwapState(FactorState):
+    """
+    累计 VWAP（与 cumsum 一致：NaN 项不累加，该位置输出 NaN）；
+    roc_window 非空时输出 VWAP 的 roc_window 期变化率（vwap_rate_of_change）
+    """
+
+    recursive = True
+
+    def __init__(self, roc_window: int | None = None):
+        self._pv = 0.0
+        self._volume = 0.0
+        self._roc = _Window(roc_window + 1) if roc_window else None
+
+    def update(self, ctx, i):
+        pv = ctx["typical_price"][i] * ctx["volume"][i]
+        volume = ctx["volume"][i]
+        if not np.isnan(pv):
+            self._pv += pv
+        if not np.isnan(volume):
+            self._volume += volume
+        vwap = np.nan if np.isnan(pv) or np.isnan(volume) else np.float64(self._pv) / self._volume
+        if self._roc is None:
+            return vwap
+        values = self._roc.push(vwap)
+        if values is None:
+            return np.nan
+        return (values[-1] / values[0] - 1) * 100
+
+
+class ParabolicSarState(FactorState):
+    """
+    与 factor_kernels.parabolic_sar 的状态机逐步等价
+    """
+
+    recursive = True
+
+    def __init__(self, af=0.02, af_max=0.2):
+        self.af_start = af
+        self.af_max = af_max
+        self.sar = None
+
+    def update(self, ctx, i):
+        high, low, close = ctx["high"][i], ctx["low"][i], ctx["close"][i]
+        if self.sar is None:
+            self.sar, self.ep, self.af, self.trend = close, close, self.af_start, 1
+            return self.sar
+
+        sar = self.sar + self.af * (self.ep - self.sar)
+        if self.trend == 1:
+            if low < sar:
+                self.trend, sar, self.ep, self.af = -1, self.ep, low, self.af_start
+            elif high > self.ep:
+                self.ep, self.af = high, min(self.af + self.af_start, self.af_max)
+        else:
+            if high > sar:
+                self.trend, sar, self.ep, self.af = 1, self.ep, high, self.af_start
+            elif low < self.ep:
+                self.ep, self.af = low, min(self.af + self.af_start, self.af_max)
+        self.sar = sar
+        return sar
+
+
+ANNUALIZE = math.sqrt(252)
+
+# 因子代码 -> 状态构造函数（参数为 FactorLibrary.calculate_* 的默认值）
+STATE_FACTORIES = {
+    "ma": lambda: RollingStatState("close", 20, "mean"),
+    "ema": lambda: EmaState("close", 20),
+    "rsi": lambda: RsiState(14),
+    "macd": lambda: MacdState(12, 26, 9),
+    "stoch_k": lambda: RangePositionState(14, "stoch_k"),
+    "std_dev": lambda: RollingStatState("close", 20, "std"),
+    "price_rate_of_change": lambda: LaggedChangeState("close", 12, "pct"),
+    "atr": lambda: RollingStatState("true_range", 14, "mean"),
+    "cci": lambda: CciState(20),
+    "roc": lambda: LaggedChangeState("close", 14, "roc"),
+    "vol_ma": lambda: RollingStatState("volume", 20, "mean"),
+    "obv": ObvState,
+    "vwap": VwapState,
+    "vwap_rate_of_change": lambda: VwapState(roc_window=12),
+    "volume_rate_of_change": lambda: LaggedChangeState("volume", 12, "pct"),
+    "volatility": lambda: RollingStatState("returns", 20, "std", ANNUALIZE),
+    "return_volatility": lambda: RollingStatState("returns", 20, "std"),
+    "historical_volatility": lambda: RollingStatState("returns", 30, "std", ANNUALIZE),
+    "realized_volatility": lambda: RollingStatState("returns", 20, "std"),
+    "momentum": lambda: LaggedChangeState("close", 14, "diff"),
+    "williams_r": lambda: RangePositionState(14, "williams_r"),
+    "tsi": lambda: TsiState(25, 13),
+    "parabolic_sar": lambda: ParabolicSarState(0.02, 0.2),
+    "trend_slope": lambda: TrendSlopeState(20),
+    "ma_crossover": lambda: MaRelationState("ma_crossover"),
+    "trend_strength": lambda: MaRelationState("trend_strength"),
+}
+
+
+# ---------------------------------------------------------------------- 更新器
+
+
+class IncrementalFactorUpdater:
+    """
+    单个 symbol/timeframe 的增量因子更新器
+
+    Args:
+        library: FactorLibrary，提供因子函数、元数据、全量计算和因子值写入
+        factor_ids: 因子代码 -> 因子ID
+        drift_check_every: 每多少根新 bar 做一次全量重算比对，0 表示不检查
+        drift_tolerance: 比对容差（相对/绝对）
+        fallback_lookback: 无显式状态的因子重算时使用的最近 bar 数
+    """
+
+    def __init__(
+        self,
+        library,
+        symbol: str,
+        timeframe: str,
+        factor_ids: dict,
+        drift_check_every: int = 240,
+        drift_tolerance: float = 1e-8,
+        fallback_lookback: int = 300,
+    ):
+        self.library = library
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.factor_ids = dict(factor_ids)
+        self.drift_check_every = drift_check_every
+        self.drift_tolerance = drift_tolerance
+        self.fallback_lookback = fallback_lookback
+
+        self.history: pd.DataFrame | None = None
+        self._base_length = 0
+        self._bars_since_check = 0
+        self._states: dict[str, FactorState] = {}
+        self._lag_queues: dict[str, deque] = {}
+        self._emitted: list[pd.DataFrame] = []
+        self._lags = {
+            code: library._get_factor_meta(code).availability_lag for code in self.factor_ids
+        }
+        self.drift_reports: list[dict] = []
+
+    @property
+    def stateful_factors(self) -> list[str]:
+        return [code for code in self.factor_ids if code in STATE_FACTORIES]
+
+    @property
+    def fallback_factors(self) -> list[str]:
+        return [code for code in self.factor_ids if code not in STATE_FACTORIES]
+
+    @property
+    def last_timestamp(self):
+        return self.history.index[-1] if self.history is not None and len(self.history) else None
+
+    # ------------------------------------------------------------------ 状态
+
+    def seed(self, df: pd.DataFrame) -> None:
+        """
+        以已全量计算过的行情初始化状态（不写库）
+        """
+        self.history = df[[col for col in BAR_FIELDS if col in df.columns]].copy()
+        self._base_length = len(self.history)
+        self._bars_since_check = 0
+        self._emitted = []
+        self._reseed(list(self.factor_ids))
+
+    def _reseed(self, codes: list[str]) -> None:
+        ctx = bar_context(self.history)
+        n = len(self.history)
+        for code in codes:
+            lag = self._lags[code]
+            if code in STATE_FACTORIES:
+                state = STATE_FACTORIES[code]()
+                # 延迟队列中的值也需由满窗口产生，因此多回放 lag 根
+                start = 0 if state.recursive else max(0, n - state.warmup - lag)
+                with np.errstate(all="ignore"):
+                    raw = [state.update(ctx, i) for i in range(start, n)]
+                self._states[code] = state
+            else:
+                raw = list(self._fallback_values(code, n).to_numpy())
+            # 延迟队列保存最近 lag 个未发布的原始值
+            self._lag_queues[code] = deque(raw[len(raw) - lag :] if lag else [], maxlen=lag + 1)
+
+    def _fallback_values(self, code: str, count: int) -> pd.Series:
+        """
+        在最近 fallback_lookback + count 根 bar 上重算因子，返回最后 count 个原始值
+        """
+        tail = self.history.iloc[-(self.fallback_lookback + count) :].copy()
+        values = self.library.factors[code]["func"](tail)
+        return self.library._extract_factor_series(code, values).iloc[-count:]
+
+    def _emit(self, code: str, raw_value: float) -> float:
+        lag = self._lags[code]
+        if lag == 0:
+            return raw_value
+        queue = self._lag_queues[code]
+        queue.append(raw_value)
+        return queue.popleft() if len(queue) > lag else np.nan
+
+    # ------------------------------------------------------------------ 更新
+
+    def update(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        追加新 bar（时间不晚于已处理的最后一根的会被忽略），更新状态并写入新值
+
+        Returns:
+            新 bar 上的因子值，行为时间，列为因子代码
+        """
+        if bars is None or bars.empty:
+            return pd.DataFrame()
+        last = self.last_timestamp
+        if last is not None:
+            bars = bars[bars.index > last]
+        if bars.empty:
+            return pd.DataFrame()
+
+        bars = bars[[col for col in BAR_FIELDS if col in bars.columns]]
+        self.history = pd.concat([self.history, bars])
+        n, count = len(self.history), len(bars)
+        # 多取一根，使首根新 bar 的 prev_close 等派生量正确
+        ctx = bar_context(self.history.iloc[-(count + 1) :])
+        offset = len(ctx["close"]) - count
+
+        results = {}
+        with np.errstate(all="ignore"):
+            for code, state in ((c, self._states[c]) for c in self.stateful_factors):
+                results[code] = [
+                    self._emit(code, state.update(ctx, offset + j)) for j in range(count)
+                ]
+        for code in self.fallback_factors:
+            raw = self._fallback_values(code, count).to_numpy()
+            results[code] = [self._emit(code, value) for value in raw]
+
+        values = pd.DataFrame(results, index=bars.index, dtype=np.float64)
+        self._write(values)
+
+        self._emitted.append(values)
+        self._bars_since_check += count
+        if self.drift_check_every and self._bars_since_check >= self.drift_check_every:
+            self.check_drift()
+        logger.debug(f"增量因子更新: {self.symbol} {self.timeframe} +{count} 根, 历史 {n} 根")
+        return values
+
+    def _write(self, values: pd.DataFrame) -> None:
+        writer = self.library._create_value_writer()
+        for code in values.columns:
+            writer.add(self.symbol, self.timeframe, self.factor_ids[code], values[code])
+        writer.flush()
+        if writer.pending_rows:
+            logger.error(
+                f"增量因子值写入失败: {self.symbol} {self.timeframe} - {writer.pending_rows} 行"
+            )
+
+    # ------------------------------------------------------------------ 漂移检查
+
+    def check_drift(self) -> dict:
+        """
+        在完整历史上全量重算，与上次检查以来发布的增量值比对
+
+        超出容差的因子：全量值覆盖写入、重建状态。历史过长时截断并重建全部状态。
+
+        Returns:
+            因子代码 -> 最大绝对误差
+        """
+        if not self._emitted:
+            return {}
+        incremental = pd.concat(self._emitted)
+        self._emitted = []
+        self._bars_since_check = 0
+
+        full = self.library._compute_factor_frame(self.history.copy(), list(self.factor_ids))
+        full = full.loc[incremental.index]
+
+        report, drifted = {}, []
+        for code in self.factor_ids:
+            expected = full[code].to_numpy(dtype=np.float64)
+            actual = incremental[code].to_numpy(dtype=np.float64)
+            nan_mismatch = np.isnan(expected) != np.isnan(actual)
+            diff = np.abs(expected - actual)
+            report[code] = (
+                float(np.inf) if nan_mismatch.any() else float(np.nanmax(diff, initial=0.0))
+            )
+            if not np.allclose(
+                actual,
+                expected,
+                rtol=self.drift_tolerance,
+                atol=self.drift_tolerance,
+                equal_nan=True,
+            ):
+                drifted.append(code)
+
+        if drifted:
+            logger.warning(
+                f"增量因子漂移 {self.symbol} {self.timeframe}: {drifted}，以全量结果修正"
+            )
+            writer = self.library._create_value_writer()
+            for code in drifted:
+                writer.add(self.symbol, self.timeframe, self.factor_ids[code], full[code])
+            writer.flush()
+
+        self.drift_reports.append(
+            {
+                "timestamp": self.last_timestamp,
+                "bars": len(incremental),
+                "max_diff": report,
+                "drifted": drifted,
+            }
+        )
+
+        if len(self.history) > 2 * self._base_length:
+            self.history = self.history.iloc[-self._base_length :]
+            self._reseed(list(self.factor_ids))
+        elif drifted:
+            self._reseed(drifted)
+        return report
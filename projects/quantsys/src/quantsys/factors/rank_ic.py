@@ -0,0 +1,140 @@
+"""
+批量 Rank IC 计算
+
+- spearman_ic_matrix：K 个因子 x J 个目标（收益周期、滞后）的 Spearman IC 一次算完。
+  每对 (因子, 目标) 只用两者同时非 NaN 的行，与 Series.corr(method="spearman") 一致；
+  有效行集合相同的因子/目标共享同一次排序，组内 IC 为一次矩阵乘法
+- rolling_spearman：滑动窗口 Spearman IC。先全局离散化为整数编码，
+  再对所有窗口批量求平均秩（排序 + searchsorted），不逐窗口调用 pandas
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# rolling_spearman 每块处理的元素数（窗口数 x 窗口长度），限制中间数组内存
+_ROLLING_CHUNK_ELEMENTS = 1 << 21
+
+
+def rank_columns(values: np.ndarray) -> np.ndarray:
+    """
+    按列求平均秩（并列取平均，NaN 保持 NaN）
+    """
+    return pd.DataFrame(values).rank(axis=0, method="average").to_numpy()
+
+
+def _mask_groups(valid: np.ndarray) -> list[np.ndarray]:
+    # 按列的有效行集合分组，返回每组的列编号
+    if valid.shape[1] == 0:
+        return []
+    keys = np.packbits(valid, axis=0).T
+    _, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = np.asarray(inverse).reshape(-1)
+    return [np.flatnonzero(inverse == group) for group in np.unique(inverse)]
+
+
+def _centered_ranks(block: np.ndarray) -> np.ndarray:
+    ranks = rank_columns(block)
+    return ranks - ranks.mean(axis=0)
+
+
+def spearman_ic_matrix(factors, targets, min_periods: int = 3) -> np.ndarray:
+    """
+    批量计算 Spearman IC
+
+    Args:
+        factors: (T, K) 因子矩阵
+        targets: (T, J) 目标矩阵（如不同周期、不同滞后的远期收益）
+        min_periods: 每对至少需要的有效样本数，不足时为 NaN
+
+    Returns:
+        (K, J) IC 矩阵；样本不足或任一方为常数时为 NaN
+    """
+    factors = np.asarray(factors, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    if targets.ndim == 1:
+        targets = targets[:, None]
+    if factors.ndim != 2 or factors.shape[0] != targets.shape[0]:
+        raise ValueError(f"因子矩阵形状 {factors.shape} 与目标矩阵形状 {targets.shape} 不匹配")
+
+    ics = np.full((factors.shape[1], targets.shape[1]), np.nan)
+    factor_valid = ~np.isnan(factors)
+    target_valid = ~np.isnan(targets)
+
+    for factor_cols in _mask_groups(factor_valid):
+        base_rows = factor_valid[:, factor_cols[0]]
+        # 与该组因子的有效行相交后，按交集再把目标分组
+        joint = base_rows[:, None] & target_valid
+        for target_cols in _mask_groups(joint):
+            rows = joint[:, target_cols[0]]
+            n = int(rows.sum())
+            if n < min_periods:
+                continue
+            factor_ranks = _centered_ranks(factors[np.ix_(rows, factor_cols)])
+            target_ranks = _centered_ranks(targets[np.ix_(rows, target_cols)])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                block = (factor_ranks.T @ target_ranks) / np.sqrt(
+                    np.outer((factor_ranks**2).sum(axis=0), (target_ranks**2).sum(axis=0))
+                )
+            ics[np.ix_(factor_cols, target_cols)] = np.where(np.isfinite(block), block, np.nan)
+    return ics
+
+
+def _window_average_ranks(codes: np.ndarray) -> np.ndarray:
+    """
+    (m, w) 整数编码矩阵的逐行平均秩（1 起）
+
+    每行加上行偏移后整体有序，一次 searchsorted 得到每个元素在本行中
+    小于它和不大于它的个数，平均秩 = (less + less_equal + 1) / 2。
+    """
+    m, w = codes.shape
+    span = int(codes.max()) + 1 if codes.size else 1
+    offsets = (np.arange(m, dtype=np.int64) * span)[:, None]
+    keys = codes.astype(np.int64) + offsets
+    ordered = np.sort(keys, axis=1).ravel()
+    flat = keys.ravel()
+    base = np.repeat(np.arange(m, dtype=np.int64) * w, w)
+    less = np.searchsorted(ordered, flat, side="left") - base
+    less_equal = np.searchsorted(ordered, flat, side="right") - base
+    return ((less + less_equal + 1) / 2.0).reshape(m, w)
+
+
+def rolling_spearman(x, y, window: int) -> np.ndarray:
+    """
+    滑动窗口 Spearman 相关系数
+
+    x、y 须已对齐且不含 NaN；结果第 i 个元素对应 x[i : i + window]，
+    与逐窗口 Series.corr(method="spearman") 相同（窗口内常数时为 NaN）。
+
+    Returns:
+        长度 max(len(x) - window + 1, 0) 的数组
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) != len(y):
+        raise ValueError(f"x、y 长度不一致: {len(x)} != {len(y)}")
+    if window < 2 or len(x) < window:
+        return np.empty(0)
+
+    # 全局离散化一次：窗口内比较整数编码与比较原值等价
+    x_codes = np.unique(x, return_inverse=True)[1].reshape(-1)
+    y_codes = np.unique(y, return_inverse=True)[1].reshape(-1)
+    x_windows = sliding_window_view(x_codes, window)
+    y_windows = sliding_window_view(y_codes, window)
+
+    count = len(x_windows)
+    result = np.empty(count)
+    center = (window + 1) / 2.0  # 平均秩的均值恒为 (w + 1) / 2
+    step = max(1, _ROLLING_CHUNK_ELEMENTS // window)
+    for start in range(0, count, step):
+        stop = min(start + step, count)
+        x_ranks = _window_average_ranks(x_windows[start:stop]) - center
+        y_ranks = _window_average_ranks(y_windows[start:stop]) - center
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[start:stop] = (x_ranks * y_ranks).sum(axis=1) / np.sqrt(
+                (x_ranks**2).sum(axis=1) * (y_ranks**2).sum(axis=1)
+            )
+    result[~np.isfinite(result)] = np.nan
+    return result
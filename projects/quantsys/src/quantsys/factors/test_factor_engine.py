@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+因子计算引擎测试
+覆盖旧版公式兼容、参数化窗口、公共子表达式复用、并行与串行一致、失败因子的输出格式
+以及可用性掩码的保存与读取
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.factors import factor_expression
+from quantsys.factors.factor_engine import AvailabilityMask, FactorEngine
+
+
+def _make_ohlcv(n=300, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    volume = rng.integers(100, 1000, n).astype(float)
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame(
+        {"high": close + 1, "low": close - 1, "close": close, "volume": volume}, index=index
+    )
+
+
+def _spec(code, formula, dependencies=(), **extra):
+    return {
+        "code": code,
+        "name": code,
+        "formula": formula,
+        "dependencies": list(dependencies),
+        **extra,
+    }
+
+
+def _engine(specs, **kwargs):
+    engine = FactorEngine(**kwargs)
+    engine.register_factors(specs)
+    return engine
+
+
+def test_legacy_formulas_match_old_engine():
+    data = _make_ohlcv()
+    engine = _engine(
+        [
+            _spec("ma", "rolling_mean", ["close"], window="configurable", output_col="close_ma"),
+            _spec("std", "rolling_std", ["close"]),
+            _spec("ret", "returns", ["close"]),
+            _spec("raw", "custom_placeholder", ["volume"]),
+        ]
+    )
+    result, availability = engine.calculate(data)
+
+    # 旧引擎：固定 20 窗口，未知公式直接输出第一个依赖
+    close = data["close"]
+    pd.testing.assert_series_equal(result["close_ma"], close.rolling(20).mean(), check_names=False)
+    pd.testing.assert_series_equal(result["std"], close.rolling(20).std(), check_names=False)
+    pd.testing.assert_series_equal(result["ret"], close.pct_change(), check_names=False)
+    pd.testing.assert_series_equal(result["raw"], data["volume"], check_names=False)
+    assert list(result.columns) == ["close_ma", "std", "ret", "raw"]
+    np.testing.assert_array_equal(availability["ma"].to_numpy(), close.rolling(20).mean().notna())
+    assert availability["ret"].count() == len(data) - 1
+
+
+def test_parameterized_windows_and_factor_references():
+    data = _make_ohlcv()
+    engine = _engine(
+        [
+            _spec(
+                "ratio",
+                "rolling_mean(close, window) / rolling_std(returns(close), 2 * window)",
+                window=5,
+            ),
+            _spec("scaled", "ratio * k", ["ratio"], params={"k": 3}),
+            _spec("short_ma", "rolling_mean(close, window)", window="7"),
+            _spec("spread", "close_ma - short_ma", ["ma", "short_ma"]),
+            _spec("ma", "rolling_mean", ["close"], window=12, output_col="close_ma"),
+        ]
+    )
+    result, _ = engine.calculate(data)
+
+    close = data["close"]
+    ratio = close.rolling(5).mean() / close.pct_change().rolling(10).std()
+    pd.testing.assert_series_equal(result["ratio"], ratio, check_names=False)
+    pd.testing.assert_series_equal(result["scaled"], ratio * 3, check_names=False)
+    pd.testing.assert_series_equal(
+        result["spread"], close.rolling(12).mean() - close.rolling(7).mean(), check_names=False
+    )
+
+
+def test_shared_subexpressions_are_evaluated_once():
+    data = _make_ohlcv()
+    calls = []
+    original = factor_expression.FUNCTIONS["rolling_mean"]
+
+    def counting_mean(x, window):
+        calls.append(window)
+        return original(x, window)
+
+    factor_expression.FUNCTIONS["rolling_mean"] = counting_mean
+    try:
+        engine = _engine(
+            [
+                _spec("a", "rolling_mean(close, 10) - close"),
+                _spec("b", "close - rolling_mean(close, window)", window=10),
+                _spec("c", "rolling_mean(close, 10) * 2 + rolling_mean(close, 20)"),
+            ]
+        )
+        graph, roots, errors = engine.compile(data.columns)
+        assert not errors
+        assert graph.shared_hits > 0
+        result, _ = engine.calculate(data)
+    finally:
+        factor_expression.FUNCTIONS["rolling_mean"] = original
+
+    # rolling_mean(close, 10) 被三个因子共享，只计算一次
+    assert sorted(calls) == [10.0, 20.0]
+    mean10 = data["close"].rolling(10).mean()
+    pd.testing.assert_series_equal(result["a"], mean10 - data["close"], check_names=False)
+    pd.testing.assert_series_equal(result["b"], data["close"] - mean10, check_names=False)
+
+
+def test_parallel_matches_serial():
+    data = _make_ohlcv(500)
+    specs = [
+        _spec(f"f{w}", "zscore(close, window) * rank(volume, window) - delta(close, 3)", window=w)
+        for w in range(5, 30, 3)
+    ]
+    specs.append(_spec("combo", " + ".join(s["code"] for s in specs), [s["code"] for s in specs]))
+    specs.append(_spec("corr", "corr(close, volume, 15) + ema(high - low, 8)"))
+
+    serial, serial_masks = _engine(specs).calculate(data)
+    parallel, parallel_masks = _engine(specs, max_workers=4).calculate(data)
+    override, _ = _engine(specs).calculate(data, max_workers=4)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    pd.testing.assert_frame_equal(override, serial)
+    for code, mask in serial_masks.items():
+        np.testing.assert_array_equal(parallel_masks[code].to_numpy(), mask.to_numpy())
+
+
+def test_compile_and_runtime_failures_produce_same_schema():
+    data = _make_ohlcv(50)
+    engine = _engine(
+        [
+            _spec("ok", "rolling_mean(close, 5)"),
+            _spec("unknown_func", "no_such_function(close)"),
+            _spec("missing_dep", "rolling_mean", ["no_such_column"]),
+            # 非整数窗口在求值时失败
+            _spec("bad_window", "rolling_mean(close, 2.5)"),
+            _spec("uses_bad", "bad_window + ok", ["bad_window", "ok"]),
+        ]
+    )
+    result, availability = engine.calculate(data)
+
+    assert list(result.columns) == ["ok", "unknown_func", "missing_dep", "bad_window", "uses_bad"]
+    for code in ("unknown_func", "missing_dep", "bad_window", "uses_bad"):
+        assert result[code].dtype == np.float64, code
+        assert result[code].isna().all(), code
+        assert availability[code].count() == 0, code
+    assert result["ok"].dtype == np.float64
+    assert availability["ok"].count() == len(data) - 4
+
+
+def test_availability_mask_round_trip():
+    data = _make_ohlcv(101)
+    engine = _engine(
+        [_spec("ma", "rolling_mean(close, 9)"), _spec("ret", "returns(close)", output_col="r")]
+    )
+    result, availability = engine.calculate(data)
+    assert availability["ma"].nbytes == 13
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path, mask_path = engine.save_results(result, availability, output_dir=tmp)
+        pd.testing.assert_frame_equal(pd.read_parquet(result_path), result, check_freq=False)
+        loaded = FactorEngine.load_availability(mask_path)
+        assert set(loaded) == {"ma", "ret"}
+        for code, mask in availability.items():
+            assert loaded[code].length == mask.length
+            np.testing.assert_array_equal(loaded[code].to_numpy(), mask.to_numpy())
+
+        # 兼容按列的 bool DataFrame 掩码
+        frame = FactorEngine.availability_frame(availability, data.index)
+        _, mask_path = engine.save_results(result, frame, output_dir=tmp)
+        loaded = FactorEngine.load_availability(mask_path)
+        np.testing.assert_array_equal(loaded["ret"].to_numpy(), frame["ret"].to_numpy())
+
+    both = availability["ma"] & availability["ret"]
+    assert both.count() == len(data) - 8
+    assert AvailabilityMask.full(10, True).count() == 10
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
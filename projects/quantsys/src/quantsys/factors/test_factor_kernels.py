@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+因子内核一致性测试
+将 factor_kernels 与原 factor_library 中的逐行/rolling().apply 实现逐项比对
+直接导入文件，避免包导入问题
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import factor_kernels
+
+
+def _make_ohlcv(n=800, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    close[::50] = np.roll(close, 1)[::50]  # 插入持平收盘价
+    open_ = close + rng.normal(0, 0.3, n)
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 0.5, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 0.5, n))
+    volume = rng.integers(100, 1000, n).astype(float)
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=index,
+    )
+
+
+# 原实现（重构前的 FactorLibrary 方法），作为参照
+def _reference_obv(df):
+    obv = pd.Series(0.0, index=df.index)
+    for i in range(1, len(df)):
+        if df["close"].iloc[i] > df["close"].iloc[i - 1]:
+            obv.iloc[i] = obv.iloc[i - 1] + df["volume"].iloc[i]
+        elif df["close"].iloc[i] < df["close"].iloc[i - 1]:
+            obv.iloc[i] = obv.iloc[i - 1] - df["volume"].iloc[i]
+        else:
+            obv.iloc[i] = obv.iloc[i - 1]
+    return obv
+
+
+def _reference_parabolic_sar(df, af=0.02, af_max=0.2):
+    sar = df["close"].copy()
+    ep = df["close"].copy()
+    trend = pd.Series(1, index=df.index)
+    af = pd.Series(af, index=df.index)
+
+    for i in range(1, len(df)):
+        if trend.iloc[i - 1] == 1:
+            sar.iloc[i] = sar.iloc[i - 1] + af.iloc[i - 1] * (ep.iloc[i - 1] - sar.iloc[i - 1])
+            if df["low"].iloc[i] < sar.iloc[i]:
+                trend.iloc[i] = -1
+                sar.iloc[i] = ep.iloc[i - 1]
+                ep.iloc[i] = df["low"].iloc[i]
+                af.iloc[i] = af.iloc[0]
+            else:
+                trend.iloc[i] = 1
+                if df["high"].iloc[i] > ep.iloc[i - 1]:
+                    ep.iloc[i] = df["high"].iloc[i]
+                    af.iloc[i] = min(af.iloc[i - 1] + af.iloc[0], af_max)
+                else:
+                    ep.iloc[i] = ep.iloc[i - 1]
+                    af.iloc[i] = af.iloc[i - 1]
+        else:
+            sar.iloc[i] = sar.iloc[i - 1] + af.iloc[i - 1] * (ep.iloc[i - 1] - sar.iloc[i - 1])
+            if df["high"].iloc[i] > sar.iloc[i]:
+                trend.iloc[i] = 1
+                sar.iloc[i] = ep.iloc[i - 1]
+                ep.iloc[i] = df["high"].iloc[i]
+                af.iloc[i] = af.iloc[0]
+            else:
+                trend.iloc[i] = -1
+                if df["low"].iloc[i] < ep.iloc[i - 1]:
+                    ep.iloc[i] = df["low"].iloc[i]
+                    af.iloc[i] = min(af.iloc[i - 1] + af.iloc[0], af_max)
+                else:
+                    ep.iloc[i] = ep.iloc[i - 1]
+                    af.iloc[i] = af.iloc[i - 1]
+    return sar
+
+
+def _reference_mad(series, window):
+    return series.rolling(window=window).apply(lambda x: np.mean(np.abs(x - x.mean())))
+
+
+def _reference_trend_slope(series, window):
+    def get_slope(x):
+        if len(x) < 2:
+            return 0
+        idx = np.arange(len(x))
+        slope, _ = np.polyfit(idx, x, 1)
+        return slope
+
+    return series.rolling(window=window).apply(get_slope)
+
+
+def test_obv_matches_reference():
+    df = _make_ohlcv()
+    expected = _reference_obv(df).to_numpy()
+    actual = factor_kernels.obv(df["close"], df["volume"])
+    assert np.array_equal(expected, actual)
+
+
+def test_parabolic_sar_matches_reference():
+    df = _make_ohlcv()
+    for af, af_max in [(0.02, 0.2), (0.01, 0.1)]:
+        expected = _reference_parabolic_sar(df, af, af_max).to_numpy()
+        actual = factor_kernels.parabolic_sar(df["high"], df["low"], df["close"], af, af_max)
+        assert np.array_equal(expected, actual)
+
+
+def test_rolling_mad_exact_matches_reference():
+    df = _make_ohlcv()
+    typical_price = (df["high"] + df["low"] + df["close"]) / 3
+    for window in (5, 20):
+        expected = _reference_mad(typical_price, window).to_numpy()
+        actual = factor_kernels.rolling_mad(typical_price, window, exact=True)
+        np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12, equal_nan=True)
+
+
+def test_rolling_mad_approximation_is_close():
+    rng = np.random.default_rng(3)
+    values = rng.normal(0, 1, 5000)
+    exact = factor_kernels.rolling_mad(values, 200, exact=True)
+    approx = factor_kernels.rolling_mad(values, 200, exact=False)
+    assert np.isnan(approx[:199]).all()
+    # 正态数据上 sqrt(2/π)·σ 与精确 MAD 的相对误差应在几个百分点以内
+    rel = np.abs(approx[199:] - exact[199:]) / exact[199:]
+    assert np.nanmean(rel) < 0.05
+
+
+def test_trend_slope_matches_polyfit():
+    df = _make_ohlcv()
+    for window in (2, 20, 60):
+        expected = _reference_trend_slope(df["close"], window).to_numpy()
+        actual = factor_kernels.rolling_ols_slope(df["close"], window)
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_kernels_propagate_nan_like_reference():
+    df = _make_ohlcv(200)
+    df.iloc[30, df.columns.get_loc("close")] = np.nan
+    expected = _reference_trend_slope(df["close"], 10).to_numpy()
+    actual = factor_kernels.rolling_ols_slope(df["close"], 10)
+    assert np.array_equal(np.isnan(expected), np.isnan(actual))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
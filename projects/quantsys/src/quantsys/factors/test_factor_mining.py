@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+批量因子挖掘测试
+覆盖进程池与当前进程求值一致、rank_ic_matrix 与逐列 calculate_factor_ic 一致、
+贪心去相关与 DataFrame.corr() 阈值筛选一致，以及 filter_factors 按绝对IC优先入选
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.factors import auto_factor_generator
+from quantsys.factors.factor_expression import FUNCTIONS
+from quantsys.factors.factor_mining import (
+    BatchExpressionEvaluator,
+    GreedyCorrelationPruner,
+    rank_ic_matrix,
+)
+
+
+class FakeDbManager:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+def _features(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame(
+        {
+            "close": close,
+            "volume": rng.integers(100, 1000, n).astype(float),
+            "spread": np.abs(rng.normal(0, 0.5, n)),
+            "returns": pd.Series(close).pct_change().to_numpy(),
+        },
+        index=index,
+    )
+
+
+def _generator(features, **kwargs):
+    original = auto_factor_generator.DatabaseManager
+    auto_factor_generator.DatabaseManager = FakeDbManager
+    try:
+        return auto_factor_generator.AutoFactorGenerator(features, **kwargs)
+    finally:
+        auto_factor_generator.DatabaseManager = original
+
+
+def _old_filter(frame: pd.DataFrame, max_corr: float) -> list:
+    # 原 filter_factors 的相关性筛选：每个候选与已选因子构造 DataFrame.corr()
+    selected = []
+    for factor in frame.columns:
+        if not selected:
+            selected.append(factor)
+            continue
+        corr_matrix = frame[[factor] + selected].corr()
+        if corr_matrix.loc[factor, selected].abs().max() <= max_corr:
+            selected.append(factor)
+    return selected
+
+
+def test_process_pool_matches_in_process():
+    features = _features()
+    generator = _generator(features)
+    random.seed(0)
+    expressions = generator.generate_factor_expressions(300)
+    # 重复表达式、未知变量、求值失败各一个
+    expressions += [expressions[0], "log(open_interest)", "rolling_mean_12h(2)"]
+
+    serial = generator._create_evaluator()
+    values, errors = serial.evaluate(features, expressions)
+    assert serial.last_stats["workers"] == 1
+
+    pooled = BatchExpressionEvaluator(serial.functions, max_workers=2, batch_size=32)
+    batches = []
+    pooled_values, pooled_errors = pooled.evaluate(features, expressions, on_batch=batches.append)
+    assert pooled.last_stats["workers"] == 2
+    assert sum(batches) == pooled.last_stats["unique_roots"] and max(batches) <= 32
+
+    np.testing.assert_array_equal(pooled_values, values)
+    assert pooled_errors == errors
+    assert set(errors) == {"log(open_interest)", "rolling_mean_12h(2)"}
+    assert np.isnan(values[:, -1]).all() and np.isnan(values[:, -2]).all()
+    np.testing.assert_array_equal(values[:, 300], values[:, 0])
+
+    # 与 eval 逐个求值的结果一致
+    for col in range(0, 300, 37):
+        expected = generator.evaluate_factor_expression(expressions[col]).to_numpy(dtype=float)
+        np.testing.assert_allclose(values[:, col], expected, rtol=1e-12, equal_nan=True)
+
+
+def test_unpicklable_functions_fall_back_in_process():
+    features = _features(100)
+    expressions = [f"rolling_mean(close, {w}) - rolling_std(volume, {w})" for w in range(2, 40)]
+    serial, _ = BatchExpressionEvaluator(FUNCTIONS).evaluate(features, expressions)
+    evaluator = BatchExpressionEvaluator(FUNCTIONS, max_workers=2, batch_size=4)
+    values, errors = evaluator.evaluate(features, expressions)
+    assert not errors
+    assert evaluator.last_stats["workers"] == 1
+    np.testing.assert_array_equal(values, serial)
+
+
+def test_rank_ic_matrix_matches_calculate_factor_ic():
+    features = _features()
+    rng = np.random.default_rng(9)
+    labels = pd.Series(rng.normal(0, 1, len(features)), index=features.index)
+    labels.iloc[::17] = np.nan
+    matrix = pd.DataFrame(
+        {
+            "close": features["close"],
+            "noisy": labels * 0.3 + rng.normal(0, 1, len(features)),
+            "ties": np.round(features["spread"], 1),
+            "sparse": features["returns"].where(rng.random(len(features)) > 0.6),
+            "constant": 1.0,
+            "empty": np.nan,
+        },
+        index=features.index,
+    )
+    generator = _generator(features)
+    expected = [generator.calculate_factor_ic(matrix[col], labels) for col in matrix.columns]
+
+    ics = rank_ic_matrix(matrix.to_numpy(dtype=np.float64), labels.to_numpy())
+    np.testing.assert_allclose(ics, expected, rtol=1e-12, atol=1e-12)
+    assert ics[-1] == 0.0 and ics[-2] == 0.0
+    np.testing.assert_allclose(
+        generator.calculate_factor_ics(matrix, labels), expected, rtol=1e-12, atol=1e-12
+    )
+
+
+def test_greedy_pruner_matches_dataframe_corr():
+    rng = np.random.default_rng(21)
+    n = 300
+    base = rng.normal(0, 1, (n, 6))
+    columns = {}
+    for i in range(40):
+        # 由少数几个基向量混合而成，候选之间相关性高低不一
+        weights = rng.normal(0, 1, 6) * (rng.random(6) > 0.5)
+        values = base @ weights + rng.normal(0, 0.2 + i % 4, n)
+        values[rng.random(n) < 0.1] = np.nan
+        columns[f"f{i}"] = values
+    columns["constant"] = np.full(n, 2.0)
+    columns["empty"] = np.full(n, np.nan)
+    columns["copy"] = columns["f3"] * 5 + 1
+    frame = pd.DataFrame(columns)
+
+    for max_corr in (0.3, 0.6, 0.9):
+        pruner = GreedyCorrelationPruner(max_corr, n, capacity=2, block_size=3)
+        kept = [name for name in frame.columns if pruner.offer(name, frame[name].to_numpy())]
+        assert kept == pruner.names
+        assert kept == _old_filter(frame, max_corr), max_corr
+        assert "copy" not in kept and "constant" not in kept and "empty" not in kept
+
+    # correlations 与 DataFrame.corr() 的成对完整相关系数一致
+    pruner = GreedyCorrelationPruner(1.0, n)
+    for name in ("f0", "f1", "f2"):
+        pruner.offer(name, frame[name].to_numpy())
+    expected = frame[["f5", "f0", "f1", "f2"]].corr().loc["f5", ["f0", "f1", "f2"]]
+    np.testing.assert_allclose(pruner.correlations(frame["f5"]), expected, rtol=1e-10)
+
+
+def test_filter_factors_prunes_in_abs_ic_order():
+    features = _features()
+    rng = np.random.default_rng(4)
+    signal = rng.normal(0, 1, len(features))
+    generator = _generator(features)
+    generator.generated_factors = pd.DataFrame(
+        {
+            "weak": signal + rng.normal(0, 0.05, len(features)),
+            "strong": signal,
+            "other": rng.normal(0, 1, len(features)),
+            "other_dup": 0.0,
+            "tiny": rng.normal(0, 1, len(features)),
+        },
+        index=features.index,
+    )
+    generator.generated_factors["other_dup"] = generator.generated_factors["other"]
+    scores = {
+        "weak": ("a", 0.05),
+        "strong": ("b", -0.3),
+        "other": ("c", 0.2),
+        "other_dup": ("c", 0.2),
+        "tiny": ("d", 0.001),
+    }
+    generator.factor_scores = {
+        name: {"expression": expr, "ic": ic, "abs_ic": abs(ic)}
+        for name, (expr, ic) in scores.items()
+    }
+
+    # 先按绝对IC排序再去相关：与 weak 高度相关的 strong 因 |IC| 更高而保留，
+    # 按原插入顺序筛选则会保留 weak；表达式重复的 other_dup 与低IC的 tiny 被剔除
+    filtered = generator.filter_factors(min_abs_ic=0.01, max_corr=0.8)
+    assert list(filtered.columns) == ["strong", "other"]
+    assert _old_filter(generator.generated_factors[["weak", "strong", "other"]], 0.8) == [
+        "weak",
+        "other",
+    ]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+因子值批量写入测试
+覆盖 upsert / COPY / Parquet 三条写入路径、批内去重以及写入失败时的缓冲保留
+直接导入文件，避免包导入问题
+"""
+
+import csv
+import io
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from factor_storage import FactorStorage
+from factor_value_writer import FactorValueWriter, factor_value_rows
+
+SCHEMA = (
+    "CREATE TABLE factor_values "
+    "(timestamp TEXT, symbol TEXT, timeframe TEXT, factor_id INTEGER, value REAL)"
+)
+
+
+class SqliteCursor:
+    """
+    以 sqlite3 模拟 psycopg2 游标：%s 占位符转为 ?，datetime 以 ISO 字符串存储
+    """
+
+    def __init__(self, conn, fail_after=None):
+        self.connection = conn
+        self._cursor = conn.cursor()
+        self.fail_after = fail_after
+        self.batches = 0
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(sql.replace("%s", "?"), params)
+
+    def executemany(self, sql, records):
+        self.batches += 1
+        if self.fail_after is not None and self.batches > self.fail_after:
+            raise sqlite3.OperationalError("simulated write failure")
+        records = [(ts.isoformat(), *rest) for ts, *rest in records]
+        return self._cursor.executemany(sql.replace("%s", "?"), records)
+
+
+class CopyCursor:
+    """
+    记录 COPY 路径发出的语句和 CSV 数据
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.connection = self
+        self.commits = 0
+
+    def execute(self, sql, params=()):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(sql)
+        self.copied.extend(csv.reader(io.StringIO(buffer.read())))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class DbManager:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+
+def _series(values, start="2024-01-01"):
+    index = pd.date_range(start, periods=len(values), freq="h")
+    return pd.Series(values, index=index, dtype=float)
+
+
+def _sqlite_writer(**kwargs):
+    conn = sqlite3.connect(":memory:")
+    conn.execute(SCHEMA)
+    cursor = SqliteCursor(conn, kwargs.pop("fail_after", None))
+    writer = FactorValueWriter(db_manager=DbManager(cursor), **kwargs)
+    writer.ensure_unique_key()
+    return writer, conn, cursor
+
+
+def _rows(conn):
+    return conn.execute(
+        "SELECT timestamp, factor_id, value FROM factor_values ORDER BY factor_id, timestamp"
+    ).fetchall()
+
+
+def test_factor_value_rows_drop_nan():
+    rows = factor_value_rows(_series([1.0, np.nan, 3.0]), "ETH-USDT", "1h", 7)
+    assert rows["value"].tolist() == [1.0, 3.0]
+    assert set(rows["factor_id"]) == {7}
+
+
+def test_upsert_is_idempotent_and_dedups_within_batch():
+    writer, conn, _ = _sqlite_writer(batch_size=4)
+    writer.add("ETH-USDT", "1h", 1, _series([1.0, 2.0, 3.0]))
+    # 同一批内重复键：以最后一次为准
+    writer.add("ETH-USDT", "1h", 1, _series([10.0]))
+    writer.add("ETH-USDT", "1h", 2, _series([5.0, 6.0]))
+    writer.flush()
+    assert writer.pending_rows == 0
+    first = _rows(conn)
+    assert [r[2] for r in first] == [10.0, 2.0, 3.0, 5.0, 6.0]
+
+    # 重写同样的键只覆盖取值，不新增行
+    writer.add("ETH-USDT", "1h", 2, _series([50.0, 60.0]))
+    writer.flush()
+    assert [r[2] for r in _rows(conn)] == [10.0, 2.0, 3.0, 50.0, 60.0]
+
+
+def test_failed_batch_stays_buffered_and_later_batches_are_written():
+    writer, conn, cursor = _sqlite_writer(batch_size=2, fail_after=1)
+    writer._pending.append(factor_value_rows(_series([1.0, 2.0, 3.0, 4.0]), "ETH-USDT", "1h", 1))
+    writer._pending_rows = 4
+
+    reports = writer.flush()
+    assert len(reports) == 1
+    assert writer.pending_rows == 2
+    assert [r[2] for r in _rows(conn)] == [1.0, 2.0]
+
+    cursor.fail_after = None
+    writer.flush()
+    assert writer.pending_rows == 0
+    assert [r[2] for r in _rows(conn)] == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_copy_path_stages_then_upserts():
+    cursor = CopyCursor()
+    writer = FactorValueWriter(db_manager=DbManager(cursor), method="copy")
+    writer.add("ETH-USDT", "1h", 3, _series([1.5, 2.5]))
+    writer.flush()
+
+    assert cursor.statements[0].startswith("CREATE TEMP TABLE IF NOT EXISTS factor_values_staging")
+    assert cursor.statements[1].startswith("COPY factor_values_staging")
+    assert "ON CONFLICT (timestamp, symbol, timeframe, factor_id)" in cursor.statements[2]
+    assert [row[1:] for row in cursor.copied] == [
+        ["ETH-USDT", "1h", "3", "1.5"],
+        ["ETH-USDT", "1h", "3", "2.5"],
+    ]
+    assert cursor.commits == 1
+
+
+def test_parquet_path_upserts_by_month():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = FactorStorage(tmp)
+        writer = FactorValueWriter(storage=storage, batch_size=3)
+        writer.add("ETH-USDT", "1h", 4, _series([1.0, 2.0], start="2024-01-31 23:00"))
+        writer.add("ETH-USDT", "1h", 4, _series([3.0, 4.0], start="2024-02-01 01:00"))
+        writer.flush()
+        writer.add("ETH-USDT", "1h", 4, _series([20.0], start="2024-02-01 00:00"))
+        writer.flush()
+
+        stored = storage.read_factor_values("ETH-USDT", "1h", factor_id=4)
+        stored = stored.sort_values("timestamp")
+        assert stored["value"].tolist() == [1.0, 20.0, 3.0, 4.0]
+        assert {r.sink for r in writer.reports} == {"parquet"}
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
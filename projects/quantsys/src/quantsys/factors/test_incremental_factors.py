@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+增量因子状态测试
+逐 bar 推进流式状态，与向量化全量计算结果比对
+直接导入文件，避免包导入问题
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import factor_kernels
+import incremental_factors as inc
+
+
+def _make_ohlcv(n=600, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    close[::40] = np.roll(close, 1)[::40]
+    open_ = close + rng.normal(0, 0.3, n)
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 0.5, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 0.5, n))
+    volume = rng.integers(100, 1000, n).astype(float)
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=index,
+    )
+
+
+def _stream(state, df):
+    ctx = inc.bar_context(df)
+    with np.errstate(all="ignore"):
+        return np.array([state.update(ctx, i) for i in range(len(df))], dtype=np.float64)
+
+
+def _assert_close(actual, expected):
+    np.testing.assert_allclose(
+        actual, np.asarray(expected, dtype=np.float64), rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+
+
+def test_rolling_states_match_pandas():
+    df = _make_ohlcv()
+    returns = df["close"].pct_change()
+    _assert_close(_stream(inc.STATE_FACTORIES["ma"](), df), df["close"].rolling(20).mean())
+    _assert_close(_stream(inc.STATE_FACTORIES["std_dev"](), df), df["close"].rolling(20).std())
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["volatility"](), df), returns.rolling(20).std() * np.sqrt(252)
+    )
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["momentum"](), df), df["close"] - df["close"].shift(14)
+    )
+
+
+def test_recursive_states_match_pandas():
+    df = _make_ohlcv()
+    close = df["close"]
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["ema"](), df), close.ewm(span=20, adjust=False).mean()
+    )
+    macd_line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["macd"](), df),
+        macd_line - macd_line.ewm(span=9, adjust=False).mean(),
+    )
+    typical_price = (df["high"] + df["low"] + df["close"]) / 3
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["vwap"](), df),
+        (typical_price * df["volume"]).cumsum() / df["volume"].cumsum(),
+    )
+
+
+def test_kernel_states_match_kernels():
+    df = _make_ohlcv()
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["obv"](), df),
+        factor_kernels.obv(df["close"], df["volume"]),
+    )
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["parabolic_sar"](), df),
+        factor_kernels.parabolic_sar(df["high"], df["low"], df["close"]),
+    )
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["trend_slope"](), df),
+        factor_kernels.rolling_ols_slope(df["close"], 20),
+    )
+
+
+def test_nan_input_matches_pandas():
+    df = _make_ohlcv(200)
+    df.iloc[0, df.columns.get_loc("close")] = np.nan
+    df.iloc[50, df.columns.get_loc("close")] = np.nan
+    close = df["close"]
+    _assert_close(_stream(inc.STATE_FACTORIES["ma"](), df), close.rolling(20).mean())
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["ema"](), df), close.ewm(span=20, adjust=False).mean()
+    )
+    typical_price = (df["high"] + df["low"] + close) / 3
+    _assert_close(
+        _stream(inc.STATE_FACTORIES["vwap"](), df),
+        (typical_price * df["volume"]).cumsum() / df["volume"].cumsum(),
+    )
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
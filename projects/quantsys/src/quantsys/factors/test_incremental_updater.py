@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+增量因子更新器测试
+分批推送新 bar，与 FactorLibrary 全量重算比对；覆盖可用性延迟队列、漂移检查修正、
+历史截断后的状态重建以及因子值写入
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quantsys.factors import factor_library
+from quantsys.factors.incremental_factors import (
+    STATE_FACTORIES,
+    FactorState,
+    IncrementalFactorUpdater,
+)
+
+REGISTRY = Path(__file__).with_name("factor_registry.json")
+SYMBOL, TIMEFRAME = "ETH-USDT", "1h"
+# 状态因子（含 EMA/累计量/SAR 等递归状态）与窗口重算因子各取几个
+STATEFUL = ["ma", "ema", "rsi", "macd", "std_dev", "atr", "cci", "obv", "vwap"]
+STATEFUL += ["volatility", "williams_r", "tsi", "parabolic_sar", "trend_slope", "ma_crossover"]
+FALLBACK = ["adx", "mfi", "roc_momentum"]
+CODES = STATEFUL + FALLBACK
+# 延迟发布的因子：一个有显式状态，一个走窗口重算
+LAGS = {"ma": 2, "mfi": 1}
+
+
+class FakeDbManager:
+    """
+    记录逐行写入的因子值，同键重复写入覆盖旧值（与 upsert 一致）
+    """
+
+    def __init__(self, config=None):
+        self.values = {}
+        self.writes = 0
+
+    def insert_factor_value(self, timestamp, symbol, timeframe, factor_id, value):
+        self.values[(factor_id, pd.Timestamp(timestamp))] = value
+        self.writes += 1
+
+    def written(self, factor_id):
+        items = sorted((ts, v) for (fid, ts), v in self.values.items() if fid == factor_id)
+        return pd.Series([v for _, v in items], index=[ts for ts, _ in items], dtype=float)
+
+
+def _make_ohlcv(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    open_ = close + rng.normal(0, 0.3, n)
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 0.5, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 0.5, n))
+    volume = rng.integers(100, 1000, n).astype(float)
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=index,
+    )
+
+
+def _library(tmp):
+    with open(REGISTRY, encoding="utf-8") as f:
+        registry = json.load(f)
+    for code, lag in LAGS.items():
+        registry["factors"][code]["availability_lag"] = lag
+    registry_path = os.path.join(tmp, "factor_registry.json")
+    with open(registry_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f)
+
+    original = factor_library.DatabaseManager
+    factor_library.DatabaseManager = FakeDbManager
+    try:
+        return factor_library.FactorLibrary(
+            {
+                "database": {},
+                "factor_registry_path": registry_path,
+                "factor": {"value_write_method": "row"},
+            }
+        )
+    finally:
+        factor_library.DatabaseManager = original
+
+
+def _updater(library, **kwargs):
+    factor_ids = {code: i + 1 for i, code in enumerate(CODES)}
+    return IncrementalFactorUpdater(library, SYMBOL, TIMEFRAME, factor_ids, **kwargs)
+
+
+def _feed(updater, df, start, batch_sizes):
+    frames, pos = [], start
+    for size in batch_sizes:
+        frames.append(updater.update(df.iloc[pos : pos + size]))
+        pos += size
+    return pd.concat(frames), pos
+
+
+def _assert_frame_close(actual, expected):
+    for code in expected.columns:
+        np.testing.assert_allclose(
+            actual[code].to_numpy(dtype=np.float64),
+            expected[code].to_numpy(dtype=np.float64),
+            rtol=1e-8,
+            atol=1e-8,
+            equal_nan=True,
+            err_msg=code,
+        )
+
+
+def test_factor_state_is_abstract():
+    class Incomplete(FactorState):
+        pass
+
+    try:
+        Incomplete()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("FactorState subclasses must implement update")
+    assert all(isinstance(make(), FactorState) for make in STATE_FACTORIES.values())
+
+
+def test_batched_updates_match_full_recompute():
+    with tempfile.TemporaryDirectory() as tmp:
+        library = _library(tmp)
+        df = _make_ohlcv(500)
+        updater = _updater(library, drift_check_every=0)
+        assert updater.stateful_factors == STATEFUL
+        assert updater.fallback_factors == FALLBACK
+
+        updater.seed(df.iloc[:400])
+        assert library.db_manager.writes == 0
+        incremental, end = _feed(updater, df, 400, [1, 7, 30, 2, 60])
+        assert end == len(df)
+        assert list(incremental.index) == list(df.index[400:])
+
+        full = library._compute_factor_frame(df.copy(), CODES)
+        _assert_frame_close(incremental, full.iloc[400:])
+        # 延迟队列：发布的值是 lag 根 bar 之前的原始值
+        assert incremental["ma"].iloc[0] == full["ma"].iloc[400]
+        np.testing.assert_allclose(
+            incremental["ma"], df["close"].rolling(20).mean().shift(2).iloc[400:], rtol=1e-12
+        )
+
+        # 每个新值只写入一次，写入值即返回值
+        for code, factor_id in updater.factor_ids.items():
+            written = library.db_manager.written(factor_id)
+            expected = incremental[code].dropna()
+            assert list(written.index) == list(expected.index), code
+            np.testing.assert_allclose(written, expected, rtol=0, atol=0)
+        assert library.db_manager.writes == incremental.notna().sum().sum()
+
+
+def test_old_bars_are_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        library = _library(tmp)
+        df = _make_ohlcv(300)
+        updater = _updater(library, drift_check_every=0)
+        updater.seed(df.iloc[:250])
+        assert updater.update(df.iloc[240:250]).empty
+        assert updater.update(None).empty
+
+        # 与已处理区间重叠的批次只处理新 bar
+        values = updater.update(df.iloc[245:260])
+        assert list(values.index) == list(df.index[250:260])
+        assert updater.last_timestamp == df.index[259]
+        assert len(updater.history) == 260
+
+
+def test_drift_check_repairs_written_values_and_state():
+    with tempfile.TemporaryDirectory() as tmp:
+        library = _library(tmp)
+        df = _make_ohlcv(500)
+        updater = _updater(library, drift_check_every=40)
+        updater.seed(df.iloc[:400])
+        # 人为破坏递归状态：之后发布的 EMA 全部偏离
+        updater._states["ema"]._ema.value += 1.0
+
+        _feed(updater, df, 400, [25, 15])
+        assert len(updater.drift_reports) == 1
+        report = updater.drift_reports[0]
+        assert report["drifted"] == ["ema"]
+        assert report["bars"] == 40
+        assert report["max_diff"]["ema"] > 1e-3
+        assert report["max_diff"]["ma"] < 1e-9
+
+        # 已写入的偏离值被全量结果覆盖
+        full = library._compute_factor_frame(df.iloc[:440].copy(), CODES)
+        ema_id = updater.factor_ids["ema"]
+        written = library.db_manager.written(ema_id)
+        np.testing.assert_allclose(written.loc[df.index[400:440]], full["ema"].iloc[400:440])
+
+        # 状态已重建：后续增量值与全量一致，下一次检查无漂移
+        incremental, _ = _feed(updater, df, 440, [20, 20])
+        full = library._compute_factor_frame(df.iloc[:480].copy(), CODES)
+        _assert_frame_close(incremental, full.iloc[440:480])
+        assert updater.drift_reports[-1]["drifted"] == []
+
+
+def test_history_is_truncated_and_reseeded():
+    with tempfile.TemporaryDirectory() as tmp:
+        library = _library(tmp)
+        df = _make_ohlcv(500)
+        updater = _updater(library, drift_check_every=50)
+        updater.seed(df.iloc[:100])
+
+        # 第 3 次检查时历史 250 根 > 2 × 100：截断回 100 根并重建全部状态
+        _feed(updater, df, 100, [50, 50])
+        assert len(updater.history) == 200
+        _feed(updater, df, 200, [50])
+        assert len(updater.history) == 100
+        assert updater.history.index[-1] == df.index[249]
+        assert all(report["drifted"] == [] for report in updater.drift_reports)
+
+        # 截断后的增量值与在截断窗口上重新全量计算一致（OBV/VWAP 等累计量重新锚定）
+        incremental, _ = _feed(updater, df, 250, [10, 15])
+        window = df.iloc[150:275]
+        assert updater.history.index.equals(window.index)
+        full = library._compute_factor_frame(window.copy(), CODES)
+        _assert_frame_close(incremental, full.iloc[-25:])
+        report = updater.check_drift()
+        assert set(report) == set(CODES) and max(report.values()) < 1e-9
+        assert updater.drift_reports[-1]["drifted"] == []
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+批量 Rank IC 测试
+与逐列 / 逐窗口的 pandas Spearman 相关系数比对
+直接导入文件，避免包导入问题
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import rank_ic
+
+
+def _pandas_spearman(x, y):
+    aligned = pd.concat([pd.Series(x), pd.Series(y)], axis=1).dropna()
+    if len(aligned) < 3:
+        return np.nan
+    return aligned.iloc[:, 0].corr(aligned.iloc[:, 1], method="spearman")
+
+
+def test_ic_matrix_matches_pandas():
+    rng = np.random.default_rng(0)
+    factors = rng.normal(size=(400, 5))
+    factors[:20, 1] = np.nan  # 预热期
+    factors[::7, 2] = np.nan
+    factors[:, 3] = np.round(factors[:, 3])  # 并列值
+    factors[:, 4] = 1.0  # 常数列
+    targets = rng.normal(size=(400, 3))
+    targets[-5:, 0] = np.nan
+    targets[::11, 1] = np.nan
+    targets[:, 2] = np.round(targets[:, 2] * 2)
+
+    ics = rank_ic.spearman_ic_matrix(factors, targets)
+    expected = np.array(
+        [[_pandas_spearman(factors[:, k], targets[:, j]) for j in range(3)] for k in range(5)]
+    )
+    np.testing.assert_allclose(ics, expected, atol=1e-12, equal_nan=True)
+
+
+def test_ic_matrix_min_periods():
+    factors = np.array([[1.0], [2.0], [np.nan], [np.nan]])
+    targets = np.array([[1.0], [3.0], [2.0], [4.0]])
+    assert np.isnan(rank_ic.spearman_ic_matrix(factors, targets)[0, 0])
+    assert rank_ic.spearman_ic_matrix(factors, targets, min_periods=2)[0, 0] == 1.0
+
+
+def test_rolling_spearman_matches_pandas():
+    rng = np.random.default_rng(1)
+    x = np.round(rng.normal(size=300), 1)
+    y = np.round(rng.normal(size=300) * 3)
+    y[100:150] = 1.0  # 窗口内常数 -> NaN
+    for window in (5, 60):
+        expected = [
+            pd.Series(x[i - window : i]).corr(pd.Series(y[i - window : i]), method="spearman")
+            for i in range(window, len(x) + 1)
+        ]
+        np.testing.assert_allclose(
+            rank_ic.rolling_spearman(x, y, window), expected, atol=1e-12, equal_nan=True
+        )
+    assert len(rank_ic.rolling_spearman(x[:10], y[:10], 20)) == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -12,6 +12,8 @@ import json
 import os
 from typing import Any
 
+from ..execution.ledger_log import SegmentLog
+
 
 class LiveMetrics:
     """
@@ -64,7 +66,21 @@ class LiveMetrics:
         """
         Load initial state from existing files
         """
-        # Load trade ledger to get initial trades
+        # Load trade ledger events to get initial trades. The ledger's segment log is
+        # opened read-only so a running TradeLedger keeps its writer lock; the legacy
+        # JSON file is only read when no segment log exists yet.
+        segment_dir = os.path.join(self.data_dir, "trade_ledger_segments")
+        if os.path.isdir(segment_dir):
+            try:
+                log = SegmentLog(segment_dir, read_only=True)
+                try:
+                    self.trades = [self._without_seq(record) for record in log.read()]
+                finally:
+                    log.close()
+            except (OSError, ValueError):
+                pass
+            return
+
         trade_ledger_path = os.path.join(self.data_dir, "trade_ledger.json")
         if os.path.exists(trade_ledger_path):
             try:
@@ -73,6 +89,11 @@ class LiveMetrics:
             except (OSError, json.JSONDecodeError):
                 pass
 
+    @staticmethod
+    def _without_seq(record: dict[str, Any]) -> dict[str, Any]:
+        record.pop("seq", None)
+        return record
+
     def update_metrics(self, portfolio_snapshot: dict[str, Any]) -> dict[str, Any]:
         """
         Update metrics based on portfolio snapshot
@@ -240,10 +261,16 @@ class LiveMetrics:
                 trade_time_str = trade.get("timestamp")
                 if trade_time_str:
                     try:
-                        trade_time = datetime.datetime.fromisoformat(trade_time_str.rstrip("Z"))
+                        if isinstance(trade_time_str, (int, float)):
+                            # Ledger events carry epoch seconds
+                            trade_time = datetime.datetime.utcfromtimestamp(trade_time_str)
+                        else:
+                            trade_time = datetime.datetime.fromisoformat(
+                                trade_time_str.rstrip("Z")
+                            )
                         if trade_time >= week_start:
                             weekly_count += 1
-                    except ValueError:
+                    except (ValueError, OverflowError, OSError):
                         continue
 
         return weekly_count